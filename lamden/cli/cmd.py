@@ -1,10 +1,14 @@
+from contracting.db.driver import ContractDriver
 from contracting.db.encoder import decode
 from lamden.crypto.wallet import Wallet
 from lamden.logger.base import get_logger
 from lamden.nodes.base import Node
-from lamden.storage import STORAGE_HOME
+from lamden.nodes.hold_time import HoldTime
+from lamden.snapshot import SnapshotHandler
+from lamden.storage import STORAGE_HOME, COMPACT_KEEP_DAYS, TIER_KEEP_DAYS, BlockStorage, NonceStorage
 
 from lamden.utils.add_block_num_to_state import AddBlockNum
+from lamden.utils.fsck import StorageChecker, REPAIRABLE
 from lamden.utils.migrate_blocks_dir import MigrateFiles
 
 import argparse
@@ -100,6 +104,17 @@ def release_all_state_locks(contract_state_path: str):
                 shutil.rmtree(dir_path)
                 print(f"Removed Lock on state: {dir_path}")
 
+def get_hold_time():
+    # Holding txs only as long as work takes to arrive from peers is opt in, the fixed delay is used otherwise.
+    adaptive_hold_time = os.environ.get('ADAPTIVE_HOLD_TIME', None)
+    if adaptive_hold_time is None or adaptive_hold_time.lower() != "true":
+        return None
+
+    return HoldTime(
+        percentile=float(os.environ.get('HOLD_TIME_PERCENTILE', 99)),
+        margin=float(os.environ.get('HOLD_TIME_MARGIN', 0.1))
+    )
+
 def start_node(args):
     sk = bytes.fromhex(os.environ['LAMDEN_SK'])
     wallet = Wallet(seed=sk)
@@ -140,7 +155,8 @@ def start_node(args):
         private_network=get_private_network_ip(),
         run_catchup=run_catchup,
         run_validation=run_validation,
-        safe_block_num=safe_block_num
+        safe_block_num=safe_block_num,
+        hold_time=get_hold_time()
     )
 
     loop = asyncio.get_event_loop()
@@ -190,6 +206,12 @@ def join_network(args):
     if rollback_point == "-1":
         rollback_point = None
 
+    run_state_sync = False
+    enable_state_sync = os.environ.get('ENABLE_STATE_SYNC', None)
+    if enable_state_sync is not None:
+        if enable_state_sync.lower() == "true":
+            run_state_sync = True
+
     n = Node(
         debug=args.debug,
         wallet=wallet,
@@ -202,7 +224,9 @@ def join_network(args):
         rollback_point=rollback_point,
         run_catchup=run_catchup,
         run_validation=run_validation,
-        safe_block_num=safe_block_num
+        safe_block_num=safe_block_num,
+        run_state_sync=run_state_sync,
+        hold_time=get_hold_time()
     )
 
     loop = asyncio.get_event_loop()
@@ -224,6 +248,32 @@ def setup_lamden_parser(parser):
     join_parser.add_argument('-gb', '--genesis_block', type=str, default='~/genesis_block.json')
     join_parser.add_argument('-rp', '--rollback_point', type=str, default="-1")
 
+    compact_parser = subparser.add_parser('compact')
+    compact_parser.add_argument('-k', '--keep_days', type=int, default=COMPACT_KEEP_DAYS)
+
+    subparser.add_parser('expand')
+
+    prune_parser = subparser.add_parser('prune')
+    prune_parser.add_argument('-b', '--keep_blocks', type=int, default=None)
+    prune_parser.add_argument('-k', '--keep_days', type=int, default=None)
+    prune_parser.add_argument('-s', '--keep_state_history', type=str, default='true')
+
+    tier_parser = subparser.add_parser('tier')
+    tier_parser.add_argument('tier', type=str, choices=['cold', 'hot'])
+    tier_parser.add_argument('-k', '--keep_days', type=int, default=TIER_KEEP_DAYS)
+
+    fsck_parser = subparser.add_parser('fsck')
+    fsck_parser.add_argument('-r', '--repair', type=str, default='false')
+    fsck_parser.add_argument('-p', '--processes', type=int, default=None)
+
+    snapshot_parser = subparser.add_parser('snapshot')
+    snapshot_parser.add_argument('action', type=str, choices=['export', 'import'])
+    snapshot_parser.add_argument('-p', '--path', type=str, default=None)
+    snapshot_parser.add_argument('-sh', '--snapshot_hash', type=str, default=None)
+
+    migrate_parser = subparser.add_parser('migrate')
+    migrate_parser.add_argument('migration', type=str, choices=['block_aliases', 'state_history'])
+
 
 def migrate_storage():
     blocks_dir = os.path.join(STORAGE_HOME, 'blocks')
@@ -248,6 +298,123 @@ def migrate_storage():
 
         logger.info("Completed Adding Block Numbers to State! \n")
 
+    # Only this one process builds the block hash index, nodes and tools opening the storage just warn it's missing.
+    if BlockStorage(root=STORAGE_HOME).needs_block_hash_index():
+        migrate_block_aliases()
+
+def compact_storage(args):
+    logger.warning(f"Packing blocks older than {args.keep_days} days...")
+
+    buckets = BlockStorage(root=STORAGE_HOME).compact_cold_blocks(keep_days=args.keep_days)
+
+    logger.info(f"Packed {buckets} day buckets! \n")
+
+def expand_storage():
+    logger.warning("Expanding packed blocks...")
+
+    blocks = BlockStorage(root=STORAGE_HOME).expand_packs()
+
+    logger.info(f"Restored {blocks} blocks! \n")
+
+def prune_storage(args):
+    if args.keep_blocks is None and args.keep_days is None:
+        logger.error("Set --keep_blocks and/or --keep_days to prune.")
+        return
+
+    logger.warning(f"Pruning blocks outside of {args.keep_blocks} blocks / {args.keep_days} days...")
+
+    blocks = BlockStorage(root=STORAGE_HOME).prune_blocks(
+        keep_blocks=args.keep_blocks,
+        keep_days=args.keep_days,
+        keep_state_history=args.keep_state_history.lower() == 'true'
+    )
+
+    logger.info(f"Pruned {blocks} blocks! \n")
+
+def move_storage_tier(args):
+    block_storage = BlockStorage(root=STORAGE_HOME)
+
+    if block_storage.roots.get('cold_blocks') is None:
+        logger.error("No cold_blocks root set in LAMDEN_STORAGE_ROOTS.")
+        return
+
+    if args.tier == 'cold':
+        logger.warning(f"Moving blocks older than {args.keep_days} days to the cold tier...")
+        buckets = block_storage.move_to_cold_tier(keep_days=args.keep_days)
+    else:
+        logger.warning("Moving all blocks back to the hot tier...")
+        buckets = block_storage.move_to_hot_tier()
+
+    logger.info(f"Moved {buckets} day buckets! \n")
+
+def check_storage(args):
+    repair = args.repair.lower() == 'true'
+    logger.warning(f"Checking block storage{' and repairing it' if repair else ''}, the node should be stopped...")
+
+    # Missing member history can only be written back signed by the node.
+    sk = os.environ.get('LAMDEN_SK')
+    wallet = Wallet(seed=bytes.fromhex(sk)) if sk is not None else None
+
+    report = StorageChecker(lamden_root=STORAGE_HOME, processes=args.processes, repair=repair, wallet=wallet).start()
+
+    for issue, count in report['issues'].items():
+        logger.error(f"{issue}: {count} found, {report['repaired'].get(issue, 0)} repaired, eg. {report['examples'][issue][:3]}")
+
+    unrepaired = [issue for issue in report['issues'] if issue not in REPAIRABLE]
+    if len(unrepaired) > 0:
+        logger.error(f"{', '.join(unrepaired)} can't be repaired, sync the affected blocks again from peers.")
+
+    logger.info(f"Checked {report['checked'].get('blocks', 0)} blocks and {report['checked'].get('txs', 0)} txs! \n")
+
+def create_snapshot_handler():
+    block_storage = BlockStorage(root=STORAGE_HOME)
+
+    # Member history is signed by the node, restored entries have to carry its signature to be trusted.
+    sk = os.environ.get('LAMDEN_SK')
+    if sk is not None:
+        block_storage.member_history.set_secure(wallet=Wallet(seed=bytes.fromhex(sk)))
+
+    return SnapshotHandler(
+        block_storage=block_storage,
+        contract_driver=ContractDriver(),
+        nonce_storage=NonceStorage(root=STORAGE_HOME)
+    )
+
+def export_snapshot():
+    logger.warning("Exporting snapshot, the node should be stopped...")
+
+    manifest = create_snapshot_handler().export()
+
+    logger.info(f"Exported snapshot of block {manifest['number']} with hash {manifest['snapshot_hash']}! \n")
+
+def import_snapshot(args):
+    snapshot_handler = create_snapshot_handler()
+
+    path = args.path or snapshot_handler.get_latest_snapshot()
+    if path is None:
+        logger.error("No snapshot found to import.")
+        return
+
+    logger.warning(f"Importing snapshot from {path}, current state and blocks will be replaced...")
+
+    manifest = snapshot_handler.restore(path=path, expected_hash=args.snapshot_hash)
+
+    logger.info(f"Restored snapshot of block {manifest['number']}! \n")
+
+def migrate_block_aliases():
+    logger.warning("Building block hash index from stored blocks, the node should be stopped...")
+
+    BlockStorage(root=STORAGE_HOME).migrate_block_aliases()
+
+    logger.info("Built block hash index! \n")
+
+def migrate_state_history():
+    logger.warning("Rebuilding state history from stored blocks, the node should be stopped...")
+
+    start = BlockStorage(root=STORAGE_HOME).rebuild_state_history()
+
+    logger.info(f"Rebuilt state history from block {start}! \n")
+
 def main():
     parser = argparse.ArgumentParser(description="Lamden Commands", prog='lamden')
     setup_lamden_parser(parser)
@@ -267,6 +434,26 @@ def main():
         start_node(args)
     elif args.command == 'join':
         join_network(args)
+    elif args.command == 'compact':
+        compact_storage(args)
+    elif args.command == 'expand':
+        expand_storage()
+    elif args.command == 'prune':
+        prune_storage(args)
+    elif args.command == 'tier':
+        move_storage_tier(args)
+    elif args.command == 'fsck':
+        check_storage(args)
+    elif args.command == 'snapshot':
+        if args.action == 'export':
+            export_snapshot()
+        else:
+            import_snapshot(args)
+    elif args.command == 'migrate':
+        if args.migration == 'block_aliases':
+            migrate_block_aliases()
+        else:
+            migrate_state_history()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
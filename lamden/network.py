@@ -10,9 +10,11 @@ from typing import List
 
 from lamden.utils import hlc
 from lamden.utils.retrieve_ips import IPFetcher
-from lamden.peer import Peer, ACTION_HELLO, ACTION_PING, ACTION_GET_BLOCK, ACTION_GET_LATEST_BLOCK, ACTION_GET_NEXT_BLOCK, ACTION_GET_PREV_BLOCK, ACTION_GET_NETWORK_MAP, ACTION_GET_NEXT_MEMBER_HISTORY
+from lamden.peer import Peer, ACTION_HELLO, ACTION_PING, ACTION_GET_BLOCK, ACTION_GET_LATEST_BLOCK, ACTION_GET_NEXT_BLOCK, ACTION_GET_PREV_BLOCK, ACTION_GET_NETWORK_MAP, ACTION_GET_NEXT_MEMBER_HISTORY, \
+    ACTION_GET_SNAPSHOT_MANIFEST, ACTION_GET_SNAPSHOT_CHUNK
 
 from lamden.crypto.wallet import Wallet
+from lamden.snapshot import SnapshotHandler
 from lamden.storage import BlockStorage, BLOCK_0
 
 from lamden.logger.base import get_logger
@@ -56,7 +58,7 @@ class PeerShutdownProcessor(Processor):
 class Network:
     def __init__(self, wallet: Wallet = Wallet(), driver: ContractDriver = ContractDriver(),
                  block_storage: BlockStorage = None, socket_ports: dict = None, local: bool = False,
-                 private_network=False):
+                 private_network=False, snapshot_handler: SnapshotHandler = None):
 
         # Private Network will force the node to report its IP address as the local IP as opposed to "internet" IP of
         # the network
@@ -67,6 +69,7 @@ class Network:
         self.wallet = wallet
         self.driver = driver
         self.block_storage = block_storage if block_storage is not None else BlockStorage()
+        self.snapshot_handler = snapshot_handler
 
         self.local = local
         self.private_network = private_network
@@ -346,6 +349,26 @@ class Network:
                 'hash': latest_block.get('hash', BLOCK_0['hash']),
                 'hlc_timestamp': latest_block.get('hlc_timestamp', '0'),
             }
+
+    def is_pruned_request(self, action: str, v, block_info: dict) -> bool:
+        # Whether the block a peer asked for is gone from our storage, see BlockStorage.prune_blocks. The pruned
+        # height is a block we removed, so the next block after anything below it and a previous block found at or
+        # under it skipped pruned blocks.
+        pruned_height = self.block_storage.get_pruned_height()
+        if pruned_height <= 0:
+            return False
+
+        if hlc.is_hcl_timestamp(hlc_timestamp=v):
+            v = hlc.nanos_from_hlc_timestamp(hlc_timestamp=v)
+
+        if action == ACTION_GET_NEXT_BLOCK:
+            return int(v) < pruned_height
+
+        if action == ACTION_GET_PREV_BLOCK:
+            return block_info is not None and int(block_info.get('number')) <= pruned_height
+
+        return self.block_storage.is_pruned(v)
+
     def get_highest_peer_block(self) -> int:
         highest_peer_block = 0
         for peer in self.get_all_connected_peers():
@@ -577,6 +600,18 @@ class Network:
                 if action == ACTION_GET_BLOCK:
                     block_info = self.block_storage.get_block(v=block_num or hlc_timestamp)
 
+                if self.is_pruned_request(action=action, v=block_num or hlc_timestamp, block_info=block_info):
+                    self.log('info', f'{action}: block {block_num or hlc_timestamp} is pruned, told {ident_vk_string[0:8]}')
+
+                    self.router.send_msg(
+                        ident_vk_bytes=ident_vk_bytes,
+                        to_vk=ident_vk_string,
+                        msg_str=('{"response": "%s", "block_info": null, "pruned": true, "pruned_height": %d}' % (
+                            action, self.block_storage.get_pruned_height()
+                        ))
+                    )
+                    return
+
                 if block_info is None:
                     self.log('warning', f'NO {action}: sent NONE to {ident_vk_string[0:8]}')
                 else:
@@ -607,6 +642,39 @@ class Network:
                 msg_str=('{"response": "%s", "member_history_info": %s}' % (ACTION_GET_NEXT_MEMBER_HISTORY, encoded_member_history_info))
             )
 
+        if action == ACTION_GET_SNAPSHOT_MANIFEST:
+            manifest = None
+            if self.snapshot_handler is not None:
+                manifest = self.snapshot_handler.get_latest_manifest()
+
+            self.router.send_msg(
+                ident_vk_bytes=ident_vk_bytes,
+                to_vk=ident_vk_string,
+                msg_str=encode({'response': ACTION_GET_SNAPSHOT_MANIFEST, 'manifest': manifest})
+            )
+
+        if action == ACTION_GET_SNAPSHOT_CHUNK:
+            block_num = msg.get('block_num')
+            index = msg.get('index')
+
+            chunk = None
+            if self.snapshot_handler is not None:
+                chunk = self.snapshot_handler.read_chunk(block_num=block_num, index=index)
+
+            self.router.send_msg(
+                ident_vk_bytes=ident_vk_bytes,
+                to_vk=ident_vk_string,
+                msg_str=encode({
+                    'response': ACTION_GET_SNAPSHOT_CHUNK,
+                    'block_num': block_num,
+                    'index': index,
+                    'chunk': chunk.decode() if chunk is not None else None
+                })
+            )
+
+            if chunk is not None:
+                self.log('info', f'Sent snapshot chunk {index} of block {block_num} to {ident_vk_string[0:8]}')
+
         if action == ACTION_GET_NETWORK_MAP:
             node_list = encode(self.make_network_map())
 
@@ -1,5 +1,6 @@
 import asyncio
 import copy
+import functools
 import gc
 import hashlib
 import json
@@ -42,6 +43,9 @@ from lamden.nodes.missing_blocks import MissingBlocksHandler
 from lamden.nodes.rollback_blocks import RollbackBlocksHandler
 from lamden.nodes.validate_chain import ValidateChainHandler
 from lamden.nodes.member_history import MemberHistoryHandler
+from lamden.nodes.state_sync import StateSyncHandler
+from lamden.snapshot import SnapshotHandler, SNAPSHOT_INTERVAL_HOURS_ENV, SNAPSHOT_INTERVAL_HOURS, SNAPSHOT_KEEP_ENV, \
+    SNAPSHOT_KEEP
 
 from lamden.crypto.transaction import build_transaction
 from datetime import datetime, timedelta
@@ -70,7 +74,7 @@ class Node:
                  consensus_percent=None, nonces=None, genesis_block=None, metering=False,
                  tx_queue=None, socket_ports=None, reconnect_attempts=5, join=False, event_writer=None,
                  private_network=False, hardcoded_peers=False, rollback_point=None, run_catchup=True,
-                 safe_block_num=None, run_validation=True):
+                 safe_block_num=None, run_validation=True, run_state_sync=False, hold_time=None):
 
         self.wallet = wallet
 
@@ -80,17 +84,27 @@ class Node:
         self.check_validation_queue_task = None
         self.connectivity_check_task = None
         self.check_for_tx_task = None
+        self.compact_blocks_task = None
+        self.prune_blocks_task = None
+        self.export_snapshot_task = None
         self.run_catchup = run_catchup
         self.run_validation = run_validation
+        self.run_state_sync = run_state_sync
 
         self.consensus_percent = consensus_percent or 51
         self.processing_delay_secs = delay or {
             'base': 1,
             'self': 0.5
         }
+        # Holds txs for as long as work takes to arrive from peers when given, the fixed delay otherwise.
+        self.hold_time = hold_time
 
         self.tx_queue = tx_queue if tx_queue is not None else FileQueue()
         self.pause_tx_queue_checking = False
+        self.tx_queue_wakeup = asyncio.Event()
+        self.tx_queue_poll_interval = 0.1
+        # Most txs processed in one pass of the main processing queue before other tasks get the event loop.
+        self.main_processing_batch_size = 100
 
         self.driver = driver if driver is not None else ContractDriver()
         self.nonces = nonces if nonces is not None else storage.NonceStorage()
@@ -138,12 +152,21 @@ class Node:
 
         self.bootnodes = bootnodes
 
+        self.snapshot_handler = SnapshotHandler(
+            block_storage=self.blocks,
+            contract_driver=self.driver,
+            nonce_storage=self.nonces,
+            interval_hours=float(os.environ.get(SNAPSHOT_INTERVAL_HOURS_ENV, SNAPSHOT_INTERVAL_HOURS)),
+            keep=int(os.environ.get(SNAPSHOT_KEEP_ENV, SNAPSHOT_KEEP))
+        )
+
         self.network = Network(
             wallet=wallet,
             socket_ports=socket_ports,
             driver=self.driver,
             block_storage=self.blocks,
-            private_network=private_network
+            private_network=private_network,
+            snapshot_handler=self.snapshot_handler
         )
 
         self.validation_queue = ValidationQueue(
@@ -155,6 +178,7 @@ class Node:
             get_block_by_hlc=self.get_block_by_hlc,
             get_block_from_network=self.get_block_from_network,# Abstract
             hard_apply_block=self.hard_apply_block,                                     # Abstract
+            discard_speculation=lambda: self.main_processing_queue.discard_speculation(),
             wallet=self.wallet,
             stop_node=self.stop
         )
@@ -174,7 +198,7 @@ class Node:
             wallet=self.wallet,
             metering=metering,
             hlc_clock=self.hlc_clock,
-            processing_delay=lambda: self.processing_delay_secs,                        # Abstract
+            processing_delay=self.get_processing_delay,                                 # Abstract
             get_last_hlc_in_consensus=self.get_last_hlc_in_consensus,                   # Abstract
             stop_node=self.stop,
             reprocess=self.reprocess,
@@ -192,7 +216,8 @@ class Node:
             get_last_processed_hlc=self.get_last_processed_hlc,
             stop_node=self.stop,
             driver=self.driver,
-            nonces=self.nonces
+            nonces=self.nonces,
+            hold_time=self.hold_time
         )
 
         self.block_contender = block_contender.Block_Contender(
@@ -212,6 +237,11 @@ class Node:
             hardcoded_peers=hardcoded_peers
         )
 
+        self.state_sync_handler: StateSyncHandler = StateSyncHandler(
+            network=self.network,
+            snapshot_handler=self.snapshot_handler
+        )
+
         self.member_history_handler: MemberHistoryHandler = MemberHistoryHandler(
             block_storage=self.blocks,
             network=self.network
@@ -247,6 +277,8 @@ class Node:
         self.reconnect_attempts = reconnect_attempts
 
         self.network_connectivity_check_timeout = 120
+        self.compact_blocks_interval = 3600
+        self.prune_blocks_interval = 600
 
     @property
     def vk(self) -> str:
@@ -315,6 +347,12 @@ class Node:
                 # will till connected to everyone
                 await self.network.connected_to_all_peers()
 
+                # A node joining with nothing but genesis can start from a snapshot instead of every block. It
+                # replaces the state and blocks the queues work on so it is restored before they start.
+                if self.rollback_point is None and self.run_catchup and self.run_state_sync \
+                        and self.blocks.total_blocks() <= 1:
+                    await self.state_sync_handler.run()
+
             # Start all queues and services
             self.start_validation_queue_task()
             self.start_main_processing_queue_task()
@@ -323,11 +361,22 @@ class Node:
             self.check_for_tx_task = loop.create_task(self.check_tx_queue())
             self.connectivity_check_task = loop.create_task(self.connectivity_check())
 
+            compact_after_days = os.environ.get(storage.COMPACT_AFTER_DAYS_ENV, None)
+            if compact_after_days is not None:
+                self.compact_blocks_task = loop.create_task(self.compact_blocks(keep_days=int(compact_after_days)))
+
+            retention_blocks = os.environ.get(storage.RETENTION_BLOCKS_ENV, None)
+            retention_days = os.environ.get(storage.RETENTION_DAYS_ENV, None)
+            if retention_blocks is not None or retention_days is not None:
+                self.prune_blocks_task = loop.create_task(self.prune_blocks(
+                    keep_blocks=int(retention_blocks) if retention_blocks is not None else None,
+                    keep_days=int(retention_days) if retention_days is not None else None
+                ))
+
             # Run catchup unless this was a rollback
             if self.rollback_point is None:
                 if self.run_catchup:
-                    member_history_task = asyncio.ensure_future(self.member_history_handler.catchup_history())
-                    member_history_task.add_done_callback(self.handle_member_history_result)
+                    self.start_member_history_catchup()
             else:
                 self.rollback_point = None
 
@@ -341,6 +390,10 @@ class Node:
     def start_node(self):
         asyncio.ensure_future(self.start())
 
+    def start_member_history_catchup(self):
+        member_history_task = asyncio.ensure_future(self.member_history_handler.catchup_history())
+        member_history_task.add_done_callback(self.handle_member_history_result)
+
     def handle_member_history_result(self, future):
         try:
             future.result()
@@ -369,6 +422,11 @@ class Node:
         await self.cancel_checking_all_queues()
 
         await self.stop_connectivity_check()
+        await self.stop_compact_blocks()
+        await self.stop_prune_blocks()
+        await self.stop_export_snapshot()
+
+        self.nonces.commit()
 
         await self.network.stop()
         self.system_monitor.stop()
@@ -466,19 +524,21 @@ class Node:
         self.log.debug(f'NODE RUNNING: {self.running}')
 
         await self.stop_connectivity_check()
+        await self.stop_check_tx_queue_task()
         self.log.info("!!!!!! check_tx_queue STOPPED !!!!!!")
 
+        # Stopping a queue wakes its loop, which then exits.
         if isinstance(self.main_processing_queue, TxProcessingQueue):
             self.main_processing_queue.stop()
-            while self.check_main_processing_queue_task and not self.check_main_processing_queue_task.done():
-                await asyncio.sleep(0.1)
+            if self.check_main_processing_queue_task is not None:
+                await asyncio.gather(self.check_main_processing_queue_task, return_exceptions=True)
 
         self.log.info("!!!!!! main_processing_queue STOPPED !!!!!!")
 
         if self.validation_queue is not None:
             self.validation_queue.stop()
-            while self.check_validation_queue_task and not self.check_validation_queue_task.done():
-                await asyncio.sleep(0.1)
+            if self.check_validation_queue_task is not None:
+                await asyncio.gather(self.check_validation_queue_task, return_exceptions=True)
 
         self.log.info("!!!!!! validation_queue STOPPED !!!!!!")
 
@@ -510,13 +570,27 @@ class Node:
 
     def pause_tx_queue(self):
         self.pause_tx_queue_checking = True
+        self.tx_queue_wakeup.set()
 
     def unpause_tx_queue(self):
         self.pause_tx_queue_checking = False
 
     async def check_tx_queue(self):
+        # Woken by the tx queue on every append, it's only checked every tx_queue_poll_interval where it can't
+        # signal appends.
+        watching = self.tx_queue.watch(callback=self.tx_queue_wakeup.set)
+
+        try:
+            await self.process_tx_queue(poll_interval=None if watching else self.tx_queue_poll_interval)
+        finally:
+            self.tx_queue.unwatch()
+
+    async def process_tx_queue(self, poll_interval: float = None):
         while self.running and not self.pause_tx_queue_checking:
-            if len(self.tx_queue) > 0:
+            self.tx_queue_wakeup.clear()
+
+            # Everything queued so far is taken in one go, it only has to be read and handed on.
+            while len(self.tx_queue) > 0 and self.running and not self.pause_tx_queue_checking:
                 self.log.debug("Calling Check TX File Queue")
                 tx_from_file = self.tx_queue.pop(0)
                 # TODO sometimes the tx info taken off the filequeue is None, investigate
@@ -534,8 +608,14 @@ class Node:
                     # add this tx the processing queue so we can process it
                     self.main_processing_queue.append(tx=tx_message)
 
+                await asyncio.sleep(0)
+
             self.debug_loop_counter['file_check'] = self.debug_loop_counter['file_check'] + 1
-            await asyncio.sleep(0.1)
+
+            try:
+                await asyncio.wait_for(self.tx_queue_wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
 
     async def stop_check_tx_queue_task(self):
         if self.check_for_tx_task is not None:
@@ -580,6 +660,103 @@ class Node:
 
         self.connectivity_check_task = None
 
+    async def compact_blocks(self, keep_days: int):
+        # Packs cold day buckets one at a time in a thread, packing is safe while the bucket is written to and only
+        # touches the bucket's files, its pack and the txs of its blocks.
+        while self.running:
+            try:
+                for bucket_path in self.blocks.get_cold_buckets(keep_days=keep_days):
+                    if not self.running:
+                        return
+                    await asyncio.get_event_loop().run_in_executor(
+                        None, functools.partial(self.blocks.compact_bucket, bucket_path=bucket_path)
+                    )
+            except Exception as err:
+                self.log.error(f'Failed to pack cold blocks: {err}')
+
+            await asyncio.sleep(self.compact_blocks_interval)
+
+    async def stop_compact_blocks(self):
+        if self.compact_blocks_task is not None:
+            self.compact_blocks_task.cancel()
+
+            try:
+                await asyncio.gather(self.compact_blocks_task, return_exceptions=True)
+            except asyncio.CancelledError:
+                print("compact_blocks_task was cancelled")
+            except Exception as e:
+                print(f"Unexpected exception: {e}")
+
+        self.compact_blocks_task = None
+
+    async def prune_blocks(self, keep_blocks: int = None, keep_days: int = None):
+        # Removes blocks outside the retention window, a batch at a time so processing gets the event loop back in
+        # between.
+        while self.running:
+            try:
+                while self.running and self.blocks.prune_blocks(
+                        keep_blocks=keep_blocks,
+                        keep_days=keep_days,
+                        limit=storage.PRUNE_BATCH_SIZE
+                ) > 0:
+                    await asyncio.sleep(0)
+            except Exception as err:
+                self.log.error(f'Failed to prune blocks: {err}')
+
+            await asyncio.sleep(self.prune_blocks_interval)
+
+    async def stop_prune_blocks(self):
+        if self.prune_blocks_task is not None:
+            self.prune_blocks_task.cancel()
+
+            try:
+                await asyncio.gather(self.prune_blocks_task, return_exceptions=True)
+            except asyncio.CancelledError:
+                print("prune_blocks_task was cancelled")
+            except Exception as e:
+                print(f"Unexpected exception: {e}")
+
+        self.prune_blocks_task = None
+
+    def check_snapshot(self, block: dict):
+        # Exports a snapshot when block starts a new snapshot interval, so peers offer matching manifests to joining
+        # nodes. Only once the block is the tip with its state on disk, ie. not while catching up or reordering.
+        if self.export_snapshot_task is not None or self.hold_blocks or self.catchup_handler.running:
+            return
+
+        block_num = block.get('number')
+        previous_block = self.blocks.get_previous_block(v=int(block_num))
+        previous_block_num = previous_block.get('number') if previous_block is not None else None
+
+        if not self.snapshot_handler.is_snapshot_block(block_num=block_num, previous_block_num=previous_block_num):
+            return
+
+        if self.blocks.get_latest_block_number() != int(block_num):
+            return
+
+        # Nothing is hard applied until the export is done, the state on disk has to stay at this block.
+        self.validation_queue.pause()
+        self.export_snapshot_task = asyncio.ensure_future(self.export_snapshot())
+
+    async def export_snapshot(self):
+        try:
+            # Nonces are only read from disk in the export thread, the cache and pending writes belong to the loop.
+            self.nonces.commit()
+            await asyncio.get_event_loop().run_in_executor(None, self.snapshot_handler.export)
+            self.snapshot_handler.prune_snapshots()
+        except Exception as err:
+            self.log.error(f'Failed to export snapshot: {err}')
+        finally:
+            self.validation_queue.unpause()
+            self.export_snapshot_task = None
+
+    async def stop_export_snapshot(self):
+        # The export runs in a thread and can't be cancelled, it is waited for so it isn't cut off half written.
+        if self.export_snapshot_task is not None:
+            await asyncio.gather(self.export_snapshot_task, return_exceptions=True)
+
+        self.export_snapshot_task = None
+
     async def check_main_processing_queue(self):
         self.main_processing_queue.start()
 
@@ -587,10 +764,19 @@ class Node:
             if len(self.main_processing_queue) > 0 and self.main_processing_queue.active:
                 self.main_processing_queue.start_processing()
                 await self.process_main_queue()
+
+                # Get the result of the next tx ready while its hold time runs out.
+                if self.running and self.main_processing_queue.active:
+                    self.main_processing_queue.speculate()
+
                 self.main_processing_queue.stop_processing()
 
             self.debug_loop_counter['main'] = self.debug_loop_counter['main'] + 1
-            await asyncio.sleep(0.1)
+
+            # Sleeps until a tx is appended, the queue is unpaused or stopped, or the first tx's hold time is up.
+            await self.main_processing_queue.wait_for_work(
+                timeout=self.main_processing_queue.time_until_ready() if self.main_processing_queue.active else None
+            )
 
         self.log.info(f'Exited Check Main Processing Queue.')
 
@@ -607,18 +793,27 @@ class Node:
                 #self.log.debug('[END] check_validation_queue')
 
             self.debug_loop_counter['validation'] = self.debug_loop_counter['validation'] + 1
-            await asyncio.sleep(0.1)
+
+            # Sleeps until a solution comes in, the queue is unpaused or stopped, or the earliest result is due to be
+            # checked again.
+            await self.validation_queue.wait_for_work(
+                timeout=self.validation_queue.time_until_recheck() if self.validation_queue.active else None
+            )
 
         self.log.info(f'Exited Check Validation Queue.')
 
     async def process_main_queue(self):
+        # Every tx whose hold time is up is processed in this one pass. Each one is soft applied before the next runs
+        # on its state, the members list and garbage collection are done once for the whole batch.
+        members = None
 
         try:
-            processing_results = await self.main_processing_queue.process_next()
+            async for processing_results in self.main_processing_queue.process_ready(limit=self.main_processing_batch_size):
+                if not self.running:
+                    break
 
-            if processing_results and self.running:
                 hlc_timestamp = processing_results.get('hlc_timestamp')
-                self.soft_apply_current_state(hlc_timestamp=hlc_timestamp)
+                self.soft_apply_current_state(hlc_timestamp=hlc_timestamp, collect_garbage=False)
 
                 if self.testing:
                     self.debug_processing_results.append(processing_results)
@@ -633,18 +828,28 @@ class Node:
                     if my_result_hash != block_result_hash:
                         await self.reprocess(tx=processing_results['tx_result']['transaction'])
                 else:
-                    processing_results = self.add_proof_to_processing_results(processing_results=processing_results)
+                    if members is None:
+                        members = self.network.get_node_list() or []
+
+                    processing_results = self.add_proof_to_processing_results(
+                        processing_results=processing_results,
+                        members=members
+                    )
                     self.store_solution_and_send_to_network(processing_results=processing_results)
 
         except Exception as err:
             self.log.error(err)
 
-    def add_proof_to_processing_results(self, processing_results: dict) -> dict:
+        finally:
+            gc.collect()
+
+    def add_proof_to_processing_results(self, processing_results: dict, members: list = None) -> dict:
         # Create merkle
         tx_result = processing_results.get('tx_result')
         hlc_timestamp = processing_results.get('hlc_timestamp')
         rewards = processing_results.get('rewards')
-        members = self.network.get_node_list() or []
+        if members is None:
+            members = self.network.get_node_list() or []
 
         if not tx_result or not hlc_timestamp or not rewards:
             raise ValueError('Invalid processing results. Cannot add proof.')
@@ -699,10 +904,14 @@ class Node:
     def send_solution_to_network(self, processing_results):
         asyncio.ensure_future(self.network.publisher.async_publish(topic_str=CONTENDER_SERVICE, msg_dict=processing_results))
 
-    def soft_apply_current_state(self, hlc_timestamp):
+    def soft_apply_current_state(self, hlc_timestamp, collect_garbage: bool = True):
+        # Any change to the current state leaves a speculative result out of date.
+        self.main_processing_queue.discard_speculation()
+
         try:
             self.driver.soft_apply(hcl=hlc_timestamp)
-            gc.collect()
+            if collect_garbage:
+                gc.collect()
         except Exception as err:
             self.log.error(err)
 
@@ -965,10 +1174,14 @@ class Node:
                 self.log.error(f'Failed to write "{NEW_BLOCK_EVENT}" event: {e}')
 
     def hard_apply_block_finish(self, block: dict):
+        # Nonces are held in memory until the block they came from is stored.
+        self.nonces.commit()
+
         state_changes = self.get_state_changes_from_block(block=block)
         if not self.blocks.is_genesis_block(block=block):
             self.check_peers(state_changes=state_changes, hlc_timestamp=block.get('hlc_timestamp'), block_num=block.get('number'))
             self.check_upgrade(state_changes=state_changes)
+            self.check_snapshot(block=block)
 
         gc.collect()
 
@@ -1226,6 +1439,8 @@ class Node:
 
     def rollback_drivers(self, hlc_timestamp):
         # Roll back the current state to the point of the last block consensus
+        self.main_processing_queue.discard_speculation()
+
         self.log.debug(f"Length of Pending Deltas BEFORE {len(self.driver.pending_deltas.keys())}")
         self.log.debug(f"rollback to hlc_timestamp: {hlc_timestamp}")
 
@@ -1338,6 +1553,12 @@ class Node:
         latest_block = self.blocks.get_latest_block()
         return latest_block
 
+    def get_processing_delay(self):
+        if self.hold_time is None:
+            return self.processing_delay_secs
+
+        return self.hold_time.get_delay(default=self.processing_delay_secs)
+
     def get_last_processed_hlc(self):
         return self.main_processing_queue.last_processed_hlc
 
@@ -154,6 +154,14 @@ class CatchupHandler:
             for future in responses:
                 try:
                     res = future.result()
+
+                    # Peers running with retention don't have old blocks, ask the others.
+                    if res.get('pruned'):
+                        peer = future.__peer__
+                        self.catchup_peers.remove(peer)
+                        self.log.info(f'{peer.server_vk} has pruned up to block {res.get("pruned_height")}, removed from catchup list. peers left {len(self.catchup_peers)}')
+                        continue
+
                     res_block = res['block_info']
                     res_block_num = res_block.get('number')
                     res_block_hash = res_block.get('hash')
@@ -203,6 +211,7 @@ class CatchupHandler:
 
         # Store block in storage
         self.block_storage.store_block(block=block)
+        self.nonce_storage.commit()
 
         self.log.info(f'Added block {block_num} from catchup.')
 
@@ -1,6 +1,8 @@
 from contracting.db.encoder import decode
 from lamden.logger.base import get_logger
+from lamden.storage import get_storage_roots
 from pathlib import Path
+import asyncio
 import os
 import pathlib
 import shutil
@@ -9,14 +11,19 @@ import uuid
 STORAGE_HOME = pathlib.Path().home().joinpath('.lamden')
 
 class FileQueue:
+    # Txs are appended by other processes (the webserver), so appends are also signalled through a named pipe in
+    # root. A process watching the queue wakes on it instead of checking the directory on a timer.
     EXTENSION = '.tx'
+    NOTIFY_FILENAME = '.txq_notify'
 
     def __init__(self, root=None, write_bytes=True):
         self.log = get_logger("TX QUEUE")
         self.file_mode = 'wb' if write_bytes else 'w'
-        self.root = Path(root) if root is not None else STORAGE_HOME
+        self.root = Path(root) if root is not None else Path(get_storage_roots().get('txq', STORAGE_HOME))
         self.txq = self.root.joinpath('txq')
         self.temp_txq = self.root.joinpath('temp_txq')
+        self.notify_path = self.root.joinpath(self.NOTIFY_FILENAME)
+        self.notify_fd = None
 
         self.__build_directories()
 
@@ -33,6 +40,61 @@ class FileQueue:
 
         os.rename(temp_filepath, final_filepath)
 
+        self.__notify()
+
+    def __notify(self):
+        # Nobody watching (no reader on the pipe) or a full pipe is fine, the tx is in the queue either way.
+        try:
+            fd = os.open(self.notify_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError:
+            return
+
+        try:
+            os.write(fd, b'\x00')
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def watch(self, callback) -> bool:
+        # Calls callback on the running loop after every append. Returns False where the pipe can't be set up, the
+        # queue has to be polled then.
+        if self.notify_fd is not None:
+            return True
+
+        try:
+            os.mkfifo(self.notify_path)
+        except FileExistsError:
+            pass
+        except (AttributeError, OSError) as err:
+            self.log.warning(f'Cannot watch TX queue at \'{self.root}\': {err}')
+            return False
+
+        # Opened for writing too so the pipe never reads as closed while no appender has it open.
+        fd = os.open(self.notify_path, os.O_RDWR | os.O_NONBLOCK)
+
+        def on_notify():
+            try:
+                while os.read(fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+            callback()
+
+        asyncio.get_event_loop().add_reader(fd, on_notify)
+        self.notify_fd = fd
+
+        return True
+
+    def unwatch(self):
+        if self.notify_fd is None:
+            return
+
+        asyncio.get_event_loop().remove_reader(self.notify_fd)
+        os.close(self.notify_fd)
+        self.notify_fd = None
+
     def pop(self, idx):
         files = sorted(self.txq.iterdir(), key=os.path.getmtime)
         try:
@@ -0,0 +1,103 @@
+from collections import deque
+from lamden.logger.base import get_logger
+import json
+import math
+import time
+
+
+class HoldTime:
+    def __init__(self, percentile: float = 99, margin: float = 0.1, minimum: float = 0.05, maximum: float = None,
+                 window: int = 500, min_samples: int = 50, update_interval: float = 1, reorder_backoff: float = 60):
+        '''
+            Works out how long the main processing queue holds txs from how late work arrives from each peer.
+
+            The lag of a work message is how far our clock is past its HLC when it arrives. A tx has to be held long
+            enough for any tx with an earlier HLC to arrive, so the hold time is the highest <percentile> lag of the
+            peers' last <window> lags plus <margin> seconds, at least <minimum>. It never goes past the fixed delay,
+            peers' txs are held at most the base delay and this node's own at most base plus self, unless a
+            <maximum> is given for both. It is worked out again at most every <update_interval> seconds.
+
+            The fixed delay is used until a peer has <min_samples> lags, and for <reorder_backoff> seconds after work
+            arrived older than what was already processed.
+        '''
+        self.log = get_logger('HOLD TIME')
+
+        self.percentile = percentile
+        self.margin = margin
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.min_samples = min_samples
+        self.update_interval = update_interval
+        self.reorder_backoff = reorder_backoff
+
+        self.lags = {}
+        self.hold_time = None
+        self.peer_lag = None
+
+        self.last_update = 0
+        self.backoff_until = 0
+
+    def record_lag(self, peer: str, lag: float):
+        lags = self.lags.get(peer)
+        if lags is None:
+            lags = self.lags[peer] = deque(maxlen=self.window)
+
+        lags.append(max(lag, 0))
+
+        if time.time() - self.last_update >= self.update_interval:
+            self.update()
+
+    def record_reorder(self):
+        self.backoff_until = time.time() + self.reorder_backoff
+        self.update()
+
+    def percentile_lag(self, peer: str):
+        lags = self.lags.get(peer)
+        if not lags or len(lags) < self.min_samples:
+            return None
+
+        lags = sorted(lags)
+        index = math.ceil(self.percentile / 100 * len(lags)) - 1
+
+        return lags[min(max(index, 0), len(lags) - 1)]
+
+    def update(self):
+        self.last_update = time.time()
+
+        peer_lags = [lag for lag in (self.percentile_lag(peer) for peer in self.lags) if lag is not None]
+        previous = self.hold_time
+
+        if len(peer_lags) == 0 or self.last_update < self.backoff_until:
+            self.peer_lag = None
+            self.hold_time = None
+        else:
+            self.peer_lag = max(peer_lags)
+            self.hold_time = max(self.peer_lag + self.margin, self.minimum)
+
+        if self.hold_time != previous:
+            self.log.debug(json.dumps({
+                'type': 'hold_time',
+                'hold_time': self.hold_time,
+                'peer_lag': self.peer_lag,
+                'percentile': self.percentile,
+                'peers': len(peer_lags),
+                'reorder_backoff': self.last_update < self.backoff_until
+            }))
+
+    def get_delay(self, default: dict) -> dict:
+        # The processing delay to hold txs for, default is the fixed delay used while there isn't enough to go on.
+        if self.hold_time is None:
+            return default
+
+        base_maximum = self.maximum if self.maximum is not None else default['base']
+        self_maximum = self.maximum if self.maximum is not None else default['base'] + default['self']
+
+        # The lag of this node's own txs is nothing, so they need the full hold time, extra on top of base only when
+        # base was capped.
+        base = min(self.hold_time, base_maximum)
+
+        return {
+            'base': base,
+            'self': max(min(self.hold_time, self_maximum) - base, 0)
+        }
@@ -53,6 +53,8 @@ class NonceEncoder(_json.JSONEncoder):
 
 
 class WebServer:
+    MAX_TX_INDEX_PAGE_SIZE = 1000
+
     def __init__(self, contracting_client: ContractingClient, driver: ContractDriver, wallet,
                  blocks: storage.BlockStorage, nonces: storage.NonceStorage=None,
                  missing_blocks_writer: MissingBlocksWriter = None,
@@ -132,6 +134,11 @@ class WebServer:
         # TX Route
         self.app.add_route(self.get_tx, '/tx', methods=['GET'])
 
+        # TX Index Routes
+        self.app.add_route(self.get_txs_by_sender, '/txs/sender/<vk>', methods=['GET'])
+        self.app.add_route(self.get_txs_by_contract, '/txs/contract/<contract>', methods=['GET'])
+        self.app.add_route(self.get_failed_txs, '/txs/failed', methods=['GET'])
+
         # Missing Blocks Route
         self.app.add_route(self.report_missing_blocks, '/report_missing_blocks', methods=['POST', 'OPTIONS'])
 
@@ -297,6 +304,8 @@ class WebServer:
             processor=tx['payload']['processor'],
             value=tx['payload']['nonce']
         )
+        # The queue is on disk so the nonce has to be too before the tx goes in.
+        self.nonces.commit()
 
         # Add TX to the processing queue
         self.queue.append(request.body)
@@ -392,7 +401,28 @@ class WebServer:
             key = key.split(',')
 
         k = self.client.raw_driver.make_key(contract=contract, variable=variable, args=key)
-        value = self.client.raw_driver.get(k)
+
+        # ?block=N answers with the value as it was once block N was applied, from the state history index.
+        block_num = request.args.get('block')
+        if block_num is not None:
+            try:
+                block_num = int(block_num)
+            except ValueError:
+                return response.json({'error': 'block must be a block number'}, status=400,
+                                     headers={'Access-Control-Allow-Origin': '*'})
+
+            # A missing value before the history starts isn't known to be unset, say so instead of a 404.
+            state_history_start = self.blocks.get_state_history_start()
+            if state_history_start is None:
+                return response.json({'error': 'state history is not available, run lamden migrate state_history'},
+                                     status=400, headers={'Access-Control-Allow-Origin': '*'})
+            if block_num < state_history_start:
+                return response.json({'error': f'state history starts at block {state_history_start}'}, status=400,
+                                     headers={'Access-Control-Allow-Origin': '*'})
+
+            value = self.blocks.get_state_value_at(key=k, block_num=block_num)
+        else:
+            value = self.client.raw_driver.get(k)
 
         if value is None:
             return response.json({'value': None}, status=404, headers={'Access-Control-Allow-Origin': '*'})
@@ -498,6 +528,50 @@ class WebServer:
 
         return response.json(tx, dumps=encode, headers={'Access-Control-Allow-Origin': '*'})
 
+    def get_tx_index_page(self, request, find):
+        # Shared by the tx index routes. ?limit=N (at most MAX_TX_INDEX_PAGE_SIZE) and ?before=<block number> page
+        # through the results newest first, 'next' is the before of the following page.
+        if self.blocks.tx_index is None:
+            return response.json({'error': 'Transaction indexes are not enabled.'}, status=404,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
+        try:
+            limit = int(request.args.get('limit', storage.TX_INDEX_PAGE_SIZE))
+            before = request.args.get('before')
+            before = int(before) if before is not None else None
+        except ValueError:
+            return response.json({'error': 'limit and before must be numbers'}, status=400,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
+        limit = min(max(limit, 1), self.MAX_TX_INDEX_PAGE_SIZE)
+        txs = find(limit=limit, before=before)
+
+        next_before = txs[-1].get('number') if len(txs) == limit else None
+
+        return response.json({'txs': txs, 'next': next_before}, headers={'Access-Control-Allow-Origin': '*'})
+
+    async def get_txs_by_sender(self, request, vk):
+        return self.get_tx_index_page(
+            request=request,
+            find=lambda limit, before: self.blocks.get_txs_by_sender(sender=vk, limit=limit, before=before)
+        )
+
+    async def get_txs_by_contract(self, request, contract):
+        function = request.args.get('function')
+
+        return self.get_tx_index_page(
+            request=request,
+            find=lambda limit, before: self.blocks.get_txs_by_contract(
+                contract=contract, function=function, limit=limit, before=before
+            )
+        )
+
+    async def get_failed_txs(self, request):
+        return self.get_tx_index_page(
+            request=request,
+            find=lambda limit, before: self.blocks.get_failed_txs(limit=limit, before=before)
+        )
+
     async def get_constitution(self, request):
         self.client.raw_driver.clear_pending_state()
 
@@ -52,13 +52,9 @@ class MemberHistoryHandler:
         if self.block_storage.member_history.has_history():
             self.block_storage.member_history.purge()
 
-        block = self.block_storage.get_next_block(v=-1)
-
-        while block is not None:
+        for block in self.block_storage.iter_blocks():
             self.process_from_block(block=block)
 
-            block = self.block_storage.get_next_block(v=int(block.get('number')))
-
     def process_from_block(self, block: dict):
         if self.block_storage.is_genesis_block(block=block):
             state_changes = block['genesis']
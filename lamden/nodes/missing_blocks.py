@@ -251,6 +251,7 @@ class MissingBlocksHandler:
 
         # Store block in storage
         self.block_storage.store_block(block=block)
+        self.nonce_storage.commit()
 
         self.log.info(f'Processed missing block {block_num}.')
 
@@ -262,19 +263,11 @@ class MissingBlocksHandler:
         # start with the block passed in
         current_block = starting_block
 
-        while True:
-            # Get the current block's number and hash
-            current_block_number = current_block.get('number')
+        # Walk every later block in sequence, only the block just handed out is ever rewritten
+        for next_block in self.block_storage.iter_blocks(start=int(starting_block_number) + 1):
+            # Get the current block's hash
             current_block_hash = current_block.get('hash')
 
-            # Get the next block in sequence
-            next_block = self.block_storage.get_next_block(v=int(current_block_number))
-
-            # If there is no next block, we are done
-            if next_block is None:
-                break
-
-
             next_block_number = next_block.get('number')
             next_block_previous_hash = next_block.get('previous')
 
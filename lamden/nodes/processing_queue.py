@@ -1,6 +1,7 @@
 import time
 import datetime
 import hashlib
+import heapq
 import math
 
 from contracting.stdlib.bridge.time import Datetime
@@ -56,6 +57,9 @@ class TxProcessingQueue(ProcessingQueue):
         self.append_history = []
         self.currently_processing_hlc = ""
 
+        # Side buffer for the result of the first tx, executed while it's held. See speculate.
+        self.speculation = None
+
     def append(self, tx):
         if not self.allow_append:
             return
@@ -77,27 +81,61 @@ class TxProcessingQueue(ProcessingQueue):
                 tx['in_queue'] = self.hlc_already_in_queue(hlc_timestamp=hlc_timestamp)
                 self.append_history.append(tx)
 
+            # An earlier tx goes first, so a speculative result for a later one is on the wrong state.
+            if self.speculation is not None and hlc_timestamp < self.speculation['hlc_timestamp']:
+                self.discard_speculation()
+
             tx['timestamp'] = time.time()
-            super().append(tx)
-            self.sort_queue()
+            self.txs[hlc_timestamp] = tx
+            heapq.heappush(self.heap, hlc_timestamp)
+            self.notify()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __getitem__(self, index):
+        if index == 0:
+            return self.txs[self.heap[0]] if self.heap else None
+        return super().__getitem__(index)
+
+    @property
+    def queue(self):
+        # The queue is a heap of HLCs with the txs keyed by HLC in self.txs, which is also what duplicates are checked
+        # against. This sorts the heap to list every tx in HLC order, processing only ever looks at the head.
+        return [self.txs[hlc_timestamp] for hlc_timestamp in sorted(self.heap)]
+
+    @queue.setter
+    def queue(self, txs):
+        self.txs = {tx['hlc_timestamp']: tx for tx in txs}
+        self.heap = list(self.txs)
+        heapq.heapify(self.heap)
 
     def flush(self):
         super().flush()
+        self.discard_speculation()
+
+    def pause(self):
+        # Whatever the queue is paused for (rollback, catchup) changes the state speculation ran on.
+        super().pause()
+        self.discard_speculation()
 
     def sort_queue(self):
-        # sort the main processing queue by hlc_timestamp
-        self.queue.sort(key=lambda x: x['hlc_timestamp'])
+        # the heap keeps the main processing queue ordered by hlc_timestamp
+        heapq.heapify(self.heap)
 
     def filter_queue(self):
-        # filter the main processing to remove hlc that are already in consensus
+        # remove hlcs that are already in consensus, being the earliest they are always at the head of the heap
         last_hlc_in_consensus = self.get_last_hlc_in_consensus()
-        self.queue = [tx for tx in self.queue if tx.get('hlc_timestamp') > last_hlc_in_consensus]
+
+        while self.heap and self.heap[0] <= last_hlc_in_consensus:
+            del self.txs[heapq.heappop(self.heap)]
+
+    def pop_next(self):
+        hlc_timestamp = heapq.heappop(self.heap)
+        return self.txs.pop(hlc_timestamp)
 
     def hlc_already_in_queue(self, hlc_timestamp):
-        for tx in self.queue:
-            if tx['hlc_timestamp'] == hlc_timestamp:
-                return True
-        return False
+        return hlc_timestamp in self.txs
 
     def hlc_earlier_than_consensus(self, hlc_timestamp):
         return hlc_timestamp < self.get_last_hlc_in_consensus()
@@ -109,12 +147,11 @@ class TxProcessingQueue(ProcessingQueue):
         self.filter_queue()
 
         # return if the queue is empty
-        if len(self.queue) == 0:
+        if len(self) == 0:
             #self.log.debug('[STOP] process_main_queue - 1')
             return
 
-        # Pop it out of the main processing queue
-        tx = self.queue.pop(0)
+        tx = self[0]
 
         self.currently_processing_hlc = tx['hlc_timestamp']
 
@@ -126,6 +163,9 @@ class TxProcessingQueue(ProcessingQueue):
 
         # If the transaction has been held for enough time then process it.
         if time_in_queue > time_delay:
+            # Pop it out of the main processing queue
+            self.pop_next()
+
             '''
             if self.debug:
                 self.log.debug(json.dumps({
@@ -144,7 +184,7 @@ class TxProcessingQueue(ProcessingQueue):
                 # Process it to get the results
                 try:
                     del tx['timestamp']
-                    processing_results = self.process_tx(tx=tx)
+                    processing_results = self.commit_speculation(tx=tx) or self.process_tx(tx=tx)
 
                 except Exception as err:
                     self.log.error(err)
@@ -160,11 +200,103 @@ class TxProcessingQueue(ProcessingQueue):
                 # self.log.debug('[STOP] process_main_queue - 3')
                 return processing_results
         else:
-            # else, put it back in queue
-            self.queue.insert(0, tx)
+            # else, leave it at the head of the queue
             # self.log.debug('[STOP] process_main_queue - 4')
             return None
 
+    def speculate(self):
+        # Executes the first tx while it's still held, on the state it will be processed on unless something else
+        # changes it first. Its writes and reads go in a side buffer, not the driver, until commit_speculation.
+        # Everything soft_apply builds the tx's deltas from is swapped out, or a discarded speculation would leave its
+        # reads in the deltas of whatever is soft applied next.
+        if len(self) == 0 or len(self.driver.pending_writes) > 0:
+            return
+
+        tx = self[0]
+        hlc_timestamp = tx['hlc_timestamp']
+
+        if self.speculation is not None and self.speculation['hlc_timestamp'] == hlc_timestamp:
+            return
+
+        # Earlier than what was processed already, so it's a rollback and not processed on the current state.
+        if hlc_timestamp < self.last_processed_hlc:
+            return
+
+        self.discard_speculation()
+
+        reads = self.driver.reads
+        pending_reads = self.driver.pending_reads
+        self.driver.reads = set()
+        self.driver.pending_reads = {}
+
+        try:
+            processing_results = self.process_tx(tx=tx)
+        except Exception as err:
+            self.log.error(err)
+            processing_results = None
+
+        if processing_results is not None:
+            self.speculation = {
+                'hlc_timestamp': hlc_timestamp,
+                'last_processed_hlc': self.last_processed_hlc,
+                'processing_results': processing_results,
+                'writes': dict(self.driver.pending_writes),
+                'reads': self.driver.reads,
+                'pending_reads': self.driver.pending_reads
+            }
+
+        self.driver.pending_writes.clear()
+        self.driver.reads = reads
+        self.driver.pending_reads = pending_reads
+
+    def commit_speculation(self, tx):
+        # Puts the speculative writes and reads of tx back in the driver and returns its processing results, None if
+        # there is no speculation for tx or the state changed since it ran.
+        speculation = self.speculation
+        self.speculation = None
+
+        if speculation is None or speculation['hlc_timestamp'] != tx['hlc_timestamp']:
+            return None
+
+        if speculation['last_processed_hlc'] != self.last_processed_hlc or len(self.driver.pending_writes) > 0:
+            return None
+
+        self.driver.pending_writes.update(speculation['writes'])
+        self.driver.reads = self.driver.reads | speculation['reads']
+        # Nothing was written since the speculation ran, so any value read since then is the same one.
+        self.driver.pending_reads = {**speculation['pending_reads'], **self.driver.pending_reads}
+
+        return speculation['processing_results']
+
+    def discard_speculation(self):
+        self.speculation = None
+
+    async def process_ready(self, limit: int = None):
+        # Drain mode of process_next, yields the results of every tx whose hold time is up in HLC order. The caller
+        # has to be done with a result (ie. have soft applied its state) before asking for the next one, that's the
+        # state the next tx runs on. Stops early when the queue is paused, ie. by a rollback.
+        processed = 0
+
+        while self.active and (limit is None or processed < limit):
+            time_until_ready = self.time_until_ready()
+
+            if time_until_ready is None or time_until_ready > 0:
+                return
+
+            processing_results = await self.process_next()
+            processed += 1
+
+            if processing_results is not None:
+                yield processing_results
+
+    def time_until_ready(self):
+        # Seconds until the first tx has been held long enough to be processed, None while the queue is empty.
+        if len(self) == 0:
+            return None
+
+        tx = self[0]
+        return tx.get('timestamp', 0) + self.hold_time(tx=tx) - time.time()
+
     def hold_time(self, tx):
         processing_delay = self.processing_delay()
 
@@ -1,5 +1,6 @@
 from lamden.logger.base import get_logger
 from lamden.nodes.processors.processor import Processor
+from lamden.nodes.hold_time import HoldTime
 from lamden.crypto.wallet import verify
 from lamden.crypto.canonical import tx_hash_from_tx
 from contracting.db.driver import ContractDriver
@@ -56,7 +57,7 @@ def valid_message_payload(msg: dict) -> bool:
 
 class WorkValidator(Processor):
     def __init__(self, hlc_clock, wallet, main_processing_queue, get_last_processed_hlc, stop_node,
-                 driver: ContractDriver, nonces = storage.NonceStorage()):
+                 driver: ContractDriver, nonces = storage.NonceStorage(), hold_time: HoldTime = None):
 
         self.log = get_logger('Work Inbox')
 
@@ -69,6 +70,7 @@ class WorkValidator(Processor):
         self.wallet = wallet
         self.hlc_clock = hlc_clock
         self.stop_node = stop_node
+        self.hold_time = hold_time
 
 
     async def process_message(self, msg):
@@ -104,13 +106,20 @@ class WorkValidator(Processor):
             self.log.error(f' {OLDER_HLC_RECEIVED}: {msg["hlc_timestamp"]} received AFTER {self.get_last_processed_hlc()} was processed!')
             # TODO at this point we might be processing a message that is older than one that we already did (from
             # UPDATE Looks like we will catch this situation later.  We can ignore it here
-            pass
+            if self.hold_time is not None:
+                self.hold_time.record_reorder()
 
         if not self.check_nonce(msg=msg):
             return
 
         self.save_nonce(msg=msg)
 
+        if self.hold_time is not None and msg['sender'] != self.wallet.verifying_key:
+            self.hold_time.record_lag(
+                peer=msg['sender'],
+                lag=self.hlc_clock.check_timestamp_age(timestamp=msg['hlc_timestamp']) / 1e9
+            )
+
         self.hlc_clock.merge_hlc_timestamp(event_timestamp=msg['hlc_timestamp'])
         self.main_processing_queue.append(msg)
 
@@ -2,6 +2,11 @@ import asyncio
 
 class ProcessingQueue:
     def __init__(self):
+        # Set by notify when the loop driving the queue has something new to look at, see wait_for_work.
+        self.wakeup = asyncio.Event()
+        # Set while nothing is being processed, what stopping and pausing wait on.
+        self.idle = asyncio.Event()
+
         self.running = False
         self.paused = False
         self.allow_append = True
@@ -23,12 +28,14 @@ class ProcessingQueue:
 
     def stop(self):
         self.running = False
+        self.notify()
 
     def pause(self):
         self.paused = True
 
     def unpause(self):
         self.paused = False
+        self.notify()
 
     def disable_append(self):
         self.allow_append = False
@@ -42,23 +49,50 @@ class ProcessingQueue:
     def stop_processing(self):
         self.currently_processing = False
 
+    @property
+    def currently_processing(self):
+        return not self.idle.is_set()
+
+    @currently_processing.setter
+    def currently_processing(self, value):
+        if value:
+            self.idle.clear()
+        else:
+            self.idle.set()
+
     @property
     def active(self):
         return self.running and not self.paused
 
+    def notify(self):
+        self.wakeup.set()
+
+    async def wait_for_work(self, timeout: float = None):
+        # Returns once notify was called since the last wait (an append, unpause or stop) or after timeout, for work
+        # that only becomes ready with time. The loop always gets a turn, even when there's work waiting already.
+        if timeout is not None and timeout <= 0:
+            await asyncio.sleep(0)
+        else:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        # Anything notified from here on is seen by the next pass, which hasn't started yet.
+        self.wakeup.clear()
+
     async def stopping(self):
-        while self.currently_processing:
-            await asyncio.sleep(0.1)
+        await self.idle.wait()
 
     async def pausing(self):
-        while self.currently_processing:
-            await asyncio.sleep(0.1)
+        await self.idle.wait()
 
     def flush(self):
         self.queue = []
 
     def append(self, item):
         self.queue.append(item)
+        self.notify()
 
     async def process_next(self):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
@@ -139,10 +139,12 @@ class RollbackBlocksHandler:
         self._safe_set_state_changes_and_rewards(block=genesis_block)
 
     def process_all_blocks(self):
-        current_block = self.block_storage.get_latest_block()
         last_print_time = time.time()
 
-        while self.block_storage.is_genesis_block(current_block) is False:
+        for current_block in self.block_storage.iter_blocks(reverse=True):
+            if self.block_storage.is_genesis_block(current_block):
+                break
+
             current_block_num = current_block.get('number')
 
             # Check if it has been more than 60 seconds since last print
@@ -153,4 +155,4 @@ class RollbackBlocksHandler:
             self._safe_set_state_changes_and_rewards(block=current_block)
             self._save_nonce_information(block=current_block)
 
-            current_block = self.block_storage.get_previous_block(v=int(current_block_num))
\ No newline at end of file
+        self.nonce_storage.commit()
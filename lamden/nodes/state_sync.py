@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import os
+import threading
+
+from lamden.logger.base import get_logger
+from lamden.network import Network
+from lamden.peer import Peer
+from lamden.snapshot import SnapshotHandler, SnapshotError
+
+from typing import List, Union
+
+
+class StateSyncHandler:
+    def __init__(self, network: Network, snapshot_handler: SnapshotHandler, max_parallel_requests: int = 8):
+        '''
+            Bootstraps a joining node from the latest snapshot its peers agree on. The manifest has to be offered by a
+            majority of the connected peers, its chunks are then fetched in parallel from the peers holding it and
+            checked against it before the snapshot is restored. Catchup only has to fetch the blocks after it.
+        '''
+        self.current_thread = threading.current_thread()
+
+        self.network = network
+        self.snapshot_handler = snapshot_handler
+        self.max_parallel_requests = max_parallel_requests
+
+        self.log = get_logger(f'[{self.current_thread.name}][STATE SYNC HANDLER]')
+
+        self.running = False
+
+    async def run(self) -> Union[dict, None]:
+        self.running = True
+
+        try:
+            peers = self.network.get_all_connected_peers()
+
+            if len(peers) == 0:
+                self.log.error('No peers available for state sync!')
+                return None
+
+            manifest, manifest_peers = await self.get_agreed_manifest(peers=peers)
+
+            if manifest is None:
+                self.log.warning('Peers do not agree on a snapshot, falling back to block catchup.')
+                return None
+
+            self.log.info(
+                f'Syncing snapshot {manifest.get("snapshot_hash")} of block {manifest.get("number")} '
+                f'({len(manifest.get("chunks"))} chunks) from {len(manifest_peers)} peers.'
+            )
+
+            path = await self.download_chunks(manifest=manifest, peers=manifest_peers)
+
+            # Restoring reads and writes the whole snapshot, the event loop keeps serving peers meanwhile.
+            await asyncio.get_event_loop().run_in_executor(
+                None,
+                functools.partial(self.snapshot_handler.restore, path=path, expected_hash=manifest.get('snapshot_hash'))
+            )
+
+            self.log.warning('State Sync Complete!')
+
+            return manifest
+        finally:
+            self.running = False
+
+    async def get_agreed_manifest(self, peers: List[Peer]) -> (Union[dict, None], List[Peer]):
+        responses = await asyncio.gather(*[peer.get_snapshot_manifest() for peer in peers], return_exceptions=True)
+
+        manifests = {}
+        holders = {}
+        for peer, res in zip(peers, responses):
+            if not isinstance(res, dict):
+                continue
+
+            manifest = res.get('manifest')
+
+            try:
+                self.snapshot_handler.check_manifest(manifest=manifest)
+            except SnapshotError:
+                continue
+
+            snapshot_hash = manifest.get('snapshot_hash')
+            manifests[snapshot_hash] = manifest
+            holders.setdefault(snapshot_hash, []).append(peer)
+
+        if len(holders) == 0:
+            return None, []
+
+        snapshot_hash = max(holders, key=lambda h: len(holders[h]))
+
+        # More than half of all the peers asked, not just of those that answered.
+        if len(holders[snapshot_hash]) * 2 <= len(peers):
+            return None, []
+
+        return manifests[snapshot_hash], holders[snapshot_hash]
+
+    async def download_chunks(self, manifest: dict, peers: List[Peer]) -> str:
+        path = self.snapshot_handler.get_download_path(block_num=manifest.get('number'))
+        os.makedirs(path, exist_ok=True)
+
+        # Chunks left over from an earlier attempt are kept if they still match.
+        queue = asyncio.Queue()
+        for chunk in manifest.get('chunks'):
+            if not self.snapshot_handler.has_chunk(path=path, chunk=chunk):
+                queue.put_nowait(chunk)
+
+        workers = min(self.max_parallel_requests, queue.qsize())
+        results = await asyncio.gather(*[
+            self.download_worker(queue=queue, manifest=manifest, path=path, peers=peers) for _ in range(workers)
+        ])
+
+        if not all(results):
+            raise SnapshotError(f'Could not fetch every chunk of snapshot {manifest.get("snapshot_hash")}.')
+
+        return self.snapshot_handler.finish_download(path=path, manifest=manifest)
+
+    async def download_worker(self, queue: asyncio.Queue, manifest: dict, path: str, peers: List[Peer]) -> bool:
+        while not queue.empty():
+            chunk = queue.get_nowait()
+
+            if not await self.download_chunk(manifest=manifest, chunk=chunk, path=path, peers=peers):
+                return False
+
+        return True
+
+    async def download_chunk(self, manifest: dict, chunk: dict, path: str, peers: List[Peer]) -> bool:
+        # Chunks are spread over the peers by index, the others are tried in turn if that one fails.
+        start = chunk.get('index') % len(peers)
+
+        for peer in peers[start:] + peers[:start]:
+            try:
+                res = await peer.get_snapshot_chunk(block_num=manifest.get('number'), index=chunk.get('index'))
+            except Exception as err:
+                self.log.error(f'Error fetching chunk {chunk.get("index")} from {peer.server_vk[:8]}: {err}')
+                continue
+
+            data = res.get('chunk') if isinstance(res, dict) else None
+
+            if isinstance(data, str) and self.snapshot_handler.write_chunk(path=path, chunk=chunk, data=data.encode()):
+                return True
+
+            self.log.warning(f'Peer {peer.server_vk[:8]} did not provide a valid chunk {chunk.get("index")}.')
+
+        return False
@@ -59,9 +59,9 @@ class ValidateChainHandler:
 
     def process_all_blocks(self, starting_block_num: int):
         previous_block = self.block_storage.get_block(v=starting_block_num)
-        block = self.block_storage.get_next_block(v=starting_block_num)
 
-        while block is not None:
+        # Each block is read once, its link to the previous block is checked when it comes up in the walk.
+        for block in self.block_storage.iter_blocks(start=int(starting_block_num) + 1):
             block_num = block.get('number')
 
             # Validate current block signatures and proofs
@@ -71,16 +71,7 @@ class ValidateChainHandler:
             self.save_member_history(block=block)
             self.set_validation_height(block_num=block_num)
 
-            # Validate new block's previous hash
-            next_block = self.block_storage.get_next_block(v=int(block_num))
-
-            if next_block is not None:
-                next_block_previous_hash = next_block.get('previous')
-
-                assert block.get('hash') == next_block_previous_hash, f'BLOCK CHAIN BROKEN: {next_block.get("number")} has bad previous hash.'
-
             previous_block = block
-            block = next_block
 
 
     def validate_block(self, block: dict) -> None:
@@ -13,7 +13,7 @@ from contracting.db.driver import ContractDriver
 
 class ValidationQueue(ProcessingQueue):
     def __init__(self, driver: ContractDriver, consensus_percent, wallet, hard_apply_block, stop_node, get_block_by_hlc,
-                 get_block_from_network, blocks, testing=False, debug=False):
+                 get_block_from_network, blocks, discard_speculation=None, testing=False, debug=False):
         super().__init__()
 
         self.log = get_logger("VALIDATION QUEUE")
@@ -23,6 +23,9 @@ class ValidationQueue(ProcessingQueue):
         self.started_checking = dict()
         self.last_checked = dict()
         self.checking_timeout = 30
+        # How often results waiting on consensus are checked again without new solutions coming in, the peers
+        # consensus is counted against can change in between.
+        self.recheck_interval = 1
 
         # Store confirmed solutions that I haven't got to yet
         self.last_hlc_in_consensus = ""
@@ -32,6 +35,7 @@ class ValidationQueue(ProcessingQueue):
         self.get_block_from_network = get_block_from_network
         self.hard_apply_block = hard_apply_block
         self.stop_node = stop_node
+        self.discard_speculation = discard_speculation
 
         self.determine_consensus = DetermineConsensus(
             consensus_percent=consensus_percent,
@@ -124,6 +128,23 @@ class ValidationQueue(ProcessingQueue):
         if self.validation_results[hlc_timestamp]['result_lookup'].get(result_hash) is None:
             self.validation_results[hlc_timestamp]['result_lookup'][result_hash] = processing_results
 
+        self.notify()
+
+    def time_until_recheck(self):
+        # Seconds the loop can wait for new solutions before checking the earliest result again, None while there
+        # are no results.
+        next_hlc_timestamp = self[0]
+
+        if next_hlc_timestamp is None:
+            return None
+
+        started_checking = self.started_checking.get(next_hlc_timestamp)
+
+        if started_checking is None or self.hlc_has_consensus(next_hlc_timestamp):
+            return 0
+
+        return min(self.recheck_interval, started_checking + self.checking_timeout - time.time())
+
     async def process_next(self):
         if len(self.validation_results) > 0:
             next_hlc_timestamp = self[0]
@@ -176,7 +197,7 @@ class ValidationQueue(ProcessingQueue):
             else:
                 # if we have future blocks that have had consensus that means we are behind and we should just ask the network for this block.
                 if self.later_consensus_exists(hlc_timestamp=next_hlc_timestamp):
-                    self.driver.rollback()
+                    self.rollback_driver()
                     await self.get_block_from_network_and_commit(hlc_timestamp=next_hlc_timestamp)
                     return
 
@@ -187,12 +208,19 @@ class ValidationQueue(ProcessingQueue):
                     # remove this hlc from the queue so we don't check it anymore
                     # also removes if from started_checking
                     self.flush_hlc(hlc_timestamp=next_hlc_timestamp)
-                    self.driver.rollback()
+                    self.rollback_driver()
 
                     # attempt to get block from network
                     await self.get_block_from_network_and_commit(hlc_timestamp=next_hlc_timestamp)
 
 
+    def rollback_driver(self):
+        self.driver.rollback()
+
+        # The main processing queue's speculative result ran on the state that was just dropped.
+        if self.discard_speculation is not None:
+            self.discard_speculation()
+
     def check_one(self, hlc_timestamp):
         #self.log.debug('[START] check_one')
 
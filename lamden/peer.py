@@ -27,6 +27,8 @@ ACTION_GET_NEXT_BLOCK = "get_next_block"
 ACTION_GET_PREV_BLOCK = "get_previous_block"
 ACTION_GET_NEXT_MEMBER_HISTORY = "get_next_member_history"
 ACTION_GET_NETWORK_MAP = "get_network_map"
+ACTION_GET_SNAPSHOT_MANIFEST = "get_snapshot_manifest"
+ACTION_GET_SNAPSHOT_CHUNK = "get_snapshot_chunk"
 
 class Peer:
     def __init__(self, ip: str, server_vk: str, local_wallet: Wallet, get_network_ip: Callable,
@@ -96,6 +98,8 @@ class Peer:
             'get_block': 15000,
             'get_next_block': 15000,
             'get_network_map': 15000,
+            'get_snapshot_manifest': 15000,
+            'get_snapshot_chunk': 60000,
             'gossip_new_block': 10000
         }
 
@@ -476,6 +480,16 @@ class Peer:
         msg_json = await self.send_request(msg_obj=msg_obj, timeout=self.timeouts.get(ACTION_GET_NETWORK_MAP), attempts=3)
         return msg_json
 
+    async def get_snapshot_manifest(self) -> (dict, None):
+        msg_obj = {'action': ACTION_GET_SNAPSHOT_MANIFEST}
+        msg_json = await self.send_request(msg_obj=msg_obj, timeout=self.timeouts.get(ACTION_GET_SNAPSHOT_MANIFEST), attempts=1)
+        return msg_json
+
+    async def get_snapshot_chunk(self, block_num: str, index: int) -> (dict, None):
+        msg_obj = {'action': ACTION_GET_SNAPSHOT_CHUNK, 'block_num': str(block_num), 'index': int(index)}
+        msg_json = await self.send_request(msg_obj=msg_obj, timeout=self.timeouts.get(ACTION_GET_SNAPSHOT_CHUNK), attempts=2)
+        return msg_json
+
     async def send_request(self, msg_obj: dict, timeout: int = 200, attempts: int = 3):
         if self.request is None:
             raise AttributeError("Request socket not setup.")
@@ -0,0 +1,425 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Union
+
+from contracting.db.driver import ContractDriver
+from contracting.db.encoder import encode, decode
+
+from lamden import storage
+from lamden.crypto.canonical import merklize
+from lamden.logger.base import get_logger
+from lamden.nodes.validate_chain import VALIDATION_HEIGHT
+
+SNAPSHOTS_DIR = 'snapshots'
+SNAPSHOT_VERSION = 2
+SNAPSHOT_MANIFEST_FILENAME = 'manifest.json'
+SNAPSHOT_CHUNK_SUFFIX = '.chunk'
+SNAPSHOT_CHUNK_MAX_BYTES = 4 * 1024 * 1024
+SNAPSHOT_READ_SIZE = 1024 * 1024
+
+# Running nodes export a snapshot at the first block of every interval of block numbers (HLC nanoseconds), which is
+# the same block on every node, and keep the latest few. An interval of 0 turns it off.
+SNAPSHOT_INTERVAL_HOURS_ENV = 'LAMDEN_SNAPSHOT_INTERVAL_HOURS'
+SNAPSHOT_INTERVAL_HOURS = 24
+SNAPSHOT_KEEP_ENV = 'LAMDEN_SNAPSHOT_KEEP'
+SNAPSHOT_KEEP = 2
+HOUR_NANOS = 3_600_000_000_000
+
+SECTION_STATE = 'state'
+SECTION_NONCES = 'nonces'
+SECTION_MEMBER_HISTORY = 'member_history'
+SECTION_BLOCKS = 'blocks'
+SECTIONS = [SECTION_STATE, SECTION_NONCES, SECTION_MEMBER_HISTORY, SECTION_BLOCKS]
+
+# Node bookkeeping kept next to contract state (latest block hash and height, validation and safe block height)
+# differs between honest nodes at the same block, so it is left out of snapshots. Contract keys never start with it.
+NODE_LOCAL_KEY_PREFIX = '__'
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def encode_record(record) -> bytes:
+    # Sorted keys and no whitespace so nodes holding the same state write the same bytes and the same hashes.
+    return json.dumps(json.loads(encode(record)), sort_keys=True, separators=(',', ':')).encode() + b'\n'
+
+
+def iter_state_keys(driver):
+    # Contract state keys in sorted order, one contract file at a time so the whole key set is never held. Keys are
+    # <contract>.<variable>..., and '.' sorts before any character of a contract name, so contract order is key order.
+    for filename in driver.get_contract_files():
+        if filename.endswith('-lock'):
+            continue
+
+        yield from sorted(driver.keys_from_file(filename))
+
+
+def chunk_filename(index: int) -> str:
+    return f'{str(index).zfill(8)}{SNAPSHOT_CHUNK_SUFFIX}'
+
+
+def snapshot_hash(manifest: dict) -> str:
+    # Merkle root over the snapshot header and every chunk, a chunk can be checked on its own against the manifest.
+    leaves = [f"{manifest.get('version')}:{manifest.get('number')}:{manifest.get('hash')}".encode()]
+    leaves.extend(
+        f"{chunk.get('section')}:{chunk.get('records')}:{chunk.get('size')}:{chunk.get('hash')}".encode()
+        for chunk in manifest.get('chunks', [])
+    )
+
+    return merklize(leaves)[0]
+
+
+class SnapshotChunkWriter:
+    def __init__(self, path: str, max_bytes: int = SNAPSHOT_CHUNK_MAX_BYTES):
+        '''
+            Streams records into numbered chunk files under path. A chunk only ever holds one section and is closed
+            once the next record would take it past max_bytes.
+        '''
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self.chunks = []
+        self.file = None
+        self.section = None
+        self.hasher = None
+        self.size = 0
+        self.records = 0
+
+    def add(self, section: str, record) -> None:
+        line = encode_record(record)
+
+        if self.file is None or section != self.section or (self.records > 0 and self.size + len(line) > self.max_bytes):
+            self._next_chunk(section=section)
+
+        self.file.write(line)
+        self.hasher.update(line)
+        self.size += len(line)
+        self.records += 1
+
+    def _next_chunk(self, section: str) -> None:
+        self._close_chunk()
+
+        self.file = open(os.path.join(self.path, chunk_filename(len(self.chunks))), 'wb')
+        self.section = section
+        self.hasher = hashlib.sha3_256()
+        self.size = 0
+        self.records = 0
+
+    def _close_chunk(self) -> None:
+        if self.file is None:
+            return
+
+        self.file.close()
+        self.chunks.append({
+            'index': len(self.chunks),
+            'section': self.section,
+            'records': self.records,
+            'size': self.size,
+            'hash': self.hasher.hexdigest()
+        })
+        self.file = None
+
+    def close(self) -> list:
+        self._close_chunk()
+        return self.chunks
+
+
+class SnapshotHandler:
+    def __init__(self, block_storage: storage.BlockStorage, contract_driver: ContractDriver,
+                 nonce_storage: storage.NonceStorage, root: str = None, chunk_max_bytes: int = SNAPSHOT_CHUNK_MAX_BYTES,
+                 interval_hours: float = SNAPSHOT_INTERVAL_HOURS, keep: int = SNAPSHOT_KEEP):
+        '''
+            Exports the contract state, nonces, member history and chain tip (plus genesis) at the latest block as a
+            directory of hashed chunks and a manifest, and restores a node from one. Snapshots live in
+            <root>/<block number>, root defaults to the snapshots dir next to the block storage.
+
+            Running nodes export at the first block of every <interval_hours> of block numbers and keep the last
+            <keep>, see is_snapshot_block.
+        '''
+        self.block_storage = block_storage
+        self.contract_driver = contract_driver
+        self.nonce_storage = nonce_storage
+
+        self.root = os.path.abspath(root if root is not None else os.path.join(block_storage.root, SNAPSHOTS_DIR))
+        self.chunk_max_bytes = chunk_max_bytes
+        self.interval = int(interval_hours * HOUR_NANOS)
+        self.keep = keep
+
+        self.log = get_logger('SNAPSHOT')
+
+    def get_snapshot_path(self, block_num: str) -> str:
+        return os.path.join(self.root, str(block_num))
+
+    def list_snapshots(self) -> list:
+        # Block numbers of the finished snapshots, oldest first.
+        if not os.path.isdir(self.root):
+            return []
+
+        snapshots = []
+        for entry in os.listdir(self.root):
+            if entry.isdigit() and os.path.isfile(os.path.join(self.root, entry, SNAPSHOT_MANIFEST_FILENAME)):
+                snapshots.append(entry)
+
+        return sorted(snapshots, key=int)
+
+    def get_latest_snapshot(self) -> Union[str, None]:
+        snapshots = self.list_snapshots()
+        return self.get_snapshot_path(snapshots[-1]) if snapshots else None
+
+    def is_snapshot_block(self, block_num, previous_block_num) -> bool:
+        # Whether block_num is the first block of an interval, judged from the block before it so every node holding
+        # the chain picks the same blocks.
+        if self.interval <= 0 or previous_block_num is None:
+            return False
+
+        return int(block_num) // self.interval != int(previous_block_num) // self.interval
+
+    def prune_snapshots(self) -> int:
+        # Removes all but the latest <keep> snapshots. Returns the number removed.
+        snapshots = self.list_snapshots()
+        old_snapshots = snapshots[:max(len(snapshots) - max(self.keep, 1), 0)]
+
+        for block_num in old_snapshots:
+            shutil.rmtree(self.get_snapshot_path(block_num), ignore_errors=True)
+
+        return len(old_snapshots)
+
+    def export(self) -> dict:
+        # Nothing may hard apply blocks while this runs, a running node pauses its validation queue. The tip is
+        # checked again at the end and the export is thrown away if the chain moved while it ran, as state would no
+        # longer match the block it is labelled with.
+        tip = self.block_storage.get_latest_block()
+
+        if tip is None:
+            raise SnapshotError('Block storage is empty, there is nothing to snapshot.')
+
+        block_num = str(tip.get('number'))
+        path = self.get_snapshot_path(block_num)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        try:
+            chunks = self.__write_chunks(path=tmp_path, tip=tip)
+
+            latest_block = self.block_storage.get_latest_block()
+            if latest_block is None or str(latest_block.get('number')) != block_num:
+                raise SnapshotError(f'Chain moved past block {block_num} during the export, stop the node and retry.')
+
+            manifest = {
+                'version': SNAPSHOT_VERSION,
+                'number': block_num,
+                'hash': tip.get('hash'),
+                'chunks': chunks
+            }
+            manifest['snapshot_hash'] = snapshot_hash(manifest)
+
+            with open(os.path.join(tmp_path, SNAPSHOT_MANIFEST_FILENAME), 'w') as f:
+                json.dump(manifest, f)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+        self.log.info(f'Exported snapshot {manifest["snapshot_hash"]} of block {block_num} in {len(chunks)} chunks.')
+
+        return manifest
+
+    def __write_chunks(self, path: str, tip: dict) -> list:
+        writer = SnapshotChunkWriter(path=path, max_bytes=self.chunk_max_bytes)
+
+        try:
+            for key in iter_state_keys(driver=self.contract_driver.driver):
+                if key.startswith(NODE_LOCAL_KEY_PREFIX):
+                    continue
+
+                value = self.contract_driver.driver.get(key)
+                if value is not None:
+                    writer.add(SECTION_STATE, [key, value])
+
+            for sender, processor, value in self.nonce_storage.iter_nonces():
+                writer.add(SECTION_NONCES, [sender, processor, value])
+
+            for block_num, members_list in self.block_storage.member_history.get_entries():
+                writer.add(SECTION_MEMBER_HISTORY, [block_num, members_list])
+
+            genesis_block = self.block_storage.get_block(v=0)
+            if genesis_block is not None and str(genesis_block.get('number')) != str(tip.get('number')):
+                writer.add(SECTION_BLOCKS, genesis_block)
+
+            writer.add(SECTION_BLOCKS, tip)
+        finally:
+            chunks = writer.close()
+
+        return chunks
+
+    def check_manifest(self, manifest: dict) -> None:
+        if not isinstance(manifest, dict) or not isinstance(manifest.get('chunks'), list):
+            raise SnapshotError('Snapshot manifest is malformed.')
+
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            raise SnapshotError(f'Unsupported snapshot version {manifest.get("version")}.')
+
+        if [chunk.get('index') for chunk in manifest.get('chunks')] != list(range(len(manifest.get('chunks')))):
+            raise SnapshotError('Snapshot manifest chunks are out of order.')
+
+        if snapshot_hash(manifest) != manifest.get('snapshot_hash'):
+            raise SnapshotError('Snapshot manifest does not match its snapshot hash.')
+
+    def read_manifest(self, path: str) -> dict:
+        try:
+            with open(os.path.join(path, SNAPSHOT_MANIFEST_FILENAME), 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            raise SnapshotError(f'No readable snapshot manifest in {path}.')
+
+        self.check_manifest(manifest=manifest)
+
+        return manifest
+
+    def get_latest_manifest(self) -> Union[dict, None]:
+        path = self.get_latest_snapshot()
+
+        if path is None:
+            return None
+
+        try:
+            return self.read_manifest(path=path)
+        except SnapshotError:
+            return None
+
+    def read_chunk(self, block_num: str, index: int) -> Union[bytes, None]:
+        # Serves a chunk to peers, block_num and index come off the wire so they are checked before building a path.
+        if not str(block_num).isdigit() or not isinstance(index, int) or index < 0:
+            return None
+
+        try:
+            with open(os.path.join(self.get_snapshot_path(block_num), chunk_filename(index)), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_download_path(self, block_num: str) -> str:
+        return f'{self.get_snapshot_path(block_num)}.download'
+
+    def has_chunk(self, path: str, chunk: dict) -> bool:
+        return self.hash_chunk(path=path, index=chunk.get('index')) == chunk.get('hash')
+
+    def write_chunk(self, path: str, chunk: dict, data: bytes) -> bool:
+        # Chunks fetched from peers are only kept if they match the manifest.
+        if hashlib.sha3_256(data).hexdigest() != chunk.get('hash'):
+            return False
+
+        file_path = os.path.join(path, chunk_filename(chunk.get('index')))
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+        return True
+
+    def finish_download(self, path: str, manifest: dict) -> str:
+        # Writing the manifest last and moving the directory into place makes the download show up as a snapshot.
+        self.check_manifest(manifest=manifest)
+
+        with open(os.path.join(path, SNAPSHOT_MANIFEST_FILENAME), 'w') as f:
+            json.dump(manifest, f)
+
+        snapshot_path = self.get_snapshot_path(manifest.get('number'))
+        shutil.rmtree(snapshot_path, ignore_errors=True)
+        os.replace(path, snapshot_path)
+
+        return snapshot_path
+
+    def hash_chunk(self, path: str, index: int) -> Union[str, None]:
+        h = hashlib.sha3_256()
+
+        try:
+            with open(os.path.join(path, chunk_filename(index)), 'rb') as f:
+                for data in iter(lambda: f.read(SNAPSHOT_READ_SIZE), b''):
+                    h.update(data)
+        except FileNotFoundError:
+            return None
+
+        return h.hexdigest()
+
+    def verify(self, path: str, expected_hash: str = None) -> dict:
+        manifest = self.read_manifest(path=path)
+
+        if expected_hash is not None and manifest.get('snapshot_hash') != expected_hash:
+            raise SnapshotError(f'Snapshot hash {manifest.get("snapshot_hash")} is not the expected {expected_hash}.')
+
+        for chunk in manifest.get('chunks'):
+            if chunk.get('section') not in SECTIONS:
+                raise SnapshotError(f'Chunk {chunk.get("index")} has unknown section {chunk.get("section")}.')
+
+            if self.hash_chunk(path=path, index=chunk.get('index')) != chunk.get('hash'):
+                raise SnapshotError(f'Chunk {chunk.get("index")} is missing or corrupt.')
+
+        return manifest
+
+    def read_chunk_records(self, path: str, chunk: dict) -> list:
+        # Chunks are hashed again as they are read so nothing that changed after verify() gets applied.
+        with open(os.path.join(path, chunk_filename(chunk.get('index'))), 'rb') as f:
+            data = f.read()
+
+        if hashlib.sha3_256(data).hexdigest() != chunk.get('hash'):
+            raise SnapshotError(f'Chunk {chunk.get("index")} changed while restoring.')
+
+        # Only state values go through the contracting decoder, blocks are stored in their plain JSON form.
+        load = decode if chunk.get('section') == SECTION_STATE else json.loads
+
+        return [load(line) for line in data.decode().splitlines()]
+
+    def restore(self, path: str, expected_hash: str = None) -> dict:
+        # Everything is verified before the current storage is wiped, a bad snapshot leaves the node as it was.
+        manifest = self.verify(path=path, expected_hash=expected_hash)
+        block_num = manifest.get('number')
+
+        self.contract_driver.flush()
+        self.nonce_storage.flush()
+        self.block_storage.flush()
+        self.block_storage.member_history.purge()
+
+        for chunk in manifest.get('chunks'):
+            section = chunk.get('section')
+
+            for record in self.read_chunk_records(path=path, chunk=chunk):
+                if section == SECTION_STATE:
+                    key, value = record
+                    self.contract_driver.driver.set(key, value, block_num=block_num)
+                    self.block_storage.state_history.save_state_change(key=key, block_num=block_num, value=value)
+
+                elif section == SECTION_NONCES:
+                    sender, processor, value = record
+                    self.nonce_storage.set_nonce(sender=sender, processor=processor, value=value)
+
+                elif section == SECTION_MEMBER_HISTORY:
+                    member_block_num, members_list = record
+                    self.block_storage.member_history.set(block_num=member_block_num, members_list=members_list)
+
+                elif section == SECTION_BLOCKS:
+                    self.block_storage.store_block(block=record)
+
+        # Node bookkeeping isn't in the snapshot, the restored tip is the latest block and validated as far as it goes.
+        self.contract_driver.driver.set(storage.LATEST_BLOCK_HASH_KEY, manifest.get('hash'), block_num=block_num)
+        self.contract_driver.driver.set(storage.LATEST_BLOCK_HEIGHT_KEY, int(block_num), block_num=block_num)
+        self.contract_driver.driver.set(VALIDATION_HEIGHT, block_num, block_num=block_num)
+
+        # Only genesis and the tip came with the snapshot, peers asking for the blocks in between are told so.
+        self.block_storage.set_pruned_height(block_num=int(block_num) - 1)
+        # State at the tip is all the history a restored node has.
+        self.block_storage.set_state_history_start(block_num=int(block_num))
+
+        self.nonce_storage.commit()
+
+        self.log.info(f'Restored snapshot {manifest.get("snapshot_hash")} of block {block_num}.')
+
+        return manifest
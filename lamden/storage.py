@@ -6,11 +6,24 @@ from lamden.crypto.canonical import hash_members_list, create_hash_512
 from lamden.crypto.wallet import Wallet, verify
 from lamden.logger.base import get_logger
 from lamden.utils import hlc
+import array
+import bisect
+import contextlib
+import copy
+import fcntl
+import hashlib
+import itertools
 import os
 import pathlib
 import shutil
 import json
+import lzma
+import re
+import sqlite3
+import struct
 import threading
+import zlib
+from collections import Counter, OrderedDict
 from typing import List, Any, Union
 
 LATEST_BLOCK_HASH_KEY = '__latest_block.hash'
@@ -23,34 +36,148 @@ BLOCK_0 = {
 
 MAX_BLOCK = '99999999999999999999'
 
+# Selects the block & tx storage backend for every process sharing a storage root: 'fs', 'segment' or 'sqlite'.
+BLOCK_DRIVER_ENV = 'LAMDEN_BLOCK_DRIVER'
+BLOCK_SEGMENTS_DIR = 'block_segments'
+TX_SEGMENTS_DIR = 'tx_segments'
+SQLITE_DIR = 'sqlite'
+BLOCK_HASH_INDEX_FILENAME = 'block_hash_index'
+
+# Compression of block and tx files written by the FS drivers: 'none' (default), 'zlib' or 'lzma'. Files are
+# readable whatever the setting, so it can be switched on for an existing root.
+COMPRESSION_ENV = 'LAMDEN_STORAGE_COMPRESSION'
+DICTIONARIES_DIR = 'dictionaries'
+
+BLOCK_CACHE_MAX_BYTES = 32 * 1024 * 1024
+ITER_BLOCKS_READAHEAD = 100
+
+# Days of the most recent blocks left as loose files when the node packs cold day buckets in the background. Unset
+# leaves storage alone, `lamden compact` packs on demand.
+COMPACT_AFTER_DAYS_ENV = 'LAMDEN_COMPACT_AFTER_DAYS'
+COMPACT_KEEP_DAYS = 30
+
+# Secondary tx indexes (sender, contract, contract function and failed txs) kept up to date by store_block when
+# set to 'true'. Chains stored before they were switched on can be indexed with BlockStorage.rebuild_tx_indexes.
+TX_INDEXES_ENV = 'LAMDEN_TX_INDEXES'
+TX_INDEX_DIR = 'tx_index'
+TX_INDEX_PAGE_SIZE = 100
+
+# Retention for lightweight nodes, by number of blocks and / or days before the latest block. Older blocks and
+# their txs are removed in the background, a block has to be outside both to go. Unset keeps every block.
+RETENTION_BLOCKS_ENV = 'LAMDEN_RETENTION_BLOCKS'
+RETENTION_DAYS_ENV = 'LAMDEN_RETENTION_DAYS'
+PRUNED_HEIGHT_FILENAME = '.pruned_height'
+STATE_HISTORY_START_FILENAME = '.state_history_start'
+# Blocks the node prunes per step on the event loop, small so consensus and peers aren't held up in between.
+PRUNE_BATCH_SIZE = 20
+DAY_NANOS = 86_400_000_000_000
+
+# Puts stores on other volumes than the storage root, as comma separated store=path pairs. Stores are blocks, txs,
+# member_history, state_history, tx_index and txq (the tx queue). cold_blocks adds a second tier for the FS block
+# driver that older day buckets can be moved to, see BlockStorage.move_to_cold_tier.
+STORAGE_ROOTS_ENV = 'LAMDEN_STORAGE_ROOTS'
+STORAGE_ROOT_STORES = ('blocks', 'txs', 'member_history', 'state_history', 'tx_index', 'txq', 'cold_blocks')
+TIER_KEEP_DAYS = 30
+
+
+def get_storage_roots(value: str = None) -> dict:
+    value = value if value is not None else os.environ.get(STORAGE_ROOTS_ENV, '')
+
+    roots = {}
+    for pair in value.split(','):
+        if pair.strip() == '':
+            continue
+
+        store, _, path = pair.partition('=')
+        store = store.strip()
+
+        if store not in STORAGE_ROOT_STORES or path.strip() == '':
+            raise ValueError(f'Invalid storage root \'{pair}\', expected one of {", ".join(STORAGE_ROOT_STORES)}=<path>.')
+
+        roots[store] = pathlib.Path(path.strip()).expanduser()
+
+    return roots
+
+
 
 class BlockStorage:
-    def __init__(self, root=None, block_diver=None):
+    def __init__(self, root=None, block_diver=None, tx_driver=None, driver_type=None,
+                 block_cache_max_bytes=BLOCK_CACHE_MAX_BYTES, tx_indexes=None, roots=None):
         self.current_thread = threading.current_thread()
         self.log = get_logger(f'[{self.current_thread.name}][BlockStorage]')
         self.root = pathlib.Path(root) if root is not None else STORAGE_HOME
+        self.roots = get_storage_roots() if roots is None else roots
 
-        self.blocks_dir = self.root.joinpath('blocks')
+        self.blocks_dir = pathlib.Path(self.roots.get('blocks', self.root.joinpath('blocks')))
         self.blocks_alias_dir = self.root.joinpath('block_alias')
-        self.txs_dir = self.root.joinpath('txs')
-        self.member_history_dir = self.root.joinpath('member_history')
-        self.state_history_dir = self.root.joinpath('state_history')
+        self.txs_dir = pathlib.Path(self.roots.get('txs', self.root.joinpath('txs')))
+        self.member_history_dir = pathlib.Path(self.roots.get('member_history', self.root.joinpath('member_history')))
+        self.state_history_dir = pathlib.Path(self.roots.get('state_history', self.root.joinpath('state_history')))
+        self.pruned_height_path = self.root.joinpath(PRUNED_HEIGHT_FILENAME)
+        self.state_history_start_path = self.root.joinpath(STATE_HISTORY_START_FILENAME)
 
         self.__build_directories()
 
-        self.block_driver = block_diver or FSBlockDriver(root=self.blocks_dir)
-        self.block_alias_driver = FSHashStorageDriver(root=self.blocks_alias_dir)
-        self.tx_driver = FSHashStorageDriver(root=self.txs_dir)
+        # Shared by the FS drivers created here so a newly trained dictionary is picked up by all of them.
+        self.codec = StorageCodec(dictionaries_dir=self.root.joinpath(DICTIONARIES_DIR))
+
+        if block_diver is None:
+            block_diver, default_tx_driver = create_block_drivers(
+                root=self.root,
+                driver_type=driver_type or os.environ.get(BLOCK_DRIVER_ENV, 'fs'),
+                codec=self.codec,
+                roots=self.roots
+            )
+            tx_driver = tx_driver or default_tx_driver
+
+        self.block_driver = block_diver
+        self.tx_driver = tx_driver or FSHashStorageDriver(root=self.txs_dir, codec=self.codec)
+
+        # Drivers that index block hashes themselves don't need the block hash index.
+        if self.block_driver.indexes_hashes:
+            self.block_hash_index = None
+        else:
+            self.block_hash_index = FSBlockHashIndex(path=self.root.joinpath(BLOCK_HASH_INDEX_FILENAME))
         self.member_history = FSMemberHistory(root=self.member_history_dir)
         self.state_history = FSStateHistory(root=self.state_history_dir)
 
+        if tx_indexes is None:
+            tx_indexes = os.environ.get(TX_INDEXES_ENV, 'false').lower() == 'true'
+        tx_index_dir = self.roots.get('tx_index', self.root.joinpath(TX_INDEX_DIR))
+        self.tx_index = FSTxIndex(root=tx_index_dir) if tx_indexes else None
+
+        # Chain tip as stored (tx not filled) and recently read filled blocks. Both are only trusted while the driver
+        # version matches the one they were read at, see __check_version.
+        self.tip = None
+        self.tip_loaded = False
+        self.block_cache = BlockCache(max_bytes=block_cache_max_bytes)
+        self.known_version = None
+
+        if self.needs_block_hash_index():
+            self.log.warning('Block hash index is missing, run `lamden migrate block_aliases` to look up blocks by hash.')
+
+        # Empty storage keeps state history from the first block on, blocks stored without a start were written
+        # before the history was kept and need `lamden migrate state_history`.
+        if self.get_state_history_start() is None and self.total_blocks() == 0:
+            self.set_state_history_start(block_num=0)
 
         self.log.info(f'Initialized block & tx storage at \'{self.root}\', {self.total_blocks()} existing blocks found.')
 
+    def needs_block_hash_index(self) -> bool:
+        return self.block_hash_index is not None and not self.block_hash_index.exists() and self.total_blocks() > 0
+
+    def migrate_block_aliases(self):
+        # Storage from before the block hash index kept a symlink per block hash, the index replaces them. Run once
+        # from the CLI with the node stopped, see `lamden migrate block_aliases`.
+        self.log.warning('Building block hash index...')
+        self.rebuild_block_hash_index()
+
+        if self.blocks_alias_dir.is_dir():
+            shutil.rmtree(self.blocks_alias_dir)
+
     def __build_directories(self):
         self.root.mkdir(exist_ok=True, parents=True)
         self.blocks_dir.mkdir(exist_ok=True, parents=True)
-        self.blocks_alias_dir.mkdir(exist_ok=True, parents=True)
         self.txs_dir.mkdir(exist_ok=True, parents=True)
         self.member_history_dir.mkdir(exist_ok=True, parents=True)
         self.state_history_dir.mkdir(exist_ok=True, parents=True)
@@ -65,23 +192,86 @@ class BlockStorage:
         return tx, tx_hash
 
     def __write_block(self, block: dict):
-        hash_symlink_name = block.get('hash')
+        self.block_driver.write_block(block=block)
 
-        filename = self.block_driver.write_block(block=block)
-        file_path = self.block_driver.get_file_path(block_num=filename)
-        self.block_alias_driver.write_symlink(
-            hash_str=hash_symlink_name,
-            link_to=file_path
-        )
+        if self.block_hash_index is not None:
+            self.block_hash_index.put(hash_str=block.get('hash'), block_num=int(block.get('number')))
+
+    def __find_block_by_hash(self, block_hash: str) -> Union[dict, None]:
+        if self.block_hash_index is None:
+            return self.block_driver.find_block_by_hash(block_hash=block_hash)
+
+        block_num = self.block_hash_index.get(hash_str=block_hash)
+        if block_num is None:
+            return None
+
+        # A block stored again under the same number with a new hash leaves the old hash pointing at it.
+        block = self.block_driver.find_block(block_num=str(block_num))
+        if block is None or block.get('hash') != block_hash:
+            return None
+
+        return block
 
     def __write_tx(self, tx_hash, tx):
         self.tx_driver.write_file(hash_str=tx_hash, data=tx)
 
     def __fill_block(self, block):
         tx_hash = block.get('processed')
-        tx = self.get_tx(tx_hash)
+        tx = self.get_tx(tx_hash, block_num=block.get('number'))
         block['processed'] = tx
 
+    def __packs_supported(self) -> bool:
+        return isinstance(self.block_driver, FSBlockDriver) and isinstance(self.tx_driver, FSHashStorageDriver)
+
+    def __state_changes(self, block: dict) -> list:
+        # State changes and rewards of a filled block in the order they are applied, later entries win.
+        if self.is_genesis_block(block=block):
+            return block.get('genesis', [])
+
+        processed = block.get('processed') or {}
+        return processed.get('state', []) + block.get('rewards', [])
+
+    def __save_state_history(self, block: dict):
+        block_num = block.get('number')
+
+        # One change per key so each is a single append, ie. a sender that is also paid a reward.
+        values = {
+            state_change.get('key'): state_change.get('value') for state_change in self.__state_changes(block=block)
+        }
+
+        for key, value in values.items():
+            self.state_history.save_state_change(key=key, block_num=block_num, value=value)
+
+    def __tx_index_entries(self, tx: dict) -> list:
+        # (index, value) pairs a tx is listed under.
+        payload = (tx.get('transaction') or {}).get('payload') or {}
+
+        entries = []
+        if payload.get('sender'):
+            entries.append((FSTxIndex.SENDER, payload.get('sender')))
+        if payload.get('contract'):
+            entries.append((FSTxIndex.CONTRACT, payload.get('contract')))
+            if payload.get('function'):
+                entries.append((FSTxIndex.FUNCTION, f"{payload.get('contract')}.{payload.get('function')}"))
+        if tx.get('status', 0) != 0:
+            entries.append((FSTxIndex.STATUS, FSTxIndex.FAILED))
+
+        return entries
+
+    def __save_tx_index(self, block_num: str, tx: dict):
+        if self.tx_index is None or not isinstance(tx, dict):
+            return
+
+        for index, value in self.__tx_index_entries(tx=tx):
+            self.tx_index.add(index=index, value=value, block_num=block_num, tx_hash=tx.get('hash'))
+
+    def __remove_tx_index(self, block_num: str, tx: dict):
+        if self.tx_index is None or not isinstance(tx, dict):
+            return
+
+        for index, value in self.__tx_index_entries(tx=tx):
+            self.tx_index.remove(index=index, value=value, block_num=block_num)
+
     def block_exists(self, block_num: str) -> bool:
         return self.block_driver.block_exists(block_num=str(block_num))
 
@@ -95,20 +285,76 @@ class BlockStorage:
         return self.block_driver.block_exists(block_num=0)
 
     def flush(self):
+        self.block_driver.flush()
+        self.tx_driver.flush()
+
         if self.blocks_dir.is_dir():
             shutil.rmtree(self.blocks_dir)
         if self.txs_dir.is_dir():
             shutil.rmtree(self.txs_dir)
         if self.blocks_alias_dir.is_dir():
             shutil.rmtree(self.blocks_alias_dir)
+        if self.block_hash_index is not None:
+            self.block_hash_index.flush()
+
+        self.state_history.flush()
+        if self.tx_index is not None:
+            self.tx_index.flush()
+        if self.pruned_height_path.is_file():
+            self.pruned_height_path.unlink()
 
         self.__build_directories()
+        self.set_state_history_start(block_num=0)
+        self.__invalidate_tip()
+        self.block_cache.clear()
+        self.known_version = None
         self.log.debug(f'Flushed block & tx storage at \'{self.root}\'')
 
+    def __invalidate_tip(self):
+        self.tip = None
+        self.tip_loaded = False
+
+    def __check_version(self):
+        # Anything cached is dropped when storage was changed by someone else, ie. the node writing blocks while
+        # the webserver reads them. Our own writes keep known_version up to date and invalidate precisely.
+        version = self.block_driver.get_version()
+
+        if version is None or version != self.known_version:
+            self.__invalidate_tip()
+            self.block_cache.clear()
+            self.known_version = version
+
+    def __get_tip(self) -> Union[dict, None]:
+        self.__check_version()
+
+        if not self.tip_loaded:
+            self.tip = self.block_driver.find_previous_block(block_num=MAX_BLOCK)
+            self.tip_loaded = True
+
+        return self.tip
+
+    def __filled(self, block: dict) -> dict:
+        # Returns the filled version of a block read from the driver, using the block cache for the tx.
+        cached_block = self.block_cache.get(block_num=block.get('number'))
+        if cached_block is not None and cached_block.get('hash') == block.get('hash'):
+            return cached_block
+
+        if not self.is_genesis_block(block=block):
+            self.__fill_block(block)
+
+        self.block_cache.put(block=block)
+
+        return block
+
+    def get_block_cache_stats(self) -> dict:
+        return self.block_cache.stats()
+
     def store_block(self, block):
         encoded_block = encode(block)
         block = json.loads(encoded_block)
 
+        self.__save_state_history(block=block)
+
         if not self.is_genesis_block(block=block):
 
             tx, tx_hash = self.__cull_tx(block)
@@ -117,9 +363,19 @@ class BlockStorage:
                 raise ValueError('Block has no transaction information or malformed tx data.')
 
             self.__write_tx(tx_hash, tx)
+            self.__save_tx_index(block_num=block.get('number'), tx=tx)
+
+        self.__check_version()
 
         self.__write_block(block)
 
+        self.block_cache.invalidate(block_num=block.get('number'))
+
+        if self.tip_loaded and (self.tip is None or int(block.get('number')) >= int(self.tip.get('number'))):
+            self.tip = block
+
+        self.known_version = self.block_driver.get_version()
+
     def remove_block(self, v=None):
         if v is None:
             return None
@@ -138,10 +394,27 @@ class BlockStorage:
         block_hash = block.get('hash')
         tx_hash = block.get('processed')
 
+        tx = self.get_tx(tx_hash, block_num=block_num)
+
+        for state_change in self.__state_changes(block={**block, 'processed': tx}):
+            self.state_history.remove_state_change(key=state_change.get('key'), block_num=block_num)
+
+        self.__remove_tx_index(block_num=block_num, tx=tx)
+
+        self.__check_version()
+
         self.block_driver.delete_block(block_num=block_num)
-        self.block_alias_driver.remove_symlink(hash_str=block_hash)
+        if self.block_hash_index is not None:
+            self.block_hash_index.remove(hash_str=block_hash)
         self.tx_driver.delete_file(hash_str=tx_hash)
 
+        self.block_cache.invalidate(block_num=block_num)
+
+        if self.tip is None or int(self.tip.get('number')) == int(block_num):
+            self.__invalidate_tip()
+
+        self.known_version = self.block_driver.get_version()
+
     def get_block(self, v=None):
         if v is None:
             return None
@@ -151,20 +424,26 @@ class BlockStorage:
             if nanos > 0:
                 v = str(nanos)
 
+        self.__check_version()
+
         try:
-            int(v)
+            block = self.block_cache.get(block_num=int(v))
+            if block is not None:
+                return block
+
             block = self.block_driver.find_block(block_num=v)
         except ValueError:
-            block = self.block_alias_driver.get_file(hash_str=v)
+            block = self.block_cache.get(block_hash=v)
+            if block is not None:
+                return block
+
+            block = self.__find_block_by_hash(block_hash=v)
 
         if block is None:
             self.log.error(f'Block \'{v}\' was not found in storage.')
             return None
 
-        if not self.is_genesis_block(block=block):
-            self.__fill_block(block)
-
-        return block
+        return self.__filled(block)
 
     def get_previous_block(self, v):
         if v is None:
@@ -176,15 +455,14 @@ class BlockStorage:
             if not isinstance(v, int) or v < 0:
                 return None
 
+        self.__check_version()
+
         block = self.block_driver.find_previous_block(block_num=str(v))
 
         if block is None:
             return None
 
-        if not self.is_genesis_block(block=block):
-            self.__fill_block(block)
-
-        return block
+        return self.__filled(block)
 
     def get_next_block(self, v):
         if v is None:
@@ -196,29 +474,25 @@ class BlockStorage:
             if not isinstance(v, int):
                 return None
 
+        self.__check_version()
+
         block = self.block_driver.find_next_block(block_num=str(v))
 
         if not block:
             return None
 
-        if not self.is_genesis_block(block=block):
-            self.__fill_block(block)
-
-        return block
+        return self.__filled(block)
 
     def get_latest_block(self) -> dict:
-        block = self.block_driver.find_previous_block(block_num=MAX_BLOCK)
+        block = self.__get_tip()
 
         if not block:
             return None
 
-        if not self.is_genesis_block(block=block):
-            self.__fill_block(block)
-
-        return block
+        return self.__filled(copy.deepcopy(block))
 
     def get_latest_block_number(self) -> int:
-        block = self.block_driver.find_previous_block(block_num=MAX_BLOCK)
+        block = self.__get_tip()
 
         try:
             block_num = block.get('number', None)
@@ -230,35 +504,54 @@ class BlockStorage:
             return None
 
     def get_latest_block_hash(self) -> str:
-        block = self.block_driver.find_previous_block(block_num=MAX_BLOCK)
+        block = self.__get_tip()
 
         try:
             return block.get('hash', None)
         except AttributeError:
             return None
 
-    def get_tx(self, h):
-        tx = self.tx_driver.get_file(hash_str=h)
+    def get_tx(self, h, block_num=None):
+        try:
+            tx = self.tx_driver.get_file(hash_str=h)
+        except FileNotFoundError:
+            tx = None
+
+        if tx is None and self.__packs_supported():
+            tx = self.block_driver.find_packed_tx(tx_hash=h, block_num=block_num)
+
         return tx
 
     def get_later_blocks(self, hlc_timestamp):
-        later_blocks = []
+        block_num = hlc.nanos_from_hlc_timestamp(hlc_timestamp=hlc_timestamp)
+        return list(self.iter_blocks(start=block_num + 1))
+
+    def iter_blocks(self, start=None, end=None, reverse=False, fill_tx=True, readahead=ITER_BLOCKS_READAHEAD):
+        # Yields the blocks numbered start to end (both inclusive, None for open ended) in order. Block numbers are
+        # taken from the driver a batch at a time and each batch is read in one go, so walking the whole chain
+        # doesn't go back to storage for every block. Blocks aren't put in the block cache, a full walk would only
+        # push out the recent blocks everyone else is asking for.
+        lower = -1 if start is None else int(start) - 1
+        upper = int(MAX_BLOCK) if end is None else int(end) + 1
+        cursor = upper if reverse else lower
+
         while True:
-            if len(later_blocks) == 0:
-                block_num = str(hlc.nanos_from_hlc_timestamp(hlc_timestamp=hlc_timestamp))
+            if reverse:
+                block_nums = self.block_driver.find_previous_block_numbers(block_num=str(cursor), amount_of_blocks=readahead)
             else:
-                block_num = later_blocks[-1].get('number')
+                block_nums = self.block_driver.find_next_block_numbers(block_num=str(cursor), amount_of_blocks=readahead)
 
-            block = self.block_driver.find_next_block(block_num=str(block_num))
+            block_nums = [block_num for block_num in block_nums if lower < int(block_num) < upper]
 
-            if block is None:
-                break
+            if len(block_nums) == 0:
+                return
 
-            self.__fill_block(block=block)
-            later_blocks.append(block)
+            for block in self.block_driver.find_blocks(block_list=block_nums):
+                if fill_tx and not self.is_genesis_block(block=block):
+                    self.__fill_block(block)
+                yield block
 
-        later_blocks = sorted(later_blocks, key=lambda x: x['number'])
-        return later_blocks
+            cursor = block_nums[-1]
 
     def set_previous_hash(self, block: dict):
         old_previous_hash = block.get('previous')
@@ -267,8 +560,11 @@ class BlockStorage:
         new_previous_block_hash = previous_block.get('hash')
         block['previous'] = new_previous_block_hash
 
-        if not self.block_alias_driver.is_symlink_valid(hash_str=old_previous_hash):
-            self.block_alias_driver.remove_symlink(hash_str=old_previous_hash)
+        if self.block_hash_index is None or old_previous_hash == new_previous_block_hash:
+            return
+
+        if self.__find_block_by_hash(block_hash=old_previous_hash) is None:
+            self.block_hash_index.remove(hash_str=old_previous_hash)
 
     def get_latest_members_list(self):
         return self.member_history.find_previous_block(block_num=MAX_BLOCK)
@@ -280,212 +576,1167 @@ class BlockStorage:
         return self.member_history.verify_member(block_num=block_num, vk=vk)
 
     def get_previous_state_value(self, key: str, block_num: str):
-        previous_change = self.state_history.get_previous_change(
-            key=key,
-            block_num=block_num
-        )
+        # Value of the key as it was before block_num was applied.
+        return self.__get_state_value(key=key, block_num=block_num, inclusive=False)
+
+    def get_state_value_at(self, key: str, block_num: str):
+        # Value of the key as it was once block_num was applied.
+        return self.__get_state_value(key=key, block_num=block_num, inclusive=True)
 
-        if not previous_change:
+    def __get_state_value(self, key: str, block_num: str, inclusive: bool):
+        change = self.state_history.find_change(key=key, block_num=block_num, inclusive=inclusive)
+
+        if change is None:
             return None
 
-        block = self.get_block(v=int(block_num))
-        value = None
+        change_block_num, has_value, value = change
 
-        if self.is_genesis_block(block):
-            state_changes = block.get('genesis', [])
-            rewards = []
-        else:
-            state_changes = block['processed'].get('state', [])
-            rewards = block.get('rewards', [])
+        if has_value:
+            return value
+
+        # Changes migrated from the old history format only know the block, read the value from there.
+        block = self.get_block(v=int(change_block_num))
 
-        for state_change in state_changes:
+        if block is None:
+            return None
+
+        value = None
+        for state_change in self.__state_changes(block=block):
             if state_change.get('key') == key:
                 value = state_change.get('value')
 
-        for reward in rewards:
-            if reward.get('key') == key:
-                value = reward.get('value')
-
         return value
 
-# TODO: remove pending nonces if we end up getting rid of them.
-# TODO: move to component responsible for state maintenance.
-NONCE_FILENAME = '__n'
-PENDING_NONCE_FILENAME = '__pn'
-class NonceStorage:
-    def __init__(self, root=None):
-        root = root if root is not None else STORAGE_HOME
-        self.driver = FSDriver(root=root)
+    def train_compression_dictionary(self, sample_size: int = 500) -> int:
+        # Trains the shared zlib dictionary on the latest blocks and their txs, see StorageCodec. Only files
+        # written afterwards use it, and only when zlib compression is on.
+        samples = []
+        for block in self.iter_blocks(reverse=True, fill_tx=False):
+            if len(samples) >= sample_size:
+                break
 
-    # Move this to transaction.py
-    def get_nonce(self, sender, processor):
-        return self.driver.get(NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor)
+            samples.append(json.dumps(block).encode())
 
-    # Move this to transaction.py
-    def get_pending_nonce(self, sender, processor):
-        return self.driver.get(PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor)
+            if not self.is_genesis_block(block=block):
+                tx = self.get_tx(block.get('processed'))
+                if tx is not None:
+                    samples.append(json.dumps(tx).encode())
 
-    def set_nonce(self, sender, processor, value):
-        self.driver.set(
-            NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor,
-            value
-        )
+        return self.codec.train_dictionary(samples=samples)
 
-    def safe_set_nonce(self, sender, processor, value):
-        current_nonce = self.get_nonce(sender=sender, processor=processor)
+    def get_cold_buckets(self, keep_days: int = COMPACT_KEEP_DAYS) -> list:
+        # Day buckets with loose blocks older than keep_days before the latest block.
+        if not self.__packs_supported():
+            return []
 
-        if current_nonce is None:
-            current_nonce = -1
+        latest_block_num = self.get_latest_block_number()
+        if latest_block_num is None:
+            return []
 
-        if value > current_nonce:
-            self.driver.set(
-                NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor,
-                value
-            )
+        before_block_num = latest_block_num - keep_days * self.block_driver.day
+        return self.block_driver.get_cold_buckets(before_block_num=before_block_num)
 
-    def set_pending_nonce(self, sender, processor, value):
-        self.driver.set(
-            PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor,
-            value
-        )
+    def compact_cold_blocks(self, keep_days: int = COMPACT_KEEP_DAYS) -> int:
+        # Packs every cold day bucket, see FSBlockDriver.compact_bucket. Returns the number of buckets packed.
+        buckets = self.get_cold_buckets(keep_days=keep_days)
 
-    # Move this to webserver.py
-    def get_latest_nonce(self, sender, processor):
-        latest_nonce = self.get_pending_nonce(sender=sender, processor=processor)
+        for bucket_path in buckets:
+            self.compact_bucket(bucket_path=bucket_path)
 
-        if latest_nonce is None:
-            latest_nonce = self.get_nonce(sender=sender, processor=processor)
+        return len(buckets)
 
-        if latest_nonce is None:
-            latest_nonce = 0
+    def compact_bucket(self, bucket_path: str) -> list:
+        packed = self.block_driver.compact_bucket(bucket_path=bucket_path, tx_driver=self.tx_driver)
 
-        return latest_nonce
+        for block_num, block_hash, tx_hash in packed:
+            if tx_hash is not None:
+                self.tx_driver.delete_file(hash_str=tx_hash)
 
-    def get_next_nonce(self, sender, processor):
-        current_nonce = self.get_pending_nonce(sender=sender, processor=processor)
+        self.log.info(f'Packed {len(packed)} blocks from \'{bucket_path}\'')
 
-        if current_nonce is None:
-            current_nonce = self.get_nonce(sender=sender, processor=processor)
+        return packed
 
-        if current_nonce is None:
+    def expand_packs(self) -> int:
+        # Turns every pack back into loose block & tx files. Returns the number of blocks restored.
+        if not self.__packs_supported():
             return 0
 
-        return current_nonce + 1
+        restored = 0
+        for pack_path in self.block_driver.list_packs():
+            for block, tx_data in self.block_driver.expand_pack(pack_path=pack_path):
+                tx_hash = block.get('processed')
+                if tx_data and isinstance(tx_hash, str):
+                    self.tx_driver.write_raw(hash_str=tx_hash, data=tx_data)
 
-    def flush(self):
-        self.driver.flush_file(NONCE_FILENAME)
-        self.driver.flush_file(PENDING_NONCE_FILENAME)
+                restored += 1
 
-    def flush_pending(self):
-        self.driver.flush_file(PENDING_NONCE_FILENAME)
+        return restored
 
-# TODO: move to component responsible for state maintenance.
-def get_latest_block_hash(driver: ContractDriver):
-    latest_hash = driver.get(LATEST_BLOCK_HASH_KEY)
-    if latest_hash is None:
-        return '0' * 64
-    return latest_hash
+    def get_pruned_height(self) -> int:
+        # Blocks numbered up to this (genesis aside) were pruned or came before a restored snapshot, 0 when there
+        # are none. Read from disk every time so the webserver and utilities see what the node pruned.
+        try:
+            with open(self.pruned_height_path, 'r') as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return 0
 
-# TODO: move to component responsible for state maintenance.
-def set_latest_block_hash(h, driver: ContractDriver):
-    driver.set(LATEST_BLOCK_HASH_KEY, h)
+    def set_pruned_height(self, block_num: int) -> None:
+        # Marks every block up to block_num (genesis aside) as gone, ie. after restoring a snapshot.
+        block_num = int(block_num)
+        if block_num <= self.get_pruned_height():
+            return
 
-# TODO: move to component responsible for state maintenance.
-def get_latest_block_height(driver: ContractDriver):
-    h = driver.get(LATEST_BLOCK_HEIGHT_KEY, save=False)
-    if h is None:
-        return -1
+        tmp_path = f'{self.pruned_height_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(block_num))
+        os.replace(tmp_path, self.pruned_height_path)
 
-    if type(h) == ContractingDecimal:
-        h = int(h._d)
+    def get_state_history_start(self) -> Union[int, None]:
+        # First block the state history is complete from, None when the blocks were stored before it was kept.
+        try:
+            with open(self.state_history_start_path, 'r') as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
 
-    return int(h)
+    def set_state_history_start(self, block_num: int) -> None:
+        tmp_path = f'{self.state_history_start_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(int(block_num)))
+        os.replace(tmp_path, self.state_history_start_path)
 
-class BlockDriver:
-    # The BlockStorage class will handle encoding and decoding. Store and return blocks as JSON strings.
+    def is_pruned(self, v) -> bool:
+        # Whether block v (number or hlc timestamp) was pruned. Genesis never is.
+        if isinstance(v, str) and hlc.is_hcl_timestamp(hlc_timestamp=v):
+            v = hlc.nanos_from_hlc_timestamp(hlc_timestamp=v)
 
-    def find_block(self, block_num: str) -> dict:
-        # This method will take a block number and return that block and the next x amount of blocks
-        raise NotImplementedError("Subclasses must implement this method.")
+        try:
+            return 0 < int(v) <= self.get_pruned_height()
+        except (TypeError, ValueError):
+            return False
 
-    def find_blocks(self, block_list: list) -> list:
-        # This method will take a list of blocks and return the block content for each
-        raise NotImplementedError("Subclasses must implement this method.")
+    def get_prune_height(self, keep_blocks: int = None, keep_days: int = None) -> int:
+        # Highest block number outside the retention window, 0 when there is nothing to prune. Both limits keep
+        # the blocks they cover so the larger window wins. The latest block is always kept.
+        latest_block_num = self.get_latest_block_number()
+        if latest_block_num is None or (keep_blocks is None and keep_days is None):
+            return 0
 
-    def write_block(self, block: dict) -> None:
-        # Writes the content of a block dict to storage
-        raise NotImplementedError("Subclasses must implement this method.")
+        heights = []
 
-    def write_blocks(self, block_list: list) -> None:
-        # Writes a list of block dicts to storage
-        raise NotImplementedError("Subclasses must implement this method.")
+        if keep_blocks is not None:
+            keep_blocks = max(int(keep_blocks), 1)
+            block_nums = self.block_driver.find_previous_block_numbers(
+                block_num=MAX_BLOCK,
+                amount_of_blocks=keep_blocks + 1
+            )
+            heights.append(int(block_nums[keep_blocks]) if len(block_nums) > keep_blocks else 0)
 
-    def delete_block(self, block_num: str) -> None:
-        # Deletes a block from storage
-        raise NotImplementedError("Subclasses must implement this method.")
+        if keep_days is not None:
+            heights.append(latest_block_num - max(int(keep_days), 0) * DAY_NANOS - 1)
 
-    def delete_blocks(self, block_list: list) -> None:
-        # Deletes a list of block numbers from storage
-        raise NotImplementedError("Subclasses must implement this method.")
+        return max(min(heights), 0)
 
-    def find_previous_block(self, block_num: str) -> dict:
-        # This method will take a block number and return the previous block
-        raise NotImplementedError("Subclasses must implement this method.")
+    def prune_blocks(self, keep_blocks: int = None, keep_days: int = None, keep_state_history: bool = True,
+                     limit: int = None) -> int:
+        # Removes up to limit blocks and their txs from before the retention window (see get_prune_height), oldest
+        # first. Genesis, the tip and member history are always kept. State history is kept by default so state
+        # lookups at old heights still work, rolling back past the pruned height isn't possible either way.
+        # Returns the number of blocks removed.
+        prune_height = self.get_prune_height(keep_blocks=keep_blocks, keep_days=keep_days)
+        if prune_height <= 0:
+            return 0
 
-    def find_previous_blocks(self, block_num: str, amount_of_blocks: int) -> list:
-        # This method will take a block number and return the previous x amount of blocks
-        raise NotImplementedError("Subclasses must implement this method.")
+        blocks = [
+            block for block in itertools.islice(self.iter_blocks(start=1, end=prune_height, fill_tx=False), limit)
+            if not self.is_genesis_block(block=block)
+        ]
 
-    def find_next_block(self, block_num: str) -> dict:
-        # This method will take a block number and return the next block
-        raise NotImplementedError("Subclasses must implement this method.")
+        if len(blocks) == 0:
+            return 0
 
-    def find_next_blocks(self, block_num: str, amount_of_blocks: int) -> list:
-        # This method will take a block number and return the next x amount of blocks
-        raise NotImplementedError("Subclasses must implement this method.")
+        # Marked first, a block that is about to go is reported as pruned rather than handed out half removed.
+        self.set_pruned_height(block_num=max(int(block.get('number')) for block in blocks))
 
-    def block_exists(self, block_num: str) -> bool:
-        # Checks if a block exists, returns Bool
-        raise NotImplementedError("Subclasses must implement this method.")
+        # Only the tx indexes and dropping state history need the txs read back.
+        if self.tx_index is not None or not keep_state_history:
+            # Block numbers to drop per state key, so every history file is rewritten once for the whole batch.
+            pruned_changes = {}
 
-    def get_total_blocks(self) -> int:
-        # Returns the total current block count
-        raise NotImplementedError("Subclasses must implement this method.")
+            for block in blocks:
+                block_num = block.get('number')
+                tx = self.get_tx(block.get('processed'), block_num=block_num)
 
-class FSBlockDriver(BlockDriver):
+                if not keep_state_history:
+                    for state_change in self.__state_changes(block={**block, 'processed': tx}):
+                        pruned_changes.setdefault(state_change.get('key'), set()).add(int(block_num))
 
-    def __init__(self, root: str, initialize: bool = True):
-        self.root = os.path.abspath(root)
-        self.total_files = 0
-        self.initialized = False
+                self.__remove_tx_index(block_num=block_num, tx=tx)
 
-        self.minute = 60_000_000_000
-        self.hour = 3_600_000_000_000
-        self.day = 86_400_000_000_000
-        self.year = 31_536_000_000_000_000
+            for key, block_nums in pruned_changes.items():
+                self.state_history.remove_changes(hash_str=create_hash_512(string=key), block_nums=block_nums)
 
-        if initialize:
-            self._initialize()
+            state_history_start = self.get_state_history_start()
+            if not keep_state_history and state_history_start is not None:
+                self.set_state_history_start(block_num=max(state_history_start, self.get_pruned_height() + 1))
 
-    def _initialize(self):
-        self.total_files = self.get_total_blocks()
-        self.initialized = True
+        self.__check_version()
 
-    def _find_directories(self, block_num: int) -> list:
-        dir_levels = [self.year, self.day, self.hour, self.minute]
-        directories = []
-        for level in dir_levels:
-            lower_bound = (block_num // level) * level
-            upper_bound = lower_bound + level - 1
-            dir_name = "{}_{}".format(lower_bound, upper_bound)
-            directories.append(dir_name)
-            block_num %= level
-        return directories
+        self.block_driver.delete_blocks(block_list=[block.get('number') for block in blocks])
 
-    def _get_file_content(self, file_path: str) -> dict:
-        try:
-            with open(file_path) as file:
-                return json.loads(file.read())
+        for block in blocks:
+            if self.block_hash_index is not None:
+                self.block_hash_index.remove(hash_str=block.get('hash'))
+            if isinstance(block.get('processed'), str):
+                self.tx_driver.delete_file(hash_str=block.get('processed'))
+
+            self.block_cache.invalidate(block_num=block.get('number'))
+
+        self.known_version = self.block_driver.get_version()
+
+        self.log.info(f'Pruned {len(blocks)} blocks up to {self.get_pruned_height()}')
+
+        return len(blocks)
+
+    def __tiers_supported(self) -> bool:
+        return isinstance(self.block_driver, FSBlockDriver) and self.block_driver.cold_root is not None
+
+    def move_to_cold_tier(self, keep_days: int = TIER_KEEP_DAYS) -> int:
+        # Moves the day buckets ending more than keep_days before the latest block to the cold tier, oldest first.
+        # Safe while the node runs, see FSBlockDriver.move_bucket. Returns the number of buckets moved.
+        if not self.__tiers_supported():
+            return 0
+
+        latest_block_num = self.get_latest_block_number()
+        if latest_block_num is None:
+            return 0
+
+        before_block_num = latest_block_num - keep_days * DAY_NANOS
+
+        moved = 0
+        for bucket in self.block_driver.list_buckets(cold=False):
+            if bucket + DAY_NANOS - 1 < before_block_num and self.block_driver.move_bucket(bucket=bucket, cold=True):
+                moved += 1
+
+        if moved > 0:
+            self.log.info(f'Moved {moved} day buckets to the cold tier')
+
+        return moved
+
+    def move_to_hot_tier(self) -> int:
+        # Moves every cold day bucket back, ie. before retiring the cold volume. Returns the number moved.
+        if not self.__tiers_supported():
+            return 0
+
+        moved = 0
+        for bucket in self.block_driver.list_buckets(cold=True):
+            if self.block_driver.move_bucket(bucket=bucket, cold=False):
+                moved += 1
+
+        if moved > 0:
+            self.log.info(f'Moved {moved} day buckets to the hot tier')
+
+        return moved
+
+    def rebuild_block_hash_index(self):
+        # Recreates the block hash index from every stored block.
+        if self.block_hash_index is None:
+            return
+
+        entries = [(block.get('hash'), int(block.get('number'))) for block in self.iter_blocks(fill_tx=False)]
+        self.block_hash_index.rebuild(entries=entries)
+
+    def find_indexed_txs(self, index: str, value: str, limit: int = TX_INDEX_PAGE_SIZE, before: int = None) -> list:
+        # Newest first page of {'number', 'hash'} (block number & tx hash) listed under value in one of the tx
+        # indexes, see FSTxIndex. The next page starts before the last block number returned.
+        if self.tx_index is None:
+            return []
+
+        return [
+            {'number': block_num, 'hash': tx_hash}
+            for block_num, tx_hash in self.tx_index.find(index=index, value=value, limit=limit, before=before)
+        ]
+
+    def get_txs_by_sender(self, sender: str, limit: int = TX_INDEX_PAGE_SIZE, before: int = None) -> list:
+        return self.find_indexed_txs(index=FSTxIndex.SENDER, value=sender, limit=limit, before=before)
+
+    def get_txs_by_contract(self, contract: str, function: str = None, limit: int = TX_INDEX_PAGE_SIZE,
+                            before: int = None) -> list:
+        if function is None:
+            return self.find_indexed_txs(index=FSTxIndex.CONTRACT, value=contract, limit=limit, before=before)
+
+        return self.find_indexed_txs(index=FSTxIndex.FUNCTION, value=f'{contract}.{function}', limit=limit, before=before)
+
+    def get_failed_txs(self, limit: int = TX_INDEX_PAGE_SIZE, before: int = None) -> list:
+        return self.find_indexed_txs(index=FSTxIndex.STATUS, value=FSTxIndex.FAILED, limit=limit, before=before)
+
+    def rebuild_tx_indexes(self):
+        # Recreates the tx indexes from every stored block, for chains stored before they were switched on.
+        if self.tx_index is None:
+            return
+
+        self.tx_index.flush()
+
+        for block in self.iter_blocks():
+            if not self.is_genesis_block(block=block):
+                self.__save_tx_index(block_num=block.get('number'), tx=block.get('processed'))
+
+    def rebuild_state_history(self) -> int:
+        # Recreates the state history from every stored block, for storage written before it was kept. Keys last
+        # set in pruned blocks can't be recovered so the history only starts after the pruned height. Returns the
+        # block it starts from.
+        self.state_history.flush()
+
+        for block in self.iter_blocks():
+            self.__save_state_history(block=block)
+
+        pruned_height = self.get_pruned_height()
+        start = pruned_height + 1 if pruned_height > 0 else 0
+        self.set_state_history_start(block_num=start)
+
+        return start
+
+class BlockCache:
+    # Bounded LRU of filled blocks keyed by number, with a hash lookup on the side. Entries are kept as encoded JSON
+    # so the memory bound is exact and every hit hands out a fresh copy that callers are free to mutate.
+    def __init__(self, max_bytes: int = BLOCK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.hashes = {}
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, block_num=None, block_hash: str = None) -> Union[dict, None]:
+        if block_num is None:
+            block_num = self.hashes.get(block_hash)
+        else:
+            try:
+                block_num = int(block_num)
+            except (TypeError, ValueError):
+                block_num = None
+
+        entry = self.entries.get(block_num) if block_num is not None else None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(block_num)
+        self.hits += 1
+
+        return json.loads(entry[1])
+
+    def put(self, block: dict) -> None:
+        block_num = int(block.get('number'))
+        encoded_block = json.dumps(block)
+
+        self.invalidate(block_num=block_num)
+
+        if len(encoded_block) > self.max_bytes:
+            return
+
+        block_hash = block.get('hash')
+        self.entries[block_num] = (block_hash, encoded_block)
+        self.hashes[block_hash] = block_num
+        self.size += len(encoded_block)
+
+        while self.size > self.max_bytes:
+            evicted_num, _ = next(iter(self.entries.items()))
+            self.invalidate(block_num=evicted_num)
+            self.evictions += 1
+
+    def invalidate(self, block_num) -> None:
+        entry = self.entries.pop(int(block_num), None)
+
+        if entry is None:
+            return
+
+        block_hash, encoded_block = entry
+        if self.hashes.get(block_hash) == int(block_num):
+            self.hashes.pop(block_hash)
+
+        self.size -= len(encoded_block)
+
+    def clear(self) -> None:
+        self.entries = OrderedDict()
+        self.hashes = {}
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'size': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+# TODO: remove pending nonces if we end up getting rid of them.
+# TODO: move to component responsible for state maintenance.
+NONCE_FILENAME = '__n'
+PENDING_NONCE_FILENAME = '__pn'
+NONCE_VERSION_FILENAME = '.nonce_version'
+NONCE_VERSION_MAX_SIZE = 1_000_000
+
+class NonceStorage:
+    # Nonces are served from memory and writes are held until commit(). The node commits once a block is hard
+    # applied so a crash can only lose nonces of txs that never made it into a block; those are rebuilt from blocks
+    # by catchup. Every commit or flush grows a version file so other processes sharing the root (node and
+    # webserver) drop what they cached.
+    def __init__(self, root=None):
+        root = root if root is not None else STORAGE_HOME
+        self.driver = FSDriver(root=root)
+
+        os.makedirs(root, exist_ok=True)
+        self.version_path = os.path.join(str(root), NONCE_VERSION_FILENAME)
+        open(self.version_path, 'ab').close()
+
+        self.cache = {}
+        self.pending_writes = {}
+        self.known_version = self.__get_version()
+
+    def __nonce_key(self, filename, sender, processor):
+        return filename + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor
+
+    def __get_version(self):
+        try:
+            stat = os.stat(self.version_path)
+        except FileNotFoundError:
+            return None
+
+        return stat.st_ino, stat.st_size
+
+    def __check_version(self):
+        version = self.__get_version()
+
+        if version is None or version != self.known_version:
+            self.cache.clear()
+            self.known_version = version
+
+    def __bump_version(self):
+        # Size is the version; the file is swapped for a fresh one now and then which changes the inode instead.
+        try:
+            if os.path.getsize(self.version_path) >= NONCE_VERSION_MAX_SIZE:
+                tmp_path = f'{self.version_path}.{os.getpid()}.tmp'
+                open(tmp_path, 'wb').close()
+                os.replace(tmp_path, self.version_path)
+        except FileNotFoundError:
+            pass
+
+        with open(self.version_path, 'ab') as f:
+            f.write(b'.')
+
+        self.known_version = self.__get_version()
+
+    def __get(self, key):
+        if key in self.pending_writes:
+            return self.pending_writes[key]
+
+        self.__check_version()
+
+        if key not in self.cache:
+            self.cache[key] = self.driver.get(key)
+
+        return self.cache[key]
+
+    def __set(self, key, value):
+        self.pending_writes[key] = value
+        self.cache[key] = value
+
+    # Move this to transaction.py
+    def get_nonce(self, sender, processor):
+        return self.__get(self.__nonce_key(NONCE_FILENAME, sender, processor))
+
+    # Move this to transaction.py
+    def get_pending_nonce(self, sender, processor):
+        return self.__get(self.__nonce_key(PENDING_NONCE_FILENAME, sender, processor))
+
+    def set_nonce(self, sender, processor, value):
+        self.__set(self.__nonce_key(NONCE_FILENAME, sender, processor), value)
+
+    def safe_set_nonce(self, sender, processor, value):
+        current_nonce = self.get_nonce(sender=sender, processor=processor)
+
+        if current_nonce is None:
+            current_nonce = -1
+
+        if value > current_nonce:
+            self.__set(self.__nonce_key(NONCE_FILENAME, sender, processor), value)
+
+    def set_pending_nonce(self, sender, processor, value):
+        self.__set(self.__nonce_key(PENDING_NONCE_FILENAME, sender, processor), value)
+
+    # Move this to webserver.py
+    def get_latest_nonce(self, sender, processor):
+        latest_nonce = self.get_pending_nonce(sender=sender, processor=processor)
+
+        if latest_nonce is None:
+            latest_nonce = self.get_nonce(sender=sender, processor=processor)
+
+        if latest_nonce is None:
+            latest_nonce = 0
+
+        return latest_nonce
+
+    def get_next_nonce(self, sender, processor):
+        current_nonce = self.get_pending_nonce(sender=sender, processor=processor)
+
+        if current_nonce is None:
+            current_nonce = self.get_nonce(sender=sender, processor=processor)
+
+        if current_nonce is None:
+            return 0
+
+        return current_nonce + 1
+
+    def iter_nonces(self):
+        # Committed nonces as (sender, processor, value), pending nonces are left out. Only reads the disk so it's
+        # safe from another thread; call commit() first for nonces set since the last one.
+        prefix = NONCE_FILENAME + config.INDEX_SEPARATOR
+        for key in sorted(self.driver.keys(prefix)):
+            sender, _, processor = key[len(prefix):].partition(config.DELIMITER)
+            yield sender, processor, self.driver.get(key)
+
+    def commit(self):
+        if not self.pending_writes:
+            return
+
+        for key, value in self.pending_writes.items():
+            self.driver.set(key, value)
+
+        self.pending_writes.clear()
+        self.__bump_version()
+
+    def flush(self):
+        self.driver.flush_file(NONCE_FILENAME)
+        self.driver.flush_file(PENDING_NONCE_FILENAME)
+
+        self.cache.clear()
+        self.pending_writes.clear()
+        self.__bump_version()
+
+    def flush_pending(self):
+        self.driver.flush_file(PENDING_NONCE_FILENAME)
+
+        prefix = PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR
+        for entries in (self.cache, self.pending_writes):
+            for key in [key for key in entries if key.startswith(prefix)]:
+                del entries[key]
+
+        self.__bump_version()
+
+# TODO: move to component responsible for state maintenance.
+def get_latest_block_hash(driver: ContractDriver):
+    latest_hash = driver.get(LATEST_BLOCK_HASH_KEY)
+    if latest_hash is None:
+        return '0' * 64
+    return latest_hash
+
+# TODO: move to component responsible for state maintenance.
+def set_latest_block_hash(h, driver: ContractDriver):
+    driver.set(LATEST_BLOCK_HASH_KEY, h)
+
+# TODO: move to component responsible for state maintenance.
+def get_latest_block_height(driver: ContractDriver):
+    h = driver.get(LATEST_BLOCK_HEIGHT_KEY, save=False)
+    if h is None:
+        return -1
+
+    if type(h) == ContractingDecimal:
+        h = int(h._d)
+
+    return int(h)
+
+
+def hash_to_key(hash_str: str) -> bytes:
+    # Fixed width key for a block or tx hash, used where hashes are kept in binary tables.
+    try:
+        key = bytes.fromhex(hash_str)
+        if len(key) == 32:
+            return key
+    except (TypeError, ValueError):
+        pass
+
+    return hashlib.sha3_256(str(hash_str).encode()).digest()
+
+
+class StorageCodec:
+    # Encodes file content for the FS drivers. Compressed files start with a header (magic, codec, dictionary id)
+    # that can never begin a JSON document, anything without it is read as plain JSON. zlib can use a preset
+    # dictionary shared by every driver under the same storage root, stored in DICTIONARIES_DIR by its id so
+    # files keep reading after a newer dictionary is trained.
+    MAGIC = b'\x00LC'
+    HEADER = struct.Struct('>3sBI')
+    CODECS = {'none': 0, 'zlib': 1, 'lzma': 2}
+    CURRENT_DICTIONARY_FILENAME = 'current'
+    DICTIONARY_SIZE = 32 * 1024
+    ZLIB_LEVEL = 6
+
+    def __init__(self, dictionaries_dir: str = None, compression: str = None):
+        compression = compression or os.environ.get(COMPRESSION_ENV) or 'none'
+        if compression not in self.CODECS:
+            raise ValueError(f'Unknown storage compression \'{compression}\'.')
+
+        self.compression = compression
+        self.dictionaries_dir = dictionaries_dir
+        self.dictionaries = {}
+
+        self.dictionary_id = 0
+        if self.compression == 'zlib':
+            self.dictionary_id = self._read_current_dictionary_id()
+
+    @classmethod
+    def for_driver_root(cls, root: str):
+        # Drivers live one level below the storage root, ie. <root>/blocks and <root>/txs.
+        return cls(dictionaries_dir=os.path.join(os.path.dirname(os.path.abspath(root)), DICTIONARIES_DIR))
+
+    def _read_current_dictionary_id(self) -> int:
+        if self.dictionaries_dir is None:
+            return 0
+
+        try:
+            with open(os.path.join(self.dictionaries_dir, self.CURRENT_DICTIONARY_FILENAME), 'r') as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _get_dictionary(self, dictionary_id: int) -> bytes:
+        dictionary = self.dictionaries.get(dictionary_id)
+
+        if dictionary is None:
+            if self.dictionaries_dir is None:
+                raise ValueError(f'Compression dictionary {dictionary_id} is needed but no dictionaries are set.')
+
+            with open(os.path.join(self.dictionaries_dir, str(dictionary_id)), 'rb') as f:
+                dictionary = f.read()
+            self.dictionaries[dictionary_id] = dictionary
+
+        return dictionary
+
+    def encode(self, data: bytes) -> bytes:
+        if self.compression == 'none':
+            return data
+
+        if self.compression == 'lzma':
+            return self.HEADER.pack(self.MAGIC, self.CODECS['lzma'], 0) + lzma.compress(data)
+
+        if self.dictionary_id:
+            compressor = zlib.compressobj(self.ZLIB_LEVEL, zdict=self._get_dictionary(self.dictionary_id))
+        else:
+            compressor = zlib.compressobj(self.ZLIB_LEVEL)
+
+        return self.HEADER.pack(self.MAGIC, self.CODECS['zlib'], self.dictionary_id) + compressor.compress(data) + compressor.flush()
+
+    def decode(self, data: bytes) -> bytes:
+        if not data.startswith(self.MAGIC):
+            return data
+
+        _, codec, dictionary_id = self.HEADER.unpack_from(data)
+        payload = memoryview(data)[self.HEADER.size:]
+
+        if codec == self.CODECS['lzma']:
+            return lzma.decompress(payload)
+
+        if codec == self.CODECS['zlib']:
+            if dictionary_id:
+                decompressor = zlib.decompressobj(zdict=self._get_dictionary(dictionary_id))
+            else:
+                decompressor = zlib.decompressobj()
+            return decompressor.decompress(payload) + decompressor.flush()
+
+        raise ValueError(f'Unknown storage codec {codec}.')
+
+    @classmethod
+    def build_dictionary(cls, samples: list, size: int = DICTIONARY_SIZE) -> bytes:
+        # The stdlib has no dictionary trainer. JSON strings (keys, contract and function names, common values)
+        # that show up in more than one sample are collected, most frequent last where zlib reaches them cheapest.
+        # One-off strings like hashes and signatures never make it in.
+        counts = Counter()
+        for sample in samples:
+            counts.update(set(re.findall(rb'"[^"\\]{0,64}"(?:: )?', sample)))
+
+        selected = []
+        total = 0
+        for token, count in counts.most_common():
+            if count < 2:
+                break
+            if total + len(token) > size:
+                continue
+            selected.append(token)
+            total += len(token)
+
+        return b''.join(reversed(selected))
+
+    def train_dictionary(self, samples: list, size: int = DICTIONARY_SIZE) -> int:
+        # Stores a dictionary built from samples and makes it the one new zlib files are written with, by any
+        # process started after this. Returns its id.
+        dictionary = self.build_dictionary(samples=samples, size=size)
+        dictionary_id = zlib.crc32(dictionary) or 1
+
+        os.makedirs(self.dictionaries_dir, exist_ok=True)
+
+        with open(os.path.join(self.dictionaries_dir, str(dictionary_id)), 'wb') as f:
+            f.write(dictionary)
+
+        current_path = os.path.join(self.dictionaries_dir, self.CURRENT_DICTIONARY_FILENAME)
+        tmp_path = f'{current_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(dictionary_id))
+        os.replace(tmp_path, current_path)
+
+        self.dictionaries[dictionary_id] = dictionary
+        if self.compression == 'zlib':
+            self.dictionary_id = dictionary_id
+
+        return dictionary_id
+
+
+class BlockDriver:
+    # The BlockStorage class will handle encoding and decoding. Store and return blocks as JSON strings.
+
+    # Set by drivers that can look blocks up by hash on their own, BlockStorage then skips the alias tree.
+    indexes_hashes = False
+
+    def find_block(self, block_num: str) -> dict:
+        # This method will take a block number and return that block and the next x amount of blocks
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_blocks(self, block_list: list) -> list:
+        # This method will take a list of blocks and return the block content for each
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def write_block(self, block: dict) -> None:
+        # Writes the content of a block dict to storage
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def write_blocks(self, block_list: list) -> None:
+        # Writes a list of block dicts to storage
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def delete_block(self, block_num: str) -> None:
+        # Deletes a block from storage
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def delete_blocks(self, block_list: list) -> None:
+        # Deletes a list of block numbers from storage
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_previous_block(self, block_num: str) -> dict:
+        # This method will take a block number and return the previous block
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_previous_blocks(self, block_num: str, amount_of_blocks: int) -> list:
+        # This method will take a block number and return the previous x amount of blocks
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_next_block(self, block_num: str) -> dict:
+        # This method will take a block number and return the next block
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_next_blocks(self, block_num: str, amount_of_blocks: int) -> list:
+        # This method will take a block number and return the next x amount of blocks
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_next_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        # Returns up to x block numbers after this block number, ascending, as ints
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_previous_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        # Returns up to x block numbers before this block number, descending, as ints
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def block_exists(self, block_num: str) -> bool:
+        # Checks if a block exists, returns Bool
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def get_total_blocks(self) -> int:
+        # Returns the total current block count
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def find_block_by_hash(self, block_hash: str) -> dict:
+        # Returns the block with this hash, only required when indexes_hashes is set
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def flush(self) -> None:
+        # Removes every block from storage
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def get_version(self):
+        # Returns a value that changes whenever storage is modified, including by other processes. None means the
+        # driver can't tell, and BlockStorage will not cache anything read through it.
+        return None
+
+class FSBlockDriver(BlockDriver):
+    # Sorted block numbers are kept in memory so neighbour lookups are a bisect instead of directory scans. Other
+    # processes sharing the same root (webserver, utilities) follow changes through an append-only journal.
+    # The index survives restarts as a snapshot plus that journal, described by a manifest holding the block count,
+    # min/max block and a checksum of the last written block. Startup trusts the manifest when it checks out and
+    # only scans every block file when it is missing or doesn't match.
+    # Cold day buckets can be rolled into a single pack file next to the bucket directory, see compact_bucket. Loose
+    # block files always win over a packed copy, so a bucket can keep taking writes after it was packed.
+    # With a cold root, day buckets can be moved there (ie. to a cheaper volume) and back, see move_bucket. Which
+    # buckets are cold is kept in a small map next to the index, lookups are routed by it and only look at the other
+    # tier after a miss, when the map is reloaded in case another process moved the bucket.
+    INDEX_JOURNAL_FILENAME = '.index_journal'
+    INDEX_JOURNAL_MAX_SIZE = 16_000_000
+    INDEX_SNAPSHOT_FILENAME = '.index_snapshot'
+    INDEX_SNAPSHOT_HEADER = struct.Struct('>QQQ')
+    MANIFEST_FILENAME = '.manifest'
+    TIERS_FILENAME = '.tiers'
+    TIER_LOCKS_DIR = '.tier_locks'
+
+    # Pack layout: block and tx records back to back, an entry per block sorted by number, block and tx hash tables
+    # sorted by hash pointing at entry positions, then the footer locating the three tables.
+    PACK_SUFFIX = '.pack'
+    PACK_MAGIC = b'LPK1'
+    PACK_ENTRY = struct.Struct('>qQIQI')
+    PACK_HASH_ENTRY = struct.Struct('>32sI')
+    PACK_FOOTER = struct.Struct('>4sQIQIQI')
+    PACK_CACHE_SIZE = 64
+
+    def __init__(self, root: str, initialize: bool = True, codec: StorageCodec = None, cold_root: str = None):
+        self.root = os.path.abspath(root)
+        self.cold_root = os.path.abspath(cold_root) if cold_root is not None else None
+        self.total_files = 0
+        self.initialized = False
+        self.codec = codec or StorageCodec.for_driver_root(root=self.root)
+
+        self.block_index = []
+        self.index_journal_path = os.path.join(self.root, self.INDEX_JOURNAL_FILENAME)
+        self.index_journal_offset = 0
+        self.index_journal_ino = None
+        self.index_built = False
+        self.index_generation = 0
+
+        self.index_snapshot_path = os.path.join(self.root, self.INDEX_SNAPSHOT_FILENAME)
+        self.manifest_path = os.path.join(self.root, self.MANIFEST_FILENAME)
+        self.last_written = None
+        self.index_scanned = False
+        self.pack_cache = OrderedDict()
+
+        self.tiers_path = os.path.join(self.root, self.TIERS_FILENAME)
+        self.tiers_version = None
+        self.cold_buckets = set()
+
+        self.minute = 60_000_000_000
+        self.hour = 3_600_000_000_000
+        self.day = 86_400_000_000_000
+        self.year = 31_536_000_000_000_000
+
+        if initialize:
+            self._initialize()
+
+    def _initialize(self):
+        self.build_index()
+        self.initialized = True
+
+    def build_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        if self.cold_root is not None:
+            os.makedirs(self.cold_root, exist_ok=True)
+            self._load_tiers()
+
+        if not os.path.exists(self.index_journal_path):
+            open(self.index_journal_path, 'a').close()
+
+        # A second attempt covers loading while another process is between writing a block and its manifest.
+        self.index_scanned = not (self._load_index() or self._load_index())
+
+        if self.index_scanned:
+            self._scan_index()
+
+        if self.index_journal_offset > self.INDEX_JOURNAL_MAX_SIZE:
+            self._compact_index()
+
+        self.index_built = True
+        self.index_generation += 1
+
+    def _scan_block_numbers(self) -> list:
+        # Every stored block number, loose or packed, from the files on disk.
+        block_nums = set()
+        for entry in itertools.chain.from_iterable(self._iterate_files(root) for root in self._roots()):
+            if entry.name.endswith(self.PACK_SUFFIX):
+                pack = self._load_pack(pack_path=entry.path)
+                if pack is not None:
+                    block_nums.update(pack['numbers'])
+                continue
+
+            try:
+                block_nums.add(int(entry.name))
+            except ValueError:
+                continue
+
+        return sorted(block_nums)
+
+    def _scan_index(self):
+        journal_stat = os.stat(self.index_journal_path)
+
+        block_index = self._scan_block_numbers()
+
+        # Journal entries written while scanning are replayed on the next sync, applying them twice is harmless.
+        self.block_index = block_index
+        self.total_files = len(block_index)
+        self.index_journal_ino = journal_stat.st_ino
+        self.index_journal_offset = journal_stat.st_size
+        self.last_written = None
+
+        self._write_snapshot()
+
+    def _load_index(self) -> bool:
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+
+            journal_stat = os.stat(self.index_journal_path)
+
+            block_index = array.array('q')
+            with open(self.index_snapshot_path, 'rb') as f:
+                journal_ino, journal_offset, count = self.INDEX_SNAPSHOT_HEADER.unpack(
+                    f.read(self.INDEX_SNAPSHOT_HEADER.size)
+                )
+
+                if journal_ino != journal_stat.st_ino or journal_offset > journal_stat.st_size:
+                    return False
+
+                block_index.fromfile(f, count)
+                if f.read(1):
+                    return False
+        except (FileNotFoundError, EOFError, ValueError, struct.error):
+            return False
+
+        self.block_index = block_index.tolist()
+        self.index_journal_ino = journal_stat.st_ino
+        self.index_journal_offset = journal_offset
+        self.last_written = manifest.get('last_written')
+
+        self._replay_index_journal(journal_size=journal_stat.st_size)
+
+        return self._index_matches_manifest(manifest=manifest)
+
+    def _index_matches_manifest(self, manifest: dict) -> bool:
+        if manifest.get('count') != len(self.block_index):
+            return False
+
+        if len(self.block_index) > 0:
+            if manifest.get('min') != self.block_index[0] or manifest.get('max') != self.block_index[-1]:
+                return False
+
+            for block_num in (self.block_index[0], self.block_index[-1]):
+                if not self.block_exists(block_num=block_num):
+                    return False
+
+        if self.last_written is not None:
+            block_num, checksum = self.last_written
+            if self._file_checksum(self.get_file_path(str(block_num).zfill(64))) != checksum:
+                return False
+
+        return True
+
+    def _compact_index(self):
+        # Everything in the journal is in the index by now. The fresh journal gets a new inode so processes
+        # following the old one notice and reload.
+        tmp_path = f'{self.index_journal_path}.{os.getpid()}.tmp'
+        open(tmp_path, 'w').close()
+        os.replace(tmp_path, self.index_journal_path)
+
+        self.index_journal_ino = os.stat(self.index_journal_path).st_ino
+        self.index_journal_offset = 0
+
+        self._write_snapshot()
+
+    def _write_snapshot(self):
+        tmp_path = f'{self.index_snapshot_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.INDEX_SNAPSHOT_HEADER.pack(self.index_journal_ino, self.index_journal_offset, len(self.block_index)))
+            array.array('q', self.block_index).tofile(f)
+        os.replace(tmp_path, self.index_snapshot_path)
+
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            'count': len(self.block_index),
+            'min': self.block_index[0] if len(self.block_index) > 0 else None,
+            'max': self.block_index[-1] if len(self.block_index) > 0 else None,
+            'last_written': self.last_written
+        }
+
+        tmp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except FileNotFoundError:
+            # Root was flushed or purged from under us.
+            pass
+
+    def _file_checksum(self, file_path: str) -> Union[int, None]:
+        try:
+            with open(file_path, 'rb') as f:
+                return zlib.crc32(f.read())
+        except FileNotFoundError:
+            return None
+
+    def get_version(self):
+        self._sync_index()
+        return self.index_generation, self.index_journal_offset
+
+    def _append_to_index_journal(self, op: str, block_num: int):
+        # Our own entries are replayed on the next sync, which is harmless as applying them is idempotent.
+        try:
+            with open(self.index_journal_path, 'a') as f:
+                f.write(f'{op}{block_num}\n')
+        except FileNotFoundError:
+            pass
+
+    def _add_to_index(self, block_num: int):
+        i = bisect.bisect_left(self.block_index, block_num)
+        if i == len(self.block_index) or self.block_index[i] != block_num:
+            self.block_index.insert(i, block_num)
+
+    def _remove_from_index(self, block_num: int):
+        i = bisect.bisect_left(self.block_index, block_num)
+        if i < len(self.block_index) and self.block_index[i] == block_num:
+            del self.block_index[i]
+
+    def _sync_index(self):
+        if not self.index_built:
+            self.build_index()
+            return
+
+        try:
+            journal_stat = os.stat(self.index_journal_path)
+        except FileNotFoundError:
+            # Root was flushed or purged from under us.
+            self.build_index()
+            return
+
+        if journal_stat.st_ino != self.index_journal_ino or journal_stat.st_size < self.index_journal_offset:
+            self.build_index()
+            return
+
+        if journal_stat.st_size == self.index_journal_offset:
+            return
+
+        self._replay_index_journal(journal_size=journal_stat.st_size)
+
+    def _replay_index_journal(self, journal_size: int):
+        with open(self.index_journal_path, 'r') as f:
+            f.seek(self.index_journal_offset)
+            data = f.read(journal_size - self.index_journal_offset)
+
+        # Only apply complete lines, a partial trailing line is picked up on the next sync.
+        end = data.rfind('\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                block_num = int(line[1:])
+            except ValueError:
+                continue
+
+            if line[0] == '+':
+                self._add_to_index(block_num)
+            elif line[0] == '-':
+                self._remove_from_index(block_num)
+
+        self.index_journal_offset += len(data[:end].encode())
+        self.total_files = len(self.block_index)
+
+    def _roots(self) -> list:
+        return [self.root] if self.cold_root is None else [self.root, self.cold_root]
+
+    def rescan_index(self):
+        # Rebuilds the index from the files on disk, for block files changed behind the driver's back (ie. repairs).
+        self._sync_index()
+        self._scan_index()
+        self._compact_index()
+        self.index_generation += 1
+
+    def _bucket_of(self, block_num: int) -> int:
+        # Lower bound of the day bucket a block number falls in.
+        return (int(block_num) // self.day) * self.day
+
+    def _load_tiers(self) -> bool:
+        # Reloads the cold bucket map when it was replaced, returns whether it changed.
+        try:
+            stat = os.stat(self.tiers_path)
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            version = None
+
+        if version == self.tiers_version:
+            return False
+
+        cold_buckets = set()
+        if version is not None:
+            try:
+                with open(self.tiers_path, 'r') as f:
+                    cold_buckets = set(json.load(f))
+            except (FileNotFoundError, ValueError):
+                version = None
+
+        self.cold_buckets = cold_buckets
+        self.tiers_version = version
+
+        return True
+
+    def _write_tiers(self):
+        tmp_path = f'{self.tiers_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(sorted(self.cold_buckets), f)
+        os.replace(tmp_path, self.tiers_path)
+
+        self._load_tiers()
+
+    @contextlib.contextmanager
+    def _bucket_lock(self, block_num: int, exclusive: bool = False):
+        # Shared while a day bucket is written to, exclusive while move_bucket moves it to the other tier, so nothing
+        # lands in the tier a bucket is leaving after its files were copied. The tier map is current once it's held.
+        if self.cold_root is None:
+            yield
+            return
+
+        lock_dir = os.path.join(self.root, self.TIER_LOCKS_DIR)
+        os.makedirs(lock_dir, exist_ok=True)
+
+        fd = os.open(os.path.join(lock_dir, str(self._bucket_of(block_num))), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._load_tiers()
+            yield
+        finally:
+            os.close(fd)
+
+    def _refresh_tiers(self) -> bool:
+        # Called after a miss, a lookup is only worth repeating if the map changed.
+        return self.cold_root is not None and self._load_tiers()
+
+    def _tier_root(self, block_num: int) -> str:
+        if self.cold_root is not None and self._bucket_of(block_num) in self.cold_buckets:
+            return self.cold_root
+
+        return self.root
+
+    def _find_directories(self, block_num: int) -> list:
+        dir_levels = [self.year, self.day, self.hour, self.minute]
+        directories = []
+        for level in dir_levels:
+            lower_bound = (block_num // level) * level
+            upper_bound = lower_bound + level - 1
+            dir_name = "{}_{}".format(lower_bound, upper_bound)
+            directories.append(dir_name)
+            block_num %= level
+        return directories
+
+    def _get_file_content(self, file_path: str) -> dict:
+        try:
+            with open(file_path, 'rb') as file:
+                return json.loads(self.codec.decode(file.read()))
         except FileNotFoundError:
             return None
         except Exception as err:
@@ -494,276 +1745,1692 @@ class FSBlockDriver(BlockDriver):
     def _iterate_files(self, path: str):
         with os.scandir(path) as entries:
             for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
                 if entry.is_file():
                     yield entry
                 elif entry.is_dir():
                     yield from self._iterate_files(entry.path)
 
-    def _traverse_up(self, current_directory: str, direction: str) -> str:
-        while True:
-            parent_directory = os.path.dirname(current_directory)
-            parent_directory_abs = os.path.abspath(parent_directory)
+    def _list_entries(self, path: str) -> list:
+        return [name for name in os.listdir(path) if not name.startswith('.')]
+
+    def _traverse_up(self, current_directory: str, direction: str) -> str:
+        while True:
+            parent_directory = os.path.dirname(current_directory)
+            parent_directory_abs = os.path.abspath(parent_directory)
+            try:
+                subdirectories = sorted(self._list_entries(parent_directory), key=lambda x: int(x.split('_')[0]))
+
+                parent_directory_abs = os.path.abspath(parent_directory)
+
+                current_directory_name = os.path.basename(current_directory)
+                try:
+                    index = subdirectories.index(current_directory_name)
+                except Exception:
+                    subdirectories.append(current_directory_name)
+                    subdirectories = sorted(subdirectories, key=lambda x: int(x.split('_')[0]))
+                    index = subdirectories.index(current_directory_name)
+
+                if (direction == 'previous' and index > 0) or (direction == 'next' and index < len(subdirectories) - 1):
+                    return os.path.join(parent_directory, subdirectories[index - 1 if direction == 'previous' else index + 1])
+
+                if parent_directory_abs == self.root and ((direction == 'previous' and index == 0) or (direction == 'next' and index == len(subdirectories) - 1)):
+                    return None
+            except (FileNotFoundError, ValueError) as e:
+                if parent_directory_abs == self.root:
+                    return None
+
+            current_directory = parent_directory
+
+    def _traverse_down(self, directory: str, direction: str) -> dict:
+        while os.path.isdir(directory):
+            sub_items = sorted(self._list_entries(directory), key=lambda x: int(x.split('_')[0]), reverse=(direction == 'previous'))
+            directory = os.path.join(directory, sub_items[0])
+
+            if os.path.isfile(directory):
+                return self._get_file_content(file_path=directory)
+
+        return None
+
+    def _remove_empty_dirs(self, starting_dir: str):
+        roots = [pathlib.Path(root) for root in self._roots()]
+        while pathlib.Path(starting_dir) not in roots:
+            if not os.listdir(starting_dir):
+                os.rmdir(starting_dir)
+                starting_dir = os.path.dirname(starting_dir)
+            else:
+                break
+
+    def flush(self):
+        for root in self._roots():
+            if os.path.isdir(root):
+                shutil.rmtree(root)
+            os.makedirs(root, exist_ok=True)
+
+        self.cold_buckets = set()
+        self.tiers_version = None
+
+        self.block_index = []
+        self.total_files = 0
+        self.index_journal_offset = 0
+        self.index_journal_ino = None
+        self.index_built = False
+        self.index_generation += 1
+        self.last_written = None
+        self.pack_cache.clear()
+
+    def get_file_path(self, block_num: str) -> str:
+        input_number = int(block_num)
+        current_dirs = self._find_directories(input_number)
+        file_path = os.path.join(self._tier_root(input_number), *current_dirs, block_num)
+        return file_path
+
+    def write_block(self, block: dict) -> str:
+        block_num = self._write_block_file(block=block)
+        self._update_manifest()
+        return block_num
+
+    def _write_block_file(self, block: dict) -> str:
+        block_num = str(block.get('number')).zfill(64)
+
+        try:
+            data = self.codec.encode(json.dumps(block).encode())
+        except Exception as err:
+            print(err)
+            data = b''
+
+        with self._bucket_lock(block_num=int(block_num)):
+            file_path = self.get_file_path(block_num)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            with open(file_path, 'wb') as f:
+                f.write(data)
+
+        self._index_block(block_num=int(block_num), checksum=zlib.crc32(data))
+
+        return block_num
+
+    def _index_block(self, block_num: int, checksum: int):
+        self._sync_index()
+        self._add_to_index(block_num)
+        self._append_to_index_journal('+', block_num)
+        self.total_files = len(self.block_index)
+
+        self.last_written = [block_num, checksum]
+
+    def _update_manifest(self):
+        if self.index_journal_offset > self.INDEX_JOURNAL_MAX_SIZE:
+            self._compact_index()
+        else:
+            self._write_manifest()
+
+    def write_blocks(self, block_list: list) -> None:
+        # The manifest is written once for the whole batch, a crash part way through just costs a rescan.
+        for block in block_list:
+            self._write_block_file(block=block)
+
+        if len(block_list) > 0:
+            self._update_manifest()
+
+    def move_block(self, src_file, block_num: str) -> None:
+        src_path = str(src_file)
+        with self._bucket_lock(block_num=int(block_num)):
+            dst_path = self.get_file_path(block_num)
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            shutil.move(src_path, dst_path)
+
+        self._index_block(block_num=int(block_num), checksum=self._file_checksum(dst_path))
+        self._update_manifest()
+
+        return dst_path
+
+    def delete_block(self, block_num: str) -> None:
+        with self._bucket_lock(block_num=int(block_num)):
+            file_path = self.get_file_path(block_num.zfill(64))
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+            self._remove_from_pack(block_num=int(block_num))
+
+        self._sync_index()
+        self._remove_from_index(int(block_num))
+        self._append_to_index_journal('-', int(block_num))
+        self.total_files = len(self.block_index)
+
+        if self.last_written is not None and self.last_written[0] == int(block_num):
+            self.last_written = None
+        self._update_manifest()
+
+        # A packed block has no directory left to tidy up.
+        if os.path.isdir(os.path.dirname(file_path)):
+            self._remove_empty_dirs(starting_dir=os.path.dirname(file_path))
+
+    def delete_blocks(self, block_list: list) -> None:
+        # Packs are rewritten once for every block of theirs in the list rather than once per block.
+        packed = {}
+        for block_num in block_list:
+            packed.setdefault(self._bucket_of(int(block_num)), set()).add(int(block_num))
+
+        for bucket, block_nums in packed.items():
+            with self._bucket_lock(block_num=bucket):
+                block_nums = {
+                    block_num for block_num in block_nums if self._find_pack_entry(block_num=block_num) is not None
+                }
+                if len(block_nums) == 0:
+                    continue
+
+                pack_path = self._pack_path(bucket)
+                records = [
+                    record for record in self._read_pack_records(pack_path=pack_path) if record[0] not in block_nums
+                ]
+                self._write_pack(pack_path=pack_path, records=records)
+
+        for block_num in block_list:
+            self.delete_block(block_num=str(block_num))
+
+    def find_block(self, block_num: str) -> dict:
+        block = self._find_tier_block(block_num=block_num)
+
+        if block is None and self._refresh_tiers():
+            block = self._find_tier_block(block_num=block_num)
+
+        return block
+
+    def _find_tier_block(self, block_num: str) -> dict:
+        path_to_file = self.get_file_path(block_num=str(block_num).zfill(64))
+        block = self._get_file_content(file_path=path_to_file)
+
+        if block is None:
+            block = self._decode_content(self._read_packed(block_num=int(block_num)))
+
+        return block
+
+    def find_blocks(self, block_list: list) -> list:
+        blocks = (self.find_block(block_num=block_num) for block_num in block_list)
+        return [block for block in blocks if block]
+
+    def _read_indexed_block(self, position: int, step: int) -> dict:
+        # Walks the index from position in the given direction until a block file can be read. Entries whose file
+        # has gone missing are dropped from the index.
+        while 0 <= position < len(self.block_index):
+            block_num = self.block_index[position]
+            block = self.find_block(block_num=block_num)
+
+            if block is not None:
+                return block
+
+            if self.block_exists(block_num=block_num):
+                position += step
+                continue
+
+            del self.block_index[position]
+            self.total_files = len(self.block_index)
+
+            if step < 0:
+                position -= 1
+
+        return None
+
+    def find_next_block(self, block_num: str) -> dict:
+        self._sync_index()
+        position = bisect.bisect_right(self.block_index, int(block_num))
+        return self._read_indexed_block(position=position, step=1)
+
+    def find_previous_block(self, block_num: str) -> dict:
+        self._sync_index()
+        position = bisect.bisect_left(self.block_index, int(block_num)) - 1
+        return self._read_indexed_block(position=position, step=-1)
+
+    def find_next_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        self._sync_index()
+        position = bisect.bisect_right(self.block_index, int(block_num))
+        return self.block_index[position:position + amount_of_blocks]
+
+    def find_previous_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        self._sync_index()
+        position = bisect.bisect_left(self.block_index, int(block_num))
+        return list(reversed(self.block_index[max(position - amount_of_blocks, 0):position]))
+
+    def find_next_blocks(self, block_num: str, amount_of_blocks: int) -> list:
+        blocks = [self.find_block(block_num=block_num)]
+        for next_block_num in self.find_next_block_numbers(block_num=block_num, amount_of_blocks=amount_of_blocks):
+            next_block = self.find_block(block_num=next_block_num)
+            if next_block is not None:
+                blocks.append(next_block)
+        return blocks
+
+    def find_previous_blocks(self, block_num: str, amount_of_blocks: int) -> list:
+        blocks = [self.find_block(block_num=block_num)]
+        for previous_block_num in self.find_previous_block_numbers(block_num=block_num, amount_of_blocks=amount_of_blocks):
+            previous_block = self.find_block(block_num=previous_block_num)
+            if previous_block is not None:
+                blocks.append(previous_block)
+        return blocks
+
+    def get_total_blocks(self) -> int:
+        return len(self._scan_block_numbers())
+
+    def block_exists(self, block_num: str) -> bool:
+        if self._tier_block_exists(block_num=block_num):
+            return True
+
+        return self._refresh_tiers() and self._tier_block_exists(block_num=block_num)
+
+    def _tier_block_exists(self, block_num: str) -> bool:
+        block_num_filled = str(block_num).zfill(64)
+        block_file_path = self.get_file_path(block_num_filled)
+        if os.path.exists(block_file_path):
+            return True
+
+        return self._find_pack_entry(block_num=int(block_num)) is not None
+
+    def _decode_content(self, data: Union[bytes, None]) -> Union[dict, None]:
+        if not data:
+            return None
+
+        try:
+            return json.loads(self.codec.decode(data))
+        except Exception as err:
+            print(err)
+            return None
+
+    def _pack_path(self, block_num: int) -> str:
+        year_dir, day_dir = self._find_directories(block_num)[:2]
+        return os.path.join(self._tier_root(block_num), year_dir, day_dir + self.PACK_SUFFIX)
+
+    def _load_pack(self, pack_path: str) -> Union[dict, None]:
+        # Entry table of a pack, cached until the pack file is replaced. Hash tables stay on disk and are searched
+        # in place, see _search_pack_hashes.
+        try:
+            stat = os.stat(pack_path)
+        except FileNotFoundError:
+            self.pack_cache.pop(pack_path, None)
+            return None
+
+        version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self.pack_cache.get(pack_path)
+        if cached is not None and cached['version'] == version:
+            self.pack_cache.move_to_end(pack_path)
+            return cached
+
+        try:
+            with open(pack_path, 'rb') as f:
+                f.seek(-self.PACK_FOOTER.size, os.SEEK_END)
+                magic, entries_offset, count, block_hashes_offset, block_hashes_count, tx_hashes_offset, tx_hashes_count = \
+                    self.PACK_FOOTER.unpack(f.read(self.PACK_FOOTER.size))
+
+                if magic != self.PACK_MAGIC:
+                    return None
+
+                f.seek(entries_offset)
+                entries = list(self.PACK_ENTRY.iter_unpack(f.read(count * self.PACK_ENTRY.size)))
+        except (OSError, struct.error) as err:
+            print(f'Unreadable pack file \'{pack_path}\': {err}')
+            return None
+
+        pack = {
+            'version': version,
+            'numbers': [entry[0] for entry in entries],
+            'entries': {entry[0]: entry for entry in entries},
+            'block_hashes': (block_hashes_offset, block_hashes_count),
+            'tx_hashes': (tx_hashes_offset, tx_hashes_count)
+        }
+
+        self.pack_cache[pack_path] = pack
+        while len(self.pack_cache) > self.PACK_CACHE_SIZE:
+            self.pack_cache.popitem(last=False)
+
+        return pack
+
+    def _find_pack_entry(self, block_num: int) -> Union[tuple, None]:
+        pack = self._load_pack(pack_path=self._pack_path(block_num))
+        if pack is None:
+            return None
+
+        return pack['entries'].get(block_num)
+
+    def _read_packed(self, block_num: int, tx: bool = False) -> Union[bytes, None]:
+        # Stored bytes of a packed block, or of its tx, still encoded.
+        entry = self._find_pack_entry(block_num=block_num)
+        if entry is None:
+            return None
+
+        _, block_offset, block_length, tx_offset, tx_length = entry
+        offset, length = (tx_offset, tx_length) if tx else (block_offset, block_length)
+
+        if length == 0:
+            return None
+
+        try:
+            with open(self._pack_path(block_num), 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+        except FileNotFoundError:
+            return None
+
+    def _read_pack_records(self, pack_path: str) -> list:
+        # All (block_num, block bytes, tx bytes) records of a pack in block order.
+        pack = self._load_pack(pack_path=pack_path)
+        if pack is None:
+            return []
+
+        records = []
+        with open(pack_path, 'rb') as f:
+            for block_num in pack['numbers']:
+                _, block_offset, block_length, tx_offset, tx_length = pack['entries'][block_num]
+                f.seek(block_offset)
+                block_data = f.read(block_length)
+                f.seek(tx_offset)
+                tx_data = f.read(tx_length)
+                records.append((block_num, block_data, tx_data))
+
+        return records
+
+    def _write_pack(self, pack_path: str, records) -> None:
+        records = sorted(records, key=lambda record: record[0])
+
+        if len(records) == 0:
+            if os.path.exists(pack_path):
+                os.remove(pack_path)
+            self.pack_cache.pop(pack_path, None)
+            return
+
+        entries = []
+        block_hashes = []
+        tx_hashes = []
+
+        tmp_path = f'{pack_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            offset = 0
+            for position, (block_num, block_data, tx_data) in enumerate(records):
+                f.write(block_data)
+                f.write(tx_data)
+                entries.append(self.PACK_ENTRY.pack(block_num, offset, len(block_data), offset + len(block_data), len(tx_data)))
+                offset += len(block_data) + len(tx_data)
+
+                block = self._decode_content(block_data) or {}
+                if block.get('hash'):
+                    block_hashes.append((hash_to_key(block.get('hash')), position))
+                if len(tx_data) > 0 and isinstance(block.get('processed'), str):
+                    tx_hashes.append((hash_to_key(block.get('processed')), position))
+
+            entries_offset = offset
+            f.write(b''.join(entries))
+
+            block_hashes_offset = entries_offset + len(entries) * self.PACK_ENTRY.size
+            f.write(b''.join(self.PACK_HASH_ENTRY.pack(*entry) for entry in sorted(block_hashes)))
+
+            tx_hashes_offset = block_hashes_offset + len(block_hashes) * self.PACK_HASH_ENTRY.size
+            f.write(b''.join(self.PACK_HASH_ENTRY.pack(*entry) for entry in sorted(tx_hashes)))
+
+            f.write(self.PACK_FOOTER.pack(
+                self.PACK_MAGIC, entries_offset, len(entries), block_hashes_offset, len(block_hashes),
+                tx_hashes_offset, len(tx_hashes)
+            ))
+        os.replace(tmp_path, pack_path)
+
+        self.pack_cache.pop(pack_path, None)
+
+    def _remove_from_pack(self, block_num: int) -> None:
+        if self._find_pack_entry(block_num=block_num) is None:
+            return
+
+        pack_path = self._pack_path(block_num)
+        records = [record for record in self._read_pack_records(pack_path=pack_path) if record[0] != block_num]
+        self._write_pack(pack_path=pack_path, records=records)
+
+    def _search_pack_hashes(self, pack_path: str, table: str, hash_str: str) -> Union[int, None]:
+        # Binary search of one of the hash tables of a pack, returns the block number the hash belongs to.
+        pack = self._load_pack(pack_path=pack_path)
+        if pack is None:
+            return None
+
+        offset, count = pack[table]
+        key = hash_to_key(hash_str=hash_str)
+        entry_size = self.PACK_HASH_ENTRY.size
+
+        try:
+            fd = os.open(pack_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+
+        try:
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                entry_key, _ = self.PACK_HASH_ENTRY.unpack(os.pread(fd, entry_size, offset + middle * entry_size))
+                if entry_key < key:
+                    low = middle + 1
+                else:
+                    high = middle
+
+            if low < count:
+                entry_key, position = self.PACK_HASH_ENTRY.unpack(os.pread(fd, entry_size, offset + low * entry_size))
+                if entry_key == key:
+                    return pack['numbers'][position]
+        finally:
+            os.close(fd)
+
+        return None
+
+    def list_packs(self, reverse: bool = False) -> list:
+        # Pack files in block order, newest first when reverse is set.
+        packs = []
+        for root in self._roots():
+            for year_dir in self._list_entries(root):
+                year_path = os.path.join(root, year_dir)
+                if not os.path.isdir(year_path):
+                    continue
+
+                for name in self._list_entries(year_path):
+                    if name.endswith(self.PACK_SUFFIX):
+                        packs.append(os.path.join(year_path, name))
+
+        return sorted(packs, key=self._bucket_lower_bound, reverse=reverse)
+
+    def get_pack_block_numbers(self, pack_path: str) -> Union[list, None]:
+        # Block numbers held by a pack file, None if it can't be read.
+        pack = self._load_pack(pack_path=pack_path)
+        return None if pack is None else list(pack['numbers'])
+
+    def _bucket_lower_bound(self, bucket_path: str) -> int:
+        year_dir = os.path.basename(os.path.dirname(bucket_path))
+        day_dir = os.path.basename(bucket_path)
+        return int(year_dir.split('_')[0]) + int(day_dir.split('_')[0])
+
+    def get_cold_buckets(self, before_block_num: int) -> list:
+        # Day bucket directories holding loose block files that all come before before_block_num, oldest first.
+        buckets = []
+        for root in self._roots():
+            for year_dir in self._list_entries(root):
+                year_path = os.path.join(root, year_dir)
+                if not os.path.isdir(year_path):
+                    continue
+
+                year_lower = int(year_dir.split('_')[0])
+                for day_dir in self._list_entries(year_path):
+                    day_path = os.path.join(year_path, day_dir)
+                    if not os.path.isdir(day_path):
+                        continue
+
+                    if year_lower + int(day_dir.split('_')[1]) < before_block_num:
+                        buckets.append(day_path)
+
+        return sorted(buckets, key=self._bucket_lower_bound)
+
+    def list_buckets(self, cold: bool = False) -> list:
+        # Lower bounds of the day buckets with loose blocks or a pack in the hot or the cold tier, oldest first.
+        root = self.cold_root if cold else self.root
+        if root is None:
+            return []
+
+        buckets = set()
+        for year_dir in self._list_entries(root):
+            year_path = os.path.join(root, year_dir)
+            if not os.path.isdir(year_path):
+                continue
+
+            for name in self._list_entries(year_path):
+                buckets.add(self._bucket_lower_bound(os.path.join(year_path, name)))
+
+        return sorted(buckets)
+
+    def move_bucket(self, bucket: int, cold: bool = True) -> bool:
+        # Moves the day bucket holding block number bucket, loose files and pack, to the cold tier or back while
+        # other processes keep reading. Files are copied, the map is switched and only then are the originals removed.
+        # Writes to the bucket wait on its lock meanwhile and go to the new tier after. Returns False if it was
+        # already in that tier.
+        if self.cold_root is None:
+            raise ValueError('No cold root to move blocks to.')
+
+        bucket = self._bucket_of(bucket)
+
+        with self._bucket_lock(block_num=bucket, exclusive=True):
+            if (bucket in self.cold_buckets) == cold:
+                return False
+
+            src_root, dst_root = (self.root, self.cold_root) if cold else (self.cold_root, self.root)
+            year_dir, day_dir = self._find_directories(bucket)[:2]
+            paths = [os.path.join(year_dir, day_dir), os.path.join(year_dir, day_dir + self.PACK_SUFFIX)]
+
+            self._copy_to_tier(src_root=src_root, dst_root=dst_root, paths=paths)
+
+            if cold:
+                self.cold_buckets.add(bucket)
+            else:
+                self.cold_buckets.discard(bucket)
+            self._write_tiers()
+
+            for path in paths:
+                src_path = os.path.join(src_root, path)
+                if os.path.isdir(src_path):
+                    shutil.rmtree(src_path)
+                elif os.path.exists(src_path):
+                    os.remove(src_path)
+                self.pack_cache.pop(src_path, None)
+
+            if os.path.isdir(os.path.join(src_root, year_dir)):
+                self._remove_empty_dirs(starting_dir=os.path.join(src_root, year_dir))
+
+        return True
+
+    def _copy_to_tier(self, src_root: str, dst_root: str, paths: list):
+        # Copies files under paths (relative to the roots) that are missing or changed in the destination.
+        for path in paths:
+            src_path = os.path.join(src_root, path)
+            if os.path.isdir(src_path):
+                files = [entry.path for entry in self._iterate_files(src_path)]
+            elif os.path.isfile(src_path):
+                files = [src_path]
+            else:
+                continue
+
+            for file_path in files:
+                dst_path = os.path.join(dst_root, os.path.relpath(file_path, src_root))
+
+                try:
+                    src_mtime = os.stat(file_path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+
+                try:
+                    if os.stat(dst_path).st_mtime_ns == src_mtime:
+                        continue
+                except FileNotFoundError:
+                    pass
+
+                os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+                tmp_path = f'{dst_path}.{os.getpid()}.tmp'
+                shutil.copy2(file_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+
+    def compact_bucket(self, bucket_path: str, tx_driver: 'FSHashStorageDriver' = None) -> list:
+        # Rolls the loose block files of a day bucket, and their txs when a tx driver is given, into the bucket's
+        # pack. Loose files are only removed when they still hold what was packed. Returns (block_num, block hash,
+        # tx hash) of every block now only in the pack, tx hash is None when its tx wasn't packed; the tx files and
+        # anything else pointing at the loose files are left for the caller to clean up.
+        with self._bucket_lock(block_num=self._bucket_lower_bound(bucket_path)):
+            return self._compact_bucket(bucket_path=bucket_path, tx_driver=tx_driver)
+
+    def _compact_bucket(self, bucket_path: str, tx_driver: 'FSHashStorageDriver' = None) -> list:
+        # Gone if it was moved to the other tier before the lock was taken.
+        if not os.path.isdir(bucket_path):
+            return []
+
+        block_nums = []
+        for entry in self._iterate_files(bucket_path):
+            try:
+                block_nums.append(int(entry.name))
+            except ValueError:
+                continue
+
+        if len(block_nums) == 0:
+            return []
+
+        pack_path = bucket_path + self.PACK_SUFFIX
+        records = {record[0]: record for record in self._read_pack_records(pack_path=pack_path)}
+
+        candidates = []
+        for block_num in sorted(block_nums):
+            file_path = self.get_file_path(str(block_num).zfill(64))
             try:
-                subdirectories = sorted(os.listdir(parent_directory), key=lambda x: int(x.split('_')[0]))
+                with open(file_path, 'rb') as f:
+                    block_data = f.read()
+            except FileNotFoundError:
+                continue
 
-                parent_directory_abs = os.path.abspath(parent_directory)
+            block = self._decode_content(block_data)
+            if block is None:
+                continue
 
-                current_directory_name = os.path.basename(current_directory)
-                try:
-                    index = subdirectories.index(current_directory_name)
-                except Exception:
-                    subdirectories.append(current_directory_name)
-                    subdirectories = sorted(subdirectories, key=lambda x: int(x.split('_')[0]))
-                    index = subdirectories.index(current_directory_name)
+            tx_hash = block.get('processed') if isinstance(block.get('processed'), str) else None
+            tx_data = tx_driver.read_raw(hash_str=tx_hash) if tx_driver is not None and tx_hash else None
 
-                if (direction == 'previous' and index > 0) or (direction == 'next' and index < len(subdirectories) - 1):
-                    return os.path.join(parent_directory, subdirectories[index - 1 if direction == 'previous' else index + 1])
+            records[block_num] = (block_num, block_data, tx_data or b'')
+            candidates.append((block_num, file_path, block_data, block.get('hash'), tx_hash if tx_data else None))
 
-                if parent_directory_abs == self.root and ((direction == 'previous' and index == 0) or (direction == 'next' and index == len(subdirectories) - 1)):
-                    return None
-            except (FileNotFoundError, ValueError) as e:
-                if parent_directory_abs == self.root:
-                    return None
+        self._write_pack(pack_path=pack_path, records=records.values())
 
-            current_directory = parent_directory
+        packed = []
+        for block_num, file_path, block_data, block_hash, tx_hash in candidates:
+            try:
+                with open(file_path, 'rb') as f:
+                    if f.read() != block_data:
+                        continue
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+            self._remove_empty_dirs(starting_dir=os.path.dirname(file_path))
+            packed.append((block_num, block_hash, tx_hash))
+
+        # The manifest can't checksum a block that only lives in a pack.
+        if self.last_written is not None and self.last_written[0] in {block_num for block_num, _, _ in packed}:
+            self.last_written = None
+            self._write_manifest()
+
+        return packed
+
+    def expand_pack(self, pack_path: str) -> list:
+        # Writes every block of a pack back out as a loose file and removes the pack. Returns (block, tx bytes) for
+        # the blocks restored so the caller can put back their txs, blocks that were rewritten loose
+        # since they were packed are left alone.
+        expanded = []
+        for block_num, block_data, tx_data in self._read_pack_records(pack_path=pack_path):
+            file_path = self.get_file_path(str(block_num).zfill(64))
+            if os.path.exists(file_path):
+                continue
+
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_path = f'{file_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(block_data)
+            os.replace(tmp_path, file_path)
+
+            block = self._decode_content(block_data)
+            if block is not None:
+                expanded.append((block, tx_data))
+
+        if os.path.exists(pack_path):
+            os.remove(pack_path)
+        self.pack_cache.pop(pack_path, None)
+
+        return expanded
+
+    def find_packed_tx(self, tx_hash: str, block_num: str = None) -> Union[dict, None]:
+        # The tx of a packed block, read straight from its pack entry when the block number is known.
+        if block_num is None:
+            for pack_path in self.list_packs(reverse=True):
+                block_num = self._search_pack_hashes(pack_path=pack_path, table='tx_hashes', hash_str=tx_hash)
+                if block_num is not None:
+                    break
+
+            if block_num is None:
+                return None
 
-    def _traverse_down(self, directory: str, direction: str) -> dict:
-        while os.path.isdir(directory):
-            sub_items = sorted(os.listdir(directory), key=lambda x: int(x.split('_')[0]), reverse=(direction == 'previous'))
-            directory = os.path.join(directory, sub_items[0])
+        return self._decode_content(self._read_packed(block_num=int(block_num), tx=True))
 
-            if os.path.isfile(directory):
-                return self._get_file_content(file_path=directory)
+class FSHashStorageDriver:
+    def __init__(self, root: str, codec: StorageCodec = None):
+        assert root is not None, "Must provide a root directory for storage"
+        self.root_dir = root
+        self.codec = codec or StorageCodec.for_driver_root(root=root)
 
-        return None
+    def get_directory(self, hash_str: str) -> str:
+        return os.path.join(self.root_dir, hash_str[:2], hash_str[2:4], hash_str[4:6])
+
+    def flush(self) -> None:
+        if os.path.isdir(self.root_dir):
+            shutil.rmtree(self.root_dir)
+        os.makedirs(self.root_dir, exist_ok=True)
 
     def _remove_empty_dirs(self, starting_dir: str):
-        while pathlib.Path(starting_dir) != pathlib.Path(self.root):
+        while pathlib.Path(starting_dir) != pathlib.Path(self.root_dir):
             if not os.listdir(starting_dir):
                 os.rmdir(starting_dir)
                 starting_dir = os.path.dirname(starting_dir)
             else:
                 break
 
+    def write_file(self, hash_str: str, data: dict) -> None:
+        dir_path = self.get_directory(hash_str)
+        os.makedirs(dir_path, exist_ok=True)
+
+        file_path = os.path.join(dir_path, hash_str)
+        with open(file_path, "wb") as f:
+            f.write(self.codec.encode(json.dumps(data).encode()))
+
+    def write_raw(self, hash_str: str, data: bytes) -> None:
+        # Writes bytes exactly as given, ie. a file read with read_raw.
+        dir_path = self.get_directory(hash_str)
+        os.makedirs(dir_path, exist_ok=True)
+
+        with open(os.path.join(dir_path, hash_str), "wb") as f:
+            f.write(data)
+
+    def read_raw(self, hash_str: str) -> Union[bytes, None]:
+        # Stored bytes of a file, still encoded.
+        file_path = os.path.join(self.get_directory(hash_str), hash_str)
+
+        try:
+            with open(file_path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete_file(self, hash_str: str) -> None:
+        dir_path = self.get_directory(hash_str=hash_str)
+        file_path = os.path.join(dir_path, hash_str)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+        if os.path.isdir(dir_path):
+            self._remove_empty_dirs(starting_dir=dir_path)
+
+    def get_file(self, hash_str: str) -> dict:
+        dir_path = self.get_directory(hash_str)
+        file_path = os.path.join(dir_path, hash_str)
+
+        if not os.path.exists(dir_path):
+            return None
+
+        with open(file_path, "rb") as f:
+            return json.loads(self.codec.decode(f.read()))
+
+class FSBlockHashIndex:
+    # Block hash -> block number as an open addressed table in a single file, replacing the symlink alias tree.
+    # Slots are (hash key, block number + 1): 0 marks an empty slot and -1 a removed entry that probing passes over.
+    # A lookup reads one window of slots from the hash's home position, which holds the entry unless the table is
+    # unusually clustered. Writes go straight to the file so readers in other processes see them without reloading.
+    # Growing writes a bigger table and swaps it in, readers notice the new inode on their next miss.
+    MAGIC = b'LHX1'
+    HEADER = struct.Struct('>4sQQ')
+    HEADER_SIZE = 64
+    SLOT = struct.Struct('>32sq')
+    INITIAL_SLOTS = 1 << 16
+    MAX_LOAD = 0.5
+    PROBE_WINDOW = 8
+    EMPTY = 0
+    REMOVED = -1
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.fd = None
+        self.ino = None
+        self.slots = 0
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def _close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+        self.ino = None
+        self.slots = 0
+
+    def _is_stale(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != self.ino
+        except FileNotFoundError:
+            return True
+
+    def _open(self, create: bool) -> bool:
+        if self.fd is not None and not self._is_stale():
+            return True
+
+        self._close()
+
+        if not self.exists():
+            if not create:
+                return False
+            self._write_table(slots=self.INITIAL_SLOTS, entries=[])
+
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+
+        magic, slots, _ = self.HEADER.unpack(os.pread(fd, self.HEADER.size, 0))
+        if magic != self.MAGIC or slots == 0:
+            os.close(fd)
+            raise ValueError(f'\'{self.path}\' is not a block hash index.')
+
+        self.fd = fd
+        self.ino = os.fstat(fd).st_ino
+        self.slots = slots
+        return True
+
+    def _home(self, key: bytes, slots: int) -> int:
+        return int.from_bytes(key[:8], 'big') % slots
+
+    def _find_slot(self, key: bytes) -> tuple:
+        # Returns (position, stored value) of the key's slot, or (None, first slot a new entry can go in).
+        position = self._home(key=key, slots=self.slots)
+        free = None
+        scanned = 0
+
+        while scanned < self.slots:
+            count = min(self.PROBE_WINDOW, self.slots - position, self.slots - scanned)
+            data = os.pread(self.fd, count * self.SLOT.size, self.HEADER_SIZE + position * self.SLOT.size)
+            data = data.ljust(count * self.SLOT.size, b'\x00')
+
+            for i, (slot_key, stored) in enumerate(self.SLOT.iter_unpack(data)):
+                if stored == self.EMPTY:
+                    return None, free if free is not None else position + i
+                if slot_key == key:
+                    return position + i, stored
+                if stored == self.REMOVED and free is None:
+                    free = position + i
+
+            scanned += count
+            position = (position + count) % self.slots
+
+        return None, free
+
+    def _read_header(self) -> tuple:
+        _, slots, used = self.HEADER.unpack(os.pread(self.fd, self.HEADER.size, 0))
+        return slots, used
+
+    def _write_header(self, slots: int, used: int):
+        os.pwrite(self.fd, self.HEADER.pack(self.MAGIC, slots, used), 0)
+
+    def _write_slot(self, position: int, key: bytes, stored: int):
+        os.pwrite(self.fd, self.SLOT.pack(key, stored), self.HEADER_SIZE + position * self.SLOT.size)
+
+    def get(self, hash_str: str) -> Union[int, None]:
+        key = hash_to_key(hash_str=hash_str)
+
+        for _ in range(2):
+            if not self._open(create=False):
+                return None
+
+            position, stored = self._find_slot(key=key)
+            if position is not None and stored > 0:
+                return stored - 1
+
+            # Missed, the table may have been swapped for a bigger one since it was opened.
+            if not self._is_stale():
+                return None
+
+        return None
+
+    def put(self, hash_str: str, block_num: int) -> None:
+        self._open(create=True)
+
+        key = hash_to_key(hash_str=hash_str)
+        position, stored = self._find_slot(key=key)
+
+        if position is not None:
+            self._write_slot(position=position, key=key, stored=int(block_num) + 1)
+            return
+
+        free = stored
+        _, previous = self.SLOT.unpack(
+            os.pread(self.fd, self.SLOT.size, self.HEADER_SIZE + free * self.SLOT.size).ljust(self.SLOT.size, b'\x00')
+        )
+
+        self._write_slot(position=free, key=key, stored=int(block_num) + 1)
+
+        # Removed entries still count as used, they lengthen probes until the table is rebuilt.
+        if previous == self.REMOVED:
+            return
+
+        slots, used = self._read_header()
+        self._write_header(slots=slots, used=used + 1)
+
+        if used + 1 > slots * self.MAX_LOAD:
+            self.rebuild(entries=self.items())
+
+    def remove(self, hash_str: str) -> None:
+        if not self._open(create=False):
+            return
+
+        key = hash_to_key(hash_str=hash_str)
+        position, stored = self._find_slot(key=key)
+
+        if position is not None and stored > 0:
+            self._write_slot(position=position, key=key, stored=self.REMOVED)
+
+    def items(self) -> list:
+        # Every (hash key, block number) in the table.
+        if not self._open(create=False):
+            return []
+
+        entries = []
+        chunk_slots = 65_536
+        for start in range(0, self.slots, chunk_slots):
+            count = min(chunk_slots, self.slots - start)
+            data = os.pread(self.fd, count * self.SLOT.size, self.HEADER_SIZE + start * self.SLOT.size)
+            data = data.ljust(count * self.SLOT.size, b'\x00')
+            entries.extend((key, stored - 1) for key, stored in self.SLOT.iter_unpack(data) if stored > 0)
+
+        return entries
+
+    def rebuild(self, entries: list) -> None:
+        # Replaces the table with one holding just entries, (hash or hash key, block number) pairs, sized so it's
+        # at most a quarter full.
+        entries = [(hash_to_key(hash_str=h) if isinstance(h, str) else h, int(block_num)) for h, block_num in entries]
+
+        slots = self.INITIAL_SLOTS
+        while len(entries) > slots * self.MAX_LOAD / 2:
+            slots *= 2
+
+        self._write_table(slots=slots, entries=entries)
+        self._close()
+
+    def _write_table(self, slots: int, entries: list):
+        # Later entries for the same key win. The table file is sparse, unwritten slots read back as empty.
+        values = dict(entries)
+
+        positions = {}
+        occupied = bytearray(slots)
+        for key in values:
+            position = self._home(key=key, slots=slots)
+            while occupied[position]:
+                position = (position + 1) % slots
+            occupied[position] = 1
+            positions[key] = position
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.truncate(self.HEADER_SIZE + slots * self.SLOT.size)
+            f.write(self.HEADER.pack(self.MAGIC, slots, len(positions)))
+            for key, position in sorted(positions.items(), key=lambda item: item[1]):
+                f.seek(self.HEADER_SIZE + position * self.SLOT.size)
+                f.write(self.SLOT.pack(key, values[key] + 1))
+        os.replace(tmp_path, self.path)
+
+    def flush(self) -> None:
+        self._close()
+        if self.exists():
+            os.remove(self.path)
+
+
+class SegmentStore:
+    # Shared plumbing for the segment drivers. Records are appended to size capped segment files and located through
+    # a fixed width index file. The index is append-only, deletes are written as zero length tombstones, so processes
+    # sharing the same root follow each other by reading whatever was appended since their last look.
+    SEGMENT_SUFFIX = '.seg'
+    INDEX_FILENAME = 'index'
+    RECORD_HEADER = struct.Struct('>I')
+    DEFAULT_MAX_SEGMENT_SIZE = 64_000_000
+    # Most bytes between two records that still get read together rather than with a read each.
+    READ_MERGE_GAP = 4096
+
+    def __init__(self, root: str, index_entry: struct.Struct, max_segment_size: int = DEFAULT_MAX_SEGMENT_SIZE):
+        assert root is not None, "Must provide a root directory for storage"
+        self.root = os.path.abspath(root)
+        self.index_path = os.path.join(self.root, self.INDEX_FILENAME)
+        self.index_entry = index_entry
+        self.index_offset = 0
+        self.max_segment_size = max_segment_size
+
+        self.segment_id = 0
+        self.segment_size = 0
+        self._readers = {}
+
+        os.makedirs(self.root, exist_ok=True)
+        self._find_current_segment()
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.root, f'{segment_id:08d}{self.SEGMENT_SUFFIX}')
+
+    def _segment_ids(self) -> list:
+        return sorted(
+            int(name[:-len(self.SEGMENT_SUFFIX)]) for name in os.listdir(self.root) if name.endswith(self.SEGMENT_SUFFIX)
+        )
+
+    def _find_current_segment(self):
+        segment_ids = self._segment_ids()
+        self.segment_id = segment_ids[-1] if segment_ids else 0
+
+        try:
+            self.segment_size = os.path.getsize(self._segment_path(self.segment_id))
+        except FileNotFoundError:
+            self.segment_size = 0
+
+    def _append_records(self, payloads: list) -> list:
+        # Writes all payloads with as few writes as possible and returns their (segment_id, offset, length).
+        self._find_current_segment()
+
+        locations = []
+        buffer = bytearray()
+
+        for payload in payloads:
+            record_size = self.RECORD_HEADER.size + len(payload)
+
+            if self.segment_size + len(buffer) > 0 and self.segment_size + len(buffer) + record_size > self.max_segment_size:
+                self._write_to_segment(buffer)
+                buffer = bytearray()
+                self.segment_id += 1
+                self.segment_size = 0
+
+            locations.append((self.segment_id, self.segment_size + len(buffer) + self.RECORD_HEADER.size, len(payload)))
+            buffer += self.RECORD_HEADER.pack(len(payload))
+            buffer += payload
+
+        self._write_to_segment(buffer)
+
+        return locations
+
+    def _write_to_segment(self, buffer: bytearray):
+        if len(buffer) == 0:
+            return
+
+        with open(self._segment_path(self.segment_id), 'ab') as f:
+            f.write(buffer)
+
+        self.segment_size += len(buffer)
+
+    def _append_index_entries(self, entries: list):
+        with open(self.index_path, 'ab') as f:
+            f.write(b''.join(self.index_entry.pack(*entry) for entry in entries))
+
+    def _read_new_index_entries(self):
+        # Yields index entries appended since the last call. Returns None if the index shrank, meaning the store was
+        # flushed and the caller has to start over from the beginning.
+        try:
+            index_size = os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            index_size = 0
+
+        if index_size < self.index_offset:
+            return None
+
+        complete_size = index_size - (index_size - self.index_offset) % self.index_entry.size
+        if complete_size == self.index_offset:
+            return []
+
+        with open(self.index_path, 'rb') as f:
+            f.seek(self.index_offset)
+            data = f.read(complete_size - self.index_offset)
+
+        self.index_offset = complete_size
+        return list(self.index_entry.iter_unpack(data))
+
+    def _reader(self, segment_id: int) -> int:
+        fd = self._readers.get(segment_id)
+        if fd is None:
+            fd = os.open(self._segment_path(segment_id), os.O_RDONLY)
+            self._readers[segment_id] = fd
+        return fd
+
+    def _read(self, location: tuple) -> Union[bytes, None]:
+        segment_id, offset, length = location
+        try:
+            return os.pread(self._reader(segment_id), length, offset)
+        except FileNotFoundError:
+            return None
+
+    def _read_many(self, locations: list) -> list:
+        # Locations that sit next to each other in the same segment, at most READ_MERGE_GAP bytes apart, are served by
+        # a single read.
+        results = [None] * len(locations)
+        order = sorted(range(len(locations)), key=lambda i: (locations[i][0], locations[i][1]))
+
+        run = []
+        run_end = 0
+        for i in order + [None]:
+            if run and (
+                i is None or
+                locations[i][0] != locations[run[0]][0] or
+                locations[i][1] > run_end + self.READ_MERGE_GAP
+            ):
+                segment_id = locations[run[0]][0]
+                start = locations[run[0]][1]
+                end = run_end
+
+                try:
+                    data = os.pread(self._reader(segment_id), end - start, start)
+                except FileNotFoundError:
+                    data = b''
+
+                for j in run:
+                    offset = locations[j][1] - start
+                    if offset + locations[j][2] <= len(data):
+                        results[j] = data[offset:offset + locations[j][2]]
+                run = []
+
+            if i is not None:
+                run.append(i)
+                run_end = max(run_end if len(run) > 1 else 0, locations[i][1] + locations[i][2])
+
+        return results
+
+    def iter_segment_records(self):
+        # Yields every payload in write order, used to rebuild a lost index.
+        for segment_id in self._segment_ids():
+            with open(self._segment_path(segment_id), 'rb') as f:
+                data = f.read()
+
+            offset = 0
+            while offset + self.RECORD_HEADER.size <= len(data):
+                (length,) = self.RECORD_HEADER.unpack_from(data, offset)
+                offset += self.RECORD_HEADER.size
+                if offset + length > len(data):
+                    break
+                yield (segment_id, offset, length), data[offset:offset + length]
+                offset += length
+
+    def _close_readers(self):
+        for fd in self._readers.values():
+            os.close(fd)
+        self._readers = {}
+
+    def flush(self) -> None:
+        self._close_readers()
+
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root, exist_ok=True)
+
+        self.index_offset = 0
+        self.segment_id = 0
+        self.segment_size = 0
+
+    def close(self):
+        self._close_readers()
+
+    @staticmethod
+    def _hash_to_key(hash_str: str) -> bytes:
+        return hash_to_key(hash_str=hash_str)
+
+
+class SegmentBlockDriver(SegmentStore, BlockDriver):
+    # Blocks appended to segment files. Index entries are (number, hash, segment_id, offset, length).
+    INDEX_ENTRY = struct.Struct('>Q32sIQI')
+
+    indexes_hashes = True
+
+    def __init__(self, root: str, max_segment_size: int = SegmentStore.DEFAULT_MAX_SEGMENT_SIZE):
+        self.block_index = []
+        self.locations = {}
+        self.hashes = {}
+        self.total_files = 0
+        self.generation = 0
+
+        super().__init__(root=root, index_entry=self.INDEX_ENTRY, max_segment_size=max_segment_size)
+
+        if not os.path.exists(self.index_path) and len(self._segment_ids()) > 0:
+            self.rebuild_index()
+
+        self._sync()
+
+    def _reset(self):
+        self.block_index = []
+        self.locations = {}
+        self.hashes = {}
+        self.total_files = 0
+        self.index_offset = 0
+        self.generation += 1
+
+    def get_version(self):
+        self._sync()
+        return self.generation, self.index_offset
+
+    def _apply_entry(self, block_num: int, hash_key: bytes, location: tuple):
+        if location[2] == 0:
+            self.locations.pop(block_num, None)
+            if self.hashes.get(hash_key) == block_num:
+                self.hashes.pop(hash_key)
+
+            i = bisect.bisect_left(self.block_index, block_num)
+            if i < len(self.block_index) and self.block_index[i] == block_num:
+                del self.block_index[i]
+            return
+
+        if block_num not in self.locations:
+            bisect.insort(self.block_index, block_num)
+
+        self.locations[block_num] = location
+        self.hashes[hash_key] = block_num
+
+    def _sync(self):
+        entries = self._read_new_index_entries()
+
+        if entries is None:
+            self._reset()
+            self._close_readers()
+            entries = self._read_new_index_entries()
+
+        for block_num, hash_key, segment_id, offset, length in entries:
+            self._apply_entry(block_num=block_num, hash_key=hash_key, location=(segment_id, offset, length))
+
+        self.total_files = len(self.block_index)
+
+    def _decode(self, payload: Union[bytes, None]) -> Union[dict, None]:
+        if not payload:
+            return None
+        return json.loads(payload)
+
+    def rebuild_index(self):
+        # Recreates the index from the segment files. Blocks deleted after being written will come back, so this is
+        # only meant for recovering from a lost index file.
+        entries = []
+        for location, payload in self.iter_segment_records():
+            block = json.loads(payload)
+            entries.append((int(block.get('number')), self._hash_to_key(block.get('hash', '')), *location))
+
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+        self._reset()
+        self._append_index_entries(entries)
+
     def get_file_path(self, block_num: str) -> str:
-        input_number = int(block_num)
-        current_dirs = self._find_directories(input_number)
-        file_path = os.path.join(self.root, *current_dirs, block_num)
-        return file_path
+        return str(int(block_num))
+
+    def write_block(self, block: dict) -> str:
+        self.write_blocks(block_list=[block])
+        return str(block.get('number')).zfill(64)
+
+    def write_blocks(self, block_list: list) -> None:
+        if len(block_list) == 0:
+            return
+
+        self._sync()
+
+        payloads = [json.dumps(block).encode() for block in block_list]
+        locations = self._append_records(payloads)
+
+        entries = [
+            (int(block.get('number')), self._hash_to_key(block.get('hash', '')), *location)
+            for block, location in zip(block_list, locations)
+        ]
+        self._append_index_entries(entries)
+        self._sync()
+
+    def delete_block(self, block_num: str) -> None:
+        self.delete_blocks(block_list=[block_num])
+
+    def delete_blocks(self, block_list: list) -> None:
+        self._sync()
+
+        entries = []
+        for block_num in block_list:
+            block_num = int(block_num)
+            if block_num not in self.locations:
+                continue
+
+            block = self.find_block(block_num=block_num)
+            hash_key = self._hash_to_key(block.get('hash', '')) if block else bytes(32)
+            entries.append((block_num, hash_key, 0, 0, 0))
+
+        if len(entries) > 0:
+            self._append_index_entries(entries)
+            self._sync()
+
+    def find_block(self, block_num: str) -> dict:
+        self._sync()
+        location = self.locations.get(int(block_num))
+        if location is None:
+            return None
+        return self._decode(self._read(location))
+
+    def find_blocks(self, block_list: list) -> list:
+        self._sync()
+        locations = [self.locations.get(int(block_num)) for block_num in block_list]
+        found = [location for location in locations if location is not None]
+        return [block for block in map(self._decode, self._read_many(found)) if block is not None]
+
+    def find_block_by_hash(self, block_hash: str) -> dict:
+        self._sync()
+        block_num = self.hashes.get(self._hash_to_key(block_hash))
+        if block_num is None:
+            return None
+        return self.find_block(block_num=block_num)
+
+    def find_next_block(self, block_num: str) -> dict:
+        self._sync()
+        position = bisect.bisect_right(self.block_index, int(block_num))
+        if position >= len(self.block_index):
+            return None
+        return self.find_block(block_num=self.block_index[position])
+
+    def find_previous_block(self, block_num: str) -> dict:
+        self._sync()
+        position = bisect.bisect_left(self.block_index, int(block_num)) - 1
+        if position < 0:
+            return None
+        return self.find_block(block_num=self.block_index[position])
+
+    def find_next_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        self._sync()
+        position = bisect.bisect_right(self.block_index, int(block_num))
+        return self.block_index[position:position + amount_of_blocks]
+
+    def find_previous_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        self._sync()
+        position = bisect.bisect_left(self.block_index, int(block_num))
+        return list(reversed(self.block_index[max(position - amount_of_blocks, 0):position]))
+
+    def find_next_blocks(self, block_num: str, amount_of_blocks: int) -> list:
+        self._sync()
+        position = bisect.bisect_left(self.block_index, int(block_num))
+        return self.find_blocks(block_list=self.block_index[position:position + amount_of_blocks + 1])
+
+    def find_previous_blocks(self, block_num: str, amount_of_blocks: int) -> list:
+        self._sync()
+        position = bisect.bisect_right(self.block_index, int(block_num))
+        block_list = self.block_index[max(position - amount_of_blocks - 1, 0):position]
+        return self.find_blocks(block_list=list(reversed(block_list)))
+
+    def block_exists(self, block_num: str) -> bool:
+        self._sync()
+        return int(block_num) in self.locations
+
+    def get_total_blocks(self) -> int:
+        self._sync()
+        return len(self.block_index)
+
+    def flush(self) -> None:
+        super().flush()
+        self._reset()
+
+
+class SegmentHashStorageDriver(SegmentStore):
+    # Drop in replacement for FSHashStorageDriver (files only, no symlinks) that keeps txs in segment files.
+    INDEX_ENTRY = struct.Struct('>32sIQI')
+
+    def __init__(self, root: str, max_segment_size: int = SegmentStore.DEFAULT_MAX_SEGMENT_SIZE):
+        self.locations = {}
+
+        super().__init__(root=root, index_entry=self.INDEX_ENTRY, max_segment_size=max_segment_size)
+
+        self._sync()
+
+    def _sync(self):
+        entries = self._read_new_index_entries()
+
+        if entries is None:
+            self.locations = {}
+            self._close_readers()
+            entries = self._read_new_index_entries()
+
+        for hash_key, segment_id, offset, length in entries:
+            if length == 0:
+                self.locations.pop(hash_key, None)
+            else:
+                self.locations[hash_key] = (segment_id, offset, length)
+
+    def write_file(self, hash_str: str, data: dict) -> None:
+        self.write_files(files=[(hash_str, data)])
+
+    def write_files(self, files: list) -> None:
+        if len(files) == 0:
+            return
+
+        locations = self._append_records([json.dumps(data).encode() for _, data in files])
+        self._append_index_entries([
+            (self._hash_to_key(hash_str), *location) for (hash_str, _), location in zip(files, locations)
+        ])
+        self._sync()
+
+    def delete_file(self, hash_str: str) -> None:
+        self._sync()
+        hash_key = self._hash_to_key(hash_str)
+
+        if hash_key in self.locations:
+            self._append_index_entries([(hash_key, 0, 0, 0)])
+            self._sync()
+
+    def get_file(self, hash_str: str) -> dict:
+        self._sync()
+        location = self.locations.get(self._hash_to_key(hash_str))
+        if location is None:
+            return None
+
+        payload = self._read(location)
+        if not payload:
+            return None
+
+        return json.loads(payload)
+
+    def flush(self) -> None:
+        super().flush()
+        self.locations = {}
+
+
+class SQLiteStore:
+    # Shared connection handling for the SQLite drivers. WAL mode lets the webserver read while the node writes.
+    DB_FILENAME = 'blocks.sqlite3'
+    MAX_VARIABLES = 500
+
+    def __init__(self, root: str):
+        assert root is not None, "Must provide a root directory for storage"
+        self.root = os.path.abspath(root)
+        self.db_path = os.path.join(self.root, self.DB_FILENAME)
+
+        os.makedirs(self.root, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+        with self.lock, self.connection:
+            self._create_tables()
+
+    def _create_tables(self):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def _fetch_one(self, query: str, params: tuple = ()):
+        with self.lock:
+            return self.connection.execute(query, params).fetchone()
+
+    def _fetch_all(self, query: str, params: tuple = ()) -> list:
+        with self.lock:
+            return self.connection.execute(query, params).fetchall()
+
+    def _execute_many(self, query: str, rows: list) -> int:
+        # Returns the amount of rows changed.
+        with self.lock, self.connection:
+            return self.connection.executemany(query, rows).rowcount
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
 
-    def write_block(self, block: dict) -> str:
-        block_num = str(block.get('number')).zfill(64)
-        file_path = self.get_file_path(block_num)
 
-        if not os.path.exists(file_path):
-            self.total_files += 1
+class SQLiteBlockDriver(SQLiteStore, BlockDriver):
+    # SQLite INTEGER is signed 64 bit, lookups past the end (ie. MAX_BLOCK) are clamped to it.
+    MAX_INTEGER = 2 ** 63 - 1
 
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    indexes_hashes = True
 
-        with open(file_path, 'w') as f:
-            try:
-                json.dump(block, f)
-            except Exception as err:
-                print(err)
+    def __init__(self, root: str):
+        super().__init__(root=root)
+        self.total_files = self.get_total_blocks()
+        self.writes = 0
 
-        return block_num
+    def _create_tables(self):
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS blocks (number INTEGER PRIMARY KEY, hash TEXT, tx_hash TEXT, data TEXT NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS blocks_hash ON blocks (hash)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS blocks_tx_hash ON blocks (tx_hash)')
 
-    def write_blocks(self, block_list: list) -> None:
-        for block in block_list:
-            self.write_block(block=block)
+    def _to_number(self, block_num) -> int:
+        return max(min(int(block_num), self.MAX_INTEGER), -self.MAX_INTEGER)
 
-    def move_block(self, src_file, block_num: str) -> None:
-        src_path = str(src_file)
-        dst_path = self.get_file_path(block_num)
-        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-        shutil.move(src_path, dst_path)
+    def _decode_row(self, row) -> Union[dict, None]:
+        if row is None:
+            return None
+        return json.loads(row[0])
 
-        return dst_path
+    def write_block(self, block: dict) -> str:
+        self.write_blocks(block_list=[block])
+        return str(block.get('number')).zfill(64)
 
-    def delete_block(self, block_num: str) -> None:
-        file_path = self.get_file_path(block_num.zfill(64))
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            self.total_files -= 1
+    def write_blocks(self, block_list: list) -> None:
+        rows = []
+        for block in block_list:
+            tx_hash = block.get('processed')
+            rows.append((
+                int(block.get('number')),
+                block.get('hash'),
+                tx_hash if isinstance(tx_hash, str) else None,
+                json.dumps(block)
+            ))
+
+        numbers = list({row[0] for row in rows})
+
+        with self.lock, self.connection:
+            # Replaced rows count as changes too, so the blocks already stored are counted up front.
+            existing = 0
+            for i in range(0, len(numbers), self.MAX_VARIABLES):
+                chunk = numbers[i:i + self.MAX_VARIABLES]
+                existing += self.connection.execute(
+                    f'SELECT COUNT(*) FROM blocks WHERE number IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchone()[0]
+
+            self.connection.executemany('INSERT OR REPLACE INTO blocks (number, hash, tx_hash, data) VALUES (?, ?, ?, ?)', rows)
+
+        self.total_files += len(numbers) - existing
+        self.writes += 1
 
-        self._remove_empty_dirs(starting_dir=os.path.dirname(file_path))
+    def delete_block(self, block_num: str) -> None:
+        self.delete_blocks(block_list=[block_num])
 
     def delete_blocks(self, block_list: list) -> None:
-        for block_num in block_list:
-            self.delete_block(block_num=block_num)
+        deleted = self._execute_many('DELETE FROM blocks WHERE number = ?', [(self._to_number(n),) for n in block_list])
+        self.total_files -= deleted
+        self.writes += 1
 
     def find_block(self, block_num: str) -> dict:
-        path_to_file = self.get_file_path(block_num=str(block_num).zfill(64))
-        block = self._get_file_content(file_path=path_to_file)
-        return block
+        return self._decode_row(self._fetch_one('SELECT data FROM blocks WHERE number = ?', (self._to_number(block_num),)))
 
     def find_blocks(self, block_list: list) -> list:
-        return [self.find_block(block_num=block_num) for block_num in block_list if self.find_block(block_num=block_num)]
-
-    def find_next_block(self, block_num: str) -> dict:
-        block_num_filled = str(block_num).zfill(64)
-        block_path = self.get_file_path(block_num_filled)
-        current_directory = os.path.dirname(block_path)
+        numbers = [self._to_number(n) for n in block_list]
 
-        if os.path.exists(current_directory):
-            try:
-                files = sorted(os.listdir(current_directory), key=lambda x: int(x.split('_')[0]))
-            except FileNotFoundError:
-                return None
+        found = {}
+        for i in range(0, len(numbers), self.MAX_VARIABLES):
+            chunk = numbers[i:i + self.MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            for number, data in self._fetch_all(f'SELECT number, data FROM blocks WHERE number IN ({placeholders})', tuple(chunk)):
+                found[number] = data
 
-            try:
-                index = files.index(block_num_filled)
-            except ValueError:
-                files.append(block_num_filled)
-                files.sort()
-                index = files.index(block_num_filled)
+        return [json.loads(found[n]) for n in numbers if n in found]
 
-            if index < len(files) - 1:
-                return self._get_file_content(file_path=os.path.join(current_directory, files[index + 1]))
+    def find_block_by_hash(self, block_hash: str) -> dict:
+        return self._decode_row(self._fetch_one('SELECT data FROM blocks WHERE hash = ?', (block_hash,)))
 
-        next_directory = self._traverse_up(current_directory, 'next')
-        if next_directory:
-            return self._traverse_down(next_directory, 'next')
+    def find_block_by_tx_hash(self, tx_hash: str) -> dict:
+        return self._decode_row(self._fetch_one('SELECT data FROM blocks WHERE tx_hash = ?', (tx_hash,)))
 
-        return None
+    def find_next_block(self, block_num: str) -> dict:
+        return self._decode_row(self._fetch_one(
+            'SELECT data FROM blocks WHERE number > ? ORDER BY number LIMIT 1', (self._to_number(block_num),)
+        ))
 
     def find_previous_block(self, block_num: str) -> dict:
-        block_num_filled = str(block_num).zfill(64)
-        block_path = self.get_file_path(block_num_filled)
-        current_directory = os.path.dirname(block_path)
-
-        if os.path.exists(current_directory):
-            try:
-                files = sorted(os.listdir(current_directory), key=lambda x: int(x.split('_')[0]))
-            except FileNotFoundError:
-                return None
-
-            try:
-                index = files.index(block_num_filled)
-            except ValueError:
-                files.append(block_num_filled)
-                files.sort()
-                index = files.index(block_num_filled)
-
-            if index > 0:
-                return self._get_file_content(file_path=os.path.join(current_directory, files[index - 1]))
-
-        previous_directory = self._traverse_up(current_directory, 'previous')
-        if previous_directory:
-            return self._traverse_down(previous_directory, 'previous')
+        return self._decode_row(self._fetch_one(
+            'SELECT data FROM blocks WHERE number < ? ORDER BY number DESC LIMIT 1', (self._to_number(block_num),)
+        ))
+
+    def find_next_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        rows = self._fetch_all(
+            'SELECT number FROM blocks WHERE number > ? ORDER BY number LIMIT ?',
+            (self._to_number(block_num), amount_of_blocks)
+        )
+        return [row[0] for row in rows]
 
-        return None
+    def find_previous_block_numbers(self, block_num: str, amount_of_blocks: int) -> list:
+        rows = self._fetch_all(
+            'SELECT number FROM blocks WHERE number < ? ORDER BY number DESC LIMIT ?',
+            (self._to_number(block_num), amount_of_blocks)
+        )
+        return [row[0] for row in rows]
 
     def find_next_blocks(self, block_num: str, amount_of_blocks: int) -> list:
-        blocks = [self.find_block(block_num=block_num)]
-        for _ in range(amount_of_blocks):
-            next_block = self.find_next_block(blocks[-1].get('number'))
-            if next_block is None:
-                break
-            blocks.append(next_block)
-        return blocks
+        rows = self._fetch_all(
+            'SELECT data FROM blocks WHERE number >= ? ORDER BY number LIMIT ?',
+            (self._to_number(block_num), amount_of_blocks + 1)
+        )
+        return [json.loads(row[0]) for row in rows]
 
     def find_previous_blocks(self, block_num: str, amount_of_blocks: int) -> list:
-        blocks = [self.find_block(block_num=block_num)]
-        for _ in range(amount_of_blocks):
-            previous_block = self.find_previous_block(blocks[-1].get('number'))
-            if previous_block is None:
-                break
-            blocks.append(previous_block)
-        return blocks
-
-    def get_total_blocks(self) -> int:
-        count = 0
-        for _ in self._iterate_files(self.root):
-            count += 1
-        return count
+        rows = self._fetch_all(
+            'SELECT data FROM blocks WHERE number <= ? ORDER BY number DESC LIMIT ?',
+            (self._to_number(block_num), amount_of_blocks + 1)
+        )
+        return [json.loads(row[0]) for row in rows]
 
     def block_exists(self, block_num: str) -> bool:
-        block_num_filled = str(block_num).zfill(64)
-        block_file_path = self.get_file_path(block_num_filled)
-        return os.path.exists(block_file_path)
-
-class FSHashStorageDriver:
-    def __init__(self, root: str):
-        assert root is not None, "Must provide a root directory for storage"
-        self.root_dir = root
+        return self._fetch_one('SELECT 1 FROM blocks WHERE number = ?', (self._to_number(block_num),)) is not None
 
-    def get_directory(self, hash_str: str) -> str:
-        return os.path.join(self.root_dir, hash_str[:2], hash_str[2:4], hash_str[4:6])
+    def get_total_blocks(self) -> int:
+        return self._fetch_one('SELECT COUNT(*) FROM blocks')[0]
 
-    def _remove_empty_dirs(self, starting_dir: str):
-        while pathlib.Path(starting_dir) != pathlib.Path(self.root_dir):
-            if not os.listdir(starting_dir):
-                os.rmdir(starting_dir)
-                starting_dir = os.path.dirname(starting_dir)
-            else:
-                break
+    def get_file_path(self, block_num: str) -> str:
+        return str(int(block_num))
 
-    def write_file(self, hash_str: str, data: dict) -> None:
-        dir_path = self.get_directory(hash_str)
-        os.makedirs(dir_path, exist_ok=True)
+    def get_version(self):
+        # data_version only moves for commits made through other connections, this connection's own writes are
+        # counted separately.
+        return self._fetch_one('PRAGMA data_version')[0], self.writes
 
-        file_path = os.path.join(dir_path, hash_str)
-        with open(file_path, "w") as f:
-            json.dump(data, f)
+    def flush(self) -> None:
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM blocks')
+        self.total_files = 0
+        self.writes += 1
 
-    def delete_file(self, hash_str: str) -> None:
-        dir_path = self.get_directory(hash_str=hash_str)
-        file_path = os.path.join(dir_path, hash_str)
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
-        self._remove_empty_dirs(starting_dir=dir_path)
+class SQLiteHashStorageDriver(SQLiteStore):
+    # Drop in replacement for FSHashStorageDriver (files only, no symlinks) backed by the same database file.
 
-    def write_symlink(self, hash_str: str, link_to: str) -> None:
-        dir_path = self.get_directory(hash_str)
-        os.makedirs(dir_path, exist_ok=True)
+    def _create_tables(self):
+        self.connection.execute('CREATE TABLE IF NOT EXISTS txs (hash TEXT PRIMARY KEY, data TEXT NOT NULL)')
 
-        file_path = os.path.join(dir_path, hash_str)
-        dest_path = os.path.abspath(link_to)
+    def write_file(self, hash_str: str, data: dict) -> None:
+        self.write_files(files=[(hash_str, data)])
 
-        if os.path.islink(file_path):
-            os.unlink(file_path)
+    def write_files(self, files: list) -> None:
+        self._execute_many(
+            'INSERT OR REPLACE INTO txs (hash, data) VALUES (?, ?)',
+            [(hash_str, json.dumps(data)) for hash_str, data in files]
+        )
 
-        os.symlink(dest_path, file_path)
+    def delete_file(self, hash_str: str) -> None:
+        self._execute_many('DELETE FROM txs WHERE hash = ?', [(hash_str,)])
 
-    def remove_symlink(self, hash_str: str) -> None:
-        dir_path = self.get_directory(hash_str)
-        file_path = os.path.join(dir_path, hash_str)
+    def get_file(self, hash_str: str) -> dict:
+        row = self._fetch_one('SELECT data FROM txs WHERE hash = ?', (hash_str,))
+        if row is None:
+            return None
+        return json.loads(row[0])
 
-        if os.path.islink(file_path):
-            os.unlink(file_path)
-            self._remove_empty_dirs(starting_dir=dir_path)
+    def flush(self) -> None:
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM txs')
 
-    def get_file(self, hash_str: str) -> dict:
-        dir_path = self.get_directory(hash_str)
-        file_path = os.path.join(dir_path, hash_str)
 
-        if not os.path.exists(dir_path):
-            return None
+def create_block_drivers(root: pathlib.Path, driver_type: str = 'fs', codec: StorageCodec = None,
+                         roots: dict = None) -> tuple:
+    # Returns the (block driver, tx driver) pair for a storage root. The codec only applies to the FS drivers, roots
+    # (see get_storage_roots) can place the blocks and txs elsewhere.
+    root = pathlib.Path(root)
+    roots = roots or {}
 
-        if os.path.islink(file_path):
-            file_path = os.readlink(file_path)
+    if driver_type == 'fs':
+        return (
+            FSBlockDriver(root=roots.get('blocks', root.joinpath('blocks')), codec=codec, cold_root=roots.get('cold_blocks')),
+            FSHashStorageDriver(root=roots.get('txs', root.joinpath('txs')), codec=codec)
+        )
 
-        with open(file_path, "r") as f:
-            return json.loads(f.read())
+    if driver_type == 'segment':
+        return (
+            SegmentBlockDriver(root=roots.get('blocks', root.joinpath(BLOCK_SEGMENTS_DIR))),
+            SegmentHashStorageDriver(root=roots.get('txs', root.joinpath(TX_SEGMENTS_DIR)))
+        )
 
-    def is_symlink_valid(self, hash_str: str) -> bool:
-        dir_path = self.get_directory(hash_str)
-        file_path = os.path.join(dir_path, hash_str)
+    if driver_type == 'sqlite':
+        return (
+            SQLiteBlockDriver(root=root.joinpath(SQLITE_DIR)),
+            SQLiteHashStorageDriver(root=root.joinpath(SQLITE_DIR))
+        )
 
-        if not os.path.islink(file_path):
-            return False
+    raise ValueError(f'Unknown block driver type \'{driver_type}\'.')
 
-        link_target = os.readlink(file_path)
-        return os.path.exists(link_target)
 
 class FSMemberHistory(FSBlockDriver):
+    # Every entry is held in memory as sorted (block number, members) intervals so a lookup is a bisect, and consensus
+    # checks can test membership against a frozenset. Intervals are reloaded when the driver version moves (another
+    # process wrote or the history was purged), and signatures are only verified the first time an entry is seen.
     def __init__(self, root: str, wallet: Wallet = None):
         super().__init__(root=root, initialize=False)
 
         self.wallet = wallet
 
+        self.interval_numbers = []
+        self.interval_members = []
+        self.intervals_version = None
+        self.verified_signatures = {}
+
     def has_history(self):
         data = self.find_next_block(block_num="-1")
 
@@ -792,6 +3459,8 @@ class FSMemberHistory(FSBlockDriver):
         except Exception as e:
             print(f"Error occurred during purge: {e}")
 
+        self.intervals_version = None
+
     def set(self, block_num: str, members_list: list = []) -> None:
         data = {
             'number': block_num,
@@ -804,19 +3473,97 @@ class FSMemberHistory(FSBlockDriver):
             signature = self.wallet.sign(msg=msg)
             data['signature'] = signature
 
+        intervals_current = self.intervals_version is not None and self.intervals_version == self._intervals_version()
+
         self.write_block(block=data)
 
+        # Keep the loaded intervals instead of reloading every entry because of our own write.
+        if intervals_current:
+            self._add_interval(data=data)
+            self.intervals_version = self._intervals_version()
+
+    def _intervals_version(self) -> tuple:
+        # Swapping the wallet changes which entries pass verification.
+        return self.get_version(), self.wallet.verifying_key if self.wallet else None
+
+    def _load_intervals(self) -> None:
+        version = self._intervals_version()
+
+        if version == self.intervals_version:
+            return
+
+        self.interval_numbers = []
+        self.interval_members = []
+
+        for block_num in list(self.block_index):
+            data = self.find_block(block_num=block_num)
+
+            if data is not None:
+                self._add_interval(data=data)
+
+        self.intervals_version = version
+
+    def _add_interval(self, data: dict) -> None:
+        block_num = int(data.get('number'))
+        members_list = data.get('members_list') or []
+
+        if self.wallet and not self._is_verified(data=data):
+            # Matches reading an entry with a bad signature, it counts as no members at all.
+            members_list = []
+
+        entry = (list(members_list), frozenset(members_list))
+
+        i = bisect.bisect_left(self.interval_numbers, block_num)
+        if i < len(self.interval_numbers) and self.interval_numbers[i] == block_num:
+            self.interval_members[i] = entry
+        else:
+            self.interval_numbers.insert(i, block_num)
+            self.interval_members.insert(i, entry)
+
+    def _is_verified(self, data: dict) -> bool:
+        key = (
+            self.wallet.verifying_key, str(data.get('number')), json.dumps(data.get('members_list')), data.get('signature')
+        )
+
+        if key not in self.verified_signatures:
+            self.verified_signatures[key] = self.verify_signature(data=data)
+
+        return self.verified_signatures[key]
+
+    def _find_interval(self, block_num: str) -> Union[tuple, None]:
+        self._load_intervals()
+
+        # The members in effect at a block are the ones set strictly before it.
+        i = bisect.bisect_left(self.interval_numbers, int(block_num)) - 1
+
+        if i < 0:
+            return None
+
+        return self.interval_members[i]
+
     def get(self, block_num: str) -> List[str]:
-        data = self.find_previous_block(block_num=block_num)
+        interval = self._find_interval(block_num=block_num)
 
-        if data is None:
+        if interval is None:
             return  []
 
-        if self.wallet:
-            if not self.verify_signature(data=data):
-                return []
+        return list(interval[0])
+
+    def get_members(self, block_num: str) -> frozenset:
+        interval = self._find_interval(block_num=block_num)
+
+        if interval is None:
+            return frozenset()
+
+        return interval[1]
 
-        return data.get('members_list', [])
+    def get_entries(self) -> list:
+        # (block number, members list) of every entry in block order, entries with a bad signature have no members.
+        self._load_intervals()
+
+        return [
+            (str(block_num), list(members[0])) for block_num, members in zip(self.interval_numbers, self.interval_members)
+        ]
 
     def verify_signature(self, data: dict, vk: str = None):
         try:
@@ -841,72 +3588,376 @@ class FSMemberHistory(FSBlockDriver):
         if block_num is None or vk is None:
             return False
 
-        member_list = self.get(block_num=block_num)
-
-        return vk in member_list
+        return vk in self.get_members(block_num=block_num)
 
 class FSStateHistory(FSHashStorageDriver):
+    # Each key's history is a file of fixed width records (block number, offset and length of the value set in that
+    # block) in ascending block order, with the values themselves appended to a second file. Recording a change is
+    # an append to both, lookups are a binary search over the records plus one read for the value, and rollback is
+    # a truncate. Histories still in the old JSON list format are converted the first time their key is touched,
+    # or all at once with migrate(). Those carry no values (length 0), callers have to read them from the block.
+    HISTORY_RECORD = struct.Struct('>qQI')
+    HISTORY_FILE_SUFFIX = '.hist'
+    VALUES_FILE_SUFFIX = '.vals'
+
     def __init__(self, root: str):
         super().__init__(root=root)
 
+    def _history_path(self, hash_str: str) -> str:
+        return os.path.join(self.get_directory(hash_str), f'{hash_str}{self.HISTORY_FILE_SUFFIX}')
+
+    def _values_path(self, hash_str: str) -> str:
+        return os.path.join(self.get_directory(hash_str), f'{hash_str}{self.VALUES_FILE_SUFFIX}')
+
+    def _find_history(self, hash_str: str) -> Union[str, None]:
+        file_path = self._history_path(hash_str)
+
+        if os.path.exists(file_path) or self._migrate_legacy_file(hash_str=hash_str):
+            return file_path
+
+        return None
+
+    def _migrate_legacy_file(self, hash_str: str) -> bool:
+        legacy_path = os.path.join(self.get_directory(hash_str), hash_str)
+
+        try:
+            with open(legacy_path, 'r') as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            return False
+
+        self.write_file(hash_str=hash_str, data=history)
+        os.remove(legacy_path)
+
+        return True
+
+    def migrate(self) -> int:
+        # Converts every JSON list history under root, returns how many were converted.
+        migrated = 0
+
+        for _, _, files in os.walk(self.root_dir):
+            for filename in files:
+                if '.' not in filename and self._migrate_legacy_file(hash_str=filename):
+                    migrated += 1
+
+        return migrated
+
     def write_file(self, hash_str: str, data: list) -> None:
+        self._write_records(hash_str=hash_str, records=[(int(n), 0, 0) for n in data])
+
+    def _write_records(self, hash_str: str, records: list) -> None:
+        # Records are deduplicated by block number, the last one given wins.
+        by_block_num = {record[0]: record for record in records}
+
         dir_path = self.get_directory(hash_str)
         os.makedirs(dir_path, exist_ok=True)
 
-        file_path = os.path.join(dir_path, hash_str)
-        with open(file_path, "w") as f:
-            json.dump(data, f)
+        file_path = self._history_path(hash_str)
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(b''.join(self.HISTORY_RECORD.pack(*by_block_num[n]) for n in sorted(by_block_num)))
+        os.replace(tmp_path, file_path)
 
-    def get_file(self, hash_str: str) -> dict:
-        dir_path = self.get_directory(hash_str)
-        file_path = os.path.join(dir_path, hash_str)
+    def _read_records(self, file_path: str) -> list:
+        with open(file_path, 'rb') as f:
+            data = f.read()
 
-        if not os.path.exists(dir_path):
+        end = len(data) - len(data) % self.HISTORY_RECORD.size
+        return list(self.HISTORY_RECORD.iter_unpack(data[:end]))
+
+    def get_file(self, hash_str: str) -> Union[list, None]:
+        file_path = self._find_history(hash_str=hash_str)
+
+        if file_path is None:
             return None
 
-        with open(file_path, "r") as f:
-            return json.loads(f.read())
+        return [record[0] for record in self._read_records(file_path=file_path)]
 
-    def save_state_change(self, key: str, block_num: str) -> None:
+    def _read_record(self, fd: int, position: int) -> tuple:
+        size = self.HISTORY_RECORD.size
+        return self.HISTORY_RECORD.unpack(os.pread(fd, size, position * size))
+
+    def _bisect(self, fd: int, count: int, block_num: int, right: bool = False) -> int:
+        # bisect_left / bisect_right over the block numbers of the records in the file.
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._read_record(fd=fd, position=mid)[0]
+            if value < block_num or (right and value == block_num):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _append_value(self, hash_str: str, value: Any) -> tuple:
+        data = json.dumps(value).encode()
+
+        fd = os.open(self._values_path(hash_str), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            offset = os.fstat(fd).st_size
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+        return offset, len(data)
+
+    def save_state_change(self, key: str, block_num: str, value: Any = None) -> None:
         hash_str = create_hash_512(string=key)
+        block_num = int(block_num)
 
-        current_history = self.get_file(hash_str=hash_str)
+        file_path = self._find_history(hash_str=hash_str)
 
-        if current_history:
-            current_history.append(int(block_num))
-            current_history = sorted(current_history, key=int, reverse=True)
-        else:
-            current_history=[int(block_num)]
+        if file_path is None:
+            os.makedirs(self.get_directory(hash_str), exist_ok=True)
+            self._write_records(hash_str=hash_str, records=[(block_num, *self._append_value(hash_str, value))])
+            return
+
+        record = (block_num, *self._append_value(hash_str, value))
+
+        fd = os.open(file_path, os.O_RDWR | os.O_APPEND)
+        try:
+            size = os.fstat(fd).st_size
+            count = size // self.HISTORY_RECORD.size
+
+            # Drop a partial record left behind by an interrupted append.
+            if size % self.HISTORY_RECORD.size:
+                os.ftruncate(fd, count * self.HISTORY_RECORD.size)
+
+            if count == 0 or block_num > self._read_record(fd=fd, position=count - 1)[0]:
+                os.write(fd, self.HISTORY_RECORD.pack(*record))
+                return
+        finally:
+            os.close(fd)
+
+        # Changes recorded out of order (ie. missing blocks processed late) or again for the same block are rare,
+        # rewrite the records for those.
+        self._write_records(hash_str=hash_str, records=self._read_records(file_path=file_path) + [record])
+
+    def remove_state_change(self, key: str, block_num: str) -> None:
+        hash_str = create_hash_512(string=key)
+
+        file_path = self._find_history(hash_str=hash_str)
+
+        if file_path is None:
+            return
+
+        # Usually the latest change is removed (rollback, removing the latest block), which is a truncate.
+        fd = os.open(file_path, os.O_RDWR)
+        try:
+            count = os.fstat(fd).st_size // self.HISTORY_RECORD.size
+
+            if count == 0:
+                return
+
+            if self._read_record(fd=fd, position=count - 1)[0] == int(block_num):
+                os.ftruncate(fd, (count - 1) * self.HISTORY_RECORD.size)
+                return
+        finally:
+            os.close(fd)
 
-        self.write_file(hash_str=hash_str, data=current_history)
+        records = self._read_records(file_path=file_path)
+        kept = [record for record in records if record[0] != int(block_num)]
+
+        if len(kept) < len(records):
+            self._write_records(hash_str=hash_str, records=kept)
+
+    def remove_changes(self, hash_str: str, block_nums: set) -> int:
+        # Drops the records for block_nums from one history file, returns how many were dropped.
+        file_path = self._find_history(hash_str=hash_str)
+
+        if file_path is None:
+            return 0
+
+        records = self._read_records(file_path=file_path)
+        kept = [record for record in records if record[0] not in block_nums]
+
+        if len(kept) < len(records):
+            self._write_records(hash_str=hash_str, records=kept)
+
+        return len(records) - len(kept)
 
     def rollback(self, key: str, block_num: str) -> None:
+        # Values of the dropped changes stay behind in the values file, nothing points at them anymore.
         hash_str = create_hash_512(string=key)
 
-        current_history = self.get_file(hash_str=hash_str)
+        file_path = self._find_history(hash_str=hash_str)
+
+        if file_path is None:
+            return
 
-        if current_history:
-            current_history = [n for n in current_history if n <= int(block_num)]
-            self.write_file(hash_str=hash_str, data=current_history)
+        fd = os.open(file_path, os.O_RDWR)
+        try:
+            count = os.fstat(fd).st_size // self.HISTORY_RECORD.size
+            keep = self._bisect(fd=fd, count=count, block_num=int(block_num), right=True)
+            os.ftruncate(fd, keep * self.HISTORY_RECORD.size)
+        finally:
+            os.close(fd)
 
-    def get_previous_change(self, key: str, block_num: str) -> Union[int, None]:
+    def _find_record(self, key: str, block_num: str, inclusive: bool) -> Union[tuple, None]:
         hash_str = create_hash_512(string=key)
 
-        current_history = self.get_file(hash_str=hash_str)
+        file_path = self._find_history(hash_str=hash_str)
+
+        if file_path is None:
+            return None
 
-        if current_history:
-            # Convert block_num to int for comparison
-            block_num_int = int(block_num)
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            count = os.fstat(fd).st_size // self.HISTORY_RECORD.size
+            position = self._bisect(fd=fd, count=count, block_num=int(block_num), right=inclusive) - 1
 
-            # Filter the history for blocks less than block_num_int
-            previous_blocks = [n for n in current_history if n < block_num_int]
+            if position < 0:
+                return None
 
-            if previous_blocks:
-                # If there are any previous blocks, return the maximum one
-                return max(previous_blocks)
+            return hash_str, self._read_record(fd=fd, position=position)
+        finally:
+            os.close(fd)
+
+    def find_change(self, key: str, block_num: str, inclusive: bool = False) -> Union[tuple, None]:
+        # Returns (block number, has value, value) for the last change before block_num, or at it when inclusive.
+        # has value is False for changes recorded without one, their value has to be read from the block.
+        found = self._find_record(key=key, block_num=block_num, inclusive=inclusive)
+
+        if found is None:
+            return None
+
+        hash_str, (change_block_num, offset, length) = found
+
+        if length == 0:
+            return change_block_num, False, None
+
+        with open(self._values_path(hash_str), 'rb') as f:
+            f.seek(offset)
+            return change_block_num, True, json.loads(f.read(length))
+
+    def get_previous_change(self, key: str, block_num: str) -> Union[int, None]:
+        found = self._find_record(key=key, block_num=block_num, inclusive=False)
+
+        if found is None:
+            return None
+
+        return found[1][0]
+
+class FSTxIndex(FSHashStorageDriver):
+    # Secondary tx indexes. Every value (a sender, contract, contract function or the failed status) has a file of
+    # fixed width (block number, tx hash) records in ascending block order. Indexing a block's tx is an append per
+    # index it's listed in and pages are read newest first with a binary search and a single read.
+    RECORD = struct.Struct('>q32s')
+    FILE_SUFFIX = '.idx'
+
+    SENDER = 'sender'
+    CONTRACT = 'contract'
+    FUNCTION = 'function'
+    STATUS = 'status'
+    FAILED = 'failed'
+
+    def __init__(self, root: str):
+        super().__init__(root=root)
+
+    def _index_path(self, index: str, value: str) -> str:
+        hash_str = create_hash_512(string=f'{index}:{value}')
+        return os.path.join(self.get_directory(hash_str), f'{hash_str}{self.FILE_SUFFIX}')
+
+    def _read_records(self, file_path: str) -> list:
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        end = len(data) - len(data) % self.RECORD.size
+        return list(self.RECORD.iter_unpack(data[:end]))
+
+    def _write_records(self, file_path: str, records: list) -> None:
+        if len(records) == 0:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+                self._remove_empty_dirs(starting_dir=os.path.dirname(file_path))
+            return
+
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(b''.join(self.RECORD.pack(*record) for record in sorted(set(records))))
+        os.replace(tmp_path, file_path)
+
+    def add(self, index: str, value: str, block_num: str, tx_hash: str) -> None:
+        try:
+            record = (int(block_num), bytes.fromhex(tx_hash))
+        except (TypeError, ValueError):
+            # Not a tx hash, there is nothing to list it by.
+            return
+
+        file_path = self._index_path(index=index, value=value)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        fd = os.open(file_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            count = size // self.RECORD.size
+
+            # Drop a partial record left behind by an interrupted append.
+            if size % self.RECORD.size:
+                os.ftruncate(fd, count * self.RECORD.size)
+
+            last = self.RECORD.unpack(os.pread(fd, self.RECORD.size, (count - 1) * self.RECORD.size)) if count else None
+
+            if last is None or record[0] > last[0]:
+                os.write(fd, self.RECORD.pack(*record))
+                return
+
+            if last == record:
+                return
+        finally:
+            os.close(fd)
+
+        # Blocks stored out of order are rare, rewrite the records for those.
+        self._write_records(file_path=file_path, records=self._read_records(file_path=file_path) + [record])
+
+    def remove(self, index: str, value: str, block_num: str) -> None:
+        file_path = self._index_path(index=index, value=value)
+
+        records = self._read_records(file_path=file_path)
+        kept = [record for record in records if record[0] != int(block_num)]
+
+        if len(kept) == len(records):
+            return
+
+        if len(kept) > 0 and records[-1][0] == int(block_num):
+            os.truncate(file_path, len(kept) * self.RECORD.size)
+        else:
+            self._write_records(file_path=file_path, records=kept)
+
+    def find(self, index: str, value: str, limit: int, before: int = None) -> list:
+        # Up to limit (block number, tx hash) listed under value, newest first, from blocks before before.
+        file_path = self._index_path(index=index, value=value)
+
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return []
+
+        try:
+            count = os.fstat(fd).st_size // self.RECORD.size
+            end = count
+
+            if before is not None:
+                lo, hi = 0, count
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    block_num, _ = self.RECORD.unpack(os.pread(fd, self.RECORD.size, mid * self.RECORD.size))
+                    if block_num < int(before):
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                end = lo
+
+            start = max(end - max(int(limit), 0), 0)
+            data = os.pread(fd, (end - start) * self.RECORD.size, start * self.RECORD.size)
+        finally:
+            os.close(fd)
+
+        return [(block_num, tx_hash.hex()) for block_num, tx_hash in reversed(list(self.RECORD.iter_unpack(data)))]
 
-        # If there is no history or no previous blocks, return None
-        return None
 
 # TODO: move to component responsible for state maintenance.
 def set_latest_block_height(h, driver: ContractDriver):
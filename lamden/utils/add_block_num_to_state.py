@@ -21,13 +21,7 @@ class AddBlockNum:
             2. call safe_set on all blocks to set theeblock number in the state
         '''
 
-        max_block_num = int("99999999999999999999")
-        prev_block = self.block_storage.get_previous_block(v=max_block_num)
-
-        while True:
-            if prev_block is None:
-                break
-
+        for prev_block in self.block_storage.iter_blocks(reverse=True):
             block_num = prev_block.get('number')
 
             if block_num == '0':
@@ -47,8 +41,6 @@ class AddBlockNum:
             for stage_change in rewards:
                 self.state_driver.set(stage_change.get('key'), stage_change.get('value'), block_num=block_num)
 
-            prev_block = self.block_storage.get_previous_block(v=int(block_num))
-
 
 
 if __name__ == '__main__':
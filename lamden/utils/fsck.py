@@ -0,0 +1,513 @@
+import concurrent.futures
+import os
+import shutil
+import sys
+
+from lamden.storage import BlockStorage, FSBlockDriver, FSHashStorageDriver, FSStateHistory, STORAGE_HOME
+from lamden.utils import hlc
+
+MEMBERS_KEY = 'masternodes.S:members'
+
+SHARD_SIZE = 10_000
+REPORT_EXAMPLES = 20
+
+# Problems a check can find. Those in REPAIRABLE are fixed with repair=True, the rest need the blocks to be synced
+# again from peers.
+UNREADABLE_BLOCK = 'unreadable_block'
+MISNUMBERED_BLOCK = 'misnumbered_block'
+MALFORMED_BLOCK = 'malformed_block'
+BROKEN_CHAIN = 'broken_chain'
+MISSING_TX = 'missing_tx'
+MISMATCHED_TX = 'mismatched_tx'
+UNREADABLE_TX = 'unreadable_tx'
+UNREADABLE_PACK = 'unreadable_pack'
+MISSING_HASH_INDEX = 'missing_hash_index'
+DANGLING_HASH_INDEX = 'dangling_hash_index'
+LEGACY_ALIASES = 'legacy_aliases'
+MISSING_STATE_HISTORY = 'missing_state_history'
+DANGLING_STATE_HISTORY = 'dangling_state_history'
+MISSING_MEMBER_HISTORY = 'missing_member_history'
+UNINDEXED_BLOCK = 'unindexed_block'
+ORPHAN_TX = 'orphan_tx'
+EMPTY_DIRECTORY = 'empty_directory'
+
+REPAIRABLE = (
+    UNREADABLE_BLOCK, UNINDEXED_BLOCK, MISSING_HASH_INDEX, DANGLING_HASH_INDEX, LEGACY_ALIASES,
+    MISSING_STATE_HISTORY, DANGLING_STATE_HISTORY, MISSING_MEMBER_HISTORY, ORPHAN_TX, EMPTY_DIRECTORY
+)
+
+# Storage opened once per worker process by _init_worker.
+worker_storage = None
+
+
+def _init_worker(lamden_root: str, roots: dict):
+    global worker_storage
+    worker_storage = BlockStorage(root=lamden_root, roots=roots)
+
+
+def _run_worker_task(task: tuple) -> dict:
+    return run_task(storage=worker_storage, task=task)
+
+
+def run_task(storage: BlockStorage, task: tuple) -> dict:
+    kind, args, repair = task
+
+    if kind == 'blocks':
+        return check_blocks(storage, *args)
+    if kind == 'txs':
+        return check_txs(storage, *args, repair=repair)
+    if kind == 'state_history':
+        return check_state_history(storage, *args, repair=repair)
+    if kind == 'block_files':
+        return check_block_files(storage, *args, repair=repair)
+
+    raise ValueError(f'Unknown check {kind}')
+
+
+def _new_result() -> dict:
+    return {
+        'checked': {},
+        'issues': {},
+        'repaired': {},
+        'first': None,
+        'last': None,
+        'hash_index_matches': 0,
+        'members': []
+    }
+
+
+def _add_issue(result: dict, issue: str, detail) -> None:
+    result['issues'].setdefault(issue, []).append(detail)
+
+
+def _add_repaired(result: dict, issue: str, count: int = 1) -> None:
+    if count > 0:
+        result['repaired'][issue] = result['repaired'].get(issue, 0) + count
+
+
+def _count(result: dict, name: str, count: int = 1) -> None:
+    result['checked'][name] = result['checked'].get(name, 0) + count
+
+
+def _indexed_between(storage: BlockStorage, lower: int, upper: int) -> list:
+    # Indexed block numbers from lower to upper (both inclusive).
+    block_nums = []
+    cursor = lower - 1
+
+    while True:
+        batch = storage.block_driver.find_next_block_numbers(block_num=str(cursor), amount_of_blocks=SHARD_SIZE)
+        batch = [int(block_num) for block_num in batch]
+        block_nums.extend(block_num for block_num in batch if block_num <= upper)
+
+        if len(batch) < SHARD_SIZE or batch[-1] >= upper:
+            return block_nums
+
+        cursor = batch[-1]
+
+
+def is_link_checked(previous_num: int, pruned_height: int) -> bool:
+    # Blocks after the pruned range point at blocks that are gone, their link can't be checked.
+    return pruned_height <= 0 or previous_num > pruned_height
+
+
+def check_blocks(storage: BlockStorage, start: int, end: int) -> dict:
+    # Every indexed block from start to end: readable, stored under its own number, has its tx, is linked to the block
+    # before it, is in the block hash index and its state changes are in the state history.
+    result = _new_result()
+    pruned_height = storage.get_pruned_height()
+    block_nums = _indexed_between(storage=storage, lower=start, upper=end)
+
+    previous = None
+    for position, block_num in enumerate(block_nums):
+        _count(result, 'blocks')
+
+        block = storage.block_driver.find_block(block_num=str(block_num))
+
+        if not isinstance(block, dict):
+            _add_issue(result, UNREADABLE_BLOCK, block_num)
+            previous = None
+            continue
+
+        block_hash = block.get('hash')
+
+        if str(block.get('number')) != str(block_num):
+            _add_issue(result, MISNUMBERED_BLOCK, block_num)
+
+        genesis = storage.is_genesis_block(block=block)
+        tx_hash = block.get('processed')
+
+        if not isinstance(block_hash, str) or 'previous' not in block or (not genesis and not isinstance(tx_hash, str)):
+            _add_issue(result, MALFORMED_BLOCK, block_num)
+            previous = None
+            continue
+
+        if position == 0:
+            result['first'] = (block_num, block.get('previous'))
+        if position == len(block_nums) - 1:
+            result['last'] = (block_num, block_hash)
+
+        if previous is not None and is_link_checked(previous_num=previous[0], pruned_height=pruned_height):
+            if block.get('previous') != previous[1]:
+                _add_issue(result, BROKEN_CHAIN, block_num)
+        previous = (block_num, block_hash)
+
+        tx = None
+        if not genesis:
+            try:
+                tx = storage.get_tx(tx_hash, block_num=block_num)
+            except Exception:
+                tx = None
+
+            if not isinstance(tx, dict):
+                _add_issue(result, MISSING_TX, (block_num, tx_hash))
+                tx = None
+            elif tx.get('hash') != tx_hash:
+                _add_issue(result, MISMATCHED_TX, (block_num, tx_hash))
+                tx = None
+
+        if storage.block_hash_index is not None:
+            if storage.block_hash_index.get(hash_str=block_hash) == block_num:
+                result['hash_index_matches'] += 1
+            else:
+                _add_issue(result, MISSING_HASH_INDEX, (block_num, block_hash))
+
+        if genesis or tx is not None:
+            # State changes in the order they're applied, rewards never change the members.
+            state = block.get('genesis', []) if genesis else tx.get('state', [])
+            rewards = [] if genesis else block.get('rewards', [])
+
+            for state_change in state + rewards:
+                key = state_change.get('key')
+                change = storage.state_history.find_change(key=key, block_num=str(block_num), inclusive=True)
+
+                if change is None or change[0] != block_num:
+                    _add_issue(result, MISSING_STATE_HISTORY, (key, block_num, state_change.get('value')))
+
+            for state_change in state:
+                if state_change.get('key') == MEMBERS_KEY:
+                    result['members'].append((str(block_num), state_change.get('value')))
+
+    return result
+
+
+def _check_empty_dirs(result: dict, dir_path: str, repair: bool) -> None:
+    if len(os.listdir(dir_path)) > 0:
+        return
+
+    _add_issue(result, EMPTY_DIRECTORY, dir_path)
+
+    if repair:
+        os.rmdir(dir_path)
+        _add_repaired(result, EMPTY_DIRECTORY)
+
+
+def check_txs(storage: BlockStorage, path: str, repair: bool = False) -> dict:
+    # Loose tx files under one top level directory of the tx store. A tx is an orphan when the block numbered by its
+    # HLC timestamp is gone or doesn't reference it.
+    result = _new_result()
+
+    for dir_path, _, filenames in os.walk(path, topdown=False):
+        for tx_hash in filenames:
+            if tx_hash.startswith('.') or '.' in tx_hash:
+                continue
+
+            _count(result, 'txs')
+
+            try:
+                tx = storage.tx_driver.get_file(hash_str=tx_hash)
+            except Exception:
+                tx = None
+
+            if not isinstance(tx, dict):
+                _add_issue(result, UNREADABLE_TX, tx_hash)
+                continue
+
+            hlc_timestamp = tx.get('hlc_timestamp')
+            if hlc_timestamp is None:
+                continue
+
+            block = storage.block_driver.find_block(block_num=str(hlc.nanos_from_hlc_timestamp(hlc_timestamp)))
+            if isinstance(block, dict) and block.get('processed') == tx_hash:
+                continue
+
+            _add_issue(result, ORPHAN_TX, tx_hash)
+
+            if repair:
+                storage.tx_driver.delete_file(hash_str=tx_hash)
+                _add_repaired(result, ORPHAN_TX)
+
+        if os.path.isdir(dir_path):
+            _check_empty_dirs(result=result, dir_path=dir_path, repair=repair)
+
+    return result
+
+
+def check_state_history(storage: BlockStorage, path: str, repair: bool = False) -> dict:
+    # History files under one top level directory of the state history. Records for blocks that aren't stored are
+    # dangling, unless the block was pruned and its history kept. Blocks are looked up on disk rather than in the
+    # index, an unindexed block file is put back in the index by the repair and keeps its history.
+    result = _new_result()
+    pruned_height = storage.get_pruned_height()
+
+    for dir_path, _, filenames in os.walk(path, topdown=False):
+        for filename in filenames:
+            if not filename.endswith(FSStateHistory.HISTORY_FILE_SUFFIX):
+                continue
+
+            _count(result, 'histories')
+
+            hash_str = filename[:-len(FSStateHistory.HISTORY_FILE_SUFFIX)]
+            records = storage.state_history._read_records(file_path=os.path.join(dir_path, filename))
+
+            dangling = set(
+                record[0] for record in records
+                if record[0] > pruned_height and not storage.block_exists(block_num=str(record[0]))
+            )
+
+            for block_num in sorted(dangling):
+                _add_issue(result, DANGLING_STATE_HISTORY, (hash_str, block_num))
+
+            if repair and len(dangling) > 0:
+                _add_repaired(result, DANGLING_STATE_HISTORY, storage.state_history.remove_changes(
+                    hash_str=hash_str, block_nums=dangling
+                ))
+
+        if os.path.isdir(dir_path):
+            _check_empty_dirs(result=result, dir_path=dir_path, repair=repair)
+
+    return result
+
+
+def check_block_files(storage: BlockStorage, path: str, repair: bool = False) -> dict:
+    # Block files and packs under one year directory of the block store that the block index doesn't know about.
+    # Those are only put back in the index by a repair in the main process, see StorageChecker.repair.
+    result = _new_result()
+
+    lower, upper = (int(bound) for bound in os.path.basename(path).split('_'))
+    indexed = set(_indexed_between(storage=storage, lower=lower, upper=upper))
+
+    for dir_path, _, filenames in os.walk(path, topdown=False):
+        for filename in filenames:
+            if filename.endswith(FSBlockDriver.PACK_SUFFIX):
+                block_nums = storage.block_driver.get_pack_block_numbers(pack_path=os.path.join(dir_path, filename))
+
+                if block_nums is None:
+                    _add_issue(result, UNREADABLE_PACK, os.path.join(dir_path, filename))
+                    continue
+            else:
+                try:
+                    block_nums = [int(filename)]
+                except ValueError:
+                    continue
+
+            _count(result, 'block_files')
+
+            for block_num in block_nums:
+                if block_num not in indexed:
+                    _add_issue(result, UNINDEXED_BLOCK, block_num)
+
+        if os.path.isdir(dir_path):
+            _check_empty_dirs(result=result, dir_path=dir_path, repair=repair)
+
+    return result
+
+
+class StorageChecker:
+    def __init__(self, lamden_root=None, roots=None, processes=None, repair=False, shard_size=SHARD_SIZE, wallet=None):
+        '''
+            Checks the block storage under <lamden_root> for consistency without re-verifying any signatures (that's
+            ValidateChainHandler). The block range and the tx, state history and block file trees are split into
+            shards checked in parallel by a pool of processes, each streaming through its files. What the shards
+            can't see on their own (links between shards, the hash index, member history) is checked here afterwards.
+            With repair, orphan txs, dangling index and history entries and empty directories are fixed as they are
+            found. Run it with the node stopped.
+        '''
+        if lamden_root is None:
+            lamden_root = STORAGE_HOME
+
+        self.lamden_root = os.path.abspath(lamden_root)
+        self.roots = roots
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.repair = repair
+        self.shard_size = shard_size
+        self.wallet = wallet
+
+        self.storage = None
+
+    def start(self) -> dict:
+        self.storage = BlockStorage(root=self.lamden_root, roots=self.roots)
+        if self.wallet is not None:
+            self.storage.member_history.set_secure(wallet=self.wallet)
+
+        results = self.run_tasks(tasks=self.create_tasks())
+
+        report = {'checked': {}, 'issues': {}, 'repaired': {}}
+        for result in results:
+            for name, count in result['checked'].items():
+                report['checked'][name] = report['checked'].get(name, 0) + count
+            for issue, details in result['issues'].items():
+                report['issues'].setdefault(issue, []).extend(details)
+            for issue, count in result['repaired'].items():
+                report['repaired'][issue] = report['repaired'].get(issue, 0) + count
+
+        self.check_shard_links(results=results, report=report)
+        self.check_hash_index(results=results, report=report)
+        self.check_member_history(results=results, report=report)
+
+        if self.storage.blocks_alias_dir.is_dir():
+            report['issues'].setdefault(LEGACY_ALIASES, []).append(str(self.storage.blocks_alias_dir))
+
+        if self.repair:
+            self.repair_storage(report=report)
+
+        return {
+            'checked': report['checked'],
+            'issues': {issue: len(details) for issue, details in report['issues'].items() if len(details) > 0},
+            'examples': {
+                issue: details[:REPORT_EXAMPLES] for issue, details in report['issues'].items() if len(details) > 0
+            },
+            'repaired': report['repaired']
+        }
+
+    def create_tasks(self) -> list:
+        tasks = []
+
+        # Block range shards, cut from the block index.
+        cursor = -1
+        while True:
+            block_nums = self.storage.block_driver.find_next_block_numbers(
+                block_num=str(cursor), amount_of_blocks=self.shard_size
+            )
+            if len(block_nums) == 0:
+                break
+
+            tasks.append(('blocks', (int(block_nums[0]), int(block_nums[-1])), self.repair))
+            cursor = block_nums[-1]
+
+        if isinstance(self.storage.tx_driver, FSHashStorageDriver):
+            tasks.extend(('txs', (path,), self.repair) for path in self._list_dirs(self.storage.tx_driver.root_dir))
+
+        tasks.extend(
+            ('state_history', (path,), self.repair) for path in self._list_dirs(self.storage.state_history.root_dir)
+        )
+
+        if isinstance(self.storage.block_driver, FSBlockDriver):
+            for root in self.storage.block_driver._roots():
+                tasks.extend(('block_files', (path,), self.repair) for path in self._list_dirs(root))
+
+        return tasks
+
+    def _list_dirs(self, root: str) -> list:
+        if not os.path.isdir(root):
+            return []
+
+        return sorted(
+            os.path.join(root, name) for name in os.listdir(root)
+            if not name.startswith('.') and os.path.isdir(os.path.join(root, name))
+        )
+
+    def run_tasks(self, tasks: list) -> list:
+        if self.processes <= 1:
+            return [run_task(storage=self.storage, task=task) for task in tasks]
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.processes,
+            initializer=_init_worker,
+            initargs=(self.lamden_root, self.storage.roots)
+        ) as executor:
+            return list(executor.map(_run_worker_task, tasks))
+
+    def check_shard_links(self, results: list, report: dict) -> None:
+        # Each shard checked the links inside it, the first block of a shard still has to link to the last of the one
+        # before. Shards that start or end with a bad block already reported it.
+        pruned_height = self.storage.get_pruned_height()
+        block_results = sorted(
+            (result for result in results if result['first'] is not None or result['last'] is not None),
+            key=lambda result: (result['first'] or result['last'])[0]
+        )
+
+        for before, after in zip(block_results, block_results[1:]):
+            if before['last'] is None or after['first'] is None:
+                continue
+
+            if not is_link_checked(previous_num=before['last'][0], pruned_height=pruned_height):
+                continue
+
+            if after['first'][1] != before['last'][1]:
+                report['issues'].setdefault(BROKEN_CHAIN, []).append(after['first'][0])
+
+    def check_hash_index(self, results: list, report: dict) -> None:
+        # Every stored block found its own entry, anything else in the index points at nothing.
+        if self.storage.block_hash_index is None:
+            return
+
+        matches = sum(result['hash_index_matches'] for result in results)
+        dangling = len(self.storage.block_hash_index.items()) - matches
+
+        if dangling > 0:
+            report['issues'][DANGLING_HASH_INDEX] = [None] * dangling
+
+    def check_member_history(self, results: list, report: dict) -> None:
+        entries = dict(self.storage.member_history.get_entries())
+
+        for result in results:
+            for block_num, members in result['members']:
+                if entries.get(block_num) != members:
+                    report['issues'].setdefault(MISSING_MEMBER_HISTORY, []).append((block_num, members))
+
+    def repair_storage(self, report: dict) -> None:
+        # Fixes what has to be fixed in one place, after the shards are done.
+        issues = report['issues']
+
+        def repaired(issue: str, count: int):
+            if count > 0:
+                report['repaired'][issue] = report['repaired'].get(issue, 0) + count
+
+        if isinstance(self.storage.block_driver, FSBlockDriver) and (issues.get(UNINDEXED_BLOCK) or issues.get(UNREADABLE_BLOCK)):
+            # Files that went missing drop out of the index and files it didn't know about come in.
+            self.storage.block_driver.rescan_index()
+            self.storage.block_cache.clear()
+            repaired(UNINDEXED_BLOCK, len(issues.get(UNINDEXED_BLOCK, [])))
+            repaired(UNREADABLE_BLOCK, len([
+                block_num for block_num in issues.get(UNREADABLE_BLOCK, [])
+                if not self.storage.block_exists(block_num=block_num)
+            ]))
+
+        if issues.get(DANGLING_HASH_INDEX) or issues.get(UNINDEXED_BLOCK):
+            self.storage.rebuild_block_hash_index()
+            repaired(DANGLING_HASH_INDEX, len(issues.get(DANGLING_HASH_INDEX, [])))
+            repaired(MISSING_HASH_INDEX, len(issues.get(MISSING_HASH_INDEX, [])))
+        elif issues.get(MISSING_HASH_INDEX):
+            for block_num, block_hash in issues[MISSING_HASH_INDEX]:
+                self.storage.block_hash_index.put(hash_str=block_hash, block_num=block_num)
+            repaired(MISSING_HASH_INDEX, len(issues[MISSING_HASH_INDEX]))
+
+        for key, block_num, value in issues.get(MISSING_STATE_HISTORY, []):
+            self.storage.state_history.save_state_change(key=key, block_num=str(block_num), value=value)
+        repaired(MISSING_STATE_HISTORY, len(issues.get(MISSING_STATE_HISTORY, [])))
+
+        # Unsigned entries would be rejected by a node checking signatures, only write them with the node's wallet.
+        if self.wallet is not None:
+            for block_num, members in issues.get(MISSING_MEMBER_HISTORY, []):
+                self.storage.member_history.set(block_num=block_num, members_list=members)
+            repaired(MISSING_MEMBER_HISTORY, len(issues.get(MISSING_MEMBER_HISTORY, [])))
+
+        if issues.get(LEGACY_ALIASES) and self.storage.block_hash_index is not None:
+            shutil.rmtree(self.storage.blocks_alias_dir)
+            repaired(LEGACY_ALIASES, 1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [2, 3]:
+        print("Usage: python fsck.py <lamden_root_directory> [repair]")
+        sys.exit(1)
+
+    lamden_root = sys.argv[1]
+    repair = len(sys.argv) == 3 and sys.argv[2] == 'repair'
+
+    report = StorageChecker(lamden_root=lamden_root, repair=repair).start()
+
+    for issue, count in report['issues'].items():
+        print(f"{issue}: {count} found, {report['repaired'].get(issue, 0)} repaired")
+
+    print(f"Check completed, {report['checked'].get('blocks', 0)} blocks checked.")
@@ -1,7 +1,7 @@
 import os
 import sys
 import json
-from lamden.storage import FSBlockDriver, FSHashStorageDriver
+from lamden.storage import FSBlockDriver, FSHashStorageDriver, FSBlockHashIndex, BLOCK_HASH_INDEX_FILENAME
 import shutil
 
 
@@ -14,7 +14,9 @@ class MigrateFiles:
         self.txs_path_src = os.path.join(self.blocks_path_src, 'txs')
 
         self.blocks_path_dest = os.path.abspath(dest_path)
-        self.block_alias_path_dest = os.path.abspath(os.path.join(os.path.dirname(self.blocks_path_dest), 'block_alias'))
+        self.block_hash_index_path_dest = os.path.abspath(
+            os.path.join(os.path.dirname(self.blocks_path_dest), BLOCK_HASH_INDEX_FILENAME)
+        )
         self.txs_path_dest = os.path.abspath(os.path.join(os.path.dirname(self.blocks_path_dest), 'txs'))
 
         self.migrated_files: list = []
@@ -29,7 +31,7 @@ class MigrateFiles:
         self._create_directories()
 
         block_driver = FSBlockDriver(root=self.blocks_path_dest)
-        block_alias_driver = FSHashStorageDriver(root=self.block_alias_path_dest)
+        block_hash_index = FSBlockHashIndex(path=self.block_hash_index_path_dest)
         tx_driver = FSHashStorageDriver(root=self.txs_path_dest)
 
         for root, _, files in os.walk(self.blocks_path_src):
@@ -37,18 +39,14 @@ class MigrateFiles:
                 if filename.isdigit():
                     src_file = os.path.join(root, filename)
 
-                    moved_to = block_driver.move_block(src_file, filename)
+                    block_driver.move_block(src_file, filename)
 
                     block = block_driver.find_block(block_num=filename)
 
                     # if isinstance(block, str):
                     #    block = json.loads(block)
 
-                    block_hash = block.get('hash')
-                    block_alias_driver.write_symlink(
-                        hash_str=block_hash,
-                        link_to=moved_to
-                    )
+                    block_hash_index.put(hash_str=block.get('hash'), block_num=int(filename))
 
                     if int(filename) != 0:
                         tx_hash = block['processed']
@@ -0,0 +1,91 @@
+import os
+import sys
+
+from lamden.storage import BlockStorage, STORAGE_HOME, create_block_drivers
+
+
+class MigrateBlockDriver:
+    def __init__(self, lamden_root=None, driver_type='segment', batch_size=500, testing=False, roots=None):
+        '''
+            Copies the one-file-per-block layout under <lamden_root>/blocks and <lamden_root>/txs into the storage of
+            another block driver ('segment' or 'sqlite'). The source tree is left untouched so it can be removed once
+            the node has been verified on the new storage.
+
+            <roots> places the source stores like LAMDEN_STORAGE_ROOTS does (see storage.get_storage_roots), which is
+            read when it's None. Packed and cold tier day buckets are read like the node reads them.
+        '''
+        self.testing = testing
+
+        if lamden_root is None:
+            lamden_root = STORAGE_HOME
+
+        self.lamden_root = os.path.abspath(lamden_root)
+        self.driver_type = driver_type
+        self.batch_size = batch_size
+
+        self.roots = roots
+
+        self.migrated_blocks: list = []
+
+    def start(self):
+        storage_src = BlockStorage(root=self.lamden_root, driver_type='fs', tx_indexes=False, roots=self.roots)
+
+        block_driver_dest, tx_driver_dest = create_block_drivers(root=self.lamden_root, driver_type=self.driver_type)
+
+        # Start from scratch so a migration that was interrupted can simply be run again.
+        block_driver_dest.flush()
+        tx_driver_dest.flush()
+
+        blocks = []
+        txs = []
+
+        for block in storage_src.iter_blocks(fill_tx=False):
+            tx_hash = block.get('processed')
+            if isinstance(tx_hash, str):
+                tx = storage_src.get_tx(tx_hash, block_num=block.get('number'))
+                if tx is None:
+                    raise ValueError(f'Tx {tx_hash} of block {block.get("number")} not found, migration stopped.')
+
+                txs.append((tx_hash, tx))
+
+            blocks.append(block)
+
+            if self.testing:
+                self.migrated_blocks.append(block.get('number'))
+
+            if len(blocks) >= self.batch_size:
+                self.__write_batch(block_driver_dest, tx_driver_dest, blocks, txs)
+                blocks = []
+                txs = []
+
+        self.__write_batch(block_driver_dest, tx_driver_dest, blocks, txs)
+
+        block_driver_dest.close()
+        tx_driver_dest.close()
+
+    def __write_batch(self, block_driver_dest, tx_driver_dest, blocks: list, txs: list):
+        if len(blocks) == 0:
+            return
+
+        tx_driver_dest.write_files(files=txs)
+        block_driver_dest.write_blocks(block_list=blocks)
+
+
+class MigrateToSegments(MigrateBlockDriver):
+    def __init__(self, lamden_root=None, batch_size=500, testing=False, roots=None):
+        super().__init__(lamden_root=lamden_root, driver_type='segment', batch_size=batch_size, testing=testing,
+                         roots=roots)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [2, 3]:
+        print("Usage: python migrate_to_segments.py <lamden_root_directory> [segment|sqlite]")
+        sys.exit(1)
+
+    lamden_root = sys.argv[1]
+    driver_type = sys.argv[2] if len(sys.argv) == 3 else 'segment'
+
+    migration = MigrateBlockDriver(lamden_root=lamden_root, driver_type=driver_type)
+    migration.start()
+
+    print("Migration completed.")
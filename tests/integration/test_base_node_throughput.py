@@ -380,3 +380,44 @@ class TestNode(TestCase):
             print(f"{key}: TX ACCUMULATOR = {result['__fixed__']} | STATE = {balance}")
 
             self.assertEqual(result['__fixed__'], balance)
+
+    def test_transaction_throughput__queued_txs_processed_in_batches(self):
+        # Get and start a node
+        self.create_and_start_node()
+        # Set the consensus percent to 0 so all processed transactions will "be in consensus"
+        self.node.consensus_percent = 0
+
+        self.await_async_process(self.node.pause_main_processing_queue)
+        self.assertTrue(self.node.main_processing_queue.paused)
+
+        # Create a wallet with a balance
+        jeff_wallet = Wallet()
+
+        # Seed initial currency balances
+        self.tn.set_smart_contract_value(
+            key=f'currency.balances:{jeff_wallet.verifying_key}',
+            value=1000000000
+        )
+
+        self.send_transactions(sender_wallet=jeff_wallet)
+
+        # Wait for every tx to be in the main processing queue with its hold time up
+        while len(self.node.main_processing_queue) != self.amount_of_txn:
+            self.async_sleep(0.1)
+        self.async_sleep(1)
+
+        loops_before = self.node.debug_loop_counter['main']
+
+        start_time = time.time()
+        self.node.main_processing_queue.unpause()
+        self.await_all_processed()
+        end_time = time.time()
+        print(f'Processing took {end_time - start_time} seconds')
+
+        # ___ VALIDATE TEST RESULTS ___
+        self.assertEqual(self.amount_of_txn + 1, self.node.blocks.total_blocks())
+
+        # Ready txs are drained in batches, not one per pass of the main loop
+        main_loops = self.node.debug_loop_counter['main'] - loops_before
+        print(f'Processed {self.amount_of_txn} txs in {main_loops} main loop passes')
+        self.assertLessEqual(main_loops, self.amount_of_txn / self.node.main_processing_batch_size + 5)
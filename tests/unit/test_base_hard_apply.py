@@ -1,4 +1,4 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 import shutil
 from pathlib import Path
 
@@ -125,6 +125,36 @@ class TestBaseNode_HardApply(TestCase):
         self.node.hard_apply_block_finish(block=block)
         self.assertEqual(new_timestamp, self.node.validation_queue.last_hlc_in_consensus)
 
+    def test_check_snapshot__exports_at_first_block_of_interval_with_validation_paused(self):
+        self.node.hard_apply_store_block(block=self.genesis_block)
+        block = self.mock_blocks.get_block_by_index(1)
+        self.node.hard_apply_store_block(block=block)
+
+        # Block 1 starts the second interval.
+        self.node.snapshot_handler.interval = int(block.get('number'))
+        def export():
+            self.assertTrue(self.node.validation_queue.paused)
+            self.assertEqual({}, self.node.nonces.pending_writes)
+
+        self.node.snapshot_handler.export = mock.MagicMock(side_effect=export)
+        self.node.nonces.set_nonce(sender='sender', processor='processor', value=1)
+
+        self.node.check_snapshot(block=block)
+        self.assertTrue(self.node.validation_queue.paused)
+
+        asyncio.get_event_loop().run_until_complete(self.node.export_snapshot_task)
+
+        self.node.snapshot_handler.export.assert_called_once()
+        self.assertFalse(self.node.validation_queue.paused)
+        self.assertIsNone(self.node.export_snapshot_task)
+
+        # Not again for a later block in the same interval.
+        block = self.mock_blocks.get_block_by_index(2)
+        self.node.hard_apply_store_block(block=block)
+
+        self.node.check_snapshot(block=block)
+        self.assertIsNone(self.node.export_snapshot_task)
+
     def test_hard_apply_store_block__can_store_a_block(self):
         block = self.mock_blocks.get_block_by_index(1)
         self.node.hard_apply_store_block(block=block)
@@ -35,8 +35,8 @@ class Network:
     def get_all_connected_peers(self):
         return self.peers
 
-    def add_peer(self, blocks={}):
-        self.peers.append(MockPeer(blocks=blocks))
+    def add_peer(self, blocks={}, pruned_height=0):
+        self.peers.append(MockPeer(blocks=blocks, pruned_height=pruned_height))
 
     def get_peer(self, vk: str):
         for peer in self.peers:
@@ -47,8 +47,9 @@ class Network:
         pass
 
 class MockPeer:
-    def __init__(self, blocks={}):
+    def __init__(self, blocks={}, pruned_height=0):
         self.blocks = blocks
+        self.pruned_height = pruned_height
 
         wallet = Wallet()
         self.server_vk = wallet.verifying_key
@@ -61,6 +62,9 @@ class MockPeer:
         return self.blocks.get(block_num, None)
 
     async def get_block(self, block_num: int) -> (dict, None):
+        if 0 < int(block_num) <= self.pruned_height:
+            return {'block_info': None, 'pruned': True, 'pruned_height': self.pruned_height}
+
         block = self.find_block(str(block_num))
         block = json.loads(encode(block))
         if block is None:
@@ -345,6 +349,24 @@ class TestCatchupHandler(TestCase):
         self.assertIsNotNone(block)
         self.assertEqual(latest_block_number, block.get('number'))
 
+    def test_METHOD_source_block_from_peers__drops_peers_that_pruned_the_block(self):
+        mock_blocks = MockBlocks(num_of_blocks=5)
+        block_number = mock_blocks.block_numbers_list[1]
+
+        for i in range(2):
+            self.mock_network.add_peer(blocks=dict(mock_blocks.blocks), pruned_height=int(mock_blocks.latest_block_number) - 1)
+        self.add_peers_to_network(amount=3, blocks=mock_blocks.blocks)
+
+        self.create_catchup_handler()
+        self.catchup_handler.catchup_peers = list(self.mock_network.peers)
+
+        block = self.loop.run_until_complete(
+            self.catchup_handler.source_block_from_peers(block_num=int(block_number), fetch_type='specific')
+        )
+
+        self.assertEqual(block_number, block.get('number'))
+        self.assertTrue(all(peer.pruned_height == 0 for peer in self.catchup_handler.catchup_peers))
+
     def test_METHOD_source_block_from_peers__can_get_a_previous_block_from_peers(self):
         mock_blocks = MockBlocks(num_of_blocks=5)
         latest_block_number = mock_blocks.latest_block_number
@@ -273,6 +273,56 @@ def get():
 
         self.assertDictEqual(response.json, {'value': 99999})
 
+    def test_get_variable_returns_value_at_block(self):
+        code = '''
+h = Hash()
+
+@construct
+def seed():
+    h['stu'] = 3
+
+@export
+def get():
+    return h['stu']
+        '''
+
+        self.ws.client.submit(f=code, name='testing')
+        self.ws.client.raw_driver.commit()
+
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )
+        for value, block in enumerate(blocks, start=1):
+            block['processed']['state'] = [{'key': 'testing.h:stu', 'value': value}]
+            self.block_storage.store_block(copy.deepcopy(block))
+
+        _, response = self.ws.app.test_client.get(f'/contracts/testing/h?key=stu&block={blocks[0].get("number")}')
+        self.assertDictEqual(response.json, {'value': 1})
+
+        _, response = self.ws.app.test_client.get(f'/contracts/testing/h?key=stu&block={int(blocks[1].get("number")) + 1}')
+        self.assertDictEqual(response.json, {'value': 2})
+
+        _, response = self.ws.app.test_client.get('/contracts/testing/h?key=stu&block=1')
+        self.assertDictEqual(response.json, {'value': None})
+
+        _, response = self.ws.app.test_client.get('/contracts/testing/h?key=stu&block=latest')
+        self.assertEqual(400, response.status)
+
+    def test_get_variable_returns_error_before_state_history_starts(self):
+        self.ws.client.submit(f="h = Hash()\n@export\ndef get():\n    return h['stu']", name='testing')
+        self.ws.client.raw_driver.commit()
+
+        self.block_storage.set_state_history_start(block_num=100)
+
+        _, response = self.ws.app.test_client.get('/contracts/testing/h?key=stu&block=99')
+        self.assertEqual(400, response.status)
+        self.assertDictEqual(response.json, {'error': 'state history starts at block 100'})
+
+        _, response = self.ws.app.test_client.get('/contracts/testing/h?key=stu&block=100')
+        self.assertEqual(404, response.status)
+
     def test_get_variable_works_for_multihashes(self):
         code = '''
 h = Hash()
@@ -624,6 +674,36 @@ def get():
         _, response = self.ws.app.test_client.get(f'/tx?hash={block["processed"]["hash"]}')
         self.assertDictEqual(response.json, block['processed'])
 
+    def test_get_txs_by_sender_and_contract_pages_tx_index(self):
+        self.ws.blocks = BlockStorage(root=self.temp_storage, tx_indexes=True)
+
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )
+        for block in blocks:
+            block['processed']['transaction']['payload'] = {'sender': 'jeff', 'contract': 'currency', 'function': 'transfer'}
+            self.ws.blocks.store_block(copy.deepcopy(block))
+
+        _, response = self.ws.app.test_client.get('/txs/sender/jeff?limit=2')
+        self.assertEqual([blocks[2]['processed']['hash'], blocks[1]['processed']['hash']], [tx['hash'] for tx in response.json['txs']])
+        self.assertEqual(int(blocks[1]['number']), response.json['next'])
+
+        _, response = self.ws.app.test_client.get(f'/txs/contract/currency?function=transfer&limit=2&before={response.json["next"]}')
+        self.assertEqual([int(blocks[0]['number'])], [tx['number'] for tx in response.json['txs']])
+        self.assertIsNone(response.json['next'])
+
+        _, response = self.ws.app.test_client.get('/txs/failed')
+        self.assertEqual({'txs': [], 'next': None}, response.json)
+
+        _, response = self.ws.app.test_client.get('/txs/sender/jeff?limit=many')
+        self.assertEqual(400, response.status)
+
+    def test_get_txs_by_sender_returns_404_without_tx_indexes(self):
+        _, response = self.ws.app.test_client.get('/txs/sender/jeff')
+        self.assertEqual(404, response.status)
+
     def test_malformed_tx_returns_error(self):
         tx = b'"df:'
 
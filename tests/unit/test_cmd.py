@@ -1,5 +1,5 @@
 
-from unittest import TestCase
+from unittest import TestCase, mock
 from lamden.cli import cmd
 
 import os
@@ -34,3 +34,13 @@ class TestCMD(TestCase):
 
         # assert lock exists
         self.assertFalse(os.path.exists(lock_dir))
+
+    def test_FUNCTION_get_hold_time__only_when_turned_on(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(cmd.get_hold_time())
+
+        with mock.patch.dict(os.environ, {'ADAPTIVE_HOLD_TIME': 'true', 'HOLD_TIME_PERCENTILE': '95', 'HOLD_TIME_MARGIN': '0.2'}):
+            hold_time = cmd.get_hold_time()
+
+        self.assertEqual(95, hold_time.percentile)
+        self.assertEqual(0.2, hold_time.margin)
@@ -2,6 +2,7 @@ from lamden.crypto import transaction
 from lamden.crypto.wallet import Wallet
 from lamden.nodes.filequeue import FileQueue
 from unittest import TestCase
+import asyncio
 import json
 import os
 import pathlib
@@ -75,4 +76,27 @@ class TestProcessingQueue(TestCase):
 
         self.assertIsNotNone(file_tx)
         self.assertEqual(len(self.tx_queue), 0)
-        self.assertEqual(file_tx['metadata'].get('signature'), file_signature)
\ No newline at end of file
+        self.assertEqual(file_tx['metadata'].get('signature'), file_signature)
+
+    def test_watch__calls_back_on_append_from_another_queue(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        notified = []
+        self.assertTrue(self.tx_queue.watch(callback=lambda: notified.append(True)))
+
+        # Same directory, as the webserver process would have it.
+        FileQueue(root=self.tx_queue_path).append(tx=b'{}')
+
+        loop.run_until_complete(asyncio.sleep(0.1))
+
+        self.tx_queue.unwatch()
+        loop.close()
+
+        self.assertEqual([True], notified)
+        self.assertIsNone(self.tx_queue.notify_fd)
+
+    def test_append__works_without_a_watcher(self):
+        self.tx_queue.append(tx=b'{}')
+
+        self.assertEqual(len(self.tx_queue), 1)
@@ -0,0 +1,77 @@
+from lamden.nodes.hold_time import HoldTime
+from unittest import TestCase
+
+DEFAULT_DELAY = {
+    'base': 1,
+    'self': 0.5
+}
+
+
+class TestHoldTime(TestCase):
+    def setUp(self):
+        self.hold_time = HoldTime(percentile=90, margin=0.1, minimum=0.05, window=10, min_samples=5, update_interval=0)
+
+    def record_lags(self, peer, lags):
+        for lag in lags:
+            self.hold_time.record_lag(peer=peer, lag=lag)
+
+    def test_get_delay__returns_default_until_enough_samples(self):
+        self.record_lags(peer='peer_1', lags=[0.01] * 4)
+
+        self.assertEqual(DEFAULT_DELAY, self.hold_time.get_delay(default=DEFAULT_DELAY))
+
+        self.record_lags(peer='peer_1', lags=[0.01])
+
+        self.assertEqual({'base': 0.11, 'self': 0}, self.hold_time.get_delay(default=DEFAULT_DELAY))
+
+    def test_get_delay__covers_percentile_lag_of_slowest_peer(self):
+        self.record_lags(peer='peer_1', lags=[0.01] * 10)
+        self.record_lags(peer='peer_2', lags=[0.1] * 8 + [0.2, 5])
+
+        self.assertAlmostEqual(0.3, self.hold_time.get_delay(default=DEFAULT_DELAY)['base'])
+        self.assertEqual(0.2, self.hold_time.peer_lag)
+
+    def test_get_delay__kept_within_bounds(self):
+        self.record_lags(peer='peer_1', lags=[-0.5] * 10)
+        self.assertEqual(0.1, self.hold_time.get_delay(default=DEFAULT_DELAY)['base'])
+
+        self.hold_time.margin = 0
+        self.hold_time.update()
+        self.assertEqual(0.05, self.hold_time.get_delay(default=DEFAULT_DELAY)['base'])
+
+        # Peers' txs are never held longer than the fixed delay, this node's own txs get at most theirs.
+        self.record_lags(peer='peer_1', lags=[3] * 10)
+        self.assertEqual(DEFAULT_DELAY, self.hold_time.get_delay(default=DEFAULT_DELAY))
+
+        self.record_lags(peer='peer_1', lags=[1.1] * 10)
+        delay = self.hold_time.get_delay(default=DEFAULT_DELAY)
+        self.assertEqual(1, delay['base'])
+        self.assertAlmostEqual(0.1, delay['self'])
+
+        self.hold_time.maximum = 2
+        self.assertEqual({'base': 1.1, 'self': 0}, self.hold_time.get_delay(default=DEFAULT_DELAY))
+
+    def test_get_delay__only_uses_latest_window_of_lags(self):
+        self.record_lags(peer='peer_1', lags=[1] * 10)
+        self.record_lags(peer='peer_1', lags=[0.01] * 10)
+
+        self.assertAlmostEqual(0.11, self.hold_time.get_delay(default=DEFAULT_DELAY)['base'])
+
+    def test_record_reorder__falls_back_to_default_until_backoff_passes(self):
+        self.record_lags(peer='peer_1', lags=[0.01] * 10)
+
+        self.hold_time.record_reorder()
+        self.record_lags(peer='peer_1', lags=[0.01])
+        self.assertEqual(DEFAULT_DELAY, self.hold_time.get_delay(default=DEFAULT_DELAY))
+
+        self.hold_time.backoff_until = 0
+        self.record_lags(peer='peer_1', lags=[0.01])
+        self.assertAlmostEqual(0.11, self.hold_time.get_delay(default=DEFAULT_DELAY)['base'])
+
+    def test_record_lag__waits_update_interval_before_updating(self):
+        self.hold_time.update_interval = 60
+        self.hold_time.update()
+
+        self.record_lags(peer='peer_1', lags=[0.01] * 10)
+
+        self.assertIsNone(self.hold_time.hold_time)
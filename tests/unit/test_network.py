@@ -2,10 +2,12 @@ import json
 from unittest import TestCase
 from lamden.crypto.wallet import Wallet
 from lamden.network import Network, EXCEPTION_PORT_NUM_NOT_INT
-from lamden.peer import Peer, ACTION_HELLO, ACTION_PING, ACTION_GET_BLOCK, ACTION_GET_LATEST_BLOCK, ACTION_GET_NEXT_BLOCK, ACTION_GET_NETWORK_MAP, ACTION_GET_NEXT_MEMBER_HISTORY
+from lamden.peer import Peer, ACTION_HELLO, ACTION_PING, ACTION_GET_BLOCK, ACTION_GET_LATEST_BLOCK, ACTION_GET_NEXT_BLOCK, ACTION_GET_NETWORK_MAP, ACTION_GET_NEXT_MEMBER_HISTORY, \
+    ACTION_GET_SNAPSHOT_MANIFEST, ACTION_GET_SNAPSHOT_CHUNK, ACTION_GET_PREV_BLOCK
 from lamden.sockets.publisher import Publisher
 from lamden.sockets.router import Router
-from lamden.storage import BlockStorage
+from lamden.snapshot import SnapshotHandler
+from lamden.storage import BlockStorage, NonceStorage
 
 from contracting.db.driver import ContractDriver, InMemDriver
 
@@ -689,6 +691,71 @@ class TestNetwork(TestCase):
 
         self.assertIsNone(block_info)
 
+    def store_pruned_chain(self, network):
+        network.block_storage.store_block(block={'number': 0, 'hash': '0' * 64, 'hlc_timestamp': '0', 'genesis': []})
+        network.block_storage.store_block(block={
+            'number': 3,
+            'hash': "1a2b3c",
+            'hlc_timestamp': '3',
+            'processed': {
+                'hash': 'testing'
+            }
+        })
+        network.block_storage.set_pruned_height(block_num=2)
+
+    def test_METHOD_router_callback__get_block_action_responds_pruned_for_pruned_block(self):
+        network_1 = self.create_network()
+        network_1.router.send_msg = self.mock_send_msg
+        self.store_pruned_chain(network=network_1)
+
+        msg = json.dumps({'action': ACTION_GET_BLOCK, 'block_num': 1})
+        peer_vk = Wallet().verifying_key
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(network_1.router_callback(ident_vk_string=peer_vk, ident_vk_bytes=peer_vk.encode(), msg=msg))
+
+        to_vk, msg = self.router_msg
+        msg_obj = json.loads(msg)
+
+        self.assertEqual(ACTION_GET_BLOCK, msg_obj.get("response"))
+        self.assertIsNone(msg_obj.get("block_info"))
+        self.assertTrue(msg_obj.get("pruned"))
+        self.assertEqual(2, msg_obj.get("pruned_height"))
+
+    def test_METHOD_router_callback__get_previous_block_action_responds_pruned_instead_of_skipping_blocks(self):
+        network_1 = self.create_network()
+        network_1.router.send_msg = self.mock_send_msg
+        self.store_pruned_chain(network=network_1)
+
+        msg = json.dumps({'action': ACTION_GET_PREV_BLOCK, 'block_num': 3})
+        peer_vk = Wallet().verifying_key
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(network_1.router_callback(ident_vk_string=peer_vk, ident_vk_bytes=peer_vk.encode(), msg=msg))
+
+        to_vk, msg = self.router_msg
+        msg_obj = json.loads(msg)
+
+        self.assertIsNone(msg_obj.get("block_info"))
+        self.assertTrue(msg_obj.get("pruned"))
+
+    def test_METHOD_router_callback__get_next_block_action_returns_blocks_after_pruned_height(self):
+        network_1 = self.create_network()
+        network_1.router.send_msg = self.mock_send_msg
+        self.store_pruned_chain(network=network_1)
+
+        msg = json.dumps({'action': ACTION_GET_NEXT_BLOCK, 'block_num': 2})
+        peer_vk = Wallet().verifying_key
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(network_1.router_callback(ident_vk_string=peer_vk, ident_vk_bytes=peer_vk.encode(), msg=msg))
+
+        to_vk, msg = self.router_msg
+        msg_obj = json.loads(msg)
+
+        self.assertIsNone(msg_obj.get("pruned"))
+        self.assertEqual(3, msg_obj.get("block_info").get("number"))
+
     def test_METHOD_router_callback__get_network_action_creates_proper_response(self):
         network_1 = self.create_network()
 
@@ -789,6 +856,114 @@ class TestNetwork(TestCase):
         self.assertEqual("0", msg_obj['member_history_info'].get('number'))
         self.assertIsNotNone(msg_obj['member_history_info'].get('signature'))
 
+    def create_snapshot(self, network):
+        network.snapshot_handler = SnapshotHandler(
+            block_storage=network.block_storage,
+            contract_driver=network.driver,
+            nonce_storage=NonceStorage(root=self.temp_storage.joinpath('nonces'))
+        )
+
+        network.block_storage.store_block(block={
+            'number': 1,
+            'hash': "1a2b3c",
+            'hlc_timestamp': '1',
+            'processed': {
+                'hash': 'testing'
+            }
+        })
+
+        return network.snapshot_handler.export()
+
+    def test_METHOD_router_callback__get_snapshot_manifest_returns_NONE_without_snapshots(self):
+        network_1 = self.create_network()
+        network_1.router.send_msg = self.mock_send_msg
+
+        wallet = Wallet()
+        peer_vk = wallet.verifying_key
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(network_1.router_callback(
+            ident_vk_string=peer_vk,
+            ident_vk_bytes=peer_vk.encode(),
+            msg=json.dumps({'action': ACTION_GET_SNAPSHOT_MANIFEST})
+        ))
+
+        to_vk, msg = self.router_msg
+        msg_obj = json.loads(msg)
+
+        self.assertEqual(ACTION_GET_SNAPSHOT_MANIFEST, msg_obj.get("response"))
+        self.assertIsNone(msg_obj.get('manifest'))
+
+    def test_METHOD_router_callback__get_snapshot_manifest_returns_latest_manifest(self):
+        network_1 = self.create_network()
+        network_1.router.send_msg = self.mock_send_msg
+
+        manifest = self.create_snapshot(network=network_1)
+
+        wallet = Wallet()
+        peer_vk = wallet.verifying_key
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(network_1.router_callback(
+            ident_vk_string=peer_vk,
+            ident_vk_bytes=peer_vk.encode(),
+            msg=json.dumps({'action': ACTION_GET_SNAPSHOT_MANIFEST})
+        ))
+
+        to_vk, msg = self.router_msg
+        msg_obj = json.loads(msg)
+
+        self.assertEqual(ACTION_GET_SNAPSHOT_MANIFEST, msg_obj.get("response"))
+        self.assertEqual(manifest, msg_obj.get('manifest'))
+
+    def test_METHOD_router_callback__get_snapshot_chunk_returns_chunk(self):
+        network_1 = self.create_network()
+        network_1.router.send_msg = self.mock_send_msg
+
+        manifest = self.create_snapshot(network=network_1)
+
+        wallet = Wallet()
+        peer_vk = wallet.verifying_key
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(network_1.router_callback(
+            ident_vk_string=peer_vk,
+            ident_vk_bytes=peer_vk.encode(),
+            msg=json.dumps({'action': ACTION_GET_SNAPSHOT_CHUNK, 'block_num': manifest.get('number'), 'index': 0})
+        ))
+
+        to_vk, msg = self.router_msg
+        msg_obj = json.loads(msg)
+
+        self.assertEqual(ACTION_GET_SNAPSHOT_CHUNK, msg_obj.get("response"))
+        self.assertEqual(0, msg_obj.get('index'))
+        self.assertEqual(
+            network_1.snapshot_handler.read_chunk(block_num=manifest.get('number'), index=0).decode(),
+            msg_obj.get('chunk')
+        )
+
+    def test_METHOD_router_callback__get_snapshot_chunk_returns_NONE_for_bad_path(self):
+        network_1 = self.create_network()
+        network_1.router.send_msg = self.mock_send_msg
+
+        self.create_snapshot(network=network_1)
+
+        wallet = Wallet()
+        peer_vk = wallet.verifying_key
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(network_1.router_callback(
+            ident_vk_string=peer_vk,
+            ident_vk_bytes=peer_vk.encode(),
+            msg=json.dumps({'action': ACTION_GET_SNAPSHOT_CHUNK, 'block_num': '../1', 'index': 0})
+        ))
+
+        to_vk, msg = self.router_msg
+        msg_obj = json.loads(msg)
+
+        self.assertEqual(ACTION_GET_SNAPSHOT_CHUNK, msg_obj.get("response"))
+        self.assertIsNone(msg_obj.get('chunk'))
+
     def test_METHOD_make_network_map(self):
         network_1 = self.create_network()
 
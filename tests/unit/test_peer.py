@@ -1,6 +1,7 @@
 import json
 
-from lamden.peer import Peer, ACTION_HELLO, ACTION_PING, ACTION_GET_BLOCK, ACTION_GET_LATEST_BLOCK, ACTION_GET_NEXT_BLOCK, ACTION_GET_NETWORK_MAP, TOPIC_PEER_SHUTDOWN, ACTION_GET_NEXT_MEMBER_HISTORY
+from lamden.peer import Peer, ACTION_HELLO, ACTION_PING, ACTION_GET_BLOCK, ACTION_GET_LATEST_BLOCK, ACTION_GET_NEXT_BLOCK, ACTION_GET_NETWORK_MAP, TOPIC_PEER_SHUTDOWN, ACTION_GET_NEXT_MEMBER_HISTORY, \
+    ACTION_GET_SNAPSHOT_MANIFEST, ACTION_GET_SNAPSHOT_CHUNK
 from lamden.sockets.request import Request, Result
 from lamden.sockets.subscriber import Subscriber
 from lamden.crypto.wallet import Wallet, verify
@@ -477,6 +478,26 @@ class TestPeer(unittest.TestCase):
         self.assertDictEqual(expected_result, msg)
 
 
+    def test_METHOD_get_snapshot_manifest__returns_successful_msg_if_peer_available(self):
+        self.peer.setup_request()
+        msg = self.await_sending_request(process=self.peer.get_snapshot_manifest)
+        expected_result = {'action': ACTION_GET_SNAPSHOT_MANIFEST, 'success': True}
+
+        self.assertDictEqual(expected_result, msg)
+
+    def test_METHOD_get_snapshot_chunk__returns_successful_msg_if_peer_available(self):
+        self.peer.setup_request()
+        msg = self.await_sending_request(process=self.peer.get_snapshot_chunk, args={'block_num': '100', 'index': 2})
+
+        expected_result = {
+            'action': ACTION_GET_SNAPSHOT_CHUNK,
+            'block_num': '100',
+            'index': 2,
+            'success': True
+        }
+
+        self.assertDictEqual(expected_result, msg)
+
     def test_METHOD_get_network_map__returns_successful_msg_if_peer_available(self):
         self.peer.setup_request()
         msg = self.await_sending_request(process=self.peer.get_network_map)
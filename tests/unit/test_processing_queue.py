@@ -19,6 +19,7 @@ import math
 import hashlib
 import random
 import asyncio
+from copy import deepcopy
 from datetime import datetime
 from operator import itemgetter
 
@@ -336,6 +337,140 @@ class TestProcessingQueue(TestCase):
         print({'hold_time': hold_time})
         self.assertEqual(self.processing_delay_secs['self'] + self.processing_delay_secs['base'], hold_time)
 
+    def test_time_until_ready__counts_down_hold_time_of_first_tx(self):
+        self.assertIsNone(self.main_processing_queue.time_until_ready())
+
+        self.main_processing_queue.append(tx=self.make_tx_message(get_new_tx()))
+        hold_time = self.processing_delay_secs['base'] + self.processing_delay_secs['self']
+
+        self.assertAlmostEqual(hold_time, self.main_processing_queue.time_until_ready(), delta=0.05)
+
+        self.main_processing_queue[0]['timestamp'] -= hold_time
+
+        self.assertLessEqual(self.main_processing_queue.time_until_ready(), 0)
+
+    def test_process_ready__processes_all_held_txs_in_hlc_order(self):
+        self.main_processing_queue.start()
+        hold_time = self.processing_delay_secs['base'] + self.processing_delay_secs['self']
+
+        for i in range(3):
+            self.main_processing_queue.append(tx=self.make_tx_message(get_new_tx()))
+        ready_hlcs = sorted(tx['hlc_timestamp'] for tx in self.main_processing_queue.queue)
+        for tx in self.main_processing_queue.queue:
+            tx['timestamp'] -= hold_time
+
+        not_ready_tx = self.make_tx_message(get_new_tx())
+        self.main_processing_queue.append(tx=not_ready_tx)
+
+        async def process_ready():
+            return [results async for results in self.main_processing_queue.process_ready()]
+
+        loop = asyncio.get_event_loop()
+        processing_results = loop.run_until_complete(process_ready())
+
+        self.assertEqual(ready_hlcs, [results['hlc_timestamp'] for results in processing_results])
+        self.assertEqual(1, len(self.main_processing_queue))
+        self.assertEqual(not_ready_tx['hlc_timestamp'], self.main_processing_queue[0]['hlc_timestamp'])
+
+    def test_process_ready__stops_at_limit(self):
+        self.main_processing_queue.start()
+        hold_time = self.processing_delay_secs['base'] + self.processing_delay_secs['self']
+
+        for i in range(3):
+            self.main_processing_queue.append(tx=self.make_tx_message(get_new_tx()))
+        for tx in self.main_processing_queue.queue:
+            tx['timestamp'] -= hold_time
+
+        async def process_ready():
+            return [results async for results in self.main_processing_queue.process_ready(limit=2)]
+
+        loop = asyncio.get_event_loop()
+        processing_results = loop.run_until_complete(process_ready())
+
+        self.assertEqual(2, len(processing_results))
+        self.assertEqual(1, len(self.main_processing_queue))
+
+    def test_speculate__keeps_writes_out_of_driver_and_commits_them_when_processed(self):
+        self.main_processing_queue.append(tx=self.make_tx_message(get_new_tx()))
+
+        self.main_processing_queue.speculate()
+
+        self.assertIsNotNone(self.main_processing_queue.speculation)
+        self.assertEqual({}, self.driver.pending_writes)
+        speculative_writes = self.main_processing_queue.speculation['writes']
+        speculative_results = self.main_processing_queue.speculation['processing_results']
+
+        self.main_processing_queue[0]['timestamp'] -= self.processing_delay_secs['base'] + self.processing_delay_secs['self']
+
+        loop = asyncio.get_event_loop()
+        processing_results = loop.run_until_complete(self.main_processing_queue.process_next())
+
+        self.assertIs(speculative_results, processing_results)
+        self.assertEqual(speculative_writes, self.driver.pending_writes)
+        self.assertIsNone(self.main_processing_queue.speculation)
+
+    def test_speculate__discarded_when_earlier_hlc_is_appended(self):
+        earlier_hlc = self.hlc_clock.get_new_hlc_timestamp()
+        later_tx = self.make_tx_message(get_new_tx())
+        earlier_tx = self.make_tx_message(get_new_tx(), hlc=earlier_hlc)
+
+        self.main_processing_queue.append(tx=later_tx)
+        self.main_processing_queue.speculate()
+        self.assertEqual(later_tx['hlc_timestamp'], self.main_processing_queue.speculation['hlc_timestamp'])
+
+        self.main_processing_queue.append(tx=earlier_tx)
+        self.assertIsNone(self.main_processing_queue.speculation)
+
+        self.main_processing_queue.speculate()
+        self.assertEqual(earlier_tx['hlc_timestamp'], self.main_processing_queue.speculation['hlc_timestamp'])
+
+    def test_speculate__not_committed_after_another_tx_was_processed(self):
+        tx = self.make_tx_message(get_new_tx())
+        self.main_processing_queue.append(tx=tx)
+        self.main_processing_queue.speculate()
+
+        self.main_processing_queue.last_processed_hlc = self.hlc_clock.get_new_hlc_timestamp()
+
+        self.assertIsNone(self.main_processing_queue.commit_speculation(tx=tx))
+        self.assertIsNone(self.main_processing_queue.speculation)
+        self.assertEqual({}, self.driver.pending_writes)
+
+    def test_speculate__discarded_speculation_does_not_change_pending_deltas(self):
+        self.main_processing_queue.processing_delay = lambda: {'base': 0, 'self': 0}
+        sender = 'd48b174f71efb9194e9cd2d58de078882bd172fcc7c8ac5ae537827542ae604e'
+
+        tx = self.make_tx_message(get_new_tx())
+        other_tx = get_new_tx()
+        other_tx['payload']['kwargs']['to'] = Wallet().verifying_key
+        other_tx_message = self.make_tx_message(other_tx)
+
+        def process_and_soft_apply(speculate):
+            self.main_processing_queue.flush()
+            self.main_processing_queue.last_processed_hlc = '0'
+            self.client.flush()
+            self.sync()
+            self.driver.pending_deltas.clear()
+            self.driver.driver.set(f'currency.balances:{sender}', 10000000)
+
+            if speculate:
+                # Speculates on a tx reading keys the other one doesn't, then has it discarded by an earlier hlc.
+                self.main_processing_queue.append(tx=deepcopy(other_tx_message))
+                self.main_processing_queue.speculate()
+                self.assertIsNotNone(self.main_processing_queue.speculation)
+
+            self.main_processing_queue.append(tx=deepcopy(tx))
+            self.assertIsNone(self.main_processing_queue.speculation)
+
+            loop = asyncio.get_event_loop()
+            self.assertIsNotNone(loop.run_until_complete(self.main_processing_queue.process_next()))
+            self.driver.soft_apply(tx['hlc_timestamp'])
+
+            return deepcopy(self.driver.pending_deltas)
+
+        pending_deltas = process_and_soft_apply(speculate=False)
+
+        self.assertEqual(pending_deltas, process_and_soft_apply(speculate=True))
+
     def test_hold_2_time_base(self):
         new_tx_message = self.make_tx_message(get_new_tx())
         new_wallet = Wallet()
@@ -477,6 +612,25 @@ class TestProcessingQueue(TestCase):
         self.assertFalse(self.main_processing_queue.hlc_already_in_queue(hlc_timestamp='1'))
         self.assertTrue(self.main_processing_queue.hlc_already_in_queue(hlc_timestamp='3'))
 
+    def test_METHOD_append__keeps_earliest_hlc_first_and_ignores_duplicates(self):
+        for hlc in ['3', '1', '2', '1']:
+            self.main_processing_queue.append(self.make_tx_message(tx=get_new_tx(), hlc=hlc))
+
+        self.assertEqual(3, len(self.main_processing_queue))
+        self.assertEqual('1', self.main_processing_queue[0]['hlc_timestamp'])
+        self.assertEqual(['1', '2', '3'], [tx['hlc_timestamp'] for tx in self.main_processing_queue.queue])
+
+    def test_METHOD_filter_queue__only_removes_txs_in_consensus(self):
+        for hlc in ['4', '1', '3', '2']:
+            self.main_processing_queue.append(self.make_tx_message(tx=get_new_tx(), hlc=hlc))
+
+        self.last_hlc_in_consensus = '2'
+
+        self.main_processing_queue.filter_queue()
+
+        self.assertEqual(['3', '4'], [tx['hlc_timestamp'] for tx in self.main_processing_queue.queue])
+        self.assertFalse(self.main_processing_queue.hlc_already_in_queue(hlc_timestamp='2'))
+
     def test_processing_transactions_does_not_drop_state(self):
         num_of_transactions = 1000
 
@@ -136,3 +136,37 @@ class TestProcessingQueue(TestCase):
         self.assertFalse(self.processing_queue.allow_append)
         self.processing_queue.enable_append()
         self.assertTrue(self.processing_queue.allow_append)
+
+    def test_append__wakes_wait_for_work(self):
+        loop = asyncio.get_event_loop()
+        task = loop.create_task(self.processing_queue.wait_for_work())
+
+        loop.call_soon(self.processing_queue.append, "testing")
+        loop.run_until_complete(asyncio.wait_for(task, 1))
+
+        self.assertFalse(self.processing_queue.wakeup.is_set())
+
+    def test_unpause_and_stop__wake_wait_for_work(self):
+        loop = asyncio.get_event_loop()
+
+        for wake in [self.processing_queue.unpause, self.processing_queue.stop]:
+            task = loop.create_task(self.processing_queue.wait_for_work())
+            loop.call_soon(wake)
+            loop.run_until_complete(asyncio.wait_for(task, 1))
+
+    def test_wait_for_work__returns_after_timeout(self):
+        start = time.time()
+        asyncio.get_event_loop().run_until_complete(self.processing_queue.wait_for_work(timeout=0.2))
+
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+    def test_wait_for_work__returns_right_away_if_notified_before(self):
+        self.processing_queue.append("testing")
+
+        start = time.time()
+        asyncio.get_event_loop().run_until_complete(self.processing_queue.wait_for_work(timeout=5))
+
+        self.assertLess(time.time() - start, 1)
+
+    def test_stopping__returns_right_away_if_not_processing(self):
+        asyncio.get_event_loop().run_until_complete(asyncio.wait_for(self.processing_queue.stopping(), 1))
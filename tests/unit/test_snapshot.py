@@ -0,0 +1,246 @@
+from unittest import TestCase
+
+from contracting.db.driver import ContractDriver, FSDriver
+
+from lamden.crypto.wallet import Wallet
+from lamden.nodes.hlc import HLC_Clock
+from lamden.snapshot import SnapshotHandler, SnapshotError, SNAPSHOT_MANIFEST_FILENAME, SECTION_STATE, \
+    SECTION_BLOCKS, chunk_filename
+from lamden.nodes.validate_chain import VALIDATION_HEIGHT
+from lamden.storage import BlockStorage, NonceStorage, LATEST_BLOCK_HASH_KEY, LATEST_BLOCK_HEIGHT_KEY
+from tests.unit.helpers.mock_blocks import generate_blocks, GENESIS_BLOCK
+
+import copy
+import json
+import os
+import shutil
+
+
+class TestSnapshotHandler(TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath('./.lamden')
+        self.snapshots_dir = os.path.join(self.test_dir, 'snapshots')
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.wallet = Wallet()
+        self.source = self.create_snapshot_handler(name='source')
+        self.destination = self.create_snapshot_handler(name='destination')
+
+        self.blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def create_snapshot_handler(self, name: str, chunk_max_bytes: int = 4 * 1024 * 1024) -> SnapshotHandler:
+        root = os.path.join(self.test_dir, name)
+
+        block_storage = BlockStorage(root=os.path.join(root, 'storage'))
+        block_storage.member_history.set_secure(wallet=self.wallet)
+
+        return SnapshotHandler(
+            block_storage=block_storage,
+            contract_driver=ContractDriver(driver=FSDriver(root=os.path.join(root, 'state'))),
+            nonce_storage=NonceStorage(root=os.path.join(root, 'nonces')),
+            root=self.snapshots_dir,
+            chunk_max_bytes=chunk_max_bytes
+        )
+
+    def populate_source(self, amount_of_keys: int = 10):
+        block_storage = self.source.block_storage
+
+        block_storage.store_block(copy.deepcopy(GENESIS_BLOCK))
+        for block in self.blocks:
+            block_storage.store_block(copy.deepcopy(block))
+
+        state_driver = self.source.contract_driver.driver
+        for i in range(amount_of_keys):
+            state_driver.set(f'con_test.balances:{i}', i)
+
+        self.source.nonce_storage.set_nonce(sender='sender', processor='processor', value=5)
+        self.source.nonce_storage.set_pending_nonce(sender='sender', processor='processor', value=6)
+        self.source.nonce_storage.commit()
+
+        block_storage.member_history.set(block_num='0', members_list=['a', 'b'])
+        block_storage.member_history.set(block_num=self.blocks[1].get('number'), members_list=['a', 'b', 'c'])
+
+    def test_METHOD_export__writes_manifest_and_chunks_for_latest_block(self):
+        self.populate_source()
+
+        manifest = self.source.export()
+
+        path = self.source.get_snapshot_path(manifest.get('number'))
+        self.assertEqual(self.blocks[-1].get('number'), manifest.get('number'))
+        self.assertEqual(self.blocks[-1].get('hash'), manifest.get('hash'))
+        self.assertTrue(os.path.isfile(os.path.join(path, SNAPSHOT_MANIFEST_FILENAME)))
+        self.assertEqual([manifest.get('number')], self.source.list_snapshots())
+        self.assertEqual(path, self.source.get_latest_snapshot())
+
+        for chunk in manifest.get('chunks'):
+            self.assertTrue(os.path.isfile(os.path.join(path, chunk_filename(chunk.get('index')))))
+
+        self.assertEqual(manifest, self.source.verify(path=path, expected_hash=manifest.get('snapshot_hash')))
+
+    def test_METHOD_export__is_deterministic(self):
+        self.populate_source()
+
+        first = self.source.export()
+        second = self.source.export()
+
+        self.assertEqual(first.get('snapshot_hash'), second.get('snapshot_hash'))
+
+    def test_METHOD_export__leaves_out_node_local_keys(self):
+        self.populate_source()
+        state_driver = self.source.contract_driver.driver
+
+        state_driver.set('__validation_height', self.blocks[0].get('number'))
+        state_driver.set('__safe_block_height', 1)
+        first = self.source.export()
+
+        state_driver.set('__validation_height', self.blocks[-1].get('number'))
+        state_driver.set('__safe_block_height', -1)
+        second = self.source.export()
+
+        self.assertEqual(first.get('snapshot_hash'), second.get('snapshot_hash'))
+
+        path = self.source.get_snapshot_path(second.get('number'))
+        keys = [
+            key for chunk in second.get('chunks') if chunk.get('section') == SECTION_STATE
+            for key, _ in self.source.read_chunk_records(path=path, chunk=chunk)
+        ]
+        self.assertEqual([f'con_test.balances:{i}' for i in range(10)], keys)
+
+    def test_METHOD_is_snapshot_block__true_for_first_block_of_each_interval(self):
+        self.source.interval = 100
+
+        self.assertTrue(self.source.is_snapshot_block(block_num='200', previous_block_num='199'))
+        self.assertTrue(self.source.is_snapshot_block(block_num='350', previous_block_num='150'))
+        self.assertFalse(self.source.is_snapshot_block(block_num='250', previous_block_num='200'))
+        self.assertFalse(self.source.is_snapshot_block(block_num='250', previous_block_num=None))
+
+        self.source.interval = 0
+        self.assertFalse(self.source.is_snapshot_block(block_num='200', previous_block_num='199'))
+
+    def test_METHOD_prune_snapshots__keeps_latest(self):
+        for block_num in ['100', '300', '200']:
+            os.makedirs(self.source.get_snapshot_path(block_num))
+            with open(os.path.join(self.source.get_snapshot_path(block_num), SNAPSHOT_MANIFEST_FILENAME), 'w') as f:
+                f.write('{}')
+
+        self.source.keep = 2
+
+        self.assertEqual(1, self.source.prune_snapshots())
+        self.assertEqual(['200', '300'], self.source.list_snapshots())
+        self.assertEqual(0, self.source.prune_snapshots())
+
+    def test_METHOD_export__raises_on_empty_storage(self):
+        with self.assertRaises(SnapshotError):
+            self.source.export()
+
+    def test_METHOD_export__splits_sections_into_chunks_of_max_bytes(self):
+        self.source = self.create_snapshot_handler(name='source', chunk_max_bytes=100)
+        self.populate_source(amount_of_keys=50)
+
+        manifest = self.source.export()
+        path = self.source.get_snapshot_path(manifest.get('number'))
+
+        state_chunks = [chunk for chunk in manifest.get('chunks') if chunk.get('section') == SECTION_STATE]
+        self.assertGreater(len(state_chunks), 1)
+        self.assertEqual(50, sum(chunk.get('records') for chunk in state_chunks))
+
+        for chunk in manifest.get('chunks'):
+            if chunk.get('records') > 1:
+                self.assertLessEqual(chunk.get('size'), 100)
+            for record in self.source.read_chunk_records(path=path, chunk=chunk):
+                self.assertIsNotNone(record)
+
+    def test_METHOD_restore__rebuilds_state_nonces_member_history_and_tip(self):
+        self.populate_source()
+        manifest = self.source.export()
+
+        # Stale data in the destination is replaced.
+        self.destination.contract_driver.driver.set('con_stale.value:x', 1)
+        self.destination.nonce_storage.set_nonce(sender='stale', processor='processor', value=1)
+        self.destination.nonce_storage.commit()
+
+        self.destination.restore(path=self.destination.get_snapshot_path(manifest.get('number')))
+
+        state_driver = self.destination.contract_driver.driver
+        for i in range(10):
+            self.assertEqual(i, state_driver.get(f'con_test.balances:{i}'))
+        self.assertIsNone(state_driver.get('con_stale.value:x'))
+        self.assertEqual(manifest.get('hash'), state_driver.get(LATEST_BLOCK_HASH_KEY))
+        self.assertEqual(int(manifest.get('number')), state_driver.get(LATEST_BLOCK_HEIGHT_KEY))
+        self.assertEqual(manifest.get('number'), state_driver.get(VALIDATION_HEIGHT))
+
+        nonces = self.destination.nonce_storage
+        self.assertEqual(5, nonces.get_nonce(sender='sender', processor='processor'))
+        self.assertIsNone(nonces.get_pending_nonce(sender='sender', processor='processor'))
+        self.assertIsNone(nonces.get_nonce(sender='stale', processor='processor'))
+
+        block_storage = self.destination.block_storage
+        self.assertEqual(self.blocks[-1], block_storage.get_latest_block())
+        self.assertTrue(block_storage.has_genesis())
+        self.assertIsNone(block_storage.get_block(v=int(self.blocks[0].get('number'))))
+        self.assertTrue(block_storage.is_pruned(self.blocks[1].get('number')))
+        self.assertFalse(block_storage.is_pruned(self.blocks[-1].get('number')))
+
+        self.assertEqual(
+            ['a', 'b', 'c'],
+            block_storage.member_history.get(block_num=self.blocks[-1].get('number'))
+        )
+        self.assertTrue(block_storage.is_member_at_block_height(block_num=self.blocks[0].get('number'), vk='b'))
+
+    def test_METHOD_restore__starts_state_history_at_snapshot_block(self):
+        self.populate_source()
+        manifest = self.source.export()
+
+        self.destination.restore(path=self.destination.get_snapshot_path(manifest.get('number')))
+
+        block_storage = self.destination.block_storage
+        self.assertEqual(int(manifest.get('number')), block_storage.get_state_history_start())
+        self.assertEqual(7, block_storage.get_state_value_at(key='con_test.balances:7', block_num=manifest.get('number')))
+
+    def test_METHOD_restore__rejects_unexpected_snapshot_hash(self):
+        self.populate_source()
+        manifest = self.source.export()
+
+        with self.assertRaises(SnapshotError):
+            self.destination.restore(
+                path=self.destination.get_snapshot_path(manifest.get('number')),
+                expected_hash='0' * 64
+            )
+
+    def test_METHOD_restore__leaves_storage_alone_if_a_chunk_is_corrupt(self):
+        self.populate_source()
+        manifest = self.source.export()
+        path = self.source.get_snapshot_path(manifest.get('number'))
+
+        self.destination.contract_driver.driver.set('con_kept.value:x', 1)
+
+        blocks_chunk = [chunk for chunk in manifest.get('chunks') if chunk.get('section') == SECTION_BLOCKS][0]
+        with open(os.path.join(path, chunk_filename(blocks_chunk.get('index'))), 'ab') as f:
+            f.write(b'[]\n')
+
+        with self.assertRaises(SnapshotError):
+            self.destination.restore(path=path)
+
+        self.assertEqual(1, self.destination.contract_driver.driver.get('con_kept.value:x'))
+
+    def test_METHOD_verify__rejects_tampered_manifest(self):
+        self.populate_source()
+        manifest = self.source.export()
+        path = self.source.get_snapshot_path(manifest.get('number'))
+
+        manifest['number'] = '1'
+        with open(os.path.join(path, SNAPSHOT_MANIFEST_FILENAME), 'w') as f:
+            json.dump(manifest, f)
+
+        with self.assertRaises(SnapshotError):
+            self.source.verify(path=path)
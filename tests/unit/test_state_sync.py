@@ -0,0 +1,200 @@
+from unittest import TestCase
+
+from contracting.db.driver import ContractDriver, FSDriver
+
+from lamden.crypto.wallet import Wallet
+from lamden.nodes.hlc import HLC_Clock
+from lamden.nodes.state_sync import StateSyncHandler
+from lamden.snapshot import SnapshotHandler, SnapshotError
+from lamden.storage import BlockStorage, NonceStorage
+from tests.unit.helpers.mock_blocks import generate_blocks, GENESIS_BLOCK
+
+import asyncio
+import copy
+import os
+import shutil
+
+
+# MOCK NETWORK
+class Network:
+    def __init__(self):
+        self.peers = []
+
+    def get_all_connected_peers(self):
+        return self.peers
+
+    def add_peer(self, snapshot_handler: SnapshotHandler = None, corrupt: bool = False):
+        peer = MockPeer(snapshot_handler=snapshot_handler, corrupt=corrupt)
+        self.peers.append(peer)
+        return peer
+
+
+class MockPeer:
+    def __init__(self, snapshot_handler: SnapshotHandler = None, corrupt: bool = False):
+        self.snapshot_handler = snapshot_handler
+        self.corrupt = corrupt
+
+        self.wallet = Wallet()
+        self.server_vk = self.wallet.verifying_key
+
+        self.chunks_requested = []
+
+    async def get_snapshot_manifest(self):
+        manifest = None
+        if self.snapshot_handler is not None:
+            manifest = self.snapshot_handler.get_latest_manifest()
+
+        return {'response': 'get_snapshot_manifest', 'manifest': manifest, 'success': True}
+
+    async def get_snapshot_chunk(self, block_num: str, index: int):
+        self.chunks_requested.append(index)
+
+        chunk = self.snapshot_handler.read_chunk(block_num=block_num, index=index)
+        if chunk is not None and self.corrupt:
+            chunk = chunk + b'[]\n'
+
+        return {
+            'response': 'get_snapshot_chunk',
+            'block_num': block_num,
+            'index': index,
+            'chunk': chunk.decode() if chunk is not None else None,
+            'success': True
+        }
+
+
+class TestStateSyncHandler(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.test_dir = os.path.abspath('./.lamden')
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.wallet = Wallet()
+        self.mock_network = Network()
+
+        self.source = self.create_snapshot_handler(name='source', chunk_max_bytes=200)
+        self.local = self.create_snapshot_handler(name='local')
+
+        self.state_sync_handler = StateSyncHandler(
+            network=self.mock_network,
+            snapshot_handler=self.local,
+            max_parallel_requests=4
+        )
+
+    def tearDown(self):
+        try:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+        except RuntimeError:
+            pass
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def create_snapshot_handler(self, name: str, chunk_max_bytes: int = 4 * 1024 * 1024) -> SnapshotHandler:
+        root = os.path.join(self.test_dir, name)
+
+        block_storage = BlockStorage(root=os.path.join(root, 'storage'))
+        block_storage.member_history.set_secure(wallet=self.wallet)
+
+        return SnapshotHandler(
+            block_storage=block_storage,
+            contract_driver=ContractDriver(driver=FSDriver(root=os.path.join(root, 'state'))),
+            nonce_storage=NonceStorage(root=os.path.join(root, 'nonces')),
+            chunk_max_bytes=chunk_max_bytes
+        )
+
+    def export_source_snapshot(self) -> dict:
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )
+
+        self.source.block_storage.store_block(copy.deepcopy(GENESIS_BLOCK))
+        for block in blocks:
+            self.source.block_storage.store_block(copy.deepcopy(block))
+
+        for i in range(30):
+            self.source.contract_driver.driver.set(f'con_test.balances:{i}', i)
+
+        self.source.nonce_storage.set_nonce(sender='sender', processor='processor', value=3)
+        self.source.nonce_storage.commit()
+
+        return self.source.export()
+
+    def test_METHOD_run__returns_NONE_without_peers(self):
+        self.assertIsNone(self.loop.run_until_complete(self.state_sync_handler.run()))
+
+    def test_METHOD_run__restores_snapshot_agreed_by_majority(self):
+        manifest = self.export_source_snapshot()
+        self.assertGreater(len(manifest.get('chunks')), 3)
+
+        peers = [self.mock_network.add_peer(snapshot_handler=self.source) for _ in range(3)]
+        self.mock_network.add_peer()
+
+        res = self.loop.run_until_complete(self.state_sync_handler.run())
+
+        self.assertEqual(manifest.get('snapshot_hash'), res.get('snapshot_hash'))
+        self.assertEqual(29, self.local.contract_driver.driver.get('con_test.balances:29'))
+        self.assertEqual(3, self.local.nonce_storage.get_nonce(sender='sender', processor='processor'))
+        self.assertEqual(manifest.get('number'), self.local.block_storage.get_latest_block().get('number'))
+        self.assertEqual([manifest.get('number')], self.local.list_snapshots())
+
+        # Every chunk was fetched once and the work was spread over the peers.
+        requested = [index for peer in peers for index in peer.chunks_requested]
+        self.assertEqual(list(range(len(manifest.get('chunks')))), sorted(requested))
+        self.assertTrue(all(len(peer.chunks_requested) > 0 for peer in peers))
+
+    def test_METHOD_run__returns_NONE_if_no_majority(self):
+        self.export_source_snapshot()
+
+        self.mock_network.add_peer(snapshot_handler=self.source)
+        self.mock_network.add_peer()
+
+        self.assertIsNone(self.loop.run_until_complete(self.state_sync_handler.run()))
+        self.assertIsNone(self.local.block_storage.get_latest_block())
+
+    def test_METHOD_run__fetches_chunk_from_other_peer_if_one_is_corrupt(self):
+        manifest = self.export_source_snapshot()
+
+        self.mock_network.add_peer(snapshot_handler=self.source, corrupt=True)
+        self.mock_network.add_peer(snapshot_handler=self.source)
+
+        res = self.loop.run_until_complete(self.state_sync_handler.run())
+
+        self.assertEqual(manifest.get('snapshot_hash'), res.get('snapshot_hash'))
+        self.assertEqual(0, self.local.contract_driver.driver.get('con_test.balances:0'))
+
+    def test_METHOD_run__raises_if_no_peer_has_a_valid_chunk(self):
+        self.export_source_snapshot()
+
+        self.mock_network.add_peer(snapshot_handler=self.source, corrupt=True)
+        self.mock_network.add_peer(snapshot_handler=self.source, corrupt=True)
+
+        with self.assertRaises(SnapshotError):
+            self.loop.run_until_complete(self.state_sync_handler.run())
+
+        self.assertIsNone(self.local.block_storage.get_latest_block())
+
+    def test_METHOD_get_agreed_manifest__ignores_tampered_manifests(self):
+        manifest = self.export_source_snapshot()
+
+        peer = self.mock_network.add_peer(snapshot_handler=self.source)
+
+        async def get_tampered_manifest():
+            tampered = dict(manifest)
+            tampered['number'] = '1'
+            return {'manifest': tampered}
+
+        peer.get_snapshot_manifest = get_tampered_manifest
+
+        agreed, holders = self.loop.run_until_complete(
+            self.state_sync_handler.get_agreed_manifest(peers=self.mock_network.get_all_connected_peers())
+        )
+
+        self.assertIsNone(agreed)
+        self.assertEqual([], holders)
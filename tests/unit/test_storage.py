@@ -236,7 +236,7 @@ class TestStorage(TestCase):
 
         self.assertEqual(block, b)
 
-    def test_PRIVATE_METHOD_write_block__stores_hash_symlink(self):
+    def test_PRIVATE_METHOD_write_block__indexes_block_hash(self):
         block = {
             'hash': '78238403271a8dcd3c1031b144ace7dfdbe760108f2953b85d40c763fc79e4d4',
             'number': '1658163894967101696',
@@ -249,18 +249,11 @@ class TestStorage(TestCase):
 
         self.block_storage._BlockStorage__write_block(block)
 
-        alias_dir = self.block_storage.block_alias_driver.get_directory(
+        block_num = self.block_storage.block_hash_index.get(
             hash_str='78238403271a8dcd3c1031b144ace7dfdbe760108f2953b85d40c763fc79e4d4'
         )
 
-        alias_path = os.path.join(alias_dir, '78238403271a8dcd3c1031b144ace7dfdbe760108f2953b85d40c763fc79e4d4')
-
-        alias_link = os.readlink(alias_path)
-
-        with open(alias_link) as f:
-            ab = json.loads(f.read())
-
-        self.assertEqual(ab, block)
+        self.assertEqual(1658163894967101696, block_num)
 
 
     def test_PRIVATE_METHOD_write_txs__stores_transactions_by_hash_and_payload(self):
@@ -288,7 +281,7 @@ class TestStorage(TestCase):
 
         self.assertEqual(tx, t)
 
-    def test_METHOD_store_block__stores_block_and_aliases(self):
+    def test_METHOD_store_block__stores_block_and_hash_index(self):
 
         block = {
             'hash': '78238403271a8dcd3c1031b144ace7dfdbe760108f2953b85d40c763fc79e4d4',
@@ -328,19 +321,12 @@ class TestStorage(TestCase):
         block['processed'] = '5a5bbc6c0388b5f76d9da11b39ed4df8c47b9d4c231c72bb09b1b5e689699e77'
         self.assertEqual(b, block)
 
-        # Check Alias File
-        alias_dir = self.block_storage.block_alias_driver.get_directory(
+        # Check Hash Index
+        block_num = self.block_storage.block_hash_index.get(
             hash_str='78238403271a8dcd3c1031b144ace7dfdbe760108f2953b85d40c763fc79e4d4'
         )
 
-        alias_path = os.path.join(alias_dir, '78238403271a8dcd3c1031b144ace7dfdbe760108f2953b85d40c763fc79e4d4')
-
-        alias_link = os.readlink(alias_path)
-
-        with open(alias_link) as f:
-            ab = json.loads(f.read())
-
-        self.assertEqual(ab, block)
+        self.assertEqual(1658163894967101696, block_num)
 
 
     def test_METHOD_get_block__returns_block_by_block_number(self):
@@ -474,7 +460,7 @@ class TestStorage(TestCase):
     def test_get_block_v_none_returns_none(self):
         self.assertIsNone(self.block_storage.get_block())
 
-    def test_METHOD_remove_block__removes_block_and_block_alias_and_tx(self):
+    def test_METHOD_remove_block__removes_block_and_block_hash_and_tx(self):
         block_number = '1658163894967101696'
         block_hash = '78238403271a8dcd3c1031b144ace7dfdbe760108f2953b85d40c763fc79e4d4'
         tx_hash = '5a5bbc6c0388b5f76d9da11b39ed4df8c47b9d4c231c72bb09b1b5e689699e77'
@@ -490,12 +476,11 @@ class TestStorage(TestCase):
         self.block_storage.store_block(deepcopy(block))
 
         block_path = self.block_storage.block_driver.get_file_path(block_num=block_number.zfill(64))
-        block_alias_path = os.path.join(self.block_storage.block_alias_driver.get_directory(hash_str=block_hash), block_hash)
         tx_path = os.path.join(self.block_storage.tx_driver.get_directory(hash_str=tx_hash), tx_hash)
 
         # Assert the block was saved properly so we can validate they were removed later
         self.assertTrue(os.path.exists(block_path))
-        self.assertTrue(os.path.exists(block_alias_path))
+        self.assertEqual(int(block_number), self.block_storage.block_hash_index.get(hash_str=block_hash))
         self.assertTrue(os.path.exists(tx_path))
 
         # Remove block
@@ -503,6 +488,6 @@ class TestStorage(TestCase):
 
         # Assert files are gone
         self.assertFalse(os.path.exists(block_path))
-        self.assertFalse(os.path.exists(block_alias_path))
+        self.assertIsNone(self.block_storage.block_hash_index.get(hash_str=block_hash))
         self.assertFalse(os.path.exists(tx_path))
 
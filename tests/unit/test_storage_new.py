@@ -1,12 +1,18 @@
 from lamden.nodes.hlc import HLC_Clock
 from lamden.utils import hlc
-from lamden.storage import BlockStorage, NonceStorage, FSBlockDriver, FSHashStorageDriver, FSMemberHistory
+from lamden.storage import BlockStorage, NonceStorage, FSBlockDriver, FSHashStorageDriver, FSMemberHistory, MAX_BLOCK, \
+    SegmentBlockDriver, SegmentHashStorageDriver, SQLiteBlockDriver, SQLiteHashStorageDriver, BLOCK_DRIVER_ENV, \
+    create_block_drivers, FSStateHistory, StorageCodec, COMPRESSION_ENV, FSBlockHashIndex, \
+    TX_INDEXES_ENV, NONCE_FILENAME, PENDING_NONCE_FILENAME, NONCE_VERSION_MAX_SIZE, get_storage_roots
+from contracting import config
+from contracting.db.driver import FSDriver
 from tests.unit.helpers.mock_blocks import generate_blocks, GENESIS_BLOCK
-from unittest import TestCase
+from unittest import TestCase, mock
 from lamden.crypto.wallet import Wallet
+from lamden.crypto.canonical import create_hash_512
 
 from pathlib import Path
-import os, copy, time, random, shutil, json
+import os, copy, time, random, shutil, json, threading
 
 
 class TestNonce(TestCase):
@@ -136,6 +142,82 @@ class TestNonce(TestCase):
 
         self.assertEqual(n, 2)
 
+    def test_set_nonce_is_not_written_until_commit(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+
+        other = NonceStorage(root='/tmp')
+        self.assertIsNone(other.get_nonce(sender='test', processor='test2'))
+
+        self.nonces.commit()
+
+        self.assertEqual(other.get_nonce(sender='test', processor='test2'), 2)
+        self.assertEqual(self.nonces.pending_writes, {})
+
+    def test_iter_nonces__only_reads_committed_nonces(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.nonces.commit()
+        self.nonces.set_nonce(sender='test', processor='test3', value=4)
+
+        self.assertEqual([('test', 'test2', 2)], list(self.nonces.iter_nonces()))
+        self.assertEqual(1, len(self.nonces.pending_writes))
+
+    def test_get_nonce_is_served_from_cache(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.nonces.commit()
+
+        self.nonces.driver.set(NONCE_FILENAME + config.INDEX_SEPARATOR + 'test' + config.DELIMITER + 'test2', 5)
+
+        self.assertEqual(self.nonces.get_nonce(sender='test', processor='test2'), 2)
+
+    def test_commit_from_other_instance_drops_cached_values(self):
+        other = NonceStorage(root='/tmp')
+        self.assertIsNone(self.nonces.get_nonce(sender='test', processor='test2'))
+
+        other.set_nonce(sender='test', processor='test2', value=4)
+        other.commit()
+
+        self.assertEqual(self.nonces.get_nonce(sender='test', processor='test2'), 4)
+
+    def test_flush_clears_cache_and_pending_writes(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.nonces.set_pending_nonce(sender='test', processor='test2', value=3)
+
+        self.nonces.flush()
+        self.nonces.commit()
+
+        self.assertIsNone(self.nonces.get_nonce(sender='test', processor='test2'))
+        self.assertIsNone(self.nonces.get_pending_nonce(sender='test', processor='test2'))
+        self.assertIsNone(NonceStorage(root='/tmp').get_nonce(sender='test', processor='test2'))
+
+    def test_flush_pending_only_clears_pending_nonces(self):
+        other = NonceStorage(root='/tmp')
+        other.get_pending_nonce(sender='test', processor='test2')
+
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.nonces.set_pending_nonce(sender='test', processor='test2', value=3)
+        self.nonces.commit()
+
+        self.assertEqual(other.get_pending_nonce(sender='test', processor='test2'), 3)
+
+        self.nonces.flush_pending()
+
+        self.assertEqual(self.nonces.get_nonce(sender='test', processor='test2'), 2)
+        self.assertIsNone(self.nonces.get_pending_nonce(sender='test', processor='test2'))
+        self.assertIsNone(other.get_pending_nonce(sender='test', processor='test2'))
+
+    def test_version_file_is_replaced_when_it_grows_too_large(self):
+        with open(self.nonces.version_path, 'ab') as f:
+            f.write(b'.' * NONCE_VERSION_MAX_SIZE)
+
+        other = NonceStorage(root='/tmp')
+        self.assertIsNone(other.get_nonce(sender='test', processor='test2'))
+
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.nonces.commit()
+
+        self.assertEqual(os.path.getsize(self.nonces.version_path), 1)
+        self.assertEqual(other.get_nonce(sender='test', processor='test2'), 2)
+
 SAMPLE_BLOCK = {
     'number': 1,
     'hash': 'sample_block_hash',
@@ -143,6 +225,7 @@ SAMPLE_BLOCK = {
     'processed': {'hash': 'sample_tx_hash'}
 }
 
+
 class TestBlockStorage(TestCase):
     def setUp(self):
         self.temp_storage_dir = os.path.abspath("./.lamden")
@@ -164,7 +247,7 @@ class TestBlockStorage(TestCase):
 
     def test_creates_directories(self):
         self.assertTrue(self.bs.blocks_dir.is_dir())
-        self.assertTrue(self.bs.blocks_alias_dir.is_dir())
+        self.assertFalse(self.bs.blocks_alias_dir.is_dir())
         self.assertTrue(self.bs.txs_dir.is_dir())
 
 
@@ -174,7 +257,7 @@ class TestBlockStorage(TestCase):
 
         self.assertEqual(len(os.listdir(self.bs.blocks_dir)), 0)
         self.assertEqual(len(os.listdir(self.bs.txs_dir)), 0)
-        self.assertEqual(len(os.listdir(self.bs.blocks_alias_dir)), 0)
+        self.assertFalse(self.bs.block_hash_index.exists())
 
     def test_METHOD_block_exists__returns_TRUE_if_block_exists(self):
         prev_block_hlc = self.hlc_clock.get_new_hlc_timestamp()
@@ -311,6 +394,70 @@ class TestBlockStorage(TestCase):
         later_blocks = self.bs.get_later_blocks(hlc_timestamp=consensus_hlc)
 
         self.assertEqual(3, len(later_blocks))
+        self.assertEqual([b.get('number') for b in blocks_2], [b.get('number') for b in later_blocks])
+
+    def test_METHOD_iter_blocks__yields_every_block_in_order_across_batches(self):
+        self.bs.store_block(copy.deepcopy(GENESIS_BLOCK))
+        blocks = generate_blocks(
+            number_of_blocks=7,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        iterated = list(self.bs.iter_blocks(readahead=3))
+
+        self.assertEqual(['0'] + [b.get('number') for b in blocks], [b.get('number') for b in iterated])
+        self.assertDictEqual(blocks[3].get('processed'), iterated[4].get('processed'))
+
+    def test_METHOD_iter_blocks__reverse_with_inclusive_range(self):
+        blocks = generate_blocks(
+            number_of_blocks=6,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        iterated = list(self.bs.iter_blocks(
+            start=blocks[1].get('number'),
+            end=blocks[4].get('number'),
+            reverse=True,
+            readahead=2
+        ))
+
+        self.assertEqual([b.get('number') for b in reversed(blocks[1:5])], [b.get('number') for b in iterated])
+
+    def test_METHOD_iter_blocks__fill_tx_false_leaves_tx_hash(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        iterated = list(self.bs.iter_blocks(fill_tx=False))
+
+        self.assertEqual(blocks[0]['processed']['hash'], iterated[0].get('processed'))
+
+    def test_METHOD_iter_blocks__does_not_fill_block_cache(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        list(self.bs.iter_blocks())
+
+        self.assertEqual(0, self.bs.get_block_cache_stats().get('entries'))
 
     def test_get_previous_block__by_block_number(self):
         blocks = generate_blocks(
@@ -445,183 +592,897 @@ class TestBlockStorage(TestCase):
         latest_block_hash = self.bs.get_latest_block_hash()
         self.assertEqual(expected_result, latest_block_hash)
 
-    def test_METHOD_get_latest_members_list__returns_member_data(self):
-        members_list = [Wallet().verifying_key, Wallet().verifying_key, Wallet().verifying_key]
-        block_num = '123'
-
-        self.bs.member_history.set(
-            block_num=block_num,
-            members_list=members_list
+    def test_METHOD_get_latest_block_hash__served_from_tip_cache_after_store(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
         )
 
-        data = self.bs.get_latest_members_list()
+        self.bs.get_latest_block_hash()
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
 
-        self.assertEqual(block_num, data.get('number'))
-        self.assertEqual(members_list, data.get('members_list'))
+        def fail(*args, **kwargs):
+            raise AssertionError('tip should come from the cache')
 
+        self.bs.block_driver.find_previous_block = fail
 
-class TestFSBlockDriver(TestCase):
-    def setUp(self):
-        self.test_dir = './.lamden'
-        self.blocks_dir = 'blocks'
-        self.blocks_path = os.path.join(self.test_dir, self.blocks_dir)
+        self.assertEqual(blocks[-1].get('hash'), self.bs.get_latest_block_hash())
+        self.assertEqual(int(blocks[-1].get('number')), self.bs.get_latest_block_number())
 
-        self.create_directories()
+    def test_METHOD_get_latest_block__tip_cache_follows_remove_block(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-        self.block_driver = FSBlockDriver(root=self.blocks_path)
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
 
-    def tearDown(self):
-        pass
+        self.assertEqual(blocks[-1].get('hash'), self.bs.get_latest_block_hash())
 
-    def create_directories(self):
-        if os.path.exists(Path(self.test_dir)):
-            shutil.rmtree(Path(self.test_dir))
+        self.bs.remove_block(v=blocks[-1].get('number'))
 
-        os.makedirs(Path(self.test_dir))
-        os.makedirs(self.blocks_path)
+        self.assertEqual(blocks[-2].get('hash'), self.bs.get_latest_block_hash())
 
-    def create_block_num(self):
-        zeros_pad_pre = '0' * 36
-        zeros_pad_post = '0' * 9
-        rand_int = random.randint(int(time.time()) - 2 * 365 * 24 * 60 * 60, int(time.time()))
+    def test_METHOD_get_latest_block__tip_cache_follows_restored_block_with_new_hash(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-        return f'{rand_int}{zeros_pad_post}'
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+        self.bs.get_latest_block_hash()
 
-    def create_block_filename(self):
-        zeros_pad_pre = '0' * 36
-        zeros_pad_post = '0' * 9
-        rand_int = random.randint(int(time.time()) - 2 * 365 * 24 * 60 * 60, int(time.time()))
+        reorged_block = copy.deepcopy(blocks[-1])
+        reorged_block['hash'] = 'a' * 64
+        self.bs.store_block(reorged_block)
 
-        return f'{zeros_pad_pre}{rand_int}{zeros_pad_post}'
+        self.assertEqual('a' * 64, self.bs.get_latest_block_hash())
 
-    def create_block_files(self, num_files):
-        for i in range(num_files):
-            file_path = os.path.join(self.test_dir, 'blocks', f"{self.create_block_filename()}")
-            open(file_path, 'w').close()
+    def test_METHOD_get_latest_block__tip_cache_sees_blocks_stored_by_other_instances(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-    def create_block_list(self, amount):
-        block_list = set()
+        self.bs.store_block(copy.deepcopy(blocks[0]))
+        self.assertEqual(blocks[0].get('hash'), self.bs.get_latest_block_hash())
 
-        while len(block_list) < amount:
-            block_list.add(self.create_block_num())
+        writer = BlockStorage(root=str(self.temp_storage_dir))
+        writer.store_block(copy.deepcopy(blocks[1]))
 
-        return [{'number': block_num} for block_num in block_list]
+        self.assertEqual(blocks[1].get('hash'), self.bs.get_latest_block_hash())
 
-    def __is_block_file(self, filename):
-        try:
-            return os.path.isfile(os.path.join(self.blocks_path, filename)) and isinstance(int(filename), int)
-        except:
-            return False
+    def test_METHOD_get_latest_block__mutating_result_does_not_change_cache(self):
+        blocks = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        self.bs.store_block(copy.deepcopy(blocks[0]))
 
-    def test_INSTANCE_total_files__keeps_track_of_total_files(self):
-        block_list = self.create_block_list(amount=5)
-        self.block_driver.write_blocks(block_list=block_list)
+        latest_block = self.bs.get_latest_block()
+        latest_block['hash'] = 'b' * 64
+        latest_block['processed']['hash'] = 'c' * 64
 
-        self.assertEqual(5, self.block_driver.total_files)
+        self.assertDictEqual(blocks[0], self.bs.get_latest_block())
 
-        block_list = self.create_block_list(amount=5)
-        self.block_driver.write_blocks(block_list=block_list)
+    def test_METHOD_get_block__second_read_is_a_cache_hit(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-        self.assertEqual(10, self.block_driver.total_files)
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
 
-    def test_INSTANCE_initialized__sets_initialized_on_startup(self):
-        self.assertTrue(self.block_driver.initialized)
+        self.bs.get_block(v=int(blocks[0].get('number')))
+        self.bs.get_block(v=int(blocks[0].get('number')))
+        self.bs.get_block(v=blocks[0].get('hash'))
 
-    def test_METHOD_get_file_path__can_retrieve_the_file_path_of_a_block(self):
-        block_num = self.create_block_num()
-        self.block_driver.write_block({
-            'number': block_num
-        })
+        stats = self.bs.get_block_cache_stats()
+        self.assertEqual(2, stats.get('hits'))
+        self.assertEqual(1, stats.get('entries'))
 
-        block_number_filled = str(block_num).zfill(64)
-        file_path = self.block_driver.get_file_path(block_num=block_number_filled)
+    def test_METHOD_get_block__cached_block_can_be_mutated_by_caller(self):
+        blocks = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        self.bs.store_block(copy.deepcopy(blocks[0]))
 
-        # should not error
-        f = open(file_path)
+        block = self.bs.get_block(v=blocks[0].get('hash'))
+        block['processed']['state'] = []
+        block['hash'] = 'a' * 64
 
-        self.assertIsNotNone(f)
+        self.assertDictEqual(blocks[0], self.bs.get_block(v=blocks[0].get('hash')))
 
-    def test_METHOD_write_block__can_write_a_block(self):
-        block_num = self.create_block_num()
-        self.block_driver.write_block({
-            'number': block_num
-        })
+    def test_METHOD_get_block__cache_invalidated_by_store_and_remove(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-        block = self.block_driver.find_block(block_num=block_num)
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
 
-        self.assertEqual(int(block.get('number')), int(block_num))
+        block_num = int(blocks[1].get('number'))
+        self.bs.get_block(v=block_num)
 
-    def test_METHOD_get_block__can_return_a_block(self):
-        block_num = self.create_block_num()
-        self.block_driver.write_block({
-            'number': block_num
-        })
+        reorged_block = copy.deepcopy(blocks[1])
+        reorged_block['hash'] = 'a' * 64
+        self.bs.store_block(reorged_block)
 
-        block = self.block_driver.find_block(block_num=block_num)
+        self.assertEqual('a' * 64, self.bs.get_block(v=block_num).get('hash'))
 
-        self.assertIsNotNone(block)
+        self.bs.remove_block(v=block_num)
 
-    def test_METHOD_get_blocks__can_return_multiple_blocks(self):
-        amount_of_blocks = 100
-        block_list = self.create_block_list(amount=amount_of_blocks)
+        self.assertIsNone(self.bs.get_block(v=block_num))
+        self.assertIsNone(self.bs.get_block(v='a' * 64))
 
-        self.block_driver.write_blocks(block_list)
+    def test_METHOD_get_block__cache_dropped_when_another_instance_writes(self):
+        blocks = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        self.bs.store_block(copy.deepcopy(blocks[0]))
+        block_num = int(blocks[0].get('number'))
+        self.bs.get_block(v=block_num)
 
-        random_block_numbers = [block.get('number') for block in random.sample(block_list, 50)]
+        reorged_block = copy.deepcopy(blocks[0])
+        reorged_block['hash'] = 'a' * 64
+        writer = BlockStorage(root=str(self.temp_storage_dir))
+        writer.store_block(reorged_block)
 
-        blocks = self.block_driver.find_blocks(block_list=random_block_numbers)
-        self.assertEqual(len(blocks), len(random_block_numbers))
+        self.assertEqual('a' * 64, self.bs.get_block(v=block_num).get('hash'))
 
+    def test_INSTANCE_block_cache__stays_within_max_bytes(self):
+        self.bs = BlockStorage(root=str(self.temp_storage_dir), block_cache_max_bytes=5_000)
 
-        for block_num in random_block_numbers:
-            list_of_found_block_numbers = [block.get('number') for block in blocks]
-            self.assertTrue(block_num in list_of_found_block_numbers)
+        blocks = generate_blocks(
+            number_of_blocks=10,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-    def test_METHOD_find_next_block__returns_next_block(self):
-        amount_of_blocks = 2000
-        block_list = self.create_block_list(amount=amount_of_blocks)
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+            self.bs.get_block(v=int(block.get('number')))
 
-        self.block_driver.write_blocks(block_list)
+        stats = self.bs.get_block_cache_stats()
+        self.assertLessEqual(stats.get('size'), 5_000)
+        self.assertGreater(stats.get('evictions'), 0)
 
-        block_list.sort(key=lambda x: int(x.get('number')))
+    def test_METHOD_get_state_value_at__and_get_previous_state_value__read_the_history_index(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-        for index, block in enumerate(block_list):
-            if index + 1 == amount_of_blocks:
-                break
+        for i, block in enumerate(blocks):
+            block['processed']['state'] = [{'key': 'currency.balances:jeff', 'value': {'__fixed__': f'{i}.5'}}]
+            self.bs.store_block(copy.deepcopy(block))
 
-            next_block = self.block_driver.find_next_block(block_num=block_list[index].get('number'))
+        key = 'currency.balances:jeff'
+        block_nums = [b.get('number') for b in blocks]
 
-            expected_block_number = block_list[index + 1].get('number')
+        self.assertEqual({'__fixed__': '1.5'}, self.bs.get_state_value_at(key=key, block_num=block_nums[1]))
+        self.assertEqual({'__fixed__': '0.5'}, self.bs.get_previous_state_value(key=key, block_num=block_nums[1]))
+        self.assertIsNone(self.bs.get_previous_state_value(key=key, block_num=block_nums[0]))
 
-            self.assertEqual(int(expected_block_number), int(next_block.get('number')))
+        self.bs.remove_block(v=block_nums[2])
 
-    def test_METHOD_find_next_blocks__returns_next_x_blocks(self):
-        amount_of_blocks = 2000
-        block_list = self.create_block_list(amount=amount_of_blocks)
+        self.assertEqual({'__fixed__': '1.5'}, self.bs.get_state_value_at(key=key, block_num=MAX_BLOCK))
 
-        self.block_driver.write_blocks(block_list)
+    def test_METHOD_store_block__saves_one_state_change_per_key_with_the_last_value(self):
+        block = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )[0]
+        key = 'currency.balances:jeff'
+        block['processed']['state'] = [{'key': key, 'value': 1}]
+        block['rewards'] = [{'key': key, 'value': 2}]
 
-        block_list.sort(key=lambda x: int(x.get('number')))
+        history = self.bs.state_history
+        with mock.patch.object(history, 'save_state_change', wraps=history.save_state_change) as save_state_change:
+            self.bs.store_block(copy.deepcopy(block))
 
-        for index, block in enumerate(block_list):
-            if index + 1 == amount_of_blocks:
-                break
+        self.assertEqual(1, len([call for call in save_state_change.call_args_list if call.kwargs['key'] == key]))
+        self.assertEqual(2, self.bs.get_state_value_at(key=key, block_num=MAX_BLOCK))
 
-            next_block = self.block_driver.find_next_block(block_num=block_list[index].get('number'))
+    def test_METHOD_get_state_value_at__reads_value_from_block_for_migrated_history(self):
+        blocks = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        self.bs.store_block(copy.deepcopy(blocks[0]))
 
-            expected_block_number = block_list[index + 1].get('number')
+        self.bs.state_history.flush()
+        self.bs.state_history.write_file(hash_str=create_hash_512(string='lets'), data=[int(blocks[0].get('number'))])
 
-            self.assertEqual(int(expected_block_number), int(next_block.get('number')))
+        self.assertEqual('go', self.bs.get_state_value_at(key='lets', block_num=MAX_BLOCK))
 
+    def test_METHOD_train_compression_dictionary__new_files_use_it_and_old_ones_still_read(self):
+        blocks = generate_blocks(
+            number_of_blocks=6,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
 
-    def test_METHOD_find_previous_block__returns_previous_block(self):
-        amount_of_blocks = 2000
-        block_list = self.create_block_list(amount=amount_of_blocks)
+        os.environ[COMPRESSION_ENV] = 'zlib'
+        try:
+            self.bs = BlockStorage(root=str(self.temp_storage_dir))
 
-        self.block_driver.write_blocks(block_list)
+            for block in blocks[:3]:
+                self.bs.store_block(copy.deepcopy(block))
 
-        block_list.sort(key=lambda x: int(x.get('number')))
-        reversed_block_list = list(reversed(block_list))
+            dictionary_id = self.bs.train_compression_dictionary()
+
+            for block in blocks[3:]:
+                self.bs.store_block(copy.deepcopy(block))
+
+            reader = BlockStorage(root=str(self.temp_storage_dir))
+        finally:
+            del os.environ[COMPRESSION_ENV]
+
+        file_path = self.bs.block_driver.get_file_path(str(blocks[-1].get('number')).zfill(64))
+        with open(file_path, 'rb') as f:
+            _, _, file_dictionary_id = StorageCodec.HEADER.unpack_from(f.read())
+
+        self.assertEqual(dictionary_id, file_dictionary_id)
+        for block in blocks:
+            self.assertDictEqual(block.get('processed'), reader.get_block(v=int(block.get('number'))).get('processed'))
+
+    def test_METHOD_rebuild_state_history__indexes_existing_blocks(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        self.bs.state_history.flush()
+        self.assertIsNone(self.bs.get_state_value_at(key='lets', block_num=MAX_BLOCK))
+
+        self.bs.rebuild_state_history()
+
+        self.assertEqual(int(blocks[1].get('number')), self.bs.state_history.get_previous_change(key='lets', block_num=MAX_BLOCK))
+        self.assertEqual('go', self.bs.get_state_value_at(key='lets', block_num=MAX_BLOCK))
+
+    def test_METHOD_get_state_history_start__unknown_for_blocks_stored_before_it_was_kept(self):
+        self.assertEqual(0, self.bs.get_state_history_start())
+
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        os.remove(self.bs.state_history_start_path)
+        self.assertIsNone(BlockStorage(root=str(self.temp_storage_dir)).get_state_history_start())
+
+        self.assertEqual(0, self.bs.rebuild_state_history())
+        self.assertEqual(0, self.bs.get_state_history_start())
+
+    def test_METHOD_rebuild_state_history__starts_after_pruned_height(self):
+        self.bs.set_pruned_height(block_num=100)
+
+        self.assertEqual(101, self.bs.rebuild_state_history())
+        self.assertEqual(101, self.bs.get_state_history_start())
+
+    def store_blocks_days_apart(self, days_back: int, amount: int = 4) -> list:
+        blocks = generate_blocks(
+            number_of_blocks=amount,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        # The first half of the blocks are moved back in time so they fall in a cold day bucket.
+        for block in blocks[:amount // 2]:
+            block['number'] = str(int(block.get('number')) - days_back * self.bs.block_driver.day)
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        return blocks
+
+    def test_METHOD_compact_cold_blocks__packed_blocks_and_txs_read_transparently(self):
+        blocks = self.store_blocks_days_apart(days_back=40)
+
+        self.assertEqual(1, self.bs.compact_cold_blocks(keep_days=30))
+
+        for block in blocks[:2]:
+            self.assertFalse(os.path.exists(self.bs.block_driver.get_file_path(str(block.get('number')).zfill(64))))
+            self.assertIsNone(self.bs.tx_driver.read_raw(hash_str=block['processed'].get('hash')))
+        for block in blocks[2:]:
+            self.assertTrue(os.path.exists(self.bs.block_driver.get_file_path(str(block.get('number')).zfill(64))))
+
+        self.assertEqual(1, len(self.bs.block_driver.list_packs()))
+        self.assertEqual([], self.bs.get_cold_buckets(keep_days=30))
+
+        reader = BlockStorage(root=str(self.temp_storage_dir))
+        self.assertEqual(4, reader.total_blocks())
+        for block in blocks:
+            self.assertDictEqual(block, reader.get_block(v=int(block.get('number'))))
+            self.assertDictEqual(block, reader.get_block(v=block.get('hash')))
+            self.assertTrue(reader.block_exists(block_num=block.get('number')))
+
+        self.assertDictEqual(blocks[0]['processed'], reader.get_tx(blocks[0]['processed'].get('hash')))
+        self.assertEqual(blocks, list(reader.iter_blocks()))
+        self.assertDictEqual(blocks[1], reader.get_next_block(v=int(blocks[0].get('number'))))
+        self.assertDictEqual(blocks[1], reader.get_previous_block(v=int(blocks[2].get('number'))))
+
+    def test_METHOD_compact_cold_blocks__leaves_recent_blocks_alone(self):
+        self.store_blocks_days_apart(days_back=10)
+
+        self.assertEqual(0, self.bs.compact_cold_blocks(keep_days=30))
+        self.assertEqual([], self.bs.block_driver.list_packs())
+
+    def test_METHOD_expand_packs__restores_loose_blocks_and_txs(self):
+        blocks = self.store_blocks_days_apart(days_back=40)
+        self.bs.compact_cold_blocks(keep_days=30)
+
+        self.assertEqual(2, self.bs.expand_packs())
+
+        self.assertEqual([], self.bs.block_driver.list_packs())
+        for block in blocks:
+            self.assertTrue(os.path.exists(self.bs.block_driver.get_file_path(str(block.get('number')).zfill(64))))
+            self.assertDictEqual(block['processed'], self.bs.tx_driver.get_file(hash_str=block['processed'].get('hash')))
+            self.assertDictEqual(block, self.bs.get_block(v=block.get('hash')))
+
+    def test_METHOD_remove_block__removes_a_packed_block(self):
+        blocks = self.store_blocks_days_apart(days_back=40)
+        self.bs.compact_cold_blocks(keep_days=30)
+
+        self.bs.remove_block(v=blocks[0].get('number'))
+
+        self.assertFalse(self.bs.block_exists(block_num=blocks[0].get('number')))
+        self.assertIsNone(self.bs.get_block(v=blocks[0].get('hash')))
+        self.assertIsNone(self.bs.get_tx(blocks[0]['processed'].get('hash')))
+        self.assertDictEqual(blocks[1], self.bs.get_block(v=int(blocks[1].get('number'))))
+
+        self.bs.remove_block(v=blocks[1].get('number'))
+
+        self.assertEqual([], self.bs.block_driver.list_packs())
+        self.assertEqual(2, BlockStorage(root=str(self.temp_storage_dir)).total_blocks())
+
+    def test_METHOD_store_block__loose_block_wins_over_packed_copy(self):
+        blocks = self.store_blocks_days_apart(days_back=40)
+        self.bs.compact_cold_blocks(keep_days=30)
+
+        block = copy.deepcopy(blocks[0])
+        block['hash'] = 'b' * 64
+        self.bs.store_block(copy.deepcopy(block))
+
+        reader = BlockStorage(root=str(self.temp_storage_dir))
+        self.assertEqual('b' * 64, reader.get_block(v=int(block.get('number'))).get('hash'))
+        self.assertEqual(4, reader.total_blocks())
+
+    def test_METHOD_get_block__by_hash_ignores_hash_of_replaced_block(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        replacement = copy.deepcopy(blocks[1])
+        replacement['hash'] = 'b' * 64
+        self.bs.store_block(copy.deepcopy(replacement))
+
+        self.assertIsNone(self.bs.get_block(v=blocks[1].get('hash')))
+        self.assertDictEqual(replacement, self.bs.get_block(v='b' * 64))
+        self.assertDictEqual(blocks[0], self.bs.get_block(v=blocks[0].get('hash')))
+
+    def test_METHOD_migrate_block_aliases__builds_block_hash_index_for_storage_with_alias_tree(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        self.bs.block_hash_index.flush()
+        os.makedirs(self.bs.blocks_alias_dir)
+
+        # Opening the storage leaves it as it is, only the migration builds the index.
+        bs = BlockStorage(root=str(self.temp_storage_dir))
+        self.assertTrue(bs.needs_block_hash_index())
+        self.assertTrue(bs.blocks_alias_dir.is_dir())
+
+        bs.migrate_block_aliases()
+
+        self.assertFalse(bs.needs_block_hash_index())
+        self.assertTrue(bs.block_hash_index.exists())
+        self.assertFalse(bs.blocks_alias_dir.is_dir())
+        for block in blocks:
+            self.assertDictEqual(block, bs.get_block(v=block.get('hash')))
+
+    def store_indexed_blocks(self, bs: BlockStorage) -> list:
+        blocks = generate_blocks(
+            number_of_blocks=4,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        calls = [('jeff', 'transfer', 0), ('stu', 'transfer', 1), ('jeff', 'approve', 0), ('jeff', 'transfer', 1)]
+        for block, (sender, function, status) in zip(blocks, calls):
+            block['processed']['transaction']['payload'] = {'sender': sender, 'contract': 'currency', 'function': function}
+            block['processed']['status'] = status
+            bs.store_block(copy.deepcopy(block))
+
+        return blocks
+
+    def test_METHOD_get_txs_by_sender__pages_newest_first(self):
+        bs = BlockStorage(root=str(self.temp_storage_dir), tx_indexes=True)
+        blocks = self.store_indexed_blocks(bs=bs)
+
+        expected = [{'number': int(b.get('number')), 'hash': b['processed'].get('hash')} for b in (blocks[3], blocks[2], blocks[0])]
+
+        self.assertEqual(expected, bs.get_txs_by_sender(sender='jeff'))
+        self.assertEqual(expected[:2], bs.get_txs_by_sender(sender='jeff', limit=2))
+        self.assertEqual(expected[2:], bs.get_txs_by_sender(sender='jeff', limit=2, before=expected[1].get('number')))
+        self.assertEqual([], bs.get_txs_by_sender(sender='nobody'))
+
+    def test_METHOD_get_txs_by_contract__and_get_failed_txs(self):
+        bs = BlockStorage(root=str(self.temp_storage_dir), tx_indexes=True)
+        blocks = self.store_indexed_blocks(bs=bs)
+
+        self.assertEqual(4, len(bs.get_txs_by_contract(contract='currency')))
+        self.assertEqual(
+            [int(blocks[3].get('number')), int(blocks[1].get('number')), int(blocks[0].get('number'))],
+            [tx.get('number') for tx in bs.get_txs_by_contract(contract='currency', function='transfer')]
+        )
+        self.assertEqual(
+            [blocks[3]['processed'].get('hash'), blocks[1]['processed'].get('hash')],
+            [tx.get('hash') for tx in bs.get_failed_txs()]
+        )
+
+    def test_METHOD_remove_block__rolls_back_tx_indexes(self):
+        bs = BlockStorage(root=str(self.temp_storage_dir), tx_indexes=True)
+        blocks = self.store_indexed_blocks(bs=bs)
+
+        bs.remove_block(v=blocks[3].get('number'))
+        bs.remove_block(v=blocks[1].get('number'))
+
+        self.assertEqual([], bs.get_failed_txs())
+        self.assertEqual(
+            [int(blocks[2].get('number')), int(blocks[0].get('number'))],
+            [tx.get('number') for tx in bs.get_txs_by_sender(sender='jeff')]
+        )
+
+    def test_METHOD_rebuild_tx_indexes__indexes_blocks_stored_without_them(self):
+        blocks = self.store_indexed_blocks(bs=self.bs)
+        self.assertIsNone(self.bs.tx_index)
+
+        os.environ[TX_INDEXES_ENV] = 'true'
+        try:
+            bs = BlockStorage(root=str(self.temp_storage_dir))
+        finally:
+            del os.environ[TX_INDEXES_ENV]
+
+        self.assertEqual([], bs.get_failed_txs())
+
+        bs.rebuild_tx_indexes()
+
+        self.assertEqual(2, len(bs.get_failed_txs()))
+        self.assertEqual(int(blocks[1].get('number')), bs.get_txs_by_sender(sender='stu')[0].get('number'))
+
+    def store_chain(self, amount: int = 6) -> list:
+        blocks = generate_blocks(
+            number_of_blocks=amount,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        self.bs.store_block(copy.deepcopy(GENESIS_BLOCK))
+        for i, block in enumerate(blocks):
+            block['processed']['state'] = [{'key': 'currency.balances:jeff', 'value': i}]
+            self.bs.store_block(copy.deepcopy(block))
+
+        return blocks
+
+    def test_METHOD_prune_blocks__keeps_latest_blocks_genesis_and_state_history(self):
+        blocks = self.store_chain()
+
+        self.assertEqual(3, self.bs.prune_blocks(keep_blocks=3))
+
+        for block in blocks[:3]:
+            self.assertIsNone(self.bs.get_block(v=int(block.get('number'))))
+            self.assertIsNone(self.bs.get_block(v=block.get('hash')))
+            self.assertIsNone(self.bs.get_tx(block['processed'].get('hash')))
+            self.assertTrue(self.bs.is_pruned(block.get('number')))
+        for block in blocks[3:]:
+            self.assertDictEqual(block, self.bs.get_block(v=int(block.get('number'))))
+            self.assertFalse(self.bs.is_pruned(block.get('number')))
+
+        self.assertTrue(self.bs.has_genesis())
+        self.assertFalse(self.bs.is_pruned(0))
+        self.assertEqual(4, self.bs.total_blocks())
+        self.assertDictEqual(blocks[-1], self.bs.get_latest_block())
+        self.assertEqual(1, self.bs.get_state_value_at(key='currency.balances:jeff', block_num=blocks[1].get('number')))
+
+        reader = BlockStorage(root=str(self.temp_storage_dir))
+        self.assertEqual(int(blocks[2].get('number')), reader.get_pruned_height())
+        self.assertEqual(0, reader.prune_blocks(keep_blocks=3))
+
+    def test_METHOD_prune_blocks__can_drop_state_history(self):
+        blocks = self.store_chain()
+
+        self.bs.prune_blocks(keep_blocks=3, keep_state_history=False)
+
+        self.assertEqual(self.bs.get_pruned_height() + 1, self.bs.get_state_history_start())
+        self.assertIsNone(self.bs.get_state_value_at(key='currency.balances:jeff', block_num=blocks[2].get('number')))
+        self.assertEqual(3, self.bs.get_state_value_at(key='currency.balances:jeff', block_num=blocks[3].get('number')))
+
+    def test_METHOD_prune_blocks__drops_state_history_of_a_key_in_one_rewrite(self):
+        blocks = self.store_chain()
+        history = self.bs.state_history
+
+        with mock.patch.object(history, 'remove_changes', wraps=history.remove_changes) as remove_changes:
+            self.bs.prune_blocks(keep_blocks=3, keep_state_history=False)
+
+        jeff_hash = create_hash_512(string='currency.balances:jeff')
+        self.assertEqual(
+            [mock.call(hash_str=jeff_hash, block_nums={int(block.get('number')) for block in blocks[:3]})],
+            [call for call in remove_changes.call_args_list if call.kwargs['hash_str'] == jeff_hash]
+        )
+        self.assertEqual([int(block.get('number')) for block in blocks[3:]], history.get_file(hash_str=jeff_hash))
+
+    def test_METHOD_prune_blocks__removes_up_to_limit_per_call_and_always_keeps_tip(self):
+        blocks = self.store_chain(amount=4)
+
+        self.assertEqual(1, self.bs.prune_blocks(keep_blocks=0, limit=1))
+        self.assertEqual(int(blocks[0].get('number')), self.bs.get_pruned_height())
+        self.assertEqual(2, self.bs.prune_blocks(keep_blocks=0))
+
+        self.assertEqual(int(blocks[2].get('number')), self.bs.get_pruned_height())
+        self.assertDictEqual(blocks[-1], self.bs.get_latest_block())
+        self.assertTrue(self.bs.has_genesis())
+
+    def test_METHOD_prune_blocks__by_age_removes_packed_blocks(self):
+        blocks = self.store_blocks_days_apart(days_back=40)
+        self.bs.compact_cold_blocks(keep_days=30)
+
+        self.assertEqual(0, self.bs.prune_blocks(keep_days=50))
+        # The block count keeps more than the age, so nothing goes either.
+        self.assertEqual(0, self.bs.prune_blocks(keep_blocks=4, keep_days=30))
+
+        self.assertEqual(2, self.bs.prune_blocks(keep_days=30))
+
+        self.assertEqual([], self.bs.block_driver.list_packs())
+        self.assertIsNone(self.bs.get_block(v=blocks[0].get('hash')))
+        self.assertEqual(blocks[2:], list(BlockStorage(root=str(self.temp_storage_dir)).iter_blocks()))
+
+    def test_METHOD_prune_blocks__removes_tx_index_entries(self):
+        bs = BlockStorage(root=str(self.temp_storage_dir), tx_indexes=True)
+        blocks = self.store_indexed_blocks(bs=bs)
+
+        bs.prune_blocks(keep_blocks=2)
+
+        self.assertEqual(
+            [int(blocks[3].get('number')), int(blocks[2].get('number'))],
+            [tx.get('number') for tx in bs.get_txs_by_sender(sender='jeff')]
+        )
+        self.assertEqual([], bs.get_txs_by_sender(sender='stu'))
+
+    def test_METHOD_flush__clears_pruned_height(self):
+        self.bs.set_pruned_height(block_num=100)
+        self.assertTrue(self.bs.is_pruned(100))
+
+        self.bs.flush()
+
+        self.assertEqual(0, self.bs.get_pruned_height())
+
+    def test_FUNCTION_get_storage_roots__parses_store_paths(self):
+        self.assertEqual({}, get_storage_roots(''))
+        self.assertEqual(
+            {'blocks': Path('/nvme/blocks'), 'cold_blocks': Path('/hdd/blocks')},
+            get_storage_roots(' blocks=/nvme/blocks, cold_blocks=/hdd/blocks')
+        )
+
+        with self.assertRaises(ValueError):
+            get_storage_roots('alias=/hdd/alias')
+        with self.assertRaises(ValueError):
+            get_storage_roots('blocks=')
+
+    def test_INSTANCE_roots__place_stores_in_their_own_directories(self):
+        roots = {
+            store: Path(self.temp_storage_dir).joinpath('volumes', store)
+            for store in ('blocks', 'txs', 'member_history', 'state_history', 'tx_index')
+        }
+        bs = BlockStorage(root=str(self.temp_storage_dir), roots=roots, tx_indexes=True)
+        blocks = self.store_indexed_blocks(bs=bs)
+
+        self.assertTrue(os.path.exists(bs.block_driver.get_file_path(str(blocks[0].get('number')).zfill(64))))
+        self.assertTrue(bs.block_driver.get_file_path('1').startswith(str(roots['blocks'])))
+        self.assertIsNotNone(FSHashStorageDriver(root=roots['txs']).get_file(hash_str=blocks[0]['processed'].get('hash')))
+        self.assertGreater(len(os.listdir(roots['state_history'])), 0)
+        self.assertGreater(len(os.listdir(roots['tx_index'])), 0)
+        self.assertEqual([], [name for name in os.listdir(self.bs.blocks_dir) if not name.startswith('.')])
+
+        reader = BlockStorage(root=str(self.temp_storage_dir), roots=roots, tx_indexes=True)
+        self.assertEqual(blocks, list(reader.iter_blocks()))
+        self.assertEqual(3, len(reader.get_txs_by_sender(sender='jeff')))
+
+    def create_tiered_storage(self) -> BlockStorage:
+        self.cold_dir = Path(self.temp_storage_dir).joinpath('cold')
+        return BlockStorage(root=str(self.temp_storage_dir), roots={'cold_blocks': self.cold_dir})
+
+    def test_METHOD_move_to_cold_tier__moves_old_buckets_and_lookups_follow(self):
+        self.bs = self.create_tiered_storage()
+        stale_reader = BlockStorage(root=str(self.temp_storage_dir), roots={'cold_blocks': self.cold_dir})
+        blocks = self.store_blocks_days_apart(days_back=40)
+
+        self.assertEqual(0, self.bs.move_to_cold_tier(keep_days=50))
+        self.assertEqual(1, self.bs.move_to_cold_tier(keep_days=30))
+        self.assertEqual(0, self.bs.move_to_cold_tier(keep_days=30))
+
+        for block in blocks[:2]:
+            file_path = self.bs.block_driver.get_file_path(str(block.get('number')).zfill(64))
+            self.assertTrue(file_path.startswith(str(self.cold_dir)))
+            self.assertTrue(os.path.exists(file_path))
+        for block in blocks[2:]:
+            self.assertFalse(self.bs.block_driver.get_file_path(str(block.get('number')).zfill(64)).startswith(str(self.cold_dir)))
+        self.assertEqual(1, len(self.bs.block_driver.list_buckets(cold=False)))
+
+        for reader in (stale_reader, BlockStorage(root=str(self.temp_storage_dir), roots={'cold_blocks': self.cold_dir})):
+            self.assertDictEqual(blocks[0], reader.get_block(v=int(blocks[0].get('number'))))
+            self.assertDictEqual(blocks[1], reader.get_block(v=blocks[1].get('hash')))
+            self.assertEqual(blocks, list(reader.iter_blocks()))
+
+    def test_METHOD_move_to_cold_tier__cold_buckets_take_writes_and_packs(self):
+        self.bs = self.create_tiered_storage()
+        blocks = self.store_blocks_days_apart(days_back=40)
+        self.bs.move_to_cold_tier(keep_days=30)
+
+        block = copy.deepcopy(blocks[0])
+        block['number'] = str(int(block.get('number')) + 1)
+        block['hash'] = 'b' * 64
+        self.bs.store_block(copy.deepcopy(block))
+        self.assertTrue(self.bs.block_driver.get_file_path(str(block.get('number')).zfill(64)).startswith(str(self.cold_dir)))
+
+        self.assertEqual(1, self.bs.compact_cold_blocks(keep_days=30))
+        self.assertTrue(self.bs.block_driver.list_packs()[0].startswith(str(self.cold_dir)))
+        self.assertDictEqual(blocks[0], self.bs.get_block(v=blocks[0].get('hash')))
+        self.assertEqual(5, BlockStorage(root=str(self.temp_storage_dir), roots={'cold_blocks': self.cold_dir}).total_blocks())
+
+    def test_METHOD_move_to_cold_tier__writes_to_a_moving_bucket_wait_and_land_in_the_new_tier(self):
+        self.bs = self.create_tiered_storage()
+        writer = BlockStorage(root=str(self.temp_storage_dir), roots={'cold_blocks': self.cold_dir})
+        blocks = self.store_blocks_days_apart(days_back=40)
+
+        block = copy.deepcopy(blocks[0])
+        block['number'] = str(int(block.get('number')) + 1)
+        block['hash'] = 'b' * 64
+        write_thread = threading.Thread(target=writer.store_block, args=(copy.deepcopy(block),))
+
+        copy_to_tier = self.bs.block_driver._copy_to_tier
+
+        def copy_while_writing(**kwargs):
+            copy_to_tier(**kwargs)
+            write_thread.start()
+            write_thread.join(timeout=0.2)
+            self.assertTrue(write_thread.is_alive())
+
+        with mock.patch.object(self.bs.block_driver, '_copy_to_tier', side_effect=copy_while_writing):
+            self.assertEqual(1, self.bs.move_to_cold_tier(keep_days=30))
+
+        write_thread.join()
+
+        self.assertTrue(writer.block_driver.get_file_path(str(block.get('number')).zfill(64)).startswith(str(self.cold_dir)))
+        self.assertDictEqual(block, self.bs.get_block(v=int(block.get('number'))))
+
+    def test_METHOD_move_to_hot_tier__moves_every_bucket_back(self):
+        self.bs = self.create_tiered_storage()
+        blocks = self.store_blocks_days_apart(days_back=40)
+        self.bs.move_to_cold_tier(keep_days=30)
+
+        self.assertEqual(1, self.bs.move_to_hot_tier())
+
+        self.assertEqual([], self.bs.block_driver.list_buckets(cold=True))
+        self.assertEqual(blocks, list(BlockStorage(root=str(self.temp_storage_dir), roots={}).iter_blocks()))
+
+    def test_METHOD_move_to_cold_tier__does_nothing_without_cold_root(self):
+        self.store_blocks_days_apart(days_back=40)
+
+        self.assertEqual(0, self.bs.move_to_cold_tier(keep_days=30))
+
+    def test_METHOD_get_latest_members_list__returns_member_data(self):
+        members_list = [Wallet().verifying_key, Wallet().verifying_key, Wallet().verifying_key]
+        block_num = '123'
+
+        self.bs.member_history.set(
+            block_num=block_num,
+            members_list=members_list
+        )
+
+        data = self.bs.get_latest_members_list()
+
+        self.assertEqual(block_num, data.get('number'))
+        self.assertEqual(members_list, data.get('members_list'))
+
+
+class TestFSBlockDriver(TestCase):
+    def setUp(self):
+        self.test_dir = './.lamden'
+        self.blocks_dir = 'blocks'
+        self.blocks_path = os.path.join(self.test_dir, self.blocks_dir)
+
+        self.create_directories()
+
+        self.block_driver = FSBlockDriver(root=self.blocks_path)
+
+    def tearDown(self):
+        pass
+
+    def create_directories(self):
+        if os.path.exists(Path(self.test_dir)):
+            shutil.rmtree(Path(self.test_dir))
+
+        os.makedirs(Path(self.test_dir))
+        os.makedirs(self.blocks_path)
+
+    def create_block_num(self):
+        zeros_pad_pre = '0' * 36
+        zeros_pad_post = '0' * 9
+        rand_int = random.randint(int(time.time()) - 2 * 365 * 24 * 60 * 60, int(time.time()))
+
+        return f'{rand_int}{zeros_pad_post}'
+
+    def create_block_filename(self):
+        zeros_pad_pre = '0' * 36
+        zeros_pad_post = '0' * 9
+        rand_int = random.randint(int(time.time()) - 2 * 365 * 24 * 60 * 60, int(time.time()))
+
+        return f'{zeros_pad_pre}{rand_int}{zeros_pad_post}'
+
+    def create_block_files(self, num_files):
+        for i in range(num_files):
+            file_path = os.path.join(self.test_dir, 'blocks', f"{self.create_block_filename()}")
+            open(file_path, 'w').close()
+
+    def create_block_list(self, amount):
+        block_list = set()
+
+        while len(block_list) < amount:
+            block_list.add(self.create_block_num())
+
+        return [{'number': block_num} for block_num in block_list]
+
+    def __is_block_file(self, filename):
+        try:
+            return os.path.isfile(os.path.join(self.blocks_path, filename)) and isinstance(int(filename), int)
+        except:
+            return False
+
+    def test_INSTANCE_total_files__keeps_track_of_total_files(self):
+        block_list = self.create_block_list(amount=5)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.assertEqual(5, self.block_driver.total_files)
+
+        block_list = self.create_block_list(amount=5)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.assertEqual(10, self.block_driver.total_files)
+
+    def test_INSTANCE_initialized__sets_initialized_on_startup(self):
+        self.assertTrue(self.block_driver.initialized)
+
+    def test_METHOD_get_file_path__can_retrieve_the_file_path_of_a_block(self):
+        block_num = self.create_block_num()
+        self.block_driver.write_block({
+            'number': block_num
+        })
+
+        block_number_filled = str(block_num).zfill(64)
+        file_path = self.block_driver.get_file_path(block_num=block_number_filled)
+
+        # should not error
+        f = open(file_path)
+
+        self.assertIsNotNone(f)
+
+    def test_METHOD_write_block__can_write_a_block(self):
+        block_num = self.create_block_num()
+        self.block_driver.write_block({
+            'number': block_num
+        })
+
+        block = self.block_driver.find_block(block_num=block_num)
+
+        self.assertEqual(int(block.get('number')), int(block_num))
+
+    def test_METHOD_get_block__can_return_a_block(self):
+        block_num = self.create_block_num()
+        self.block_driver.write_block({
+            'number': block_num
+        })
+
+        block = self.block_driver.find_block(block_num=block_num)
+
+        self.assertIsNotNone(block)
+
+    def test_METHOD_get_blocks__can_return_multiple_blocks(self):
+        amount_of_blocks = 100
+        block_list = self.create_block_list(amount=amount_of_blocks)
+
+        self.block_driver.write_blocks(block_list)
+
+        random_block_numbers = [block.get('number') for block in random.sample(block_list, 50)]
+
+        blocks = self.block_driver.find_blocks(block_list=random_block_numbers)
+        self.assertEqual(len(blocks), len(random_block_numbers))
+
+
+        for block_num in random_block_numbers:
+            list_of_found_block_numbers = [block.get('number') for block in blocks]
+            self.assertTrue(block_num in list_of_found_block_numbers)
+
+    def test_METHOD_find_next_block__returns_next_block(self):
+        amount_of_blocks = 2000
+        block_list = self.create_block_list(amount=amount_of_blocks)
+
+        self.block_driver.write_blocks(block_list)
+
+        block_list.sort(key=lambda x: int(x.get('number')))
+
+        for index, block in enumerate(block_list):
+            if index + 1 == amount_of_blocks:
+                break
+
+            next_block = self.block_driver.find_next_block(block_num=block_list[index].get('number'))
+
+            expected_block_number = block_list[index + 1].get('number')
+
+            self.assertEqual(int(expected_block_number), int(next_block.get('number')))
+
+    def test_METHOD_find_next_blocks__returns_next_x_blocks(self):
+        amount_of_blocks = 2000
+        block_list = self.create_block_list(amount=amount_of_blocks)
+
+        self.block_driver.write_blocks(block_list)
+
+        block_list.sort(key=lambda x: int(x.get('number')))
+
+        for index, block in enumerate(block_list):
+            if index + 1 == amount_of_blocks:
+                break
+
+            next_block = self.block_driver.find_next_block(block_num=block_list[index].get('number'))
+
+            expected_block_number = block_list[index + 1].get('number')
+
+            self.assertEqual(int(expected_block_number), int(next_block.get('number')))
+
+
+    def test_METHOD_find_previous_block__returns_previous_block(self):
+        amount_of_blocks = 2000
+        block_list = self.create_block_list(amount=amount_of_blocks)
+
+        self.block_driver.write_blocks(block_list)
+
+        block_list.sort(key=lambda x: int(x.get('number')))
+        reversed_block_list = list(reversed(block_list))
 
         start_time = time.time()
         for index, block in enumerate(reversed_block_list):
@@ -770,6 +1631,153 @@ class TestFSBlockDriver(TestCase):
 
         self.assertGreater(new_legacy_time, new_total_time)
 
+    def test_METHOD_find_next_block__lookup_time_stays_flat_as_chain_grows(self):
+        lookups = 200
+        timings = []
+
+        for amount_of_blocks in [100, 2000]:
+            self.create_directories()
+            self.block_driver = FSBlockDriver(root=self.blocks_path)
+
+            block_list = self.create_block_list(amount=amount_of_blocks)
+            self.block_driver.write_blocks(block_list)
+            block_list.sort(key=lambda x: int(x.get('number')))
+
+            start_time = time.time()
+            for index in range(lookups):
+                block_num = block_list[index % (amount_of_blocks - 1)].get('number')
+                next_block = self.block_driver.find_next_block(block_num=block_num)
+                self.assertIsNotNone(next_block)
+            timings.append((time.time() - start_time) / lookups)
+
+        print({'blocks_100_sec_per_lookup': timings[0], 'blocks_2000_sec_per_lookup': timings[1]})
+
+        self.assertLess(timings[1], timings[0] * 5)
+
+    def test_INSTANCE_block_index__built_on_startup_from_existing_files(self):
+        block_list = self.create_block_list(amount=5)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        block_driver = FSBlockDriver(root=self.blocks_path)
+
+        expected = sorted(int(block.get('number')) for block in block_list)
+        self.assertEqual(expected, block_driver.block_index)
+        self.assertEqual(5, block_driver.total_files)
+
+    def test_INSTANCE_block_index__follows_writes_and_deletes_from_other_instances(self):
+        reader = FSBlockDriver(root=self.blocks_path)
+
+        block_list = self.create_block_list(amount=3)
+        block_list.sort(key=lambda x: int(x.get('number')))
+        self.block_driver.write_blocks(block_list=block_list)
+
+        latest_block = reader.find_previous_block(block_num=MAX_BLOCK)
+        self.assertEqual(block_list[-1].get('number'), latest_block.get('number'))
+
+        self.block_driver.delete_block(block_num=block_list[-1].get('number'))
+
+        latest_block = reader.find_previous_block(block_num=MAX_BLOCK)
+        self.assertEqual(block_list[-2].get('number'), latest_block.get('number'))
+        self.assertEqual(2, reader.total_files)
+
+    def test_INSTANCE_block_index__rebuilt_if_root_is_removed(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.create_directories()
+
+        self.assertIsNone(self.block_driver.find_next_block(block_num=-1))
+        self.assertEqual(0, self.block_driver.total_files)
+
+    def test_METHOD_find_block__reads_compressed_and_plain_files_side_by_side(self):
+        block_list = self.create_block_list(amount=4)
+        for block in block_list:
+            block['processed'] = 'a' * 64
+
+        for i, compression in enumerate(['none', 'zlib', 'lzma', 'zlib']):
+            driver = FSBlockDriver(root=self.blocks_path, codec=StorageCodec(compression=compression))
+            driver.write_block(block=block_list[i])
+
+        file_path = self.block_driver.get_file_path(str(block_list[2].get('number')).zfill(64))
+        with open(file_path, 'rb') as f:
+            self.assertTrue(f.read().startswith(StorageCodec.MAGIC))
+
+        for block in block_list:
+            self.assertDictEqual(block, self.block_driver.find_block(block_num=block.get('number')))
+
+    def test_INSTANCE_block_index__loaded_from_manifest_without_scanning(self):
+        block_list = self.create_block_list(amount=5)
+        self.block_driver.write_blocks(block_list=block_list)
+        self.block_driver.delete_block(block_num=block_list[0].get('number'))
+
+        block_driver = FSBlockDriver(root=self.blocks_path)
+
+        self.assertFalse(block_driver.index_scanned)
+        self.assertEqual(self.block_driver.block_index, block_driver.block_index)
+        self.assertEqual(4, block_driver.total_files)
+
+    def test_INSTANCE_block_index__rescanned_if_manifest_missing(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        os.remove(os.path.join(self.blocks_path, FSBlockDriver.MANIFEST_FILENAME))
+
+        block_driver = FSBlockDriver(root=self.blocks_path)
+
+        self.assertTrue(block_driver.index_scanned)
+        self.assertEqual(3, block_driver.total_files)
+
+    def test_INSTANCE_block_index__rescanned_if_last_written_block_does_not_match_checksum(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        with open(self.block_driver.get_file_path(str(block_list[-1].get('number')).zfill(64)), 'w') as f:
+            f.write('{"number": "')
+
+        block_driver = FSBlockDriver(root=self.blocks_path)
+
+        self.assertTrue(block_driver.index_scanned)
+        self.assertEqual(3, block_driver.total_files)
+
+    def test_INSTANCE_block_index__rescanned_if_max_block_removed_outside_the_driver(self):
+        block_list = self.create_block_list(amount=3)
+        block_list.sort(key=lambda x: int(x.get('number')))
+        self.block_driver.write_blocks(block_list=block_list)
+        self.block_driver.write_block(block=block_list[0])
+
+        os.remove(self.block_driver.get_file_path(block_num=str(block_list[-1].get('number')).zfill(64)))
+
+        block_driver = FSBlockDriver(root=self.blocks_path)
+
+        self.assertTrue(block_driver.index_scanned)
+        self.assertEqual(2, block_driver.total_files)
+
+    def test_INSTANCE_block_index__journal_compacted_into_snapshot(self):
+        self.block_driver.INDEX_JOURNAL_MAX_SIZE = 100
+
+        block_list = self.create_block_list(amount=10)
+        for block in block_list:
+            self.block_driver.write_block(block=block)
+
+        self.assertLess(os.path.getsize(self.block_driver.index_journal_path), 200)
+
+        block_driver = FSBlockDriver(root=self.blocks_path)
+
+        self.assertFalse(block_driver.index_scanned)
+        self.assertEqual(10, block_driver.total_files)
+
+    def test_METHOD_find_previous_block__skips_blocks_removed_outside_the_driver(self):
+        block_list = self.create_block_list(amount=3)
+        block_list.sort(key=lambda x: int(x.get('number')))
+        self.block_driver.write_blocks(block_list=block_list)
+
+        os.remove(self.block_driver.get_file_path(block_num=str(block_list[-1].get('number')).zfill(64)))
+
+        latest_block = self.block_driver.find_previous_block(block_num=MAX_BLOCK)
+
+        self.assertEqual(block_list[-2].get('number'), latest_block.get('number'))
+        self.assertEqual(2, self.block_driver.total_files)
+
     def test_METOHD__traverse_up__returns_None_if_no_next_dir_at_root(self):
         amount_of_blocks = 1
         block_list = self.create_block_list(amount=amount_of_blocks)
@@ -894,11 +1902,8 @@ class TestFSHashStorageDriver(TestCase):
         self.test_dir = './.lamden'
         self.txs_dir = 'txs'
         self.txs_path = os.path.join(self.test_dir, self.txs_dir)
-        self.alias_dir = 'block_alias'
-        self.alias_path = os.path.join(self.test_dir, self.alias_dir)
 
         self.transactions_driver = FSHashStorageDriver(root=self.txs_path)
-        self.alias_driver = FSHashStorageDriver(root=self.alias_path)
 
         self.create_directories()
 
@@ -911,7 +1916,13 @@ class TestFSHashStorageDriver(TestCase):
 
         os.makedirs(Path(self.test_dir))
         os.makedirs(self.txs_path)
-        os.makedirs(self.alias_path)
+
+    def test_METHOD_get_file__reads_compressed_file(self):
+        compressed_driver = FSHashStorageDriver(root=self.txs_path, codec=StorageCodec(compression='zlib'))
+        tx = {'hash': 'a' * 64, 'state': [{'key': 'currency.balances:jeff', 'value': 1}]}
+        compressed_driver.write_file(hash_str=tx['hash'], data=tx)
+
+        self.assertDictEqual(tx, self.transactions_driver.get_file(hash_str=tx['hash']))
 
     def test_METHOD_write_file__can_write_file_to_proper_directory(self):
         tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
@@ -962,85 +1973,9 @@ class TestFSHashStorageDriver(TestCase):
             data = tx_data
         )
 
-        tx = self.transactions_driver.get_file(tx_hash)
-
-        self.assertIsNotNone(tx)
-
-    def test_METHOD_write_symlink__can_write_a_symlink(self):
-        tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
-        alias_hash = 'fcf68695ed53d23939d5f82198cc61d7fbf20837f69c16b963f1dc9e0162a5c2'
-
-        self.transactions_driver.write_file(
-            hash_str=tx_hash,
-            data={}
-        )
-
-        tx_path = os.path.join(self.transactions_driver.get_directory(hash_str=tx_hash), tx_hash)
-
-        self.alias_driver.write_symlink(
-            hash_str=alias_hash,
-            link_to=tx_path
-        )
-
-        alias_path = os.path.join(self.alias_driver.get_directory(hash_str=alias_hash), alias_hash)
-        self.assertTrue(os.path.islink(alias_path))
-
-
-    def test_METHOD_get_file__can_retrieve_a_file_from_link(self):
-        tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
-        alias_hash = 'fcf68695ed53d23939d5f82198cc61d7fbf20837f69c16b963f1dc9e0162a5c2'
-
-        self.transactions_driver.write_file(hash_str=tx_hash, data={})
-        tx_path = os.path.join(self.transactions_driver.get_directory(hash_str=tx_hash), tx_hash)
-
-        self.alias_driver.write_symlink(hash_str=alias_hash, link_to=tx_path)
-
-        tx_file = self.alias_driver.get_file(hash_str=alias_hash)
-
-        self.assertIsNotNone(tx_file)
-
-    def test_METHOD_is_syslink_valid__True(self):
-        tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
-        alias_hash = 'fcf68695ed53d23939d5f82198cc61d7fbf20837f69c16b963f1dc9e0162a5c2'
-
-        self.transactions_driver.write_file(hash_str=tx_hash, data={})
-        tx_path = os.path.join(self.transactions_driver.get_directory(hash_str=tx_hash), tx_hash)
-
-        self.alias_driver.write_symlink(hash_str=alias_hash, link_to=tx_path)
-
-        valid = self.alias_driver.is_symlink_valid(hash_str=alias_hash)
-
-        self.assertTrue(valid)
-
-    def test_METHOD_is_syslink_valid__False(self):
-        tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
-        alias_hash = 'fcf68695ed53d23939d5f82198cc61d7fbf20837f69c16b963f1dc9e0162a5c2'
-
-        tx_path = os.path.join(self.transactions_driver.get_directory(hash_str=tx_hash), tx_hash)
-
-        self.alias_driver.write_symlink(hash_str=alias_hash, link_to=tx_path)
-
-        valid = self.alias_driver.is_symlink_valid(hash_str=alias_hash)
-
-        self.assertFalse(valid)
-
-    def test_METHOD_remove_syslink(self):
-        tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
-        alias_hash = 'fcf68695ed53d23939d5f82198cc61d7fbf20837f69c16b963f1dc9e0162a5c2'
-
-        self.transactions_driver.write_file(hash_str=tx_hash, data={})
-        tx_path = os.path.join(self.transactions_driver.get_directory(hash_str=tx_hash), tx_hash)
-
-        self.alias_driver.write_symlink(hash_str=alias_hash, link_to=tx_path)
-
-        self.alias_driver.remove_symlink(hash_str=alias_hash)
-        link_dir = os.path.join(self.alias_driver.get_directory(hash_str=alias_hash), alias_hash)
-
-        self.assertFalse(os.path.exists(link_dir))
+        tx = self.transactions_driver.get_file(tx_hash)
 
-    def test_METHOD_remove_syslink__returns_if_not_exists(self):
-        alias_hash = 'fcf68695ed53d23939d5f82198cc61d7fbf20837f69c16b963f1dc9e0162a5c2'
-        self.alias_driver.remove_symlink(hash_str=alias_hash)
+        self.assertIsNotNone(tx)
 
     def test_PRIVATE_METHOD_remove_empty_dirs_to_root(self):
         tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
@@ -1059,6 +1994,62 @@ class TestFSHashStorageDriver(TestCase):
         # root still exists
         self.assertTrue(os.path.exists(check_dir))
 
+class TestFSBlockHashIndex(TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath('./.lamden')
+        self.index_path = os.path.join(self.test_dir, 'block_hash_index')
+
+        if os.path.isdir(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.index = FSBlockHashIndex(path=self.index_path)
+
+    def tearDown(self):
+        if os.path.isdir(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_METHOD_get__returns_None_without_table(self):
+        self.assertIsNone(self.index.get(hash_str='a' * 64))
+        self.assertFalse(self.index.exists())
+
+    def test_METHOD_put__then_get_and_remove(self):
+        self.index.put(hash_str='a' * 64, block_num=0)
+        self.index.put(hash_str='b' * 64, block_num=123)
+        self.index.put(hash_str='b' * 64, block_num=456)
+
+        self.assertEqual(0, self.index.get(hash_str='a' * 64))
+        self.assertEqual(456, self.index.get(hash_str='b' * 64))
+
+        self.index.remove(hash_str='a' * 64)
+
+        self.assertIsNone(self.index.get(hash_str='a' * 64))
+        self.assertEqual(456, self.index.get(hash_str='b' * 64))
+
+    def test_METHOD_put__grows_table_and_other_readers_follow(self):
+        self.index.INITIAL_SLOTS = 8
+        reader = FSBlockHashIndex(path=self.index_path)
+
+        hashes = [create_hash_512(string=str(i))[:64] for i in range(100)]
+        self.index.put(hash_str=hashes[0], block_num=0)
+        self.assertEqual(0, reader.get(hash_str=hashes[0]))
+
+        for i, h in enumerate(hashes):
+            self.index.put(hash_str=h, block_num=i)
+
+        self.assertGreater(self.index.slots, 100)
+        for i, h in enumerate(hashes):
+            self.assertEqual(i, reader.get(hash_str=h))
+
+    def test_METHOD_rebuild__replaces_entries(self):
+        self.index.put(hash_str='a' * 64, block_num=1)
+        self.index.rebuild(entries=[('b' * 64, 2), ('c' * 64, 3)])
+
+        self.assertIsNone(self.index.get(hash_str='a' * 64))
+        self.assertEqual(2, self.index.get(hash_str='b' * 64))
+        self.assertEqual(3, self.index.get(hash_str='c' * 64))
+
+
 class TestFSMemberHistory(TestCase):
     def setUp(self):
         self.test_dir = './.lamden'
@@ -1152,6 +2143,61 @@ class TestFSMemberHistory(TestCase):
 
         self.assertFalse(self.member_history.verify_member(block_num=int(block_num) + 1, vk=test_member))
 
+    def test_METHOD_get_members__returns_frozenset_of_interval_in_effect(self):
+        first_list = [Wallet().verifying_key, Wallet().verifying_key]
+        second_list = first_list + [Wallet().verifying_key]
+
+        self.member_history.set(block_num='100', members_list=first_list)
+        self.member_history.set(block_num='200', members_list=second_list)
+
+        self.assertEqual(frozenset(), self.member_history.get_members(block_num='100'))
+        self.assertEqual(frozenset(first_list), self.member_history.get_members(block_num='101'))
+        self.assertEqual(frozenset(first_list), self.member_history.get_members(block_num='200'))
+        self.assertEqual(frozenset(second_list), self.member_history.get_members(block_num='201'))
+
+    def test_METHOD_verify_member__verifies_each_signature_once(self):
+        members = [Wallet().verifying_key for _ in range(3)]
+        for block_num in ['100', '200', '300']:
+            self.member_history.set(block_num=block_num, members_list=members)
+
+        calls = []
+        verify_signature = self.member_history.verify_signature
+
+        def counting_verify_signature(data, vk=None):
+            calls.append(data.get('number'))
+            return verify_signature(data=data, vk=vk)
+
+        self.member_history.verify_signature = counting_verify_signature
+
+        for block_num in range(101, 1000):
+            self.assertTrue(self.member_history.verify_member(block_num=block_num, vk=members[0]))
+
+        self.assertEqual(3, len(calls))
+
+        # A reload after another process wrote does not verify the existing entries again.
+        FSMemberHistory(root=self.member_history_path, wallet=self.wallet).set(block_num='400', members_list=members)
+        self.assertTrue(self.member_history.verify_member(block_num=401, vk=members[0]))
+
+        self.assertEqual(4, len(calls))
+
+    def test_METHOD_get__picks_up_entries_written_by_another_instance(self):
+        members = [Wallet().verifying_key]
+        self.assertEqual([], self.member_history.get(block_num='101'))
+
+        FSMemberHistory(root=self.member_history_path, wallet=self.wallet).set(block_num='100', members_list=members)
+
+        self.assertEqual(members, self.member_history.get(block_num='101'))
+
+    def test_METHOD_set__replaces_loaded_interval(self):
+        first_list = [Wallet().verifying_key]
+        second_list = [Wallet().verifying_key]
+
+        self.member_history.set(block_num='100', members_list=first_list)
+        self.assertEqual(first_list, self.member_history.get(block_num='101'))
+
+        self.member_history.set(block_num='100', members_list=second_list)
+        self.assertEqual(second_list, self.member_history.get(block_num='101'))
+
     def test_METHOD_set_secure__sets_wallet(self):
         member_history = FSMemberHistory(root=self.member_history_path)
 
@@ -1186,4 +2232,578 @@ class TestFSMemberHistory(TestCase):
         self.assertTrue(self.member_history.has_history())
 
     def test_METHOD_has_history__returns_TRUE_if_HAS_history(self):
-        self.assertFalse(self.member_history.has_history())
\ No newline at end of file
+        self.assertFalse(self.member_history.has_history())
+
+class TestFSStateHistory(TestCase):
+    def setUp(self):
+        self.test_dir = './.lamden'
+        self.state_history_path = os.path.join(self.test_dir, 'state_history')
+
+        if os.path.exists(Path(self.test_dir)):
+            shutil.rmtree(Path(self.test_dir))
+
+        self.state_history = FSStateHistory(root=self.state_history_path)
+        self.key = 'currency.balances:jeff'
+
+    def test_METHOD_get_previous_change__returns_latest_change_before_block(self):
+        for block_num in ['100', '200', '300']:
+            self.state_history.save_state_change(key=self.key, block_num=block_num)
+
+        self.assertEqual(200, self.state_history.get_previous_change(key=self.key, block_num='300'))
+        self.assertEqual(300, self.state_history.get_previous_change(key=self.key, block_num='301'))
+        self.assertIsNone(self.state_history.get_previous_change(key=self.key, block_num='100'))
+        self.assertIsNone(self.state_history.get_previous_change(key='currency.balances:stu', block_num='301'))
+
+    def test_METHOD_save_state_change__appends_and_handles_out_of_order_and_repeated_changes(self):
+        for block_num in ['100', '300', '200', '300']:
+            self.state_history.save_state_change(key=self.key, block_num=block_num)
+
+        hash_str = create_hash_512(string=self.key)
+        self.assertEqual([100, 200, 300], self.state_history.get_file(hash_str=hash_str))
+        self.assertEqual(3 * FSStateHistory.HISTORY_RECORD.size, os.path.getsize(self.state_history._history_path(hash_str)))
+
+    def test_METHOD_find_change__returns_value_recorded_with_change(self):
+        self.state_history.save_state_change(key=self.key, block_num='100', value={'__fixed__': '1.0'})
+        self.state_history.save_state_change(key=self.key, block_num='200', value=None)
+
+        self.assertEqual((100, True, {'__fixed__': '1.0'}), self.state_history.find_change(key=self.key, block_num='200'))
+        self.assertEqual((200, True, None), self.state_history.find_change(key=self.key, block_num='200', inclusive=True))
+
+    def test_METHOD_remove_state_change__removes_only_that_block(self):
+        for block_num in ['100', '200', '300']:
+            self.state_history.save_state_change(key=self.key, block_num=block_num, value=int(block_num))
+
+        self.state_history.remove_state_change(key=self.key, block_num='200')
+        self.assertEqual(100, self.state_history.get_previous_change(key=self.key, block_num='300'))
+
+        self.state_history.remove_state_change(key=self.key, block_num='300')
+        self.assertEqual((100, True, 100), self.state_history.find_change(key=self.key, block_num=MAX_BLOCK))
+
+    def test_METHOD_remove_state_change__latest_change_is_truncated_without_reading_the_history(self):
+        for block_num in ['100', '200', '300']:
+            self.state_history.save_state_change(key=self.key, block_num=block_num)
+
+        with mock.patch.object(self.state_history, '_read_records') as read_records:
+            self.state_history.remove_state_change(key=self.key, block_num='300')
+            self.state_history.remove_state_change(key=self.key, block_num='250')
+
+        read_records.assert_called_once()
+        self.assertEqual([100, 200], self.state_history.get_file(hash_str=create_hash_512(string=self.key)))
+
+    def test_METHOD_rollback__truncates_later_changes(self):
+        for block_num in ['100', '200', '300']:
+            self.state_history.save_state_change(key=self.key, block_num=block_num)
+
+        self.state_history.rollback(key=self.key, block_num='200')
+
+        self.assertEqual(200, self.state_history.get_previous_change(key=self.key, block_num='1000'))
+
+        self.state_history.save_state_change(key=self.key, block_num='250')
+        self.assertEqual(250, self.state_history.get_previous_change(key=self.key, block_num='1000'))
+
+    def test_METHOD_get_previous_change__reads_and_converts_legacy_json_history(self):
+        hash_str = create_hash_512(string=self.key)
+        legacy_path = os.path.join(self.state_history.get_directory(hash_str), hash_str)
+        os.makedirs(os.path.dirname(legacy_path))
+        with open(legacy_path, 'w') as f:
+            json.dump([300, 200, 100], f)
+
+        self.assertEqual(200, self.state_history.get_previous_change(key=self.key, block_num='250'))
+        self.assertFalse(os.path.exists(legacy_path))
+
+    def test_METHOD_migrate__converts_every_legacy_file(self):
+        for key in [self.key, 'currency.balances:stu']:
+            hash_str = create_hash_512(string=key)
+            legacy_path = os.path.join(self.state_history.get_directory(hash_str), hash_str)
+            os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
+            with open(legacy_path, 'w') as f:
+                json.dump([200, 100], f)
+
+        self.assertEqual(2, self.state_history.migrate())
+        self.assertEqual([100, 200], self.state_history.get_file(hash_str=create_hash_512(string='currency.balances:stu')))
+
+
+class TestSegmentBlockDriver(TestCase):
+    def setUp(self):
+        self.test_dir = './.lamden'
+        self.blocks_path = os.path.join(self.test_dir, 'block_segments')
+
+        self.create_directories()
+
+        self.block_driver = SegmentBlockDriver(root=self.blocks_path)
+
+    def tearDown(self):
+        self.block_driver.close()
+
+    def create_directories(self):
+        if os.path.exists(Path(self.test_dir)):
+            shutil.rmtree(Path(self.test_dir))
+
+        os.makedirs(Path(self.test_dir))
+
+    def create_block_list(self, amount, start=1689708055238093056):
+        return [
+            {'number': str(start + i), 'hash': Wallet().verifying_key, 'processed': Wallet().verifying_key}
+            for i in range(amount)
+        ]
+
+    def test_METHOD_write_block__can_write_and_find_a_block(self):
+        block = self.create_block_list(amount=1)[0]
+        self.block_driver.write_block(block=block)
+
+        self.assertDictEqual(block, self.block_driver.find_block(block_num=block.get('number')))
+        self.assertTrue(self.block_driver.block_exists(block_num=block.get('number')))
+        self.assertEqual(1, self.block_driver.total_files)
+
+    def test_METHOD_find_block_by_hash__returns_block(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        block = self.block_driver.find_block_by_hash(block_hash=block_list[1].get('hash'))
+
+        self.assertDictEqual(block_list[1], block)
+
+    def test_METHOD_find_next_block__and_find_previous_block(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.assertDictEqual(block_list[0], self.block_driver.find_next_block(block_num=-1))
+        self.assertDictEqual(block_list[2], self.block_driver.find_next_block(block_num=block_list[1].get('number')))
+        self.assertDictEqual(block_list[2], self.block_driver.find_previous_block(block_num=MAX_BLOCK))
+        self.assertIsNone(self.block_driver.find_previous_block(block_num=block_list[0].get('number')))
+
+    def test_METHOD_find_next_blocks__returns_range(self):
+        block_list = self.create_block_list(amount=10)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        blocks = self.block_driver.find_next_blocks(block_num=block_list[2].get('number'), amount_of_blocks=3)
+
+        self.assertEqual(block_list[2:6], blocks)
+
+    def test_METHOD_find_previous_blocks__returns_range(self):
+        block_list = self.create_block_list(amount=10)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        blocks = self.block_driver.find_previous_blocks(block_num=block_list[5].get('number'), amount_of_blocks=3)
+
+        self.assertEqual(list(reversed(block_list[2:6])), blocks)
+
+    def test_METHOD_delete_block__removes_block_and_hash(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.block_driver.delete_block(block_num=block_list[2].get('number'))
+
+        self.assertIsNone(self.block_driver.find_block(block_num=block_list[2].get('number')))
+        self.assertIsNone(self.block_driver.find_block_by_hash(block_hash=block_list[2].get('hash')))
+        self.assertDictEqual(block_list[1], self.block_driver.find_previous_block(block_num=MAX_BLOCK))
+        self.assertEqual(2, self.block_driver.total_files)
+
+    def test_METHOD_find_blocks__only_merges_reads_of_nearby_records(self):
+        block_list = self.create_block_list(amount=3)
+        block_list[1]['processed'] = 'x' * 10_000
+        self.block_driver.write_blocks(block_list=block_list)
+
+        with mock.patch('lamden.storage.os.pread', wraps=os.pread) as pread:
+            blocks = self.block_driver.find_blocks(block_list=[block_list[0].get('number'), block_list[2].get('number')])
+
+        self.assertEqual([block_list[0], block_list[2]], blocks)
+        self.assertEqual(2, pread.call_count)
+        self.assertTrue(all(call.args[1] < 10_000 for call in pread.call_args_list))
+
+        with mock.patch('lamden.storage.os.pread', wraps=os.pread) as pread:
+            blocks = self.block_driver.find_blocks(block_list=[block.get('number') for block in block_list])
+
+        self.assertEqual(block_list, blocks)
+        self.assertEqual(1, pread.call_count)
+
+    def test_INSTANCE_segments_roll_over_at_max_size(self):
+        self.block_driver = SegmentBlockDriver(root=self.blocks_path, max_segment_size=1_000)
+
+        block_list = self.create_block_list(amount=50)
+        for block in block_list:
+            self.block_driver.write_block(block=block)
+
+        self.assertGreater(len(self.block_driver._segment_ids()), 1)
+        self.assertEqual(block_list, self.block_driver.find_next_blocks(block_num=block_list[0].get('number'), amount_of_blocks=49))
+
+    def test_INSTANCE_reloads_index_on_startup_and_follows_other_instances(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list[:2])
+
+        reader = SegmentBlockDriver(root=self.blocks_path)
+        self.assertEqual(2, reader.total_files)
+
+        self.block_driver.write_block(block=block_list[2])
+        self.block_driver.delete_block(block_num=block_list[0].get('number'))
+
+        self.assertDictEqual(block_list[2], reader.find_previous_block(block_num=MAX_BLOCK))
+        self.assertIsNone(reader.find_block(block_num=block_list[0].get('number')))
+        reader.close()
+
+    def test_METHOD_rebuild_index__recovers_blocks_from_segments(self):
+        block_list = self.create_block_list(amount=5)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        os.remove(self.block_driver.index_path)
+
+        block_driver = SegmentBlockDriver(root=self.blocks_path)
+
+        self.assertEqual(5, block_driver.total_files)
+        self.assertDictEqual(block_list[3], block_driver.find_block_by_hash(block_hash=block_list[3].get('hash')))
+        block_driver.close()
+
+    def test_METHOD_flush__removes_all_blocks(self):
+        self.block_driver.write_blocks(block_list=self.create_block_list(amount=3))
+
+        self.block_driver.flush()
+
+        self.assertEqual(0, self.block_driver.total_files)
+        self.assertIsNone(self.block_driver.find_next_block(block_num=-1))
+
+
+class TestSegmentHashStorageDriver(TestCase):
+    def setUp(self):
+        self.test_dir = './.lamden'
+
+        if os.path.exists(Path(self.test_dir)):
+            shutil.rmtree(Path(self.test_dir))
+
+        self.tx_driver = SegmentHashStorageDriver(root=os.path.join(self.test_dir, 'tx_segments'))
+
+    def tearDown(self):
+        self.tx_driver.close()
+
+    def test_METHOD_write_file__can_write_and_get_file(self):
+        tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
+
+        self.tx_driver.write_file(hash_str=tx_hash, data={'hash': tx_hash})
+
+        self.assertDictEqual({'hash': tx_hash}, self.tx_driver.get_file(hash_str=tx_hash))
+
+    def test_METHOD_get_file__returns_None_if_file_not_exist(self):
+        self.assertIsNone(self.tx_driver.get_file(hash_str='ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'))
+
+    def test_METHOD_delete_file__removes_file(self):
+        tx_hash = 'ffe2f8ef7664c12804739a5a4b8ede34aa61a99111eae760c5a114e26774711c'
+
+        self.tx_driver.write_file(hash_str=tx_hash, data={'hash': tx_hash})
+        self.tx_driver.delete_file(hash_str=tx_hash)
+
+        self.assertIsNone(self.tx_driver.get_file(hash_str=tx_hash))
+
+
+class TestBlockStorageWithSegmentDrivers(TestCase):
+    driver_type = 'segment'
+
+    def setUp(self):
+        self.temp_storage_dir = os.path.abspath("./.lamden")
+
+        if os.path.exists(self.temp_storage_dir):
+            shutil.rmtree(self.temp_storage_dir)
+
+        self.bs = BlockStorage(root=self.temp_storage_dir, driver_type=self.driver_type)
+
+        self.hlc_clock = HLC_Clock()
+
+    def tearDown(self):
+        if os.path.isdir(self.temp_storage_dir):
+            shutil.rmtree(self.temp_storage_dir)
+
+    def test_store_block__and_get_block_by_number_and_hash(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        self.assertIsNone(self.bs.block_hash_index)
+
+        block = self.bs.get_block(v=int(blocks[1].get('number')))
+        self.assertEqual(blocks[1].get('processed'), block.get('processed'))
+
+        block = self.bs.get_block(v=blocks[1].get('hash'))
+        self.assertEqual(blocks[1].get('number'), block.get('number'))
+
+        self.assertEqual(blocks[-1].get('hash'), self.bs.get_latest_block_hash())
+
+    def test_remove_block__removes_block_and_tx(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        self.bs.remove_block(v=blocks[-1].get('number'))
+
+        self.assertIsNone(self.bs.get_tx(h=blocks[-1]['processed']['hash']))
+        self.assertEqual(blocks[0].get('hash'), self.bs.get_latest_block_hash())
+
+
+    def test_get_latest_block_hash__sees_blocks_stored_by_other_instances(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        self.bs.store_block(copy.deepcopy(blocks[0]))
+        self.assertEqual(blocks[0].get('hash'), self.bs.get_latest_block_hash())
+
+        writer = BlockStorage(root=self.temp_storage_dir, driver_type=self.driver_type)
+        writer.store_block(copy.deepcopy(blocks[1]))
+
+        self.assertEqual(blocks[1].get('hash'), self.bs.get_latest_block_hash())
+
+    def test_iter_blocks__walks_range_both_ways(self):
+        blocks = generate_blocks(
+            number_of_blocks=5,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        numbers = [b.get('number') for b in blocks]
+
+        self.assertEqual(numbers[1:], [b.get('number') for b in self.bs.iter_blocks(start=numbers[1], readahead=2)])
+        self.assertEqual(list(reversed(numbers[:4])), [b.get('number') for b in self.bs.iter_blocks(end=numbers[3], reverse=True, readahead=2)])
+        self.assertDictEqual(blocks[2].get('processed'), list(self.bs.iter_blocks(start=numbers[2], end=numbers[2]))[0].get('processed'))
+
+class TestBlockStorageWithSQLiteDrivers(TestBlockStorageWithSegmentDrivers):
+    driver_type = 'sqlite'
+
+    def test_INSTANCE_driver_type__can_be_set_from_environment(self):
+        os.environ[BLOCK_DRIVER_ENV] = 'sqlite'
+        try:
+            bs = BlockStorage(root=self.temp_storage_dir)
+        finally:
+            del os.environ[BLOCK_DRIVER_ENV]
+
+        self.assertIsInstance(bs.block_driver, SQLiteBlockDriver)
+        self.assertIsInstance(bs.tx_driver, SQLiteHashStorageDriver)
+
+    def test_INSTANCE_unknown_driver_type_raises(self):
+        with self.assertRaises(ValueError):
+            BlockStorage(root=self.temp_storage_dir, driver_type='tape')
+
+
+class TestSQLiteBlockDriver(TestCase):
+    def setUp(self):
+        self.test_dir = './.lamden'
+
+        if os.path.exists(Path(self.test_dir)):
+            shutil.rmtree(Path(self.test_dir))
+
+        self.block_driver = SQLiteBlockDriver(root=os.path.join(self.test_dir, 'sqlite'))
+
+    def tearDown(self):
+        self.block_driver.close()
+
+    def create_block_list(self, amount, start=1689708055238093056):
+        return [
+            {'number': str(start + i), 'hash': Wallet().verifying_key, 'processed': Wallet().verifying_key}
+            for i in range(amount)
+        ]
+
+    def test_METHOD_write_blocks__can_write_and_find_blocks(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.assertDictEqual(block_list[1], self.block_driver.find_block(block_num=block_list[1].get('number')))
+        self.assertEqual(block_list, self.block_driver.find_blocks(block_list=[b.get('number') for b in block_list]))
+        self.assertEqual(3, self.block_driver.total_files)
+
+    def test_METHOD_find_block_by_hash__and_tx_hash(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.assertDictEqual(block_list[1], self.block_driver.find_block_by_hash(block_hash=block_list[1].get('hash')))
+        self.assertDictEqual(block_list[2], self.block_driver.find_block_by_tx_hash(tx_hash=block_list[2].get('processed')))
+
+    def test_METHOD_find_next_block__and_find_previous_block(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.assertDictEqual(block_list[0], self.block_driver.find_next_block(block_num=-1))
+        self.assertDictEqual(block_list[2], self.block_driver.find_next_block(block_num=block_list[1].get('number')))
+        self.assertDictEqual(block_list[2], self.block_driver.find_previous_block(block_num=MAX_BLOCK))
+        self.assertIsNone(self.block_driver.find_previous_block(block_num=block_list[0].get('number')))
+
+    def test_METHOD_find_next_blocks__and_find_previous_blocks__return_ranges(self):
+        block_list = self.create_block_list(amount=10)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.assertEqual(block_list[2:6], self.block_driver.find_next_blocks(block_num=block_list[2].get('number'), amount_of_blocks=3))
+        self.assertEqual(list(reversed(block_list[2:6])), self.block_driver.find_previous_blocks(block_num=block_list[5].get('number'), amount_of_blocks=3))
+
+    def test_METHOD_find_next_block_numbers__and_find_previous_block_numbers(self):
+        block_list = self.create_block_list(amount=10)
+        self.block_driver.write_blocks(block_list=block_list)
+        numbers = [int(b.get('number')) for b in block_list]
+
+        self.assertEqual(numbers[3:6], self.block_driver.find_next_block_numbers(block_num=numbers[2], amount_of_blocks=3))
+        self.assertEqual(list(reversed(numbers[:2])), self.block_driver.find_previous_block_numbers(block_num=numbers[2], amount_of_blocks=3))
+
+    def test_METHOD_delete_blocks__removes_blocks(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list)
+
+        self.block_driver.delete_blocks(block_list=[block_list[1].get('number'), block_list[2].get('number')])
+
+        self.assertFalse(self.block_driver.block_exists(block_num=block_list[2].get('number')))
+        self.assertDictEqual(block_list[0], self.block_driver.find_previous_block(block_num=MAX_BLOCK))
+        self.assertEqual(1, self.block_driver.total_files)
+
+    def test_INSTANCE_total_files__counts_only_rows_added_or_removed(self):
+        block_list = self.create_block_list(amount=3)
+        self.block_driver.write_blocks(block_list=block_list[:2])
+
+        self.block_driver.write_blocks(block_list=block_list[1:] + block_list[2:])
+        self.assertEqual(3, self.block_driver.total_files)
+
+        self.block_driver.delete_blocks(block_list=[block_list[0].get('number'), '1'])
+        self.assertEqual(2, self.block_driver.total_files)
+
+        self.assertEqual(self.block_driver.get_total_blocks(), self.block_driver.total_files)
+        self.assertEqual(2, SQLiteBlockDriver(root=self.block_driver.root).total_files)
+
+
+class TestBlockDriverBenchmark(TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath('./.lamden')
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_compare_block_drivers(self):
+        amount_of_blocks = 1000
+        start = 1689708055238093056
+        block_list = [
+            {'number': str(start + i * 1_000_000_000), 'hash': Wallet().verifying_key, 'processed': {'hash': str(i)}}
+            for i in range(amount_of_blocks)
+        ]
+
+        print(" ")
+        for driver_type in ['fs', 'segment', 'sqlite']:
+            block_driver, _ = create_block_drivers(root=os.path.join(self.test_dir, driver_type), driver_type=driver_type)
+
+            start_time = time.time()
+            for block in block_list:
+                block_driver.write_block(block=block)
+            write_time = time.time() - start_time
+
+            start_time = time.time()
+            block = block_driver.find_next_block(block_num=-1)
+            while block is not None:
+                block = block_driver.find_next_block(block_num=block.get('number'))
+            walk_time = time.time() - start_time
+
+            start_time = time.time()
+            blocks = block_driver.find_next_blocks(block_num=block_list[0].get('number'), amount_of_blocks=amount_of_blocks)
+            range_time = time.time() - start_time
+
+            start_time = time.time()
+            for _ in range(amount_of_blocks):
+                block_driver.find_previous_block(block_num=MAX_BLOCK)
+            latest_time = time.time() - start_time
+
+            print({
+                'driver': driver_type,
+                'write_sec': round(write_time, 4),
+                'walk_sec': round(walk_time, 4),
+                'range_sec': round(range_time, 4),
+                'latest_sec': round(latest_time, 4)
+            })
+
+            self.assertEqual(amount_of_blocks, len(blocks))
+
+    def test_compare_nonce_admission(self):
+        amount_of_txs = 2000
+        senders = [Wallet().verifying_key for _ in range(50)]
+        processor = Wallet().verifying_key
+
+        print(" ")
+        # Write-through baseline: every check and every admitted nonce goes straight to the FSDriver.
+        driver = FSDriver(root=os.path.join(self.test_dir, 'write_through'))
+        start_time = time.time()
+        for i in range(amount_of_txs):
+            sender = senders[i % len(senders)]
+            key = NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor
+            driver.get(PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor)
+            nonce = driver.get(key)
+            driver.set(key, 0 if nonce is None else nonce + 1)
+        write_through_time = time.time() - start_time
+
+        results = {}
+        for name, commit_every in [('webserver', 1), ('node', 100)]:
+            nonces = NonceStorage(root=os.path.join(self.test_dir, name))
+            start_time = time.time()
+            for i in range(amount_of_txs):
+                sender = senders[i % len(senders)]
+                nonces.get_pending_nonce(sender=sender, processor=processor)
+                nonce = nonces.get_nonce(sender=sender, processor=processor)
+                nonces.set_nonce(sender=sender, processor=processor, value=0 if nonce is None else nonce + 1)
+                if (i + 1) % commit_every == 0:
+                    nonces.commit()
+            nonces.commit()
+            results[name] = time.time() - start_time
+
+            self.assertEqual(
+                NonceStorage(root=os.path.join(self.test_dir, name)).get_nonce(sender=senders[0], processor=processor),
+                amount_of_txs // len(senders) - 1
+            )
+
+        print({
+            'txs': amount_of_txs,
+            'write_through_tx_per_sec': round(amount_of_txs / write_through_time),
+            'commit_per_tx_tx_per_sec': round(amount_of_txs / results['webserver']),
+            'commit_per_block_tx_per_sec': round(amount_of_txs / results['node'])
+        })
+
+    def test_compare_compression(self):
+        blocks = generate_blocks(
+            number_of_blocks=300,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )
+
+        print(" ")
+        for compression, train in [('none', False), ('zlib', False), ('zlib', True), ('lzma', False)]:
+            root = os.path.join(self.test_dir, f'{compression}_{train}')
+            codec = StorageCodec(dictionaries_dir=os.path.join(root, 'dictionaries'), compression=compression)
+            if train:
+                codec.train_dictionary(samples=[json.dumps(b).encode() for b in blocks[:50]])
+
+            block_driver = FSBlockDriver(root=os.path.join(root, 'blocks'), codec=codec)
+            block_driver.write_blocks(block_list=blocks)
+
+            size = sum(entry.stat().st_size for entry in block_driver._iterate_files(block_driver.root))
+
+            start_time = time.time()
+            for block in blocks:
+                block_driver.find_block(block_num=block.get('number'))
+            read_time = time.time() - start_time
+
+            print({
+                'compression': compression,
+                'dictionary': train,
+                'bytes': size,
+                'read_ms_per_block': round(read_time / len(blocks) * 1000, 4)
+            })
+
+            if compression == 'none':
+                plain_size = size
+            else:
+                self.assertLess(size, plain_size)
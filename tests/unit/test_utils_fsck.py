@@ -0,0 +1,184 @@
+from lamden.crypto.wallet import Wallet
+from lamden.utils import fsck
+from lamden.utils.fsck import StorageChecker
+from lamden.storage import BlockStorage
+from lamden.nodes.hlc import HLC_Clock
+from tests.unit.helpers.mock_blocks import generate_blocks, GENESIS_BLOCK
+
+import os
+import copy
+import shutil
+from unittest import TestCase
+
+
+class TestStorageChecker(TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath('./.lamden')
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.bs = BlockStorage(root=self.test_dir)
+        self.hlc_clock = HLC_Clock()
+
+        self.blocks = self.store_chain()
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def store_chain(self, amount: int = 5) -> list:
+        blocks = generate_blocks(
+            number_of_blocks=amount,
+            prev_block_hash=GENESIS_BLOCK.get('hash'),
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        self.bs.store_block(copy.deepcopy(GENESIS_BLOCK))
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        return blocks
+
+    def check(self, repair: bool = False, processes: int = 1, shard_size: int = 2, wallet: Wallet = None) -> dict:
+        return StorageChecker(
+            lamden_root=self.test_dir, roots={}, processes=processes, repair=repair, shard_size=shard_size, wallet=wallet
+        ).start()
+
+    def test_start__finds_nothing_on_consistent_storage(self):
+        report = self.check()
+
+        self.assertEqual({}, report['issues'])
+        self.assertEqual(6, report['checked']['blocks'])
+        self.assertEqual(5, report['checked']['txs'])
+
+    def test_start__same_report_from_process_pool(self):
+        self.bs.tx_driver.write_file(hash_str='a' * 64, data={'hash': 'a' * 64, 'hlc_timestamp': self.blocks[0]['hlc_timestamp']})
+
+        inline = self.check()
+        pooled = self.check(processes=2)
+
+        self.assertEqual(inline['checked'], pooled['checked'])
+        self.assertEqual({fsck.ORPHAN_TX: 1}, pooled['issues'])
+
+    def test_start__finds_broken_chain_across_shards(self):
+        block = self.bs.block_driver.find_block(block_num=self.blocks[1].get('number'))
+        block['previous'] = 'f' * 64
+        self.bs.block_driver.write_block(block=block)
+
+        for shard_size in [2, 100]:
+            report = self.check(shard_size=shard_size)
+            self.assertEqual([int(self.blocks[1].get('number'))], report['examples'][fsck.BROKEN_CHAIN])
+
+    def test_start__skips_links_into_pruned_range(self):
+        self.bs.prune_blocks(keep_blocks=3)
+
+        self.assertEqual({}, self.check()['issues'])
+
+    def test_start__reports_missing_tx_without_repairing_it(self):
+        tx_hash = self.blocks[2]['processed']['hash']
+        self.bs.tx_driver.delete_file(hash_str=tx_hash)
+
+        report = self.check(repair=True)
+
+        self.assertEqual([(int(self.blocks[2].get('number')), tx_hash)], report['examples'][fsck.MISSING_TX])
+        self.assertNotIn(fsck.MISSING_TX, report['repaired'])
+
+    def test_start__repairs_orphan_txs_and_empty_directories(self):
+        orphan_hlc = self.hlc_clock.get_new_hlc_timestamp()
+        self.bs.tx_driver.write_file(hash_str='a' * 64, data={'hash': 'a' * 64, 'hlc_timestamp': orphan_hlc})
+        os.makedirs(os.path.join(self.bs.state_history_dir, 'ff', 'ff'))
+
+        report = self.check()
+        self.assertEqual(['a' * 64], report['examples'][fsck.ORPHAN_TX])
+        self.assertEqual(1, report['issues'][fsck.EMPTY_DIRECTORY])
+
+        report = self.check(repair=True)
+        self.assertEqual(1, report['repaired'][fsck.ORPHAN_TX])
+        self.assertIsNone(self.bs.tx_driver.get_file(hash_str='a' * 64))
+
+        # Parents left empty by the repair go too.
+        self.assertEqual(2, report['repaired'][fsck.EMPTY_DIRECTORY])
+        self.assertFalse(os.path.exists(os.path.join(self.bs.state_history_dir, 'ff')))
+
+        self.assertEqual({}, self.check()['issues'])
+
+    def test_start__repairs_missing_and_dangling_hash_index_entries(self):
+        self.bs.block_hash_index.remove(hash_str=self.blocks[3].get('hash'))
+        self.bs.block_hash_index.put(hash_str='b' * 64, block_num=1)
+
+        report = self.check()
+        self.assertEqual(
+            [(int(self.blocks[3].get('number')), self.blocks[3].get('hash'))], report['examples'][fsck.MISSING_HASH_INDEX]
+        )
+        self.assertEqual(1, report['issues'][fsck.DANGLING_HASH_INDEX])
+
+        self.check(repair=True)
+
+        self.assertEqual({}, self.check()['issues'])
+        self.assertIsNone(self.bs.block_hash_index.get(hash_str='b' * 64))
+        self.assertEqual(self.blocks[3].get('hash'), self.bs.get_block(v=self.blocks[3].get('hash')).get('hash'))
+
+    def test_start__repairs_missing_and_dangling_state_history(self):
+        block_num = self.blocks[2].get('number')
+        self.bs.state_history.remove_state_change(key='lets', block_num=block_num)
+        self.bs.state_history.save_state_change(key='blue', block_num='1', value='birds')
+
+        report = self.check()
+        self.assertEqual([('lets', int(block_num), 'go')], report['examples'][fsck.MISSING_STATE_HISTORY])
+        self.assertEqual(1, report['issues'][fsck.DANGLING_STATE_HISTORY])
+
+        report = self.check(repair=True, processes=2)
+        self.assertEqual(1, report['repaired'][fsck.MISSING_STATE_HISTORY])
+        self.assertEqual(1, report['repaired'][fsck.DANGLING_STATE_HISTORY])
+
+        self.assertEqual({}, self.check()['issues'])
+        self.assertEqual('go', self.bs.get_state_value_at(key='lets', block_num=block_num))
+
+    def test_start__puts_unindexed_block_files_back_in_the_index(self):
+        block_num = self.blocks[4].get('number')
+        file_path = self.bs.block_driver.get_file_path(block_num=block_num.zfill(64))
+
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        self.bs.block_driver.delete_block(block_num=block_num)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+
+        report = self.check()
+        self.assertEqual([int(block_num)], report['examples'][fsck.UNINDEXED_BLOCK])
+
+        report = self.check(repair=True)
+        self.assertEqual(1, report['repaired'][fsck.UNINDEXED_BLOCK])
+
+        self.assertEqual({}, self.check()['issues'])
+        self.assertEqual(6, BlockStorage(root=self.test_dir).total_blocks())
+
+    def test_start__removes_leftover_block_aliases(self):
+        os.makedirs(self.bs.blocks_alias_dir)
+
+        self.assertEqual(1, self.check()['issues'][fsck.LEGACY_ALIASES])
+
+        self.check(repair=True)
+        self.assertFalse(self.bs.blocks_alias_dir.exists())
+
+    def test_start__repairs_member_history_only_with_a_wallet(self):
+        wallet = Wallet()
+        members = [Wallet().verifying_key, Wallet().verifying_key]
+
+        block = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash=self.blocks[-1].get('hash'),
+            prev_block_hlc=self.blocks[-1].get('hlc_timestamp')
+        )[0]
+        block['processed']['state'].append({'key': fsck.MEMBERS_KEY, 'value': members})
+        self.bs.store_block(copy.deepcopy(block))
+
+        report = self.check(repair=True)
+        self.assertEqual([(block.get('number'), members)], report['examples'][fsck.MISSING_MEMBER_HISTORY])
+        self.assertNotIn(fsck.MISSING_MEMBER_HISTORY, report['repaired'])
+
+        report = self.check(repair=True, wallet=wallet)
+        self.assertEqual(1, report['repaired'][fsck.MISSING_MEMBER_HISTORY])
+
+        self.assertEqual({}, self.check(wallet=wallet)['issues'])
@@ -1,5 +1,5 @@
 from lamden.utils.migrate_blocks_dir import MigrateFiles
-from lamden.storage import FSBlockDriver
+from lamden.storage import FSBlockDriver, FSBlockHashIndex, BLOCK_HASH_INDEX_FILENAME
 
 import os
 import shutil
@@ -116,5 +116,18 @@ class TestMigrateBlocksDir(TestCase):
             block = self.create_block(block_num=filename)
             self.assertDictEqual(block, migrated_file)
 
+    def test_migrate_blocks_dir_indexes_block_hashes(self):
+        self.create_block_files(10)
 
+        block_migration = MigrateFiles(
+            src_path=self.blocks_path,
+            dest_path=self.blocks_dest_path,
+            testing=True
+        )
 
+        block_migration.start()
+
+        block_hash_index = FSBlockHashIndex(path=os.path.join(self.test_dir, BLOCK_HASH_INDEX_FILENAME))
+        self.assertEqual(10, len(block_migration.migrated_files))
+        for filename in block_migration.migrated_files:
+            self.assertEqual(int(filename), block_hash_index.get(hash_str=self.create_hash(data=filename)))
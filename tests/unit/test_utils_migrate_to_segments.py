@@ -0,0 +1,118 @@
+from lamden.utils.migrate_to_segments import MigrateToSegments, MigrateBlockDriver
+from lamden.storage import BlockStorage
+from lamden.nodes.hlc import HLC_Clock
+from tests.unit.helpers.mock_blocks import generate_blocks
+
+import os
+import copy
+import shutil
+from unittest import TestCase
+
+
+class TestMigrateToSegments(TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath('./.lamden')
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.bs = BlockStorage(root=self.test_dir)
+        self.hlc_clock = HLC_Clock()
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def store_blocks_days_apart(self, bs, days_back: int) -> list:
+        blocks = generate_blocks(
+            number_of_blocks=4,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        # The first two blocks are moved back in time so they fall in an old day bucket.
+        for block in blocks[:2]:
+            block['number'] = str(int(block.get('number')) - days_back * bs.block_driver.day)
+
+        for block in blocks:
+            bs.store_block(copy.deepcopy(block))
+
+        return blocks
+
+    def assert_migrated(self, blocks: list):
+        migrated = BlockStorage(root=self.test_dir, driver_type='segment')
+
+        self.assertEqual(len(blocks), migrated.total_blocks())
+        for block in blocks:
+            self.assertDictEqual(block, migrated.get_block(v=block.get('hash')))
+
+    def test_migrate_to_segments_works(self):
+        blocks = generate_blocks(
+            number_of_blocks=5,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        migration = MigrateToSegments(lamden_root=self.test_dir, batch_size=2, testing=True)
+        migration.start()
+
+        self.assertEqual([block.get('number') for block in blocks], migration.migrated_blocks)
+
+        migrated = BlockStorage(root=self.test_dir, driver_type='segment')
+
+        for block in blocks:
+            self.assertEqual(self.bs.get_block(v=block.get('hash')), migrated.get_block(v=block.get('hash')))
+
+    def test_migrate_to_sqlite_works(self):
+        blocks = generate_blocks(
+            number_of_blocks=5,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        migration = MigrateBlockDriver(lamden_root=self.test_dir, driver_type='sqlite', batch_size=2)
+        migration.start()
+
+        migrated = BlockStorage(root=self.test_dir, driver_type='sqlite')
+
+        for block in blocks:
+            self.assertEqual(self.bs.get_block(v=block.get('hash')), migrated.get_block(v=block.get('hash')))
+
+    def test_migrate_to_segments__reads_packed_buckets(self):
+        blocks = self.store_blocks_days_apart(bs=self.bs, days_back=40)
+        self.assertEqual(1, self.bs.compact_cold_blocks(keep_days=30))
+
+        MigrateToSegments(lamden_root=self.test_dir, batch_size=3).start()
+
+        self.assert_migrated(blocks=blocks)
+
+    def test_migrate_to_segments__reads_cold_tier_buckets(self):
+        roots = {'cold_blocks': os.path.join(self.test_dir, 'cold')}
+        bs = BlockStorage(root=self.test_dir, roots=roots)
+        blocks = self.store_blocks_days_apart(bs=bs, days_back=40)
+        self.assertEqual(1, bs.move_to_cold_tier(keep_days=30))
+
+        MigrateToSegments(lamden_root=self.test_dir, batch_size=3, roots=roots).start()
+
+        self.assert_migrated(blocks=blocks)
+
+    def test_migrate_to_segments__stops_when_a_tx_is_missing(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        self.bs.tx_driver.delete_file(hash_str=blocks[1]['processed'].get('hash'))
+
+        with self.assertRaises(ValueError):
+            MigrateToSegments(lamden_root=self.test_dir).start()
@@ -7,6 +7,7 @@ from lamden.nodes.hlc import HLC_Clock
 from lamden.crypto.canonical import tx_result_hash_from_tx_result_object
 from tests.unit.helpers.mock_transactions import get_new_currency_tx, get_tx_message, get_processing_results, get_new_processing_result
 import asyncio
+import time
 import hashlib
 from contracting.db.encoder import encode
 
@@ -495,6 +496,33 @@ class TestValidationQueue(TestCase):
         self.assertTrue(self.hard_apply_block_called)
         self.assertEqual(len(self.validation_queue), 0)
 
+    def test_time_until_recheck__NONE_without_results(self):
+        self.assertIsNone(self.validation_queue.time_until_recheck())
+
+    def test_time_until_recheck__waits_up_to_recheck_interval_for_results_without_consensus(self):
+        pr = self.add_solution()
+        hlc_timestamp = pr['hlc_timestamp']
+
+        # Not looked at yet.
+        self.assertEqual(0, self.validation_queue.time_until_recheck())
+
+        self.validation_queue.started_checking[hlc_timestamp] = time.time()
+        self.assertAlmostEqual(self.validation_queue.recheck_interval, self.validation_queue.time_until_recheck(), delta=0.05)
+
+        self.validation_queue.started_checking[hlc_timestamp] = time.time() - self.validation_queue.checking_timeout
+        self.assertLessEqual(self.validation_queue.time_until_recheck(), 0)
+
+        self.validation_queue.started_checking[hlc_timestamp] = time.time()
+        self.validation_queue.validation_results[hlc_timestamp]['last_check_info']['has_consensus'] = True
+        self.assertEqual(0, self.validation_queue.time_until_recheck())
+
+    def test_append__wakes_the_queue(self):
+        self.validation_queue.wakeup.clear()
+
+        self.add_solution()
+
+        self.assertTrue(self.validation_queue.wakeup.is_set())
+
     def test_check_all_returns_if_already_checking(self):
         self.validation_queue.checking = True
         self.check_all()
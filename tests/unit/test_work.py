@@ -4,6 +4,7 @@ from lamden.crypto.canonical import tx_hash_from_tx
 from lamden.crypto.wallet import Wallet
 from lamden.network import Network
 from lamden.nodes.hlc import HLC_Clock
+from lamden.nodes.hold_time import HoldTime
 from lamden.nodes.processors.work import WorkValidator, OLDER_HLC_RECEIVED, MASTERNODE_NOT_KNOWN, valid_message_payload
 from unittest import TestCase
 import asyncio
@@ -194,6 +195,28 @@ class TestWorkValidator(TestCase):
             self.assertIn(f'{msg["hlc_timestamp"]} received AFTER {self.last_processed_hlc} was processed!', log.output[0])
             self.assertEqual(1, len(self.main_processing_queue))
 
+    def test_process_message_records_lag_of_peer_work(self):
+        self.wv.hold_time = HoldTime(min_samples=1, update_interval=0)
+        self.wv.known_masternode = lambda msg: True
+
+        self.process_message(self.make_tx(wallet=self.wallet))
+        self.assertEqual({}, self.wv.hold_time.lags)
+
+        peer_wallet = Wallet()
+        self.process_message(self.make_tx(wallet=peer_wallet))
+
+        self.assertEqual(1, len(self.wv.hold_time.lags[peer_wallet.verifying_key]))
+        self.assertIsNotNone(self.wv.hold_time.hold_time)
+
+    def test_process_message_older_than_last_processed_backs_off_hold_time(self):
+        self.wv.hold_time = HoldTime()
+        msg = self.make_tx(wallet=self.wallet)
+        self.last_processed_hlc = self.hlc_clock.get_new_hlc_timestamp()
+
+        self.process_message(msg)
+
+        self.assertGreater(self.wv.hold_time.backoff_until, 0)
+
     def test_process_message_doesnt_append_message_if_unknown_masternode(self):
         msg = self.make_tx()
 